@@ -0,0 +1,136 @@
+"""Agendamento alinhado ao fecho das velas e vigia rápido de stop-loss/take-profit.
+
+Os sinais só mudam quando fecha uma vela de ``TIMEFRAME``; avaliá-los a cada
+5 segundos repete o mesmo trabalho sobre os mesmos dados. ``AgendadorVelas``
+corre o pipeline de sinal uma vez por vela fechada, alinhado à hora do
+servidor da Binance (``RelogioServidor``), enquanto ``VigiaSLTP`` verifica o
+preço numa thread própria, com latência baixa, para disparar a saída por
+stop-loss/take-profit assim que o nível é cruzado. A sincronização entre os
+dois caminhos (lock sobre o estado da posição) fica a cargo de quem os usa.
+"""
+import logging
+import threading
+import time
+
+from velas import intervalo_ms
+
+logger = logging.getLogger(__name__)
+
+
+class RelogioServidor:
+    """Hora do servidor da Binance em ms, estimada a partir do relógio local e de um desvio medido."""
+
+    def __init__(self, client=None, relogio=time.time, ressincronizar=3600):
+        self.client = client
+        self.relogio = relogio
+        self.ressincronizar = ressincronizar
+        self.desvio_ms = 0.0
+        self._sincronizado_em = None
+
+    def sincronizar(self):
+        """Mede o desvio para o servidor (get_server_time), compensando metade da latência do pedido."""
+        if self.client is None:
+            return self.desvio_ms
+        antes = self.relogio()
+        servidor = self.client.get_server_time()['serverTime']
+        depois = self.relogio()
+        self.desvio_ms = servidor - (antes + depois) / 2 * 1000
+        self._sincronizado_em = depois
+        return self.desvio_ms
+
+    def agora_ms(self):
+        if self.client is not None and (self._sincronizado_em is None or
+                                        self.relogio() - self._sincronizado_em >= self.ressincronizar):
+            try:
+                self.sincronizar()
+            except Exception as e:
+                # Mantém o último desvio conhecido; volta a tentar no próximo pedido de hora
+                logger.warning("Falha ao sincronizar a hora do servidor: %s", e)
+                self._sincronizado_em = self.relogio()
+        return self.relogio() * 1000 + self.desvio_ms
+
+
+class AgendadorVelas:
+    """Executa uma tarefa uma vez por vela fechada, pouco depois do fecho (hora do servidor)."""
+
+    def __init__(self, timeframe, relogio_servidor=None, atraso=1.0):
+        self.intervalo = intervalo_ms(timeframe)
+        self.relogio_servidor = relogio_servidor or RelogioServidor()
+        self.atraso = atraso  # Segundos após o fecho, para a vela fechada já constar nas klines
+        self.execucoes = 0
+        self.ultimo_atraso_ms = None  # Atraso real da última execução em relação ao fecho
+        self.fecho_processado = None  # Último fecho passado à tarefa
+        self._parar = threading.Event()
+
+    def ultimo_fecho(self, agora_ms=None):
+        """Tempo (ms) do fecho mais recente, i.e. abertura da vela em formação."""
+        agora_ms = self.relogio_servidor.agora_ms() if agora_ms is None else agora_ms
+        return int(agora_ms // self.intervalo) * self.intervalo
+
+    def proximo_fecho(self, agora_ms=None):
+        return self.ultimo_fecho(agora_ms) + self.intervalo
+
+    def esperar_fecho(self):
+        """Dorme até ao próximo fecho (+ ``atraso``). Devolve o tempo do fecho, ou None se for parado.
+
+        Nunca devolve um fecho já processado, mesmo que a ressincronização atrase a hora do servidor."""
+        fecho = self.proximo_fecho()
+        if self.fecho_processado is not None:
+            fecho = max(fecho, self.fecho_processado + self.intervalo)
+        espera = (fecho - self.relogio_servidor.agora_ms()) / 1000 + self.atraso
+        if self._parar.wait(max(0.0, espera)):
+            return None
+        return fecho
+
+    def executar(self, tarefa, imediato=True):
+        """Chama ``tarefa(fecho_ms)`` a cada vela fechada até ``parar()``; as velas abertas antes de
+        ``fecho_ms`` estão fechadas. Com ``imediato`` corre já uma vez sobre o último fecho."""
+        fecho = self.ultimo_fecho() if imediato else self.esperar_fecho()
+        while fecho is not None and not self._parar.is_set():
+            self.ultimo_atraso_ms = self.relogio_servidor.agora_ms() - fecho
+            self.fecho_processado = fecho
+            tarefa(fecho)
+            self.execucoes += 1
+            fecho = self.esperar_fecho()
+
+    def parar(self):
+        self._parar.set()
+
+
+class VigiaSLTP:
+    """Thread que lê o preço com alta frequência e o passa a ``verificar(preco)``.
+
+    ``obter_preco`` pode bloquear (ex.: à espera do próximo evento do
+    WebSocket) e devolver None quando não há nada a verificar; entre leituras
+    espera ``intervalo`` segundos.
+    """
+
+    def __init__(self, obter_preco, verificar, intervalo=1.0):
+        self.obter_preco = obter_preco
+        self.verificar = verificar
+        self.intervalo = intervalo
+        self.verificacoes = 0
+        self._parar = threading.Event()
+        self._thread = None
+
+    def iniciar(self):
+        self._parar.clear()
+        self._thread = threading.Thread(target=self._executar, name="vigia-sltp", daemon=True)
+        self._thread.start()
+        return self
+
+    def parar(self, timeout=5):
+        self._parar.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _executar(self):
+        while not self._parar.is_set():
+            try:
+                preco = self.obter_preco()
+                if preco is not None:
+                    self.verificar(preco)
+                    self.verificacoes += 1
+            except Exception as e:
+                logger.error("Erro no vigia de stop-loss/take-profit: %s", e)
+            self._parar.wait(self.intervalo)
@@ -0,0 +1,291 @@
+"""Camada sobre o ``binance.client.Client`` com orçamento de peso, agregação de leituras e novas tentativas.
+
+``ClienteLimitado`` expõe a mesma interface do cliente (os métodos não
+tratados aqui são delegados tal como estão) e acrescenta:
+
+- orçamento de peso partilhado (``LimitePedidos``), alinhado com o peso
+  usado que a Binance reporta no cabeçalho ``x-mbx-used-weight-1m``;
+- agregação de leituras: pedidos iguais em curso esperam pela mesma
+  resposta e, durante uma janela curta (``TTL_LEITURA``), reutilizam-na em
+  vez de repetir o pedido (ex.: o ticker pedido três vezes na mesma
+  iteração);
+- novas tentativas com espera exponencial e jitter para falhas
+  transitórias (ligação, timeout, 5xx, 429/418 com ``Retry-After``,
+  relógio fora da ``recvWindow``).
+
+As ordens nunca são duplicadas por uma nova tentativa: levam sempre um
+``clientOrderId`` e, depois de uma falha ambígua (sem saber se a Binance a
+recebeu), a ordem é consultada por esse id antes de ser reenviada.
+"""
+import logging
+import random
+import threading
+import time
+import uuid
+
+import requests
+from binance.exceptions import BinanceAPIException, BinanceRequestException
+
+from metricas import PESO_ENDPOINT
+
+logger = logging.getLogger(__name__)
+
+# Peso de cada método do cliente (os restantes contam como 1)
+PESO_METODO = {
+    'get_klines': PESO_ENDPOINT['/api/v3/klines'],
+    'get_symbol_ticker': PESO_ENDPOINT['/api/v3/ticker/price'],
+    'get_account': PESO_ENDPOINT['/api/v3/account'],
+    'get_exchange_info': PESO_ENDPOINT['/api/v3/exchangeInfo'],
+    'get_symbol_info': PESO_ENDPOINT['/api/v3/exchangeInfo'],
+    'get_server_time': PESO_ENDPOINT['/api/v3/time'],
+    'get_open_orders': PESO_ENDPOINT['/api/v3/openOrders'],
+    'get_order': 4,
+    'v3_get_order_list': PESO_ENDPOINT['/api/v3/orderList'],
+}
+
+# Peso sem ``symbol`` (todos os símbolos): ticker/price passa de 2 para 4 e openOrders de 6 para 80
+PESO_SEM_SIMBOLO = {
+    'get_symbol_ticker': 4,
+    'get_open_orders': 80,
+}
+
+
+def peso_metodo(nome, kwargs):
+    """Peso de uma chamada ``nome(**kwargs)`` do cliente."""
+    if nome in PESO_SEM_SIMBOLO and not kwargs.get('symbol'):
+        return PESO_SEM_SIMBOLO[nome]
+    return PESO_METODO.get(nome, 1)
+
+
+# Leituras agregadas -> segundos durante os quais uma resposta é reutilizada (0 = só pedidos em curso)
+TTL_LEITURA = {
+    'get_symbol_ticker': 1.0,
+    'get_klines': 1.0,
+    'get_account': 1.0,
+    'get_exchange_info': 3600.0,
+    'get_symbol_info': 3600.0,
+    'get_server_time': 0.0,
+    'get_open_orders': 0.0,
+    'get_order': 0.0,
+    'v3_get_order_list': 0.0,
+}
+
+# Ordens -> parâmetro com o id atribuído pelo cliente
+ORDENS = {
+    'create_order': 'newClientOrderId',
+    'order_market_buy': 'newClientOrderId',
+    'order_market_sell': 'newClientOrderId',
+    'order_limit_buy': 'newClientOrderId',
+    'order_limit_sell': 'newClientOrderId',
+    'create_oco_order': 'listClientOrderId',
+    'order_oco_sell': 'listClientOrderId',
+    'order_oco_buy': 'listClientOrderId',
+}
+
+# Leituras que deixam de ser válidas depois de uma ordem
+INVALIDADAS_POR_ORDEM = ('get_account', 'get_open_orders')
+
+CODIGOS_ORDEM_INEXISTENTE = (-2011, -2013, -2018)
+CODIGO_RECV_WINDOW = -1021
+CODIGO_ESTADO_DESCONHECIDO = -1007  # Timeout no servidor: a ordem pode ou não ter sido executada
+
+
+class _PedidoEmCurso:
+    def __init__(self):
+        self.concluido = threading.Event()
+        self.resultado = None
+        self.erro = None
+
+
+class ClienteLimitado:
+    """Cliente Binance com orçamento de peso, leituras agregadas e novas tentativas seguras.
+
+    Escritas de atributos que não são da camada (ex.: ``timestamp_offset``) vão para o cliente Binance.
+    """
+
+    _PROPRIOS = frozenset({'client', 'limite', 'tentativas', 'espera_base', 'espera_maxima', 'relogio', 'dormir',
+                           'aleatorio', 'peso_usado', 'estatisticas', '_cache', '_em_curso', '_lock'})
+
+    def __init__(self, client, limite=None, tentativas=4, espera_base=0.5, espera_maxima=30.0,
+                 relogio=time.monotonic, dormir=time.sleep, aleatorio=random.random):
+        self.client = client
+        self.limite = limite  # LimitePedidos partilhado, ou None para não limitar
+        self.tentativas = tentativas
+        self.espera_base = espera_base
+        self.espera_maxima = espera_maxima
+        self.relogio = relogio
+        self.dormir = dormir
+        self.aleatorio = aleatorio
+        self.peso_usado = None  # Último x-mbx-used-weight-1m recebido
+        self.estatisticas = {'pedidos': 0, 'agregados': 0, 'repeticoes': 0, 'ordens_recuperadas': 0}
+        self._cache = {}
+        self._em_curso = {}
+        self._lock = threading.Lock()
+        sessao = getattr(client, 'session', None)
+        if sessao is not None and hasattr(sessao, 'hooks'):
+            sessao.hooks.setdefault('response', []).append(self._registar_resposta)
+
+    def __getattr__(self, nome):
+        atributo = getattr(self.client, nome)
+        if not callable(atributo) or nome.startswith('_'):
+            return atributo
+        if nome in TTL_LEITURA:
+            return lambda *args, **kwargs: self._ler(nome, atributo, args, kwargs)
+        if nome in ORDENS:
+            return lambda *args, **kwargs: self._ordem(nome, atributo, args, kwargs)
+        return lambda *args, **kwargs: self._executar(atributo, args, kwargs, peso_metodo(nome, kwargs))
+
+    def __setattr__(self, nome, valor):
+        if nome in self._PROPRIOS:
+            object.__setattr__(self, nome, valor)
+        else:
+            setattr(self.client, nome, valor)
+
+    # --- Peso -------------------------------------------------------------------
+
+    def _registar_resposta(self, resposta, *args, **kwargs):
+        usado = resposta.headers.get('x-mbx-used-weight-1m')
+        if usado is None:
+            return
+        self.peso_usado = int(usado)
+        if self.limite is not None:
+            self.limite.sincronizar(self.peso_usado, self.limite.taxa * 60)
+
+    # --- Leituras ---------------------------------------------------------------
+
+    def invalidar(self, *nomes):
+        """Esquece as respostas guardadas dos métodos ``nomes`` (todos, se vazio)."""
+        with self._lock:
+            for chave in list(self._cache):
+                if not nomes or chave[0] in nomes:
+                    del self._cache[chave]
+
+    def _ler(self, nome, metodo, args, kwargs):
+        try:
+            chave = (nome, args, tuple(sorted(kwargs.items())))
+            hash(chave)
+        except TypeError:
+            return self._executar(metodo, args, kwargs, peso_metodo(nome, kwargs))
+
+        with self._lock:
+            guardado = self._cache.get(chave)
+            if guardado is not None and self.relogio() - guardado[0] <= TTL_LEITURA[nome]:
+                self.estatisticas['agregados'] += 1
+                return guardado[1]
+            pedido = self._em_curso.get(chave)
+            lider = pedido is None
+            if lider:
+                pedido = self._em_curso[chave] = _PedidoEmCurso()
+
+        if not lider:
+            # Pedido igual já em curso noutra thread: espera pela mesma resposta
+            pedido.concluido.wait()
+            with self._lock:
+                self.estatisticas['agregados'] += 1
+            if pedido.erro is not None:
+                raise pedido.erro
+            return pedido.resultado
+
+        try:
+            pedido.resultado = self._executar(metodo, args, kwargs, peso_metodo(nome, kwargs))
+            if TTL_LEITURA[nome] > 0:
+                with self._lock:
+                    self._cache[chave] = (self.relogio(), pedido.resultado)
+            return pedido.resultado
+        except Exception as e:
+            pedido.erro = e
+            raise
+        finally:
+            with self._lock:
+                self._em_curso.pop(chave, None)
+            pedido.concluido.set()
+
+    # --- Ordens -----------------------------------------------------------------
+
+    def _ordem(self, nome, metodo, args, kwargs):
+        parametro = ORDENS[nome]
+        kwargs = dict(kwargs)
+        kwargs.setdefault(parametro, f"fatima-{uuid.uuid4().hex[:20]}")
+
+        def procurar():
+            # A ordem chegou à Binance antes da falha? Consulta pelo id do cliente (com novas tentativas;
+            # se a consulta falhar de vez a exceção sobe, para nunca reenviar sem saber)
+            try:
+                if parametro == 'listClientOrderId':
+                    return self._executar(self.client.v3_get_order_list, (),
+                                          {'origClientOrderId': kwargs[parametro]}, PESO_METODO['v3_get_order_list'])
+                return self._executar(self.client.get_order, (),
+                                      {'symbol': kwargs['symbol'], 'origClientOrderId': kwargs[parametro]},
+                                      PESO_METODO['get_order'])
+            except BinanceAPIException as e:
+                if e.code in CODIGOS_ORDEM_INEXISTENTE:
+                    return None
+                raise
+
+        try:
+            return self._executar(metodo, args, kwargs, peso_metodo(nome, kwargs), procurar=procurar)
+        finally:
+            self.invalidar(*INVALIDADAS_POR_ORDEM)
+
+    # --- Execução com novas tentativas ----------------------------------------------
+
+    def _espera(self, tentativa):
+        # Espera exponencial com jitter total
+        return self.aleatorio() * min(self.espera_maxima, self.espera_base * 2 ** tentativa)
+
+    def _classificar(self, erro, tentativa):
+        """(espera, ambíguo) para uma falha transitória, ou None se não deve ser repetida."""
+        if isinstance(erro, BinanceAPIException):
+            if erro.status_code in (429, 418):
+                cabecalhos = getattr(erro.response, 'headers', None) or {}
+                espera = float(cabecalhos.get('Retry-After', 0)) or self._espera(tentativa)
+                if espera > self.espera_maxima:
+                    return None  # Banimento longo: melhor falhar do que bloquear o bot
+                return espera, False
+            if erro.code == CODIGO_RECV_WINDOW:
+                self._sincronizar_relogio()
+                return 0.0, False
+            if erro.code == CODIGO_ESTADO_DESCONHECIDO or erro.status_code >= 500:
+                return self._espera(tentativa), True
+            return None
+        if isinstance(erro, (requests.ConnectionError, requests.Timeout, BinanceRequestException)):
+            return self._espera(tentativa), True
+        return None
+
+    def _sincronizar_relogio(self):
+        servidor = self.client.get_server_time()['serverTime']
+        self.client.timestamp_offset = servidor - int(time.time() * 1000)
+        logger.warning("Relógio fora da recvWindow: desvio para o servidor ajustado para %d ms.",
+                       self.client.timestamp_offset)
+
+    def _executar(self, metodo, args, kwargs, peso, procurar=None):
+        """Executa o pedido respeitando o orçamento; repete falhas transitórias.
+
+        ``procurar`` (ordens) é chamado depois de uma falha ambígua: se devolver a
+        ordem, ela chegou à Binance e não é reenviada.
+        """
+        tentativa = 0
+        while True:
+            if self.limite is not None:
+                self.limite.adquirir(peso)
+            with self._lock:
+                self.estatisticas['pedidos'] += 1
+            try:
+                return metodo(*args, **kwargs)
+            except Exception as e:
+                classificacao = self._classificar(e, tentativa)
+                tentativa += 1
+                if classificacao is None or tentativa >= self.tentativas:
+                    raise
+                espera, ambiguo = classificacao
+                logger.warning("Falha transitória (%s); nova tentativa %d/%d em %.2fs.",
+                               e, tentativa, self.tentativas - 1, espera)
+                self.dormir(espera)
+                if ambiguo and procurar is not None:
+                    existente = procurar()
+                    if existente is not None:
+                        with self._lock:
+                            self.estatisticas['ordens_recuperadas'] += 1
+                        return existente
+                with self._lock:
+                    self.estatisticas['repeticoes'] += 1
@@ -0,0 +1,287 @@
+"""Diário de trades: registo local (SQLite) das ordens executadas e dos trades fechados.
+
+Cada ordem executada é gravada a partir da resposta da Binance
+(``executedQty``, ``cummulativeQuoteQty`` e as comissões dos ``fills``). O
+PnL de um trade vem dessas execuções e não do ticker lido antes ou depois
+da ordem:
+
+    pnl = fluxo em cotação (compra + venda, já sem as comissões)
+          + variação líquida da base (quantidade - comissões) x preço médio de venda
+
+As comissões em ativos que não sejam a base nem a cotação (ex.: BNB) ficam
+na ordem (``comissoes``), mas fora do PnL.
+
+As tabelas só recebem INSERTs e estão indexadas por símbolo e tempo. Os
+agregados (PnL diário, win rate, drawdown, comissões) são consultas SQL.
+Os totais por símbolo também ficam em memória, atualizados a cada trade,
+para o resumo periódico do bot não precisar de consultas nem da API.
+
+Uso:
+    python diario_trades.py trades_fatima.db --simbolo BTCEUR --inicio 2024-06-01
+"""
+import argparse
+import json
+import sqlite3
+import threading
+
+from historico import para_ms
+
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS ordens (
+    id INTEGER PRIMARY KEY,
+    simbolo TEXT NOT NULL,
+    tempo_ms INTEGER NOT NULL,
+    lado TEXT NOT NULL,
+    id_ordem INTEGER,
+    id_cliente TEXT,
+    quantidade REAL NOT NULL,
+    valor REAL NOT NULL,
+    preco REAL NOT NULL,
+    comissao REAL NOT NULL,
+    comissoes TEXT NOT NULL,
+    base_liquida REAL NOT NULL,
+    cotacao_liquida REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ordens_simbolo_tempo ON ordens (simbolo, tempo_ms);
+CREATE UNIQUE INDEX IF NOT EXISTS ordens_id_ordem ON ordens (simbolo, id_ordem) WHERE id_ordem IS NOT NULL;
+CREATE TABLE IF NOT EXISTS trades (
+    id INTEGER PRIMARY KEY,
+    simbolo TEXT NOT NULL,
+    tempo_entrada_ms INTEGER NOT NULL,
+    tempo_saida_ms INTEGER NOT NULL,
+    ordem_entrada INTEGER NOT NULL,
+    ordem_saida INTEGER NOT NULL,
+    quantidade REAL NOT NULL,
+    preco_entrada REAL NOT NULL,
+    preco_saida REAL NOT NULL,
+    volume REAL NOT NULL,
+    comissoes REAL NOT NULL,
+    pnl REAL NOT NULL,
+    motivo TEXT
+);
+CREATE INDEX IF NOT EXISTS trades_simbolo_tempo ON trades (simbolo, tempo_saida_ms);
+CREATE INDEX IF NOT EXISTS trades_tempo ON trades (tempo_saida_ms);
+"""
+
+# Agregados de um conjunto de trades; o drawdown é a maior descida do PnL acumulado desde o pico (a partir de 0)
+_AGREGADOS = """
+WITH sel AS (SELECT * FROM trades {filtro}),
+acumulado AS (SELECT tempo_saida_ms, id, SUM(pnl) OVER (ORDER BY tempo_saida_ms, id ROWS UNBOUNDED PRECEDING)
+              AS acumulado FROM sel),
+picos AS (SELECT acumulado, MAX(MAX(acumulado) OVER (ORDER BY tempo_saida_ms, id ROWS UNBOUNDED PRECEDING), 0) AS pico
+          FROM acumulado)
+SELECT (SELECT COUNT(*) FROM sel), (SELECT COALESCE(SUM(pnl > 0), 0) FROM sel), (SELECT COALESCE(SUM(pnl), 0) FROM sel),
+       (SELECT COALESCE(SUM(comissoes), 0) FROM sel), (SELECT COALESCE(SUM(volume), 0) FROM sel),
+       (SELECT COALESCE(MAX(pico - acumulado), 0) FROM picos), (SELECT COALESCE(MAX(pico), 0) FROM picos)
+"""
+
+
+def execucao(ordem, base, cotacao):
+    """Quantidade, valor, preço médio, comissões e variações líquidas dos saldos de uma ordem executada."""
+    quantidade = float(ordem['executedQty'])
+    valor = float(ordem['cummulativeQuoteQty'])
+    preco = valor / quantidade if quantidade else 0.0
+    comissoes, comissao, comissao_base, comissao_cotacao = {}, 0.0, 0.0, 0.0
+    for fill in ordem.get('fills', []):
+        ativo, montante = fill['commissionAsset'], float(fill['commission'])
+        comissoes[ativo] = comissoes.get(ativo, 0.0) + montante
+        if ativo == base:
+            comissao_base += montante
+            comissao += montante * float(fill['price'])
+        elif ativo == cotacao:
+            comissao_cotacao += montante
+            comissao += montante
+    sinal = 1 if ordem['side'] == 'BUY' else -1
+    return {'lado': ordem['side'], 'quantidade': quantidade, 'valor': valor, 'preco': preco, 'comissao': comissao,
+            'comissoes': comissoes, 'base_liquida': sinal * quantidade - comissao_base,
+            'cotacao_liquida': -sinal * valor - comissao_cotacao}
+
+
+def _filtro(simbolo=None, inicio=None, fim=None, coluna='tempo_saida_ms'):
+    condicoes, parametros = [], []
+    if simbolo is not None:
+        condicoes.append("simbolo = ?")
+        parametros.append(simbolo)
+    if inicio is not None:
+        condicoes.append(f"{coluna} >= ?")
+        parametros.append(para_ms(inicio))
+    if fim is not None:
+        condicoes.append(f"{coluna} < ?")
+        parametros.append(para_ms(fim))
+    return ("WHERE " + " AND ".join(condicoes) if condicoes else ""), parametros
+
+
+def _indicadores(trades, ganhos, pnl, comissoes, volume, max_drawdown):
+    return {'trades': trades, 'pnl': pnl, 'win_rate': ganhos / trades if trades else 0.0,
+            'max_drawdown': max_drawdown, 'comissoes': comissoes,
+            'arrasto_comissoes': comissoes / volume if volume else 0.0}  # Comissões em fração do volume negociado
+
+
+class DiarioTrades:
+    """Ordens e trades num ficheiro SQLite (``":memory:"`` para um diário temporário)."""
+
+    def __init__(self, caminho):
+        self.caminho = caminho
+        self._lock = threading.Lock()
+        self._con = sqlite3.connect(caminho, check_same_thread=False)  # Ordens também vêm da thread do vigia SL/TP
+        self._con.row_factory = sqlite3.Row
+        if caminho != ":memory:":
+            self._con.execute("PRAGMA journal_mode=WAL")
+        self._con.executescript(ESQUEMA)
+        self._abertas = {}   # Símbolo -> compras ainda sem venda (linhas de `ordens`)
+        self._ultimo = {}    # Símbolo -> último trade fechado pela última ordem de venda (ou None)
+        self._totais = {}    # Símbolo -> [trades, ganhos, pnl, comissoes, volume, pico, acumulado, max_drawdown]
+        for (simbolo,) in self._con.execute("SELECT DISTINCT simbolo FROM ordens").fetchall():
+            self._carregar(simbolo)
+
+    def _carregar(self, simbolo):
+        filtro, parametros = _filtro(simbolo)
+        trades, ganhos, pnl, comissoes, volume, max_drawdown, pico = self._con.execute(
+            _AGREGADOS.format(filtro=filtro), parametros).fetchone()
+        self._totais[simbolo] = [trades, ganhos, pnl, comissoes, volume, pico, pnl, max_drawdown]
+        self._abertas[simbolo] = self._con.execute(
+            "SELECT * FROM ordens WHERE simbolo = ? AND lado = 'BUY' AND id > "
+            "(SELECT COALESCE(MAX(ordem_saida), 0) FROM trades WHERE simbolo = ?) ORDER BY id",
+            (simbolo, simbolo)).fetchall()
+
+    def fechar(self):
+        with self._lock:
+            self._con.close()
+
+    def registar_ordem(self, simbolo, base, cotacao, ordem, motivo=None):
+        """Grava uma ordem executada; uma venda fecha o trade das compras em aberto.
+
+        Returns:
+            dict or None: o trade fechado por esta ordem (None numa compra, numa venda sem compra registada ou numa
+            ordem já gravada, ex.: a mesma ordem reconciliada depois de um reinício).
+        """
+        e = execucao(ordem, base, cotacao)
+        if not e['quantidade']:
+            return None
+        tempo_ms = int(ordem.get('transactTime') or ordem.get('updateTime') or ordem.get('time') or 0)
+        with self._lock, self._con:
+            if simbolo not in self._totais:
+                self._totais[simbolo] = [0, 0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0]
+                self._abertas[simbolo] = []
+            cursor = self._con.execute(
+                "INSERT OR IGNORE INTO ordens (simbolo, tempo_ms, lado, id_ordem, id_cliente, quantidade, valor, preco,"
+                " comissao, comissoes, base_liquida, cotacao_liquida) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (simbolo, tempo_ms, e['lado'], ordem.get('orderId'), ordem.get('clientOrderId'), e['quantidade'],
+                 e['valor'], e['preco'], e['comissao'], json.dumps(e['comissoes']), e['base_liquida'],
+                 e['cotacao_liquida']))
+            if not cursor.rowcount:
+                return None
+            linha = self._con.execute("SELECT * FROM ordens WHERE id = ?", (cursor.lastrowid,)).fetchone()
+            if e['lado'] == 'BUY':
+                self._abertas[simbolo].append(linha)
+                self._ultimo[simbolo] = None
+                return None
+            compras = self._abertas[simbolo]
+            if not compras:
+                self._ultimo[simbolo] = None
+                return None
+            trade = self._trade(simbolo, compras, linha, motivo)
+            self._con.execute(
+                "INSERT INTO trades (simbolo, tempo_entrada_ms, tempo_saida_ms, ordem_entrada, ordem_saida, quantidade,"
+                " preco_entrada, preco_saida, volume, comissoes, pnl, motivo) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                tuple(trade[c] for c in ('simbolo', 'tempo_entrada_ms', 'tempo_saida_ms', 'ordem_entrada',
+                                         'ordem_saida', 'quantidade', 'preco_entrada', 'preco_saida', 'volume',
+                                         'comissoes', 'pnl', 'motivo')))
+            self._abertas[simbolo] = []
+            self._acumular(simbolo, trade)
+            self._ultimo[simbolo] = trade
+            return trade
+
+    @staticmethod
+    def _trade(simbolo, compras, venda, motivo):
+        quantidade = sum(c['quantidade'] for c in compras)
+        valor = sum(c['valor'] for c in compras)
+        pnl = (sum(c['cotacao_liquida'] for c in compras) + venda['cotacao_liquida']
+               + (sum(c['base_liquida'] for c in compras) + venda['base_liquida']) * venda['preco'])
+        return {'simbolo': simbolo, 'tempo_entrada_ms': compras[0]['tempo_ms'], 'tempo_saida_ms': venda['tempo_ms'],
+                'ordem_entrada': compras[0]['id'], 'ordem_saida': venda['id'], 'quantidade': quantidade,
+                'preco_entrada': valor / quantidade, 'preco_saida': venda['preco'], 'volume': valor + venda['valor'],
+                'comissoes': sum(c['comissao'] for c in compras) + venda['comissao'], 'pnl': pnl, 'motivo': motivo}
+
+    def _acumular(self, simbolo, trade):
+        t = self._totais[simbolo]
+        t[0] += 1
+        t[1] += trade['pnl'] > 0
+        t[2] += trade['pnl']
+        t[3] += trade['comissoes']
+        t[4] += trade['volume']
+        t[6] += trade['pnl']
+        t[5] = max(t[5], t[6])
+        t[7] = max(t[7], t[5] - t[6])
+
+    def ultimo_trade(self, simbolo):
+        """Trade fechado pela última ordem de venda de ``simbolo`` (None se essa venda não fechou nenhum)."""
+        with self._lock:
+            return self._ultimo.get(simbolo)
+
+    def posicao_aberta(self, simbolo):
+        """Quantidade comprada e ainda sem venda registada."""
+        with self._lock:
+            return sum(c['quantidade'] for c in self._abertas.get(simbolo, []))
+
+    def totais(self, simbolo):
+        """Agregados de todos os trades de ``simbolo``, mantidos em memória (sem consultas)."""
+        with self._lock:
+            trades, ganhos, pnl, comissoes, volume, _, _, max_drawdown = self._totais.get(simbolo, [0] * 8)
+        return _indicadores(trades, ganhos, pnl, comissoes, volume, max_drawdown)
+
+    def resumo(self, simbolo=None, inicio=None, fim=None):
+        """Agregados dos trades fechados em ``[inicio, fim)``: trades, pnl, win_rate, max_drawdown, comissoes e
+        arrasto_comissoes (comissões / volume negociado)."""
+        filtro, parametros = _filtro(simbolo, inicio, fim)
+        with self._lock:
+            trades, ganhos, pnl, comissoes, volume, max_drawdown, _ = self._con.execute(
+                _AGREGADOS.format(filtro=filtro), parametros).fetchone()
+        return _indicadores(trades, ganhos, pnl, comissoes, volume, max_drawdown)
+
+    def pnl_diario(self, simbolo=None, inicio=None, fim=None):
+        """PnL, comissões, número de trades e win rate por dia (UTC) de fecho."""
+        filtro, parametros = _filtro(simbolo, inicio, fim)
+        with self._lock:
+            linhas = self._con.execute(
+                "SELECT strftime('%Y-%m-%d', tempo_saida_ms / 1000, 'unixepoch') AS dia, COUNT(*), SUM(pnl > 0), "
+                f"SUM(pnl), SUM(comissoes) FROM trades {filtro} GROUP BY dia ORDER BY dia", parametros).fetchall()
+        return [{'dia': dia, 'trades': trades, 'pnl': pnl, 'comissoes': comissoes, 'win_rate': ganhos / trades}
+                for dia, trades, ganhos, pnl, comissoes in linhas]
+
+    def trades(self, simbolo=None, inicio=None, fim=None):
+        """Trades fechados em ``[inicio, fim)``, por ordem de fecho."""
+        filtro, parametros = _filtro(simbolo, inicio, fim)
+        with self._lock:
+            return [dict(linha) for linha in self._con.execute(
+                f"SELECT * FROM trades {filtro} ORDER BY tempo_saida_ms, id", parametros)]
+
+    def ordens(self, simbolo=None, inicio=None, fim=None):
+        """Ordens executadas em ``[inicio, fim)``, com as comissões por ativo."""
+        filtro, parametros = _filtro(simbolo, inicio, fim, coluna='tempo_ms')
+        with self._lock:
+            linhas = self._con.execute(f"SELECT * FROM ordens {filtro} ORDER BY tempo_ms, id", parametros).fetchall()
+        return [dict(linha, comissoes=json.loads(linha['comissoes'])) for linha in linhas]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Agregados do diário de trades do bot')
+    parser.add_argument('caminho', help='Ficheiro SQLite do diário (DIARIO_TRADES)')
+    parser.add_argument('--simbolo', help='Ex.: BTCEUR (por omissão, todos)')
+    parser.add_argument('--inicio', help="Ex.: '2024-06-01'")
+    parser.add_argument('--fim', help="Fim (exclusivo)")
+    args = parser.parse_args()
+
+    diario = DiarioTrades(args.caminho)
+    for dia in diario.pnl_diario(args.simbolo, args.inicio, args.fim):
+        print(f"{dia['dia']}: PnL {dia['pnl']:.2f} | Trades {dia['trades']} | Win rate {dia['win_rate']:.0%} | "
+              f"Comissões {dia['comissoes']:.2f}")
+    r = diario.resumo(args.simbolo, args.inicio, args.fim)
+    print(f"Total: PnL {r['pnl']:.2f} | Trades {r['trades']} | Win rate {r['win_rate']:.0%} | "
+          f"Max drawdown {r['max_drawdown']:.2f} | Comissões {r['comissoes']:.2f} "
+          f"({r['arrasto_comissoes']:.3%} do volume)")
+    diario.fechar()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+"""Estado persistente do bot: snapshot atómico para arranque a quente.
+
+A posição (aberta ou não, preços de entrada/SL/TP, OCO na exchange), os
+contadores de trades, uma eventual ordem em curso e o estado dos
+indicadores são gravados num ficheiro JSON sempre que mudam. A escrita é
+atómica (ficheiro temporário, ``fsync`` e ``os.replace``): uma falha a meio
+deixa o snapshot anterior intacto, nunca um ficheiro truncado.
+
+No arranque o bot lê o snapshot, repõe o estado e reconcilia-o com a
+exchange (ordem em curso, OCO, saldo e ordens abertas) em vez de começar
+sem posição e reaquecer os indicadores.
+"""
+import json
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+VERSAO = 1
+
+
+def gravar_json_atomico(caminho, dados):
+    """Grava ``dados`` em ``caminho`` de forma atómica e durável."""
+    diretorio = os.path.dirname(os.path.abspath(caminho))
+    temporario = caminho + ".tmp"
+    with open(temporario, "w", encoding="utf-8") as f:
+        f.write(dados if isinstance(dados, str) else json.dumps(dados))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temporario, caminho)
+    if hasattr(os, "O_DIRECTORY"):
+        # Garante que a troca de nome também chega ao disco
+        fd = os.open(diretorio, os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+
+class GravadorEstado:
+    """Snapshot do estado do bot num ficheiro JSON; só escreve quando o estado muda."""
+
+    def __init__(self, caminho):
+        self.caminho = caminho
+        self.gravacoes = 0
+        self._ultimo = None
+
+    def gravar(self, estado):
+        """Grava ``estado`` (dict serializável) se for diferente do último gravado; devolve True se gravou."""
+        texto = json.dumps(dict(estado, versao=VERSAO), sort_keys=True)
+        if texto == self._ultimo:
+            return False
+        gravar_json_atomico(self.caminho, texto)
+        self._ultimo = texto
+        self.gravacoes += 1
+        return True
+
+    def ler(self):
+        """Último snapshot, ou None se não existir, estiver corrompido ou for de outra versão."""
+        try:
+            with open(self.caminho, encoding="utf-8") as f:
+                texto = f.read()
+            estado = json.loads(texto)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning("Snapshot de estado ilegível em %s: %s", self.caminho, e)
+            return None
+        if not isinstance(estado, dict) or estado.get('versao') != VERSAO:
+            logger.warning("Snapshot de estado em %s com versão desconhecida; ignorado.", self.caminho)
+            return None
+        self._ultimo = texto
+        return estado
@@ -0,0 +1,165 @@
+"""Regras de sinal da estratégia EMA + RSI, sem estado global.
+
+O núcleo é ``regras_sinal``: avalia as regras de ``fatima.verificar_sinal``
+(cruzamentos, venda antecipada pela margem na EMA, margens do RSI e
+continuação) sobre arrays inteiros, de uma só vez. ``serie_sinais`` aplica a
+posição (COMPRA só sem posição, VENDA só com posição) e devolve a série
+completa de sinais, que é o que o backtester usa. O bot usa o mesmo núcleo
+sobre as últimas velas, em ``avaliar_sinal``, que recebe a posição e os
+parâmetros explicitamente e devolve a nova posição, para poder ser usada por
+várias instâncias (um objeto por par ou por variante).
+"""
+from dataclasses import dataclass
+
+import numpy as np
+
+
+@dataclass(frozen=True)
+class ParametrosEstrategia:
+    """Parâmetros de uma instância da estratégia (padrões iguais aos de fatima.py)."""
+    media_rapida: int = 9
+    media_lenta: int = 21
+    periodo_rsi: int = 14
+    rsi_sobrecompra: float = 70
+    rsi_sobrevenda: float = 30
+    stop_loss: float = 0.02
+    take_profit: float = 0.006
+    margem_venda_ema: float = 0.0005
+    continuacao: bool = False
+
+
+COMPRA = 1
+VENDA = -1
+
+# Regras de sinal (o código é o número da regra nos logs: 11 -> "(1.1)")
+CRUZAMENTO_ALTA = 11     # EMA rápida cruza acima da lenta, RSI a subir perto da sobrevenda
+CONTINUACAO_ALTA = 12    # Tendência de alta há 3 velas, RSI não sobrecomprado (p.continuacao)
+VENDA_ANTECIPADA = 20    # EMA rápida perto/abaixo da lenta (margem_venda_ema), RSI a cair acima de 50
+CRUZAMENTO_BAIXA = 21    # EMA rápida cruza abaixo da lenta, RSI a cair perto da sobrecompra
+CONTINUACAO_BAIXA = 22   # Tendência de baixa, RSI não sobrevendido (p.continuacao)
+
+MENSAGENS = {
+    CRUZAMENTO_ALTA: "(1.1) Sinal de COMPRA! EMA cruzou para cima e RSI ({rsi:.2f}) confirmou.",
+    CONTINUACAO_ALTA: "(1.2) Sinal de COMPRA! Continuação de alta e RSI ({rsi:.2f}) não sobrecomprado.",
+    VENDA_ANTECIPADA: "(2.0) Sinal de VENDA ANTECIPADA! EMA9 ({ema_rapida:.2f}) perto/abaixo de EMA21 "
+                      "({ema_lenta:.2f}) e RSI ({rsi:.2f}) a cair.",
+    CRUZAMENTO_BAIXA: "(2.1) Sinal de VENDA! EMA cruzou para baixo e RSI ({rsi:.2f}) confirmou.",
+    CONTINUACAO_BAIXA: "(2.2) Sinal de VENDA! Continuação de baixa e RSI ({rsi:.2f}) não sobrevendido.",
+}
+
+
+def _sem_log(tipo, mensagem):
+    pass
+
+
+def proximo_indice(mascara):
+    """Para cada i, o primeiro índice j >= i com ``mascara[j]`` verdadeiro (len(mascara) se não existir)."""
+    n = len(mascara)
+    indices = np.where(mascara, np.arange(n), n)
+    return np.minimum.accumulate(indices[::-1])[::-1]
+
+
+# Funcao para avaliar as regras de sinal em todas as velas de uma vez
+# - As condições são as de avaliar_sinal, como máscaras sobre os arrays, pela mesma ordem (a primeira
+#   regra cujas condições se verificam decide, mesmo que não dispare com a posição atual).
+# - Args:
+#        ema_rapida, ema_lenta, rsi (array): séries dos indicadores.
+#        p (ParametrosEstrategia): parâmetros da estratégia.
+#        inicio (int): primeira vela que pode ter sinal; por omissão a primeira com dados suficientes
+#                      (max(media_lenta, periodo_rsi)), como em avaliar_sinal.
+# - Returns:
+#        tuple: (regra_compra, regra_venda), arrays int8 com a regra que dispara em cada vela sem posição
+#               e com posição, ou 0.
+def regras_sinal(ema_rapida, ema_lenta, rsi, p=ParametrosEstrategia(), inicio=None):
+    rapida = np.asarray(ema_rapida, dtype=float)
+    lenta = np.asarray(ema_lenta, dtype=float)
+    rsi = np.asarray(rsi, dtype=float)
+    n = len(rapida)
+    regra_compra = np.zeros(n, dtype=np.int8)
+    regra_venda = np.zeros(n, dtype=np.int8)
+    inicio = max(1, max(p.media_lenta, p.periodo_rsi) if inicio is None else inicio)
+    if n <= inicio:
+        return regra_compra, regra_venda
+
+    r, l, a = rapida[inicio:], lenta[inicio:], rsi[inicio:]
+    r1, l1, a1 = rapida[inicio - 1:-1], lenta[inicio - 1:-1], rsi[inicio - 1:-1]
+    acima, acima1 = r > l, r1 > l1
+    abaixo, abaixo1 = r < l, r1 < l1
+
+    cruzamento_alta = acima & (r1 <= l1) & (a < p.rsi_sobrecompra) & (a > a1) & (a1 < p.rsi_sobrevenda + 10)
+    venda_antecipada = (r <= l * (1 + p.margem_venda_ema)) & acima1 & (a < a1) & (a > 50)
+    cruzamento_baixa = abaixo & (r1 >= l1) & (a > p.rsi_sobrevenda) & (a < a1) & (a1 > p.rsi_sobrecompra - 10)
+    continuacao_alta = np.zeros(len(r), dtype=bool)
+    continuacao_baixa = np.zeros(len(r), dtype=bool)
+    if p.continuacao:
+        acima2 = np.zeros(len(r), dtype=bool)  # A vela i-2 só existe a partir de i = 2
+        desde = max(0, 2 - inicio)
+        acima2[desde:] = rapida[inicio - 2 + desde:-2] > lenta[inicio - 2 + desde:-2]
+        continuacao_alta = acima & acima1 & (a < p.rsi_sobrecompra) & acima2
+        continuacao_baixa = abaixo & abaixo1 & (a > p.rsi_sobrevenda)
+
+    # Sem posição: o cruzamento de alta e a continuação de alta excluem-se (e às regras de baixa)
+    compra = regra_compra[inicio:]
+    compra[continuacao_alta] = CONTINUACAO_ALTA
+    compra[cruzamento_alta] = CRUZAMENTO_ALTA
+    # Com posição: a venda antecipada só é avaliada se não houver cruzamento de alta (nesse caso não há
+    # sinal); excluem-se entre si pela posição da EMA rápida na vela anterior ou atual
+    venda = regra_venda[inicio:]
+    venda[continuacao_baixa & ~venda_antecipada] = CONTINUACAO_BAIXA
+    venda[cruzamento_baixa & ~venda_antecipada] = CRUZAMENTO_BAIXA
+    venda[venda_antecipada & ~cruzamento_alta] = VENDA_ANTECIPADA
+    return regra_compra, regra_venda
+
+
+# Funcao para obter a série completa de sinais a partir das regras, aplicando a posição
+# - COMPRA só dispara sem posição e VENDA só com posição; cada sinal inverte a posição (o loop do bot
+#   fecha a posição em qualquer VENDA). O ciclo salta de sinal em sinal pelos próximos índices
+#   pré-calculados, por isso custa o número de sinais e não o de velas.
+# - Returns:
+#        tuple: (sinais, posicao) - int8 com COMPRA (1), VENDA (-1) ou 0, e a posição após cada vela.
+def serie_sinais(regra_compra, regra_venda, posicao_inicial=False):
+    n = len(regra_compra)
+    sinais = np.zeros(n, dtype=np.int8)
+    proxima_compra = np.append(proximo_indice(np.asarray(regra_compra) != 0), n).tolist()
+    proxima_venda = np.append(proximo_indice(np.asarray(regra_venda) != 0), n).tolist()
+    i, aberta = 0, bool(posicao_inicial)
+    while i < n:
+        i = proxima_venda[i] if aberta else proxima_compra[i]
+        if i < n:
+            sinais[i] = VENDA if aberta else COMPRA
+            aberta = not aberta
+            i += 1
+    posicao = (np.cumsum(sinais, dtype=np.int64) + int(bool(posicao_inicial))).astype(bool)
+    return sinais, posicao
+
+
+# Funcao para avaliar os sinais atraves das EMAs e RSI
+# - Usa o núcleo regras_sinal sobre as três últimas velas e lê a última.
+# - Args:
+#        dados (pd.DataFrame ou MotorIndicadores): dados com as colunas 'EMA9', 'EMA21' e 'RSI'
+#                                                  (EMA rápida, EMA lenta e RSI).
+#        posicao_aberta (bool): estado atual da posição.
+#        p (ParametrosEstrategia): parâmetros da estratégia.
+#        log (callable): função (tipo, mensagem) para registar os sinais.
+# - Returns:
+#        tuple: ("COMPRA", "VENDA" ou None, nova posicao_aberta). Na venda antecipada a posição
+#               devolvida continua aberta: é fechada por quem executa a venda.
+def avaliar_sinal(dados, posicao_aberta, p=ParametrosEstrategia(), log=_sem_log):
+
+    # Garante que há dados suficientes para as EMAs e RSI
+    if len(dados) < max(p.media_lenta, p.periodo_rsi) + 1:
+        log("ALERTA", "Dados insuficientes para verificar sinais (EMA/RSI).")
+        return None, posicao_aberta
+
+    ema9 = np.asarray(dados["EMA9"], dtype=float)[-3:]
+    ema21 = np.asarray(dados["EMA21"], dtype=float)[-3:]
+    rsi = np.asarray(dados["RSI"], dtype=float)[-3:]
+    regra_compra, regra_venda = regras_sinal(ema9, ema21, rsi, p, inicio=len(ema9) - 1)
+    regra = int(regra_venda[-1] if posicao_aberta else regra_compra[-1])
+    if not regra:
+        return None, posicao_aberta
+
+    log("SINAL", MENSAGENS[regra].format(ema_rapida=ema9[-1], ema_lenta=ema21[-1], rsi=rsi[-1]))
+    if not posicao_aberta:
+        return "COMPRA", True
+    return "VENDA", regra == VENDA_ANTECIPADA # A posição é atualizada pelo loop principal
@@ -2,13 +2,35 @@ import time
 from binance.client import Client
 from binance.exceptions import BinanceAPIException
 import pandas as pd
+import numpy as np
 import threading
 import sys
 import logging
 import os
+import uuid
+import atexit
+import sqlite3
 from dotenv import load_dotenv
 
-import requests
+from estrategia import ParametrosEstrategia, avaliar_sinal
+from agendador import AgendadorVelas, RelogioServidor, VigiaSLTP
+from indicadores import MotorIndicadores
+from limites import LimitePedidos
+from metricas import GravadorMetricas, Metricas, ServidorMetricas
+from multipar import EstrategiaPar, MotorMultiPar
+from mercado_stream import URL_BINANCE, StreamMercado
+from velas import BufferVelas
+from notificacoes import NotificadorTelegram
+from saldos import CacheSaldos
+from sombra import MotorSombra
+from protecao import ProtecaoOCO
+from estado import GravadorEstado
+from cliente import ClienteLimitado
+from registo import LOGGER_BOT, configurar_registo
+from historico import DescarregadorVelas
+from diario_trades import DiarioTrades
+from ordens import ExecutorOrdens, OrdemInvalida
+from velas import intervalo_ms
 
 
 # ==============================================================================
@@ -22,6 +44,10 @@ API_SECRET = os.getenv('BINANCE_API_SECRET')
 TELEGRAM_TOKEN = os.getenv("TELEGRAM_TOKEN")
 TELEGRAM_CHAT_ID = os.getenv("TELEGRAM_CHAT_ID")
 
+# Endpoints alternativos da API (ex.: simulador_exchange.py em testes de carga); vazio = Binance
+BINANCE_API_URL = os.getenv("BINANCE_API_URL")
+BINANCE_STREAM_URL = os.getenv("BINANCE_STREAM_URL")
+
 # ==============================================================================
 # 2. Parâmetros do Bot
 # ==============================================================================
@@ -34,9 +60,20 @@ PAR = MOEDA + MOEDA_2
 # === GESTÃO DE RISCO: STOP-LOSS E TAKE-PROFIT ===
 PERCENTAGEM_STOP_LOSS = 0.02   # 0.2% de perda máxima em relação ao preço de compra
 PERCENTAGEM_TAKE_PROFIT = 0.006 # 0.6% de lucro desejado em relação ao preço de compra
+OCO_EXCHANGE = 0 # Coloca o SL/TP na Binance (ordem OCO de venda) ao abrir a posição, em vez de só vigiar o preço
+OCO_MARGEM_STOP_LIMITE = 0.001 # Preço limite da perna de stop 0.1% abaixo do stop (garante a execução)
+OCO_INTERVALO_VERIFICACAO = 60 # Segundos entre consultas ao estado da OCO enquanto o preço não cruza um nível
 
 # Variáveis globais para rastrear o estado da posição (já existem, mas vamos usá-las)
 
+# === MULTI-PAR ===
+# Lista de (MOEDA, MOEDA_2, QUANTIDADE). Se não estiver vazia, todos os pares correm num só processo
+# (um cliente, um orçamento de pedidos e um cache de saldos partilhados) em vez do loop de PAR.
+# As ordens levam newClientOrderId e novas tentativas seguras (ClienteLimitado), mas a validação pelos
+# filtros do símbolo, o registo de trades e a proteção OCO só existem no modo de um par.
+PARES = []   # ex.: [("BTC", "EUR", 0.0012), ("ETH", "EUR", 0.05)]
+PESO_MAXIMO_MINUTO = 1200 # Orçamento de peso de pedidos por minuto (partilhado pelos pares no modo multi-par)
+
 # === HISTORICO: QUANTIDADE ===
 #QUANTIDADE = 0.2 #26.03.2025 - 0.2 BTC = 17500 USD
 #QUANTIDADE = 0.16 #26.03.2025 - 0.16 BTC = 13800 USD
@@ -65,11 +102,36 @@ RSI_SOBREVENDA = 30  # Nível de sobrevenda do RSI
 # ==============================================================================
 
 CONTINUACAO = 0
-SIMULACAO = 0
+SIMULACAO = 0 # Ordens em papel: executadas localmente ao preço atual, sem enviar nada à Binance
 DEBUG_ALL = 0
 DEBUG_EMA = 0
 DEBUG_SINAIS = 0
 DEBUG_RSI = 0 # NOVO: Ativa o debug do RSI
+STREAMING = 0 # Recebe velas e preços por WebSocket em vez de consultar a API REST a cada iteração
+SALDO_TTL = 300 # Segundos entre leituras completas do saldo (get_account); entretanto usa o cache
+AGENDADOR_VELAS = 0 # Avalia o sinal uma vez por vela fechada (hora do servidor) em vez de a cada 5s
+INTERVALO_VIGIA = 1 # Segundos entre verificações de STOP-LOSS/TAKE-PROFIT no modo AGENDADOR_VELAS
+ATRASO_FECHO_VELA = 1.0 # Segundos após o fecho da vela antes de pedir as klines
+METRICAS_PORTA = 0 # Porta do endpoint local de métricas (texto Prometheus em /metrics); 0 = desligado
+METRICAS_FICHEIRO = "" # Ficheiro de métricas regravado a cada METRICAS_INTERVALO segundos; "" = desligado
+METRICAS_INTERVALO = 60
+FICHEIRO_ESTADO = "estado_fatima.json" # Snapshot da posição, contadores e indicadores para arranque a quente; "" = desligado
+LOG_MAX_MB = 20 # Tamanho a partir do qual o ficheiro de log roda (o anterior é comprimido em .gz); 0 = sem limite
+LOG_RODAR_HORAS = 24 # Roda também os ficheiros de log a cada N horas; 0 = só por tamanho
+LOG_COPIAS = 30 # Ficheiros de log rodados que são mantidos
+LOG_EVENTOS = 1 # Grava também os eventos estruturados (preço, sinal, ordens, trades) em logs/eventos - <data>.jsonl
+ARQUIVO_VELAS = "" # Diretório do arquivo histórico (historico.py) usado para aquecer os indicadores; "" = só REST
+ARQUIVO_AQUECIMENTO_DIAS = 30 # Dias de velas do arquivo confirmados nos indicadores no arranque
+DIARIO_TRADES = "trades_fatima.db" # Diário SQLite das ordens executadas e dos trades (PnL das execuções); "" = desligado (sempre em SIMULACAO)
+FILTROS_REFRESCAR = 3600 # Segundos entre leituras em fundo dos filtros do símbolo (LOT_SIZE, NOTIONAL) usados nas ordens
+MANTER_LIGACAO = 30 # Segundos entre pings que mantêm aberta a ligação HTTP à Binance (ordens sem novo handshake); 0 = desligado
+SAIDA_ESPERA_FALHA = 5 # Segundos até nova tentativa de uma venda de SL/TP falhada (duplica a cada falha seguida)
+SAIDA_ESPERA_MAXIMA = 300 # Espera máxima entre tentativas de uma venda de SL/TP que continua a falhar
+
+# === MODO SOMBRA ===
+# Variantes da estratégia avaliadas em papel sobre os mesmos dados (sem ordens nem pedidos extra à API).
+# Nome -> alterações aos parâmetros do bot (campos de estrategia.ParametrosEstrategia).
+VARIANTES_SOMBRA = {}   # ex.: {"ema5_21": dict(media_rapida=5), "rsi75_25": dict(rsi_sobrecompra=75, rsi_sobrevenda=25)}
 
 # ==============================================================================
 # 4. Variáveis Globais (Estado do Bot)
@@ -82,9 +144,36 @@ contador = 0
 n_trade = 0
 posicao_aberta = False
 preco_entrada_global = None
-historico_trades = []
+saldo_entrada = 0.0
 preco_stop_loss = None
 preco_take_profit = None
+stream_mercado = None
+registo = None # RegistoAssincrono (setup_logger)
+logger = logging.getLogger(LOGGER_BOT) # Logger do bot: o nível DEBUG das flags aplica-se só a ele
+notificador = None
+cache_saldos = None
+sombra = None
+protecao = None # ProtecaoOCO (modo OCO_EXCHANGE)
+ultima_verificacao_oco = 0.0
+gravador_estado = None # GravadorEstado (FICHEIRO_ESTADO)
+diario_trades = None # DiarioTrades (DIARIO_TRADES)
+executor_ordens = None # ExecutorOrdens: filtros do símbolo em cache e validação local das ordens
+falhas_saida = 0 # Vendas de SL/TP falhadas seguidas
+proxima_tentativa_saida = 0.0 # time.monotonic() a partir do qual a venda de SL/TP volta a ser tentada
+motor_persistido = None # MotorIndicadores cujo estado vai no snapshot
+ordem_pendente = None # Ordem enviada e ainda sem resposta: {'tipo', 'id'} (clientOrderId)
+lock_posicao = threading.RLock() # Protege a posição (loop/pipeline de sinal e vigia SL/TP)
+# Duração por etapa, latência sinal->ordem, pedidos/peso por endpoint e jitter do loop
+metricas = Metricas()
+metricas.descrever("etapa_segundos", "Duração de cada etapa do loop")
+metricas.descrever("sinal_ate_ordem_segundos", "Tempo desde o sinal até à confirmação da ordem")
+metricas.descrever("iteracao_segundos", "Duração de uma iteração (sem a espera)")
+metricas.descrever("loop_jitter_segundos", "Atraso do início da iteração em relação ao previsto")
+metricas.descrever("api_pedidos_total", "Pedidos HTTP por endpoint")
+metricas.descrever("api_peso_total", "Peso de API consumido por endpoint")
+metricas.descrever("api_peso_usado_1m", "Peso usado no último minuto (x-mbx-used-weight-1m)")
+# Buffer circular das últimas velas (margem para o RSI e EMAs)
+buffer_velas = BufferVelas(capacidade=max(50, PERIODO_RSI + MEDIA_LENTA + 5))
 
 
 # ==============================================================================
@@ -92,12 +181,17 @@ preco_take_profit = None
 # ==============================================================================
 
 # Funcao para configurar ficheiro de LOGs
+# - Registo assíncrono: log_event só coloca o evento numa fila; uma thread de fundo formata e escreve
+#   no ficheiro de texto, na consola e no ficheiro de eventos JSONL. Os ficheiros rodam por tamanho/tempo
+#   e os antigos são comprimidos.
 def setup_logger():
+    global registo
     # Define o diretório para os logs na pasta do utilizador
     filename_prefix = "trading" 
     timestamp = time.strftime("%Y-%m-%d %Hh%M")
     log_directory = "logs"  # Define o diretório de logs relativo ao script atual
     log_filename = os.path.join(log_directory, f"{filename_prefix} - {timestamp}.txt")  # Define o nome do arquivo de log
+    eventos_filename = os.path.join(log_directory, f"eventos - {timestamp}.jsonl")
 
     # Verifica se o diretório de logs existe, se não existir, tenta criar
     if not os.path.exists(log_directory):
@@ -106,19 +200,17 @@ def setup_logger():
             print(f"INFO: Diretório de logs '{log_directory}' criado com sucesso.")
         except OSError as e:
             print(f"ERRO: Falha ao criar diretório de logs '{log_directory}': {e}. O log pode não ser salvo em arquivo.")
-            # Se não conseguir criar o diretório, pode ser necessário sair ou logar apenas na console.
-            # Por agora, vamos continuar e ver se o basicConfig consegue logar em algum lugar.
+            # Se não conseguir criar o diretório, grava na raiz
             log_filename = f"{filename_prefix} - {timestamp}.txt" # Tenta gravar na raiz se a pasta falhar
+            eventos_filename = f"eventos - {timestamp}.jsonl"
 
-    # Configuração do logger
-    # Tenta configurar o logger para gravar em arquivo
+    # Configuração do logger (nível DEBUG só com as flags de debug: senão as mensagens de debug nem são formatadas)
+    nivel = logging.DEBUG if (DEBUG_ALL or DEBUG_EMA or DEBUG_RSI or DEBUG_SINAIS) else logging.INFO
     try:
-        logging.basicConfig(
-            filename=log_filename,
-            level=logging.INFO,
-            format='%(asctime)s - %(levelname)s - %(message)s',
-            datefmt='%Y-%m-%d %H:%M:%S'
-        )
+        registo = configurar_registo(log_filename, eventos_filename if LOG_EVENTOS else None, consola=True,
+                                     nivel=nivel, max_bytes=int(LOG_MAX_MB * 1024 * 1024),
+                                     intervalo=LOG_RODAR_HORAS * 3600, copias=LOG_COPIAS)
+        atexit.register(parar_registo)  # Escreve o que ficou na fila mesmo numa saída por exit()
         print("INFO", f"Arquivo de log '{log_filename}' configurado com sucesso.") # Mensagem de sucesso
     except Exception as e:
         # Imprime no console se houver um erro na configuração do logger
@@ -127,11 +219,12 @@ def setup_logger():
 
 
 # Funcao para fazer LOGs
-def log_event(event_type, message):
+# - ``campos``: valores tipados do evento (preço, sinal, lucro, ...) gravados no ficheiro JSONL.
+def log_event(event_type, message, **campos):
 
-    log_message = f"{event_type}: {message}"
-    logging.info(log_message)
-    print(log_message)  # Opcional: tambem imprime no terminal
+    logger.info("%s: %s", event_type, message, extra={'tipo': event_type, 'campos': campos})
+    if registo is None:
+        print(f"{event_type}: {message}")  # Sem registo assíncrono (ex.: testes): imprime diretamente
     if (event_type == "ERRO" or event_type == "ERRO_GERAL"):
         enviar_telegram(f"⚠️ ERRO: {message}")
     elif (event_type == "COMPRA"):
@@ -141,16 +234,33 @@ def log_event(event_type, message):
     elif (event_type == "ALERTA"):
         enviar_telegram(f"🚨 ALERTA: {message}")
 
+# Funcao para fazer LOGs de debug
+# - Formatação preguiçosa: ``formato`` usa %-placeholders e os valores seguem em ``args``; a mensagem só é
+#   montada (na thread de escrita) se o nível DEBUG estiver ativo.
+def log_debug(event_type, formato, *args):
+    logger.debug("%s: " + formato, event_type, *args, extra={'tipo': event_type})
+    if registo is None and logger.isEnabledFor(logging.DEBUG):
+        print(f"{event_type}: {formato % args}")
+
+# Funcao para parar o registo assíncrono (escreve o que ainda está na fila)
+def parar_registo():
+    global registo
+    if registo is not None:
+        registo.parar()
+        registo = None
+
+# Funcao para enviar mensagens Telegram
+# - Não bloqueia: a mensagem é colocada na fila do notificador (thread de fundo com sessão keep-alive,
+#   agrupamento de rajadas, limite de ritmo e novas tentativas).
 def enviar_telegram(mensagem):
-    try:
-        url = f"https://api.telegram.org/bot{TELEGRAM_TOKEN}/sendMessage"
-        payload = {
-            "chat_id": TELEGRAM_CHAT_ID,
-            "text": mensagem
-        }
-        requests.post(url, data=payload)
-    except Exception as e:
-        log_event("ERRO", f"Erro ao enviar mensagem Telegram: {e}")
+    global notificador
+    if not TELEGRAM_TOKEN or not TELEGRAM_CHAT_ID:
+        return
+    if notificador is None:
+        notificador = NotificadorTelegram(TELEGRAM_TOKEN, TELEGRAM_CHAT_ID)
+        metricas.instrumentar_sessao(notificador.sessao)
+        notificador.iniciar()
+    notificador.enviar(mensagem)
 
 
 # ==============================================================================
@@ -158,9 +268,8 @@ def enviar_telegram(mensagem):
 # ==============================================================================
 def conexao_binance(client):
     try:
-        client = Client(API_KEY, API_SECRET)
-        client.timestamp_offset = client.get_server_time()['serverTime'] - int(time.time() * 1100)
-        client.get_server_time()  # Usar para calcular diferença e ajustar timestamps
+        # Ajusta os timestamps dos pedidos assinados à hora do servidor
+        client.timestamp_offset = client.get_server_time()['serverTime'] - int(time.time() * 1000)
         log_event("INFO", "Conexão com a Binance estabelecida com sucesso.")
     except BinanceAPIException as e:
         log_event("ERRO", f"Falha na conexão com a API da Binance. Status: {e.status_code}, Mensagem: {e.message}, \
@@ -175,17 +284,20 @@ def conexao_binance(client):
 # ==============================================================================
 
 # Funcao para obter dados da BINANCE/Conta
+# - Integra as klines no buffer circular `buffer_velas`: só as velas novas ou a vela em formação são escritas.
+# - Returns:
+#        BufferVelas: buffer com as últimas velas (colunas 'time', 'open', ..., 'close' como views NumPy),
+#        ou um DataFrame vazio em caso de erro.
+@metricas.cronometrado("obter_dados")
 def obter_dados():
-    if DEBUG_ALL: log_event("DEBUG", "7.1- Obter dados")
+    if DEBUG_ALL: log_debug("DEBUG", "7.1- Obter dados")
     try:
-        # Aumentar o limite para garantir dados suficientes para o RSI (PERIODO_RSI) e EMAs 
-        # (Adiciona uma margem de 5 para evitar problemas com dados insuficientes)
-        klines = client.get_klines(symbol=PAR, interval=TIMEFRAME, limit=max(50, PERIODO_RSI + MEDIA_LENTA + 5)) 
-        df = pd.DataFrame(klines, columns=['time', 'open', 'high', 'low', 'close', 'volume',
-                                           'close_time', 'quote_asset_volume', 'number_of_trades',
-                                           'taker_buy_base_asset_volume', 'taker_buy_quote_asset_volume', 'ignore'])
-        df['close'] = df['close'].astype(float)
-        return df
+        # Na primeira chamada pede a janela completa (margem para o RSI e EMAs); depois apenas as velas
+        # em falta desde a última guardada, mais a vela em formação
+        limite = buffer_velas.limite_pedido(TIMEFRAME, time.time() * 1000)
+        klines = client.get_klines(symbol=PAR, interval=TIMEFRAME, limit=limite)
+        buffer_velas.mesclar(klines)
+        return buffer_velas
     except BinanceAPIException as e:
         log_event("ERRO", f"Falha ao obter klines da Binance. Status: {e.status_code}, Mensagem: {e.message}")
         return pd.DataFrame()
@@ -199,9 +311,10 @@ def obter_dados():
 #        df (pd.DataFrame): DataFrame com os dados de preço de fechamento.
 # - Returns:
 #        pd.DataFrame: DataFrame com as colunas 'EMA9', 'EMA21' e 'RSI' adicionadas.
+@metricas.cronometrado("calcular_medias_e_rsi")
 def calcular_medias_e_rsi(df): 
 
-    if DEBUG_ALL: log_event("DEBUG", "7.2- Calcular EMAs e RSI.")
+    if DEBUG_ALL: log_debug("DEBUG", "7.2- Calcular EMAs e RSI.")
     if df.empty:
         log_event("ALERTA", "DataFrame vazio ao calcular médias e RSI. Pulando o cálculo.")
         return df
@@ -231,110 +344,97 @@ def calcular_medias_e_rsi(df):
     df['RSI'] = 100 - (100 / (1 + rs))
     # ==========================================================
 
+    _log_debug_indicadores(df)
+    return df
+
+# Funcao para atualizar o motor incremental de indicadores com as velas obtidas
+# - Só as velas novas são confirmadas (O(1) por vela); a vela em formação é calculada como provisória
+#   e não altera o estado confirmado até fechar.
+# - Args:
+#        motor (MotorIndicadores): estado incremental de EMAs e RSI.
+#        velas (BufferVelas ou pd.DataFrame): dados com as colunas 'time' e 'close' (resultado de obter_dados).
+# - Returns:
+#        MotorIndicadores: o próprio motor, com as colunas 'EMA9', 'EMA21' e 'RSI' das últimas velas.
+@metricas.cronometrado("atualizar_indicadores")
+def atualizar_indicadores(motor, velas):
+
+    if DEBUG_ALL: log_debug("DEBUG", "7.2- Atualizar EMAs e RSI (incremental).")
+    if velas.empty:
+        log_event("ALERTA", "Sem velas ao atualizar médias e RSI. Pulando o cálculo.")
+        return motor
+
+    motor.sincronizar(velas['time'], velas['close'])
+    _log_debug_indicadores(motor)
+    return motor
+
+# Funcao para imprimir os valores de debug das EMAs e do RSI (DataFrame ou MotorIndicadores)
+def _log_debug_indicadores(dados):
     if DEBUG_EMA:
-        log_event("DEBUG_EMA", f"EMA9(Atual) = {df['EMA9'].iloc[-1]:.2f} | EMA21(Atual) = {df['EMA21'].iloc[-1]:.2f} | \
-                  Diferença = {(df['EMA9'].iloc[-1]-df['EMA21'].iloc[-1]):.2f}")
-        log_event("DEBUG_EMA", f"EMA9(Anterior) = {df['EMA9'].iloc[-2]:.2f} | EMA21(Anterior) = {df['EMA21'].iloc[-2]:.2f} \
-                  | Diferença = {(df['EMA9'].iloc[-2]-df['EMA21'].iloc[-2]):.2f}")
-        if len(df) >= 3:
-            log_event("DEBUG_EMA", f"EMA9(2x Anterior) = {df['EMA9'].iloc[-3]:.2f} | EMA21(2x Anterior) = \
-                      {df['EMA21'].iloc[-3]:.2f} | Diferença = {(df['EMA9'].iloc[-3]-df['EMA21'].iloc[-3]):.2f}")
+        ema9 = np.asarray(dados["EMA9"], dtype=float)
+        ema21 = np.asarray(dados["EMA21"], dtype=float)
+        for nome, i in (("Atual", -1), ("Anterior", -2), ("2x Anterior", -3))[:len(ema9)]:
+            log_debug("DEBUG_EMA", "EMA9(%s) = %.2f | EMA21(%s) = %.2f | Diferença = %.2f",
+                      nome, ema9[i], nome, ema21[i], ema9[i] - ema21[i])
 
     if DEBUG_RSI:
-        if not df['RSI'].empty:
-            log_event("DEBUG_RSI", f"RSI(Atual) = {df['RSI'].iloc[-1]:.2f}")
-            if len(df) >= 2:
-                log_event("DEBUG_RSI", f"RSI(Anterior) = {df['RSI'].iloc[-2]:.2f}")
-    return df
+        rsi = np.asarray(dados["RSI"], dtype=float)
+        for nome, i in (("Atual", -1), ("Anterior", -2))[:len(rsi)]:
+            log_debug("DEBUG_RSI", "RSI(%s) = %.2f", nome, rsi[i])
+
+# Funcao para obter os parâmetros atuais da estratégia (a partir das constantes do bot)
+def parametros_estrategia():
+    return ParametrosEstrategia(
+        media_rapida=MEDIA_RAPIDA, media_lenta=MEDIA_LENTA, periodo_rsi=PERIODO_RSI,
+        rsi_sobrecompra=RSI_SOBRECOMPRA, rsi_sobrevenda=RSI_SOBREVENDA,
+        stop_loss=PERCENTAGEM_STOP_LOSS, take_profit=PERCENTAGEM_TAKE_PROFIT,
+        margem_venda_ema=MARGEM_PROXIMIDADE_VENDA_EMA, continuacao=bool(CONTINUACAO))
 
 # Funcao para verificar sinais atraves das EMAs e RSI
-# - Verifica os sinais de compra e venda com base no cruzamento das EMAs e nas condições do RSI.
+# - Verifica os sinais de compra e venda com base no cruzamento das EMAs e nas condições do RSI
+#   (regras em estrategia.avaliar_sinal) e atualiza a posição global.
 # - Args:
-#        df (pd.DataFrame): DataFrame com as colunas 'EMA9', 'EMA21' e 'RSI'.
+#        df (pd.DataFrame ou MotorIndicadores): dados com as colunas 'EMA9', 'EMA21' e 'RSI'.
 # - Returns:
 #        str or None: "COMPRA", "VENDA" ou None se nenhum sinal for detectado.
+@metricas.cronometrado("verificar_sinal")
 def verificar_sinal(df):
 
-    if DEBUG_ALL: log_event("DEBUG", "3- Verificar Sinais com EMA e RSI.")
+    if DEBUG_ALL: log_debug("DEBUG", "3- Verificar Sinais com EMA e RSI.")
     global posicao_aberta
 
-    # Garante que há dados suficientes para as EMAs e RSI
-    if df.empty or len(df) < max(MEDIA_LENTA, PERIODO_RSI) + 1:
-        log_event("ALERTA", "Dados insuficientes para verificar sinais (EMA/RSI).")
-        return None
+    sinal, posicao_aberta = avaliar_sinal(df, posicao_aberta, parametros_estrategia(), log_event)
+    return sinal
 
-    ema9_atual = df["EMA9"].iloc[-1]
-    ema21_atual = df["EMA21"].iloc[-1]
-    ema9_anterior = df["EMA9"].iloc[-2]
-    ema21_anterior = df["EMA21"].iloc[-2]
-
-    rsi_atual = df["RSI"].iloc[-1]
-    rsi_anterior = df["RSI"].iloc[-2] # Para verificar a "virada" do RSI
-
-    # === LÓGICA DE COMPRA (EMA + RSI) ===
-    # Sinal de Compra: EMA9 cruza acima da EMA21 E RSI está em sobrevenda e começando a subir
-    if (ema9_atual > ema21_atual) and \
-       (ema9_anterior <= ema21_anterior) and \
-       (rsi_atual < RSI_SOBRECOMPRA) and \
-       (rsi_atual > rsi_anterior) and \
-       (rsi_anterior < RSI_SOBREVENDA + 10): # Adiciona uma margem de movimento do RSI para sair da sobrevenda
-        if not posicao_aberta:
-            posicao_aberta = True
-            log_event("SINAL", f"(1.1) Sinal de COMPRA! EMA cruzou para cima e RSI ({rsi_atual:.2f}) confirmou.")
-            return "COMPRA"
-
-    # Sinal de Venda Antecipado (Margem na EMA): EMA9 está muito perto ou ligeiramente abaixo da EMA21
-    # e a EMA9 estava acima da EMA21 no candle anterior (ou seja, está a perder momentum de alta)
-    # E o RSI está a descer de uma zona alta.
-    elif posicao_aberta and \
-         (ema9_atual <= (ema21_atual * (1 + MARGEM_PROXIMIDADE_VENDA_EMA))) and \
-         (ema9_anterior > ema21_anterior) and \
-         (rsi_atual < rsi_anterior) and \
-         (rsi_atual > 50): # RSI acima de 50 ainda indica algum momentum para cair, mas não sobrevendido.
-                           # Ajustar o 50 se necessário.
-        log_event("SINAL", f"(2.0) Sinal de VENDA ANTECIPADA! EMA9 ({ema9_atual:.2f}) perto/abaixo de EMA21 \
-                  ({ema21_atual:.2f}) e RSI ({rsi_atual:.2f}) a cair.")
-        return "VENDA" # Retornar "VENDA" para o loop principal
-
-    # === LÓGICA DE VENDA (EMA + RSI) ===
-    # Sinal de Venda: EMA9 cruza abaixo da EMA21 E RSI está em sobrecompra e começando a cair
-    elif (ema9_atual < ema21_atual) and \
-         (ema9_anterior >= ema21_anterior) and \
-         (rsi_atual > RSI_SOBREVENDA) and \
-         (rsi_atual < rsi_anterior) and \
-         (rsi_anterior > RSI_SOBRECOMPRA - 10): # Adiciona uma margem de movimento do RSI para sair da sobrecompra
-        if posicao_aberta:
-            posicao_aberta = False
-            log_event("SINAL", f"(2.1) Sinal de VENDA! EMA cruzou para baixo e RSI ({rsi_atual:.2f}) confirmou.")
-            return "VENDA"
-
-    # === Lógica de Continuação (opcional, com RSI como filtro extra) ===
-    # Se CONTINUACAO estiver habilitado e as EMAs continuam em tendência de alta E RSI não está sobrecomprado
-    elif CONTINUACAO and \
-         (ema9_atual > ema21_atual) and \
-         (ema9_anterior > ema21_anterior) and \
-         (rsi_atual < RSI_SOBRECOMPRA): # Não compra se o RSI já estiver muito alto na continuação
-        if len(df) >= 3:
-            ema9_anterior_2x = df["EMA9"].iloc[-3]
-            ema21_anterior_2x = df["EMA21"].iloc[-3]
-            if (ema9_anterior_2x > ema21_anterior_2x):
-                if not posicao_aberta:
-                    posicao_aberta = True
-                    log_event("SINAL", f"(1.2) Sinal de COMPRA! Continuação de alta e RSI ({rsi_atual:.2f})  \
-                              não sobrecomprado.")
-                    return "COMPRA"
-
-    # Se CONTINUACAO estiver habilitado e as EMAs continuam em tendência de baixa E RSI não está sobrevendido
-    elif CONTINUACAO and \
-         (ema9_atual < ema21_atual) and \
-         (ema9_anterior < ema21_anterior) and \
-         (rsi_atual > RSI_SOBREVENDA): # Não vende se o RSI já estiver muito baixo na continuação
-        if posicao_aberta:
-            posicao_aberta = False
-            log_event("SINAL", f"(2.2) Sinal de VENDA! Continuação de baixa e RSI ({rsi_atual:.2f}) não sobrevendido.")
-            return "VENDA"
+# Funcao para obter o preço atual do par
+# - Com o modo STREAMING ativo usa o último preço recebido pelo WebSocket (sem custo de API);
+#   caso contrário consulta o ticker por REST.
+def obter_preco_atual():
+    if stream_mercado is not None and stream_mercado.ultimo_preco is not None:
+        return stream_mercado.ultimo_preco
+    return float(client.get_symbol_ticker(symbol=PAR)['price'])
 
-    return None
+# Funcao para aplicar os eventos do stream ao motor de indicadores
+# - Espera até `espera` segundos pelos eventos do WebSocket. Atualizações da vela em formação são
+#   aplicadas como provisórias; quando uma vela fecha retorna de imediato para o sinal ser avaliado.
+# - Args:
+#        stream (StreamMercado): stream de velas e preços do par.
+#        motor (MotorIndicadores): estado incremental de EMAs e RSI.
+#        espera (float): tempo máximo de espera em segundos (substitui o sleep do loop).
+def processar_eventos_stream(stream, motor, espera=5):
+    limite = time.monotonic() + espera
+    while True:
+        evento = stream.proximo_evento(timeout=max(0.0, limite - time.monotonic()))
+        if evento is None:
+            return
+        tipo, dados = evento
+        if tipo == "VELA_FECHADA":
+            if motor.ultimo_tempo is None or dados['time'] > motor.ultimo_tempo:
+                motor.fechar_vela(dados['close'], dados['time'])
+                _log_debug_indicadores(motor)
+            return
+        elif tipo == "VELA":
+            if motor.ultimo_tempo is None or dados['time'] > motor.ultimo_tempo:
+                motor.atualizar_provisoria(dados['close'], dados['time'])
 
 
 # ==============================================================================
@@ -342,61 +442,137 @@ def verificar_sinal(df):
 # ==============================================================================
 
 # Funcao para executar COMPRA/VENDA de ordens
-def executar_ordem(tipo, quantidade):
-    if DEBUG_ALL: log_event("DEBUG", "4- Executar Ordem")
+# - Com o executor de ordens, a quantidade é arredondada e validada localmente com os filtros em cache (nas
+#   vendas, limitada ao saldo livre em cache: a comissão da compra pode ter sido paga em MOEDA), sem pedidos
+#   antes do envio.
+# - Uma ordem recusada (localmente ou pela Binance) é registada e devolve None: o bot continua.
+# - Args:
+#        preco (float): último preço conhecido, para validar o valor nocional.
+# - Returns:
+#        dict or None: resposta da Binance.
+def executar_ordem(tipo, quantidade, motivo=None, preco=None):
+    global ordem_pendente
+    if DEBUG_ALL: log_debug("DEBUG", "4- Executar Ordem")
 
-    if tipo == "BUY":
-        try:
-            ordem = client.order_market_buy(symbol=PAR, quantity=quantidade)
-        except BinanceAPIException as e:
-            log_event("ERRO", "STATUS CODE:", e.status_code)
-            log_event("ERRO", "RESPONSE TEXT:", e.message)
-            log_event("ERRO", "RAW RESPONSE:", e.response.text)
-            exit()
-    else:
+    if SIMULACAO:
+        return ordem_simulada(tipo, quantidade)  # Fora do diário: o PnL registado é só o de execuções reais
+
+    if executor_ordens is not None:
         try:
-            ordem = client.order_market_sell(symbol=PAR, quantity=quantidade)
-        except BinanceAPIException as e:
-            log_event("ERRO", "STATUS CODE:", e.status_code)
-            log_event("ERRO", "RESPONSE TEXT:", e.message)
-            log_event("ERRO", "RAW RESPONSE:", e.response.text)
-            exit()
+            disponivel = cache_saldos.obter(MOEDA) if tipo == "SELL" and cache_saldos is not None else None
+            quantidade = executor_ordens.preparar(tipo, quantidade, preco, disponivel)
+        except OrdemInvalida as e:
+            log_event("ERRO", f"Ordem {tipo} não enviada: {e}")
+            return None
+
+    # A ordem fica no snapshot antes de ser enviada: após um reinício o resultado é consultado pelo clientOrderId
+    ordem_pendente = {'tipo': tipo, 'id': f"fatima-{uuid.uuid4().hex[:20]}"}
+    gravar_estado()
+
+    try:
+        if tipo == "BUY":
+            ordem = client.order_market_buy(symbol=PAR, quantity=quantidade, newClientOrderId=ordem_pendente['id'])
+        else:
+            ordem = client.order_market_sell(symbol=PAR, quantity=quantidade, newClientOrderId=ordem_pendente['id'])
+    except BinanceAPIException as e:
+        log_event("ERRO", f"Ordem {tipo} rejeitada. Status: {e.status_code}, Código: {e.code}, Mensagem: {e.message}, \
+                  Resposta: {e.response.text if e.response is not None else ''}")
+        if e.status_code < 500 and e.code != -1007:
+            # Recusa definitiva: a ordem não existe na Binance (com estado desconhecido fica para a reconciliação)
+            ordem_pendente = None
+            gravar_estado()
+        if e.code == -2010 and cache_saldos is not None:
+            cache_saldos.invalidar()  # Saldo insuficiente: relê os saldos antes da próxima ordem
+        return None
+
+    ordem_pendente = None
+    # Mantém o cache de saldos atualizado a partir da execução da ordem (sem get_account)
+    if cache_saldos is not None:
+        cache_saldos.aplicar_ordem(ordem, MOEDA, MOEDA_2)
+    registar_execucao(ordem, motivo)
     return ordem
 
+# Funcao para obter o preço médio de execução de uma ordem (None se a resposta não o trouxer)
+def preco_execucao(ordem):
+    try:
+        return float(ordem['cummulativeQuoteQty']) / float(ordem['executedQty'])
+    except (KeyError, TypeError, ValueError, ZeroDivisionError):
+        return None
+
+# Funcao para simular uma ordem de mercado (modo SIMULACAO)
+# - Executada ao preço atual, com o mesmo formato da resposta da Binance; os saldos não são alterados.
+def ordem_simulada(tipo, quantidade):
+    preco = obter_preco_atual()
+    log_event("INFO", f"[SIMULACAO] Ordem {tipo} de {quantidade} {MOEDA} a {preco:.2f} {MOEDA_2} (não enviada)",
+              lado=tipo, preco=preco, quantidade=quantidade)
+    return {'symbol': PAR, 'side': tipo, 'type': 'MARKET', 'status': 'FILLED', 'transactTime': int(time.time() * 1000),
+            'executedQty': f"{quantidade:.8f}", 'cummulativeQuoteQty': f"{quantidade * preco:.8f}", 'fills': []}
+
 # ==============================================================================
 # 9. Funções de Registo e Saldo
 # ==============================================================================
 
+# Funcao para registar uma ordem executada no diário de trades (DIARIO_TRADES)
+# - Uma venda fecha o trade da compra em aberto; uma falha do diário é registada mas não pára o bot.
+# - Em SIMULACAO nada é registado: as ordens em papel não podem misturar-se com as reais no mesmo diário.
+def registar_execucao(ordem, motivo=None):
+    if diario_trades is None or SIMULACAO or not ordem:
+        return None
+    try:
+        return diario_trades.registar_ordem(PAR, MOEDA, MOEDA_2, ordem, motivo)
+    except (sqlite3.Error, KeyError, TypeError, ValueError) as e:
+        log_event("ERRO", f"Falha ao registar a ordem no diário de trades: {e}")
+        return None
+
 # Funcao para registar TRADE no log
+# - Com o diário de trades, entrada, saída, quantidade e delta real vêm das execuções da Binance (preços médios
+#   e comissões); sem ele, dos preços do ticker e da variação do saldo em cache.
+# - Com o diário mas sem trade fechado pela venda (ex.: compra anterior ao diário), o delta real fica por
+#   contabilizar: saldo_entrada só é lido com o diário desligado.
 def registar_trade(preco_entrada, preco_saida):
     global delta_total
     global delta_saldo_total
     global n_trade
     global saldo_entrada
 
-    lucro_preco = (preco_saida - preco_entrada) * QUANTIDADE
+    trade = diario_trades.ultimo_trade(PAR) if diario_trades is not None else None
+    if trade is not None:
+        preco_entrada, preco_saida, quantidade = trade['preco_entrada'], trade['preco_saida'], trade['quantidade']
+        delta_saldo = trade['pnl']
+    elif diario_trades is not None:
+        quantidade = QUANTIDADE
+        delta_saldo = None
+        log_event("ALERTA", "Venda sem compra no diário de trades: delta real não registado nem somado ao total.")
+    else:
+        quantidade = QUANTIDADE
+        delta_saldo = cache_saldos.obter(MOEDA_2) - saldo_entrada
+    lucro_preco = (preco_saida - preco_entrada) * quantidade
     n_trade += 1
-    
-    saldo_moeda_1 = float(next((b['free'] for b in client.get_account()['balances'] if b['asset'] == MOEDA), 0))
-    saldo_moeda_2 = float(next((b['free'] for b in client.get_account()['balances'] if b['asset'] == MOEDA_2), 0))
-    delta_saldo = saldo_moeda_2-saldo_entrada
     delta_total += (lucro_preco-TAX)
-    delta_saldo_total += delta_saldo
+    if delta_saldo is not None:
+        delta_saldo_total += delta_saldo
 
-    log_event("TRADE", f"--- TRADE #{n_trade} ---")
-    log_event("TRADE", f"  Entrada: {preco_entrada:.2f} {MOEDA_2} | Saída: {preco_saida:.2f} {MOEDA_2} | Qtd: {QUANTIDADE} {MOEDA}")
+    log_event("TRADE", f"--- TRADE #{n_trade} ---", n_trade=n_trade, entrada=preco_entrada, saida=preco_saida,
+              quantidade=quantidade, lucro=lucro_preco - TAX, delta_total=delta_total, delta_saldo=delta_saldo)
+    log_event("TRADE", f"  Entrada: {preco_entrada:.2f} {MOEDA_2} | Saída: {preco_saida:.2f} {MOEDA_2} | Qtd: {quantidade} {MOEDA}")
     log_event("TRADE", f"  Lucro (Preço): {lucro_preco:.2f} {MOEDA_2}")
-    log_event("TRADE", f"  Saldo Atual: {MOEDA_2}: {saldo_moeda_2:.2f} | {MOEDA}: {saldo_moeda_1:.5f}")
-    log_event("TRADE", f"  Delta (Saldo Real): {delta_saldo:.2f} {MOEDA_2}")
+    if trade is not None:
+        log_event("TRADE", f"  Comissões: {trade['comissoes']:.4f} {MOEDA_2}")
+    else:
+        log_event("TRADE", f"  Saldo Atual: {MOEDA_2}: {cache_saldos.obter(MOEDA_2):.2f} | {MOEDA}: {cache_saldos.obter(MOEDA):.5f}")
+    if delta_saldo is not None:
+        log_event("TRADE", f"  Delta (Saldo Real): {delta_saldo:.2f} {MOEDA_2}")
     log_event("TRADE", f"  Total Acumulado (Preço): {delta_total:.2f} {MOEDA_2}")
     log_event("TRADE", f"  Total Acumulado (Saldo Real): {delta_saldo_total:.2f} {MOEDA_2}")
     log_event("TRADE", f"--------------------")
 
 # Funcao para imprimir saldo
+# - Lê o cache de saldos (atualizado pelas ordens); get_account só é chamado quando o TTL expira.
+@metricas.cronometrado("exibir_saldo")
 def exibir_saldo():
     
     try:    
-        info = client.get_account()
+        saldos = cache_saldos.todos()
     except BinanceAPIException as e:
         log_event("ERRO", f"Falha ao obter informações da conta. Status: {e.status_code}, Mensagem: {e.message}")
         return
@@ -404,145 +580,154 @@ def exibir_saldo():
         log_event("ERRO", f"Ocorreu um erro inesperado ao exibir saldo: {e}")
         return
     
-    for asset in info['balances']:
-        saldo = float(asset['free'])
+    for asset, saldo in saldos.items():
         if contador == 0:
             if saldo > 0:
-                log_event("SALDO", f"🔹 {asset['asset']}: {saldo:.7f} disponivel")
+                log_event("SALDO", f"🔹 {asset}: {saldo:.7f} disponivel")
         else:
-            if asset['asset'] == MOEDA or asset['asset'] == MOEDA_2:
-                log_event("SALDO", f"🔹 {asset['asset']}: {saldo:.7f} disponivel")
+            if asset == MOEDA or asset == MOEDA_2:
+                log_event("SALDO", f"🔹 {asset}: {saldo:.7f} disponivel")
 
 
-####### LOOP PRINCIPAL #######
 # ==============================================================================
-# 10. Loop Principal do Bot
+# 10. Gestão da Posição e Agendamento
 # ==============================================================================
-# if __name__ == "__main__":
-
-setup_logger()
 
-log_event("ALERTA", "🤖 O bot de trading foi iniciado.")
-log_event("INFO", f"Par de Trading: {PAR}, Quantidade por Trade: {QUANTIDADE} {MOEDA}, Timeframe: {TIMEFRAME}")
-log_event("INFO", f"Estratégia: EMA Rápida ({MEDIA_RAPIDA}), EMA Lenta ({MEDIA_LENTA}), RSI Período ({PERIODO_RSI})")
-log_event("INFO", f"RSI Níveis: Sobrecompra {RSI_SOBRECOMPRA}, Sobrevenda {RSI_SOBREVENDA}")
-log_event("INFO", f"Stop Loss Configurado: {PERCENTAGEM_STOP_LOSS}% {MOEDA_2}")
-log_event("INFO", f"Take Profit Configurado: {PERCENTAGEM_TAKE_PROFIT}% {MOEDA_2}")
-
-# Conectar ao cliente Binance
-client = Client(API_KEY, API_SECRET)
-conexao_binance(client)
+# Funcao para vender a posição aberta quando o preço cruza o STOP-LOSS ou o TAKE-PROFIT
+# - Protegida por `lock_posicao`: é chamada pelo loop principal, pelo pipeline agendado e pela
+#   thread do vigia SL/TP (modo AGENDADOR_VELAS).
+# - Args:
+#        preco_atual (float): último preço conhecido do par.
+# - Returns:
+#        str or None: "STOP-LOSS", "TAKE-PROFIT" ou None se a posição não foi fechada.
+def verificar_stop_loss_take_profit(preco_atual):
+    global posicao_aberta, preco_entrada_global, preco_stop_loss, preco_take_profit
+    global falhas_saida, proxima_tentativa_saida
+
+    with lock_posicao:
+        if not posicao_aberta or preco_entrada_global is None:
+            return None
+
+        if protecao is not None and protecao.ativa:
+            execucao = verificar_oco(preco_atual)
+            if execucao is not None:
+                fechar_posicao_oco(execucao)
+                gravar_estado()
+                return execucao.motivo
+            if protecao.ativa:
+                return None
+            # Sem OCO ativa (cancelada pelo bot ou fora dele): o SL/TP volta a ser vigiado localmente
+
+        if time.monotonic() < proxima_tentativa_saida:
+            return None  # Venda recusada há pouco: espera antes de voltar a pedir (sem tempestade de pedidos)
+
+        if preco_atual <= preco_stop_loss:
+            log_event("STOP_LOSS", f"🔴 STOP-LOSS sinalizado! Preco atual ({preco_atual:.2f}) atingiu ou \
+                          ultrapassou SL ({preco_stop_loss:.2f}).", preco=preco_atual, nivel=preco_stop_loss)
+            motivo = "STOP-LOSS"
+        elif preco_atual >= preco_take_profit:
+            log_event("TAKE_PROFIT", f"🟢 TAKE-PROFIT sinalizado! Preco atual ({preco_atual:.2f}) atingiu ou \
+                          ultrapassou TP ({preco_take_profit:.2f}).", preco=preco_atual, nivel=preco_take_profit)
+            motivo = "TAKE-PROFIT"
+        else:
+            return None
 
-preco_stop_loss = 0.0
-preco_take_profit = 0.0
+        # Vende já, sem voltar a pedir o ticker: o preço real da venda vem da execução
+        ordem_venda = executar_ordem("SELL", QUANTIDADE, motivo, preco_atual)
+        if ordem_venda:
+            registar_trade(preco_entrada_global, preco_atual) # Registar a venda de SL/TP
+            log_event("VENDA", f"VENDA por {motivo}: => PRECO DE VENDA = {preco_atual:.2f} {MOEDA_2} || \
+                              Quantidade = {QUANTIDADE} {MOEDA} || Valor vendido (- Fee) = \
+                              {(QUANTIDADE*preco_atual - TAX):.2f} {MOEDA_2}",
+                      preco=preco_atual, quantidade=QUANTIDADE, motivo=motivo)
+            posicao_aberta = False
+            preco_entrada_global = None
+            preco_stop_loss = None
+            preco_take_profit = None
+            falhas_saida, proxima_tentativa_saida = 0, 0.0
+        else:
+            # Nova tentativa com espera exponencial: o vigia (1 s) e o loop não repetem a ordem a cada verificação
+            falhas_saida += 1
+            espera = min(SAIDA_ESPERA_FALHA * 2 ** (falhas_saida - 1), SAIDA_ESPERA_MAXIMA)
+            proxima_tentativa_saida = time.monotonic() + espera
+            log_event("ERRO", f"Ordem de venda {motivo} falhou ({falhas_saida}x). Nova tentativa em {espera:.0f} s.")
+        gravar_estado()
+        return motivo
+
+# Funcao para consultar a OCO de SL/TP na Binance (modo OCO_EXCHANGE)
+# - Só consulta quando o preço local cruza um dos níveis ou a cada OCO_INTERVALO_VERIFICACAO segundos.
+# - Se o stop disparou mas o preço já está abaixo do limite da perna de stop (gap), cancela a OCO para
+#   a posição ser fechada a mercado.
+# - Returns:
+#        ExecucaoOCO or None: perna executada, se a OCO terminou.
+def verificar_oco(preco_atual):
+    global ultima_verificacao_oco
 
-while True:
-    #exibir_saldo_paper_trading()
-    exibir_saldo()
+    cruzou = preco_atual <= preco_stop_loss or preco_atual >= preco_take_profit
+    if not cruzou and time.monotonic() - ultima_verificacao_oco < OCO_INTERVALO_VERIFICACAO:
+        return None
+    ultima_verificacao_oco = time.monotonic()
     try:
-        df = obter_dados()
-            
-        if df.empty:
-            log_event("ALERTA", "Não foi possível obter dados de mercado. Tentando novamente na próxima iteração.")
-            time.sleep(5)
-            continue
+        execucao = protecao.verificar()
+        if execucao is None and protecao.ativa and preco_atual < protecao.preco_stop_limite:
+            log_event("ALERTA", f"Preço ({preco_atual:.2f}) abaixo do limite do stop ({protecao.preco_stop_limite:.2f}). \
+                      A cancelar a OCO para vender a mercado.")
+            execucao = protecao.cancelar()
+        return execucao
+    except BinanceAPIException as e:
+        log_event("ERRO", f"Falha ao consultar a OCO. Status: {e.status_code}, Mensagem: {e.message}")
+        return None
 
-        contador += 1
-        preco_atual = float(client.get_symbol_ticker(symbol=PAR)['price'])
-        log_event("INFO", f" *** Iteracao = {contador} || VALOR BTC = {preco_atual:.2f} EUR ***")
+# Funcao para fechar a posição a partir da execução da OCO na Binance
+def fechar_posicao_oco(execucao):
+    global posicao_aberta, preco_entrada_global, preco_stop_loss, preco_take_profit
+
+    if cache_saldos is not None:
+        cache_saldos.aplicar_ordem(execucao.ordem, MOEDA, MOEDA_2)
+    registar_execucao(execucao.ordem, execucao.motivo)
+    registar_trade(preco_entrada_global, execucao.preco)
+    log_event("VENDA", f"VENDA por {execucao.motivo} (OCO): => PRECO DE VENDA = {execucao.preco:.2f} {MOEDA_2} || \
+                      Quantidade = {execucao.quantidade} {MOEDA} || Valor vendido (- Fee) = \
+                      {(execucao.quantidade*execucao.preco - TAX):.2f} {MOEDA_2}",
+              preco=execucao.preco, quantidade=execucao.quantidade, motivo=execucao.motivo)
+    posicao_aberta = False
+    preco_entrada_global = None
+    preco_stop_loss = None
+    preco_take_profit = None
+
+# Funcao para colocar a OCO de SL/TP na Binance depois da compra (modo OCO_EXCHANGE)
+# - A quantidade é a executada na compra, descontada a comissão paga em MOEDA.
+# - Se falhar, o SL/TP continua a ser vigiado localmente.
+def colocar_oco(ordem_compra):
+    global ultima_verificacao_oco
+
+    quantidade = float(ordem_compra.get('executedQty', QUANTIDADE))
+    quantidade -= sum(float(f['commission']) for f in ordem_compra.get('fills', []) if f['commissionAsset'] == MOEDA)
+    try:
+        protecao.colocar(quantidade, preco_take_profit, preco_stop_loss)
+        ultima_verificacao_oco = time.monotonic()
+    except BinanceAPIException as e:
+        log_event("ERRO", f"Falha ao colocar a OCO. Status: {e.status_code}, Mensagem: {e.message}. \
+                  SL/TP vigiados localmente.")
 
+# Funcao para executar a ordem correspondente ao sinal (COMPRA/VENDA) e atualizar a posição
+def executar_sinal(sinal):
+    global posicao_aberta, preco_entrada_global, preco_stop_loss, preco_take_profit, saldo_entrada
+    global falhas_saida, proxima_tentativa_saida
 
-        # Verifica se já existe uma posição aberta - STOP LOSS e TAKE PROFIT
-        if posicao_aberta and preco_entrada_global is not None:
-            if preco_atual <= preco_stop_loss:
-                log_event("STOP_LOSS", f"🔴 STOP-LOSS sinalizado! Preco atual ({preco_atual:.2f}) atingiu ou \
-                          ultrapassou SL ({preco_stop_loss:.2f}).")
-                # Lógica para vender tudo
-                #qtd_moeda_disponivel = float(next((b['free'] for b in client.get_account()['balances'] if \
-                #  b['asset'] == MOEDA), 0))
-                #quantidade_a_vender = min(QUANTIDADE, qtd_moeda_disponivel)
-
-                # Verifica a quantidade mínima para o par antes de tentar vender
-                # Adaptação para pegar a quantidade mínima do filtro 'LOT_SIZE'
-                #symbol_info = client.get_symbol_info(PAR)
-                #min_qty_filter = next((f for f in symbol_info['filters'] if f['filterType'] == 'LOT_SIZE'), None)
-                #min_qty = float(min_qty_filter['minQty']) if min_qty_filter else 0.0
-
-                #if quantidade_a_vender >= min_qty:
-
-                preco_atual = float(client.get_symbol_ticker(symbol=PAR)['price'])        
-
-                ordem_venda = executar_ordem("SELL", QUANTIDADE)
-                if ordem_venda:
-                    registar_trade(preco_entrada_global, preco_atual) # Registar a venda de SL
-                    log_event("VENDA", f"VENDA por STOP-LOSS: => PRECO DE VENDA = {preco_atual:.2f} {MOEDA_2} || \
-                              Quantidade = {QUANTIDADE} {MOEDA} || Valor vendido (- Fee) = \
-                              {(QUANTIDADE*preco_atual - TAX):.2f} {MOEDA_2}")
-                    posicao_aberta = False
-                    preco_entrada_global = None
-                    preco_stop_loss = None
-                    preco_take_profit = None
-                else:
-                    log_event("ERRO", "Ordem de venda STOP-LOSS falhou.")
-                #else:
-                #    log_event("ALERTA", f"Não há {MOEDA} suficiente para vender via STOP-LOSS. Qtd disponível: 
-                # {qtd_moeda_disponivel}")
-                #    posicao_aberta = False # Se não tem para vender, assume que a posição não está mais aberta
-                #    preco_entrada_global = None
-                #    preco_stop_loss = None
-                #    preco_take_profit = None
-
-            elif preco_atual >= preco_take_profit:
-                log_event("TAKE_PROFIT", f"🟢 TAKE-PROFIT sinalizado! Preco atual ({preco_atual:.2f}) atingiu ou \
-                          ultrapassou TP ({preco_take_profit:.2f}).")
-                # Lógica para vender tudo 
-                #qtd_moeda_disponivel = float(next((b['free'] for b in client.get_account()['balances'] if b['asset']
-                # == MOEDA), 0))
-                #quantidade_a_vender = min(QUANTIDADE, qtd_moeda_disponivel)
-
-                # Verifica a quantidade mínima para o par antes de tentar vender
-                # Adaptação para pegar a quantidade mínima do filtro 'LOT_SIZE'
-                #symbol_info = client.get_symbol_info(PAR)
-                #min_qty_filter = next((f for f in symbol_info['filters'] if f['filterType'] == 'LOT_SIZE'), None)
-                #min_qty = float(min_qty_filter['minQty']) if min_qty_filter else 0.0
-
-                #if quantidade_a_vender >= min_qty:
-
-                preco_atual = float(client.get_symbol_ticker(symbol=PAR)['price'])        
-                
-                ordem_venda = executar_ordem("SELL", QUANTIDADE)
-                if ordem_venda:
-                    registar_trade(preco_entrada_global, preco_atual) # Registar a venda de TP
-                    log_event("VENDA", f"VENDA por TAKE-PROFIT: => PRECO DE VENDA = {preco_atual:.2f} {MOEDA_2} || \
-                              Quantidade = {QUANTIDADE} {MOEDA} || Valor vendido (- Fee) = \
-                              {(QUANTIDADE*preco_atual - TAX):.2f} {MOEDA_2}")
-                    posicao_aberta = False
-                    preco_entrada_global = None
-                    preco_stop_loss = None
-                    preco_take_profit = None
-                else:
-                    log_event("ERRO", "Ordem de venda TAKE-PROFIT falhou.")
-                #else:
-                #    log_event("ALERTA", f"Não há {MOEDA} suficiente para vender via TAKE-PROFIT. Qtd disponível: 
-                # {qtd_moeda_disponivel}")
-                #    posicao_aberta = False # Se não tem para vender, assume que a posição não está mais aberta
-                #    preco_entrada_global = None
-                #    preco_stop_loss = None
-                #    preco_take_profit = None
-            
-
-        df = calcular_medias_e_rsi(df)
-
-        sinal = verificar_sinal(df)
-        
+    with lock_posicao:
         if sinal == "COMPRA":
-            log_event("INFO", "📈 Sinal de COMPRA! Executando ordem...")
-            preco_entrada_global = float(client.get_symbol_ticker(symbol=PAR)['price'])
-            saldo_entrada = float(next((b['free'] for b in client.get_account()['balances'] if b['asset'] == MOEDA_2), 0))
+            log_event("INFO", "📈 Sinal de COMPRA! Executando ordem...", sinal="COMPRA")
+            preco_entrada_global = obter_preco_atual()
+            if diario_trades is None:
+                saldo_entrada = cache_saldos.obter(MOEDA_2)  # Com o diário, o delta real vem das execuções
 
-            log_event("INFO", f"Preço de entrada definido: {preco_entrada_global:.2f} {MOEDA_2}")
-            ordem_compra = executar_ordem("BUY", QUANTIDADE)
+            ordem_compra = executar_ordem("BUY", QUANTIDADE, preco=preco_entrada_global)
             if ordem_compra:
+                    # SL/TP a partir do preço médio executado (o ticker fica se a resposta não o trouxer)
+                    preco_entrada_global = preco_execucao(ordem_compra) or preco_entrada_global
+                    falhas_saida, proxima_tentativa_saida = 0, 0.0  # Nova posição: SL/TP sem espera pendente
+                    log_event("INFO", f"Preço de entrada definido: {preco_entrada_global:.2f} {MOEDA_2}")
                     preco_stop_loss = preco_entrada_global * (1 - PERCENTAGEM_STOP_LOSS)
                     preco_take_profit = preco_entrada_global * (1 + PERCENTAGEM_TAKE_PROFIT)
 
@@ -553,15 +738,31 @@ while True:
 
                     log_event("COMPRA", f"=> PRECO DE COMPRA = {preco_entrada_global:.2f} {MOEDA_2} \
                               || Quantidade = {QUANTIDADE} {MOEDA} || Valor gasto (+ Fee) = {(QUANTIDADE*preco_entrada_global + TAX):.2f} \
-                                {MOEDA_2}")
+                                {MOEDA_2}", preco=preco_entrada_global, quantidade=QUANTIDADE)
+                    if protecao is not None:
+                        colocar_oco(ordem_compra)
             else:
                 log_event("ERRO", "Ordem de compra falhou. Mantendo a posição 'fechada' ou tratando o erro.")
                 posicao_aberta = False
-        
+    
         elif sinal == "VENDA": #and preco_entrada_global is not None:
-            log_event("INFO", "📉 Sinal de VENDA! Executando ordem...")
-            
-            preco_venda = float(client.get_symbol_ticker(symbol=PAR)['price'])
+            log_event("INFO", "📉 Sinal de VENDA! Executando ordem...", sinal="VENDA")
+
+            if protecao is not None and protecao.ativa:
+                # A OCO bloqueia a quantidade: é cancelada antes da venda a mercado
+                try:
+                    execucao = protecao.cancelar()
+                except BinanceAPIException as e:
+                    log_event("ERRO", f"Falha ao cancelar a OCO. Status: {e.status_code}, Mensagem: {e.message}. \
+                              Posição mantida sob a OCO.")
+                    posicao_aberta = True
+                    return
+                if execucao is not None:
+                    # Já tinha sido executada na Binance: a posição fechou pelo SL/TP
+                    fechar_posicao_oco(execucao)
+                    return
+
+            preco_venda = obter_preco_atual()
 
             #qtd_moeda_disponivel = float(next((b['free'] for b in client.get_account()['balances'] if b['asset'] == MOEDA)
             # , 0))
@@ -574,36 +775,497 @@ while True:
             #min_qty = float(min_qty_filter['minQty']) if min_qty_filter else 0.0
 
             #if quantidade_a_vender >= min_qty:
-            ordem_venda = executar_ordem("SELL", QUANTIDADE)
+            ordem_venda = executar_ordem("SELL", QUANTIDADE, "SINAL", preco_venda)
             if ordem_venda:
                 registar_trade(preco_entrada_global, preco_venda)
                 log_event("VENDA", f"=> PRECO DE VENDA = {preco_venda:.2f} {MOEDA_2} || Quantidade = {QUANTIDADE} {MOEDA} \
-                          || Valor vendido (- Fee)= {(QUANTIDADE*preco_venda - TAX):.2f} {MOEDA_2}")
+                          || Valor vendido (- Fee)= {(QUANTIDADE*preco_venda - TAX):.2f} {MOEDA_2}",
+                          preco=preco_venda, quantidade=QUANTIDADE, motivo="SINAL")
+                posicao_aberta = False # Também na venda antecipada (2.0), em que o sinal não fecha a posição
                 preco_entrada_global = None
             else:
                 log_event("ERRO", "Ordem de venda falhou. Mantendo a posição 'aberta' ou tratando o erro.")
-                posicao_aberta = True
+                posicao_aberta = True  # Preço de entrada e SL/TP mantidos: o vigia continua a proteger a posição
             #else:
             #    log_event("ALERTA", f"Quantidade de {MOEDA} ({qtd_moeda_disponivel:.5f}) insuficiente para venda. Mínimo
             #  para {PAR}: {min_qty}")
             #    posicao_aberta = False
-            
-            preco_entrada_global = None
 
-        #
-        if (contador % 720 == 0) :
-            log_event("ALERTA", f"📊 Informações do Bot: Iteração {contador} | Trades Realizados: {n_trade} \
+# Funcao para avaliar o sinal e executar a ordem de forma atómica em relação ao vigia SL/TP
+# - Returns:
+#        str or None: "COMPRA", "VENDA" ou None.
+def processar_sinal(motor):
+    with lock_posicao:
+        sinal = verificar_sinal(motor)
+        inicio = time.perf_counter()
+        executar_sinal(sinal)
+        if sinal is not None:
+            metricas.observar("sinal_ate_ordem_segundos", time.perf_counter() - inicio, sinal=sinal)
+        gravar_estado()
+    return sinal
+
+# Funcao para imprimir o resumo periódico do bot
+def exibir_resumo():
+    log_event("ALERTA", f"📊 Informações do Bot: Iteração {contador} | Trades Realizados: {n_trade} \
                         | Delta Total (Preço): {delta_total:.2f} {MOEDA_2} | Delta Saldo Total: {delta_saldo_total:.2f} \
                         {MOEDA_2}")
-        
-        time.sleep(5)
-    
-    except KeyboardInterrupt:
-        log_event("ALERTA", "Bot interrompido manualmente (Ctrl+C).")
-        break
+    if diario_trades is not None:
+        # Totais em memória do diário: sem consultas nem pedidos de saldo à API
+        totais = diario_trades.totais(PAR)
+        log_event("ALERTA", f"📒 Diário: PnL {totais['pnl']:.2f} {MOEDA_2} | Win rate {totais['win_rate']:.0%} \
+                  | Max drawdown {totais['max_drawdown']:.2f} {MOEDA_2} | Comissões {totais['comissoes']:.2f} \
+                  {MOEDA_2} ({totais['arrasto_comissoes']:.3%} do volume)", **totais)
+    log_event("INFO", f"⏱️ Etapas: {metricas.resumo()}")
+    if sombra is not None:
+        log_event("ALERTA", f"👥 Variantes sombra: {sombra.resumo_texto()}")
+
+# Funcao para esperar entre iterações do loop, registando o atraso real (jitter) em relação ao pedido
+def esperar_iteracao(segundos):
+    inicio = time.perf_counter()
+    time.sleep(segundos)
+    metricas.observar("loop_jitter_segundos", time.perf_counter() - inicio - segundos)
+
+# Funcao para executar uma iteração do loop principal
+# - Saldo, velas e indicadores (REST ou stream), preço, STOP-LOSS/TAKE-PROFIT, sinal, variantes sombra,
+#   resumo periódico e espera até à próxima iteração. Os erros da API ou inesperados são registados e
+#   seguidos de uma pausa; o Ctrl+C (KeyboardInterrupt) sobe para o loop.
+# - Também é corrida por reproducao.py, com um relógio simulado no lugar do módulo time.
+# - Args:
+#        motor (MotorIndicadores): estado incremental de EMAs e RSI.
+def executar_iteracao(motor):
+    global contador
+
+    inicio_iteracao = time.perf_counter()
+    #exibir_saldo_paper_trading()
+    exibir_saldo()
+    try:
+        if stream_mercado is not None:
+            processar_eventos_stream(stream_mercado, motor)
+        else:
+            velas = obter_dados()
+
+            if velas.empty:
+                log_event("ALERTA", "Não foi possível obter dados de mercado. Tentando novamente na próxima iteração.")
+                time.sleep(5)
+                return
+
+            atualizar_indicadores(motor, velas)
+
+        contador += 1
+        preco_atual = obter_preco_atual()
+        log_event("INFO", f" *** Iteracao = {contador} || VALOR BTC = {preco_atual:.2f} EUR ***",
+              iteracao=contador, preco=preco_atual)
+
+
+        # Verifica se já existe uma posição aberta - STOP LOSS e TAKE PROFIT
+        verificar_stop_loss_take_profit(preco_atual)
+
+        sinal = processar_sinal(motor)
+        if sombra is not None:
+            sombra.passo(preco_atual)
+
+        #
+        if (contador % 720 == 0) :
+            exibir_resumo()
+
+        metricas.observar("iteracao_segundos", time.perf_counter() - inicio_iteracao)
+        if stream_mercado is None:
+            esperar_iteracao(5)
+
     except BinanceAPIException as e:
         log_event("ERRO_GERAL", f"Erro da API da Binance no loop principal. Status: {e.status_code}, Mensagem: {e.message}")
         time.sleep(10)
     except Exception as e:
         log_event("ERRO_GERAL", f"Ocorreu um erro inesperado no loop principal: {e}")
-        time.sleep(10)
\ No newline at end of file
+        time.sleep(10)
+
+# Funcao para parar os serviços de fundo antes de terminar
+# - Grava o estado, pára o stream e os exportadores de métricas (grava o ficheiro uma última vez) e envia as
+#   notificações pendentes.
+def terminar_servicos(exportadores_metricas=()):
+    gravar_estado()
+    if stream_mercado is not None:
+        stream_mercado.parar()
+    for exportador in exportadores_metricas:
+        exportador.parar()
+    if notificador is not None:
+        notificador.parar()
+    if diario_trades is not None:
+        diario_trades.fechar()
+    if executor_ordens is not None:
+        executor_ordens.parar()
+    parar_registo()
+
+# Funcao para iniciar a exportação das métricas (endpoint local e/ou ficheiro), conforme a configuração
+def iniciar_exportacao_metricas():
+    exportadores = []
+    if METRICAS_PORTA:
+        exportadores.append(ServidorMetricas(metricas, METRICAS_PORTA).iniciar())
+        log_event("INFO", f"Métricas disponíveis em http://127.0.0.1:{METRICAS_PORTA}/metrics")
+    if METRICAS_FICHEIRO:
+        exportadores.append(GravadorMetricas(metricas, METRICAS_FICHEIRO, METRICAS_INTERVALO).iniciar())
+    return exportadores
+
+# Funcao para correr o pipeline de sinal sobre as velas fechadas antes de `fecho_ms` (modo AGENDADOR_VELAS)
+# - A vela em formação é ignorada: o sinal é avaliado uma única vez por vela, sobre dados finais.
+# - Args:
+#        motor (MotorIndicadores): estado incremental de EMAs e RSI.
+#        fecho_ms (int): hora do fecho (hora do servidor, ms); as velas abertas antes dela estão fechadas.
+# - Returns:
+#        str or None: sinal avaliado.
+def processar_vela_fechada(motor, fecho_ms):
+    global contador
+
+    exibir_saldo()
+    try:
+        velas = obter_dados()
+        if velas.empty:
+            log_event("ALERTA", "Não foi possível obter dados de mercado. Tentando novamente na próxima vela.")
+            return None
+
+        fechadas = int(np.searchsorted(velas['time'], fecho_ms, side='left'))
+        motor.descartar_provisoria()
+        motor.sincronizar(velas['time'][:fechadas], velas['close'][:fechadas], ultima_fechada=True)
+        _log_debug_indicadores(motor)
+
+        contador += 1
+        preco_atual = obter_preco_atual()
+        log_event("INFO", f" *** Iteracao = {contador} || VALOR BTC = {preco_atual:.2f} EUR ***",
+                  iteracao=contador, preco=preco_atual)
+
+        verificar_stop_loss_take_profit(preco_atual)
+        sinal = processar_sinal(motor)
+        if sombra is not None:
+            sombra.passo(preco_atual)
+
+        if (contador % 720 == 0) :
+            exibir_resumo()
+        return sinal
+
+    except BinanceAPIException as e:
+        log_event("ERRO_GERAL", f"Erro da API da Binance no pipeline agendado. Status: {e.status_code}, Mensagem: {e.message}")
+    except Exception as e:
+        log_event("ERRO_GERAL", f"Ocorreu um erro inesperado no pipeline agendado: {e}")
+    return None
+
+# Funcao para obter o próximo preço a verificar pelo vigia SL/TP
+# - Com STREAMING acorda a cada evento do WebSocket (ou ao fim de `espera`); sem stream consulta o
+#   ticker, mas só com posição aberta (sem posição não há nada a vigiar nem peso de API a gastar).
+def proximo_preco_vigia(espera=1.0):
+    if stream_mercado is not None:
+        stream_mercado.proximo_evento(timeout=espera)
+        return stream_mercado.ultimo_preco
+    if not posicao_aberta:
+        return None
+    return obter_preco_atual()
+
+# Funcao para correr o bot no modo AGENDADOR_VELAS
+# - O sinal é avaliado uma vez por vela de TIMEFRAME, logo após o fecho (hora do servidor), e o
+#   stop-loss/take-profit é vigiado numa thread própria a cada INTERVALO_VIGIA segundos
+#   (ou a cada preço recebido, com STREAMING).
+def executar_agendado(motor):
+    agendador = AgendadorVelas(TIMEFRAME, RelogioServidor(client), atraso=ATRASO_FECHO_VELA)
+    intervalo_vigia = 0 if stream_mercado is not None else INTERVALO_VIGIA
+    vigia = VigiaSLTP(proximo_preco_vigia, verificar_stop_loss_take_profit, intervalo_vigia).iniciar()
+
+    def tarefa(fecho_ms):
+        metricas.observar("loop_jitter_segundos", agendador.ultimo_atraso_ms / 1000 - ATRASO_FECHO_VELA)
+        with metricas.cronometrar("iteracao_segundos"):
+            processar_vela_fechada(motor, fecho_ms)
+
+    try:
+        agendador.executar(tarefa)
+    except KeyboardInterrupt:
+        log_event("ALERTA", "Bot interrompido manualmente (Ctrl+C).")
+    finally:
+        agendador.parar()
+        vigia.parar()
+
+
+# ==============================================================================
+# 11. Estado Persistente e Arranque a Quente
+# ==============================================================================
+
+# Funcao para montar o snapshot do estado do bot (posição, contadores, ordem em curso e indicadores)
+def estado_atual():
+    return {
+        'simbolo': PAR,
+        'posicao': {'aberta': posicao_aberta, 'preco_entrada': preco_entrada_global, 'stop_loss': preco_stop_loss,
+                    'take_profit': preco_take_profit, 'saldo_entrada': saldo_entrada,
+                    'oco': protecao.exportar() if protecao is not None else None},
+        'contadores': {'n_trade': n_trade, 'delta_total': delta_total, 'delta_saldo_total': delta_saldo_total},
+        'ordem_pendente': ordem_pendente,
+        'indicadores': motor_persistido.exportar() if motor_persistido is not None else None,
+    }
+
+# Funcao para gravar o snapshot do estado (escrita atómica, só quando o estado muda)
+# - Uma falha de disco é registada mas não pára o bot.
+def gravar_estado():
+    if gravador_estado is None:
+        return
+    with lock_posicao:
+        estado = estado_atual()
+    try:
+        gravador_estado.gravar(estado)
+    except OSError as e:
+        log_event("ERRO", f"Falha ao gravar o estado em {gravador_estado.caminho}: {e}")
+
+# Funcao para repor o estado dos indicadores gravado no snapshot
+# - Se faltarem mais velas do que as que obter_dados traz num pedido, o estado é descartado e os
+#   indicadores são aquecidos por REST, como num arranque a frio.
+def restaurar_indicadores(motor, dados):
+    if not dados or dados.get('ultimo_tempo') is None:
+        return False
+    em_falta = (time.time() * 1000 - dados['ultimo_tempo']) // intervalo_ms(TIMEFRAME)
+    if em_falta > buffer_velas.capacidade - 2:
+        log_event("INFO", f"Estado dos indicadores com {em_falta:.0f} velas de atraso; a aquecer por REST.")
+        return False
+    try:
+        motor.restaurar(dados)
+    except (ValueError, KeyError, TypeError) as e:
+        log_event("ALERTA", f"Estado dos indicadores ignorado: {e}")
+        return False
+    return True
+
+# Funcao para aquecer os indicadores com as velas do arquivo histórico (ARQUIVO_VELAS)
+# - Completa primeiro o arquivo até à última vela fechada (só os intervalos em falta) e confirma no motor as
+#   velas dos últimos ARQUIVO_AQUECIMENTO_DIAS dias: as EMAs e o RSI arrancam sobre o mesmo histórico que o
+#   backtester lê, em vez de só sobre a janela do buffer. Uma falha deixa o aquecimento para o REST.
+# - Returns:
+#        bool: True se o motor foi aquecido pelo arquivo.
+def aquecer_do_arquivo(motor):
+    agora = int(time.time() * 1000)
+    inicio = agora - ARQUIVO_AQUECIMENTO_DIAS * 86_400_000
+    try:
+        descarregador = DescarregadorVelas(client, ARQUIVO_VELAS, log=log_event)
+        descarregador.descarregar(PAR, TIMEFRAME, inicio)
+        velas = descarregador.arquivo.ler(PAR, TIMEFRAME, inicio)
+    except (BinanceAPIException, OSError, ValueError) as e:
+        log_event("ALERTA", f"Aquecimento pelo arquivo {ARQUIVO_VELAS} falhou: {e}. A aquecer por REST.")
+        return False
+    if not len(velas['time']):
+        return False
+    motor.sincronizar(velas['time'], velas['close'], ultima_fechada=True)
+    log_event("INFO", f"Indicadores aquecidos com {len(velas['time'])} velas do arquivo {ARQUIVO_VELAS}.")
+    return True
+
+# Funcao para resolver a ordem que estava a ser enviada quando o bot parou (consulta pelo clientOrderId)
+def resolver_ordem_pendente():
+    global ordem_pendente, posicao_aberta, preco_entrada_global, preco_stop_loss, preco_take_profit
+
+    try:
+        ordem = client.get_order(symbol=PAR, origClientOrderId=ordem_pendente['id'])
+    except BinanceAPIException as e:
+        if e.code != -2013: # Order does not exist
+            raise
+        ordem = None
+    executada = ordem is not None and float(ordem.get('executedQty', 0)) > 0
+    if executada:
+        registar_execucao(ordem, "REINICIO")  # Ignorada pelo diário se a resposta já tinha sido gravada
+
+    if ordem_pendente['tipo'] == "BUY":
+        if executada:
+            preco_entrada_global = float(ordem['cummulativeQuoteQty']) / float(ordem['executedQty'])
+            preco_stop_loss = preco_entrada_global * (1 - PERCENTAGEM_STOP_LOSS)
+            preco_take_profit = preco_entrada_global * (1 + PERCENTAGEM_TAKE_PROFIT)
+            posicao_aberta = True
+            log_event("ALERTA", f"Compra {ordem_pendente['id']} executada antes do reinício a \
+                      {preco_entrada_global:.2f} {MOEDA_2}: posição aberta.")
+            if protecao is not None and not protecao.ativa:
+                colocar_oco(ordem)
+        else:
+            posicao_aberta = False
+            preco_entrada_global = preco_stop_loss = preco_take_profit = None
+    elif executada:
+        preco_venda = float(ordem['cummulativeQuoteQty']) / float(ordem['executedQty'])
+        if preco_entrada_global is not None:
+            registar_trade(preco_entrada_global, preco_venda)
+        log_event("ALERTA", f"Venda {ordem_pendente['id']} executada antes do reinício a {preco_venda:.2f} \
+                  {MOEDA_2}: posição fechada.")
+        posicao_aberta = False
+        preco_entrada_global = preco_stop_loss = preco_take_profit = None
+    else:
+        # A venda não chegou à Binance: a posição continua aberta
+        posicao_aberta = preco_entrada_global is not None
+    ordem_pendente = None
+
+# Funcao para reconciliar o estado reposto com a conta na Binance
+# - Ordem em curso (pelo clientOrderId), OCO (executada enquanto o bot estava parado), ordens abertas que o
+#   bot não conhece e saldo de MOEDA (uma posição sem saldo que a cubra é dada como fechada).
+def reconciliar_estado():
+    global posicao_aberta, preco_entrada_global, preco_stop_loss, preco_take_profit, ordem_pendente
+
+    if SIMULACAO:
+        ordem_pendente = None
+        return
+    if ordem_pendente is not None:
+        resolver_ordem_pendente()
+
+    abertas = client.get_open_orders(symbol=PAR)
+    listas = {o.get('orderListId', -1) for o in abertas}
+    if protecao is not None and protecao.ativa and protecao.id_lista not in listas:
+        execucao = protecao.verificar()
+        if execucao is not None and posicao_aberta:
+            fechar_posicao_oco(execucao)
+    desconhecidas = [o['orderId'] for o in abertas if protecao is None or o.get('orderListId') != protecao.id_lista]
+    if desconhecidas:
+        log_event("ALERTA", f"Ordens abertas em {PAR} que o bot não conhece: {desconhecidas}")
+
+    if posicao_aberta:
+        saldo_moeda = cache_saldos.obter(MOEDA) + (protecao.quantidade if protecao is not None and protecao.ativa else 0)
+        if saldo_moeda < QUANTIDADE * 0.5:
+            log_event("ALERTA", f"Posição aberta no estado gravado mas o saldo de {MOEDA} é {saldo_moeda:.5f}: \
+                      posição dada como fechada.")
+            posicao_aberta = False
+            preco_entrada_global = preco_stop_loss = preco_take_profit = None
+
+# Funcao para repor o estado gravado em FICHEIRO_ESTADO e reconciliá-lo com a Binance
+# - Returns:
+#        bool: True se havia um snapshot válido do par.
+def restaurar_estado(motor):
+    global posicao_aberta, preco_entrada_global, preco_stop_loss, preco_take_profit, saldo_entrada
+    global n_trade, delta_total, delta_saldo_total, ordem_pendente
+
+    inicio = time.perf_counter()
+    estado = gravador_estado.ler()
+    if estado is None or estado.get('simbolo') != PAR:
+        return False
+
+    with lock_posicao:
+        posicao = estado['posicao']
+        posicao_aberta = posicao['aberta']
+        preco_entrada_global = posicao['preco_entrada']
+        preco_stop_loss = posicao['stop_loss']
+        preco_take_profit = posicao['take_profit']
+        saldo_entrada = posicao['saldo_entrada']
+        n_trade = estado['contadores']['n_trade']
+        delta_total = estado['contadores']['delta_total']
+        delta_saldo_total = estado['contadores']['delta_saldo_total']
+        ordem_pendente = estado.get('ordem_pendente')
+        if protecao is not None:
+            protecao.restaurar(posicao.get('oco'))
+        indicadores = restaurar_indicadores(motor, estado.get('indicadores'))
+        try:
+            reconciliar_estado()
+        except BinanceAPIException as e:
+            log_event("ERRO", f"Falha ao reconciliar o estado com a Binance. Status: {e.status_code}, \
+                      Mensagem: {e.message}. A continuar com o estado gravado.")
+
+    log_event("INFO", f"Estado restaurado em {(time.perf_counter() - inicio) * 1000:.0f} ms: posição \
+              {'aberta' if posicao_aberta else 'fechada'} (entrada: {preco_entrada_global}) | Trades: {n_trade} \
+              | Indicadores: {'repostos' if indicadores else 'a aquecer'}")
+    gravar_estado()
+    return True
+
+
+####### LOOP PRINCIPAL #######
+# ==============================================================================
+# 12. Loop Principal do Bot
+# ==============================================================================
+if __name__ == "__main__":
+
+    setup_logger()
+
+    log_event("ALERTA", "🤖 O bot de trading foi iniciado.")
+    log_event("INFO", f"Par de Trading: {PAR}, Quantidade por Trade: {QUANTIDADE} {MOEDA}, Timeframe: {TIMEFRAME}")
+    log_event("INFO", f"Estratégia: EMA Rápida ({MEDIA_RAPIDA}), EMA Lenta ({MEDIA_LENTA}), RSI Período ({PERIODO_RSI})")
+    log_event("INFO", f"RSI Níveis: Sobrecompra {RSI_SOBRECOMPRA}, Sobrevenda {RSI_SOBREVENDA}")
+    log_event("INFO", f"Stop Loss Configurado: {PERCENTAGEM_STOP_LOSS}% {MOEDA_2}")
+    log_event("INFO", f"Take Profit Configurado: {PERCENTAGEM_TAKE_PROFIT}% {MOEDA_2}")
+
+    # Conectar ao cliente Binance
+    client = Client(API_KEY, API_SECRET, ping=not BINANCE_API_URL)
+    if BINANCE_API_URL:
+        client.API_URL = BINANCE_API_URL
+        log_event("ALERTA", f"API alternativa em uso: {BINANCE_API_URL}")
+    metricas.instrumentar_sessao(client.session)
+    # Orçamento de peso, leituras repetidas agregadas e novas tentativas com jitter (ordens nunca duplicadas).
+    # O mesmo orçamento serve os dois modos (o MotorMultiPar não conta o peso outra vez).
+    client = ClienteLimitado(client, LimitePedidos(PESO_MAXIMO_MINUTO))
+    exportadores_metricas = iniciar_exportacao_metricas()
+    conexao_binance(client)
+
+    # Saldos lidos uma vez no arranque e depois mantidos pelas respostas das ordens
+    cache_saldos = CacheSaldos(client, ttl=SALDO_TTL)
+
+    if PARES:
+        # Modo multi-par: uma EstrategiaPar por símbolo, executadas pelo mesmo motor
+        estrategias = [EstrategiaPar(moeda, moeda_2, quantidade, parametros_estrategia(), TIMEFRAME, TAX,
+                                     log=log_event)
+                       for moeda, moeda_2, quantidade in PARES]
+        log_event("INFO", f"Modo MULTI-PAR: {', '.join(e.simbolo for e in estrategias)}")
+        motor_multipar = MotorMultiPar(client, estrategias, None, cache_saldos, log=log_event)
+        try:
+            motor_multipar.executar()
+        except KeyboardInterrupt:
+            log_event("ALERTA", "Bot interrompido manualmente (Ctrl+C).")
+        terminar_servicos(exportadores_metricas)
+        sys.exit(0)
+
+    preco_stop_loss = 0.0
+    preco_take_profit = 0.0
+
+    # Filtros do símbolo em cache (refrescados em fundo) e ligação mantida aberta: cada ordem é validada
+    # localmente e enviada sem pedidos prévios
+    executor_ordens = ExecutorOrdens(client, PAR, FILTROS_REFRESCAR, MANTER_LIGACAO, log=log_event)
+    try:
+        executor_ordens.carregar()
+        executor_ordens.iniciar()
+    except (BinanceAPIException, ValueError) as e:
+        log_event("ALERTA", f"Filtros de {PAR} indisponíveis ({e}): as ordens seguem sem validação local.")
+        executor_ordens = None
+
+    # Estado incremental dos indicadores (atualizado em O(1) por vela nova)
+    motor_indicadores = MotorIndicadores(MEDIA_RAPIDA, MEDIA_LENTA, PERIODO_RSI)
+
+    if VARIANTES_SOMBRA:
+        # As variantes partilham o motor de indicadores: cada span/período distinto é calculado uma vez
+        sombra = MotorSombra(motor_indicadores, VARIANTES_SOMBRA, QUANTIDADE, TAX, parametros_estrategia(),
+                             log=log_event)
+        log_event("INFO", f"Modo SOMBRA: {len(sombra.variantes)} variantes em papel")
+    if SIMULACAO:
+        log_event("ALERTA", "Modo SIMULACAO ativo: as ordens não são enviadas à Binance.")
+    elif OCO_EXCHANGE:
+        protecao = ProtecaoOCO(client, PAR, OCO_MARGEM_STOP_LIMITE, log=log_event, executor=executor_ordens)
+        log_event("INFO", "Modo OCO_EXCHANGE ativo: SL/TP colocados na Binance como ordem OCO.")
+
+    if DIARIO_TRADES and not SIMULACAO:
+        # Ordens e trades com o PnL das execuções; os totais servem o resumo periódico sem pedidos à API
+        diario_trades = DiarioTrades(DIARIO_TRADES)
+        log_event("INFO", f"Diário de trades em {DIARIO_TRADES}: {diario_trades.totais(PAR)['trades']} trades registados")
+
+    if FICHEIRO_ESTADO:
+        # Arranque a quente: posição, contadores e indicadores do último snapshot, reconciliados com a conta
+        gravador_estado = GravadorEstado(FICHEIRO_ESTADO)
+        motor_persistido = motor_indicadores
+        restaurar_estado(motor_indicadores)
+
+    if ARQUIVO_VELAS and motor_indicadores.ultimo_tempo is None:
+        # Sem estado reposto: aquece os indicadores com o histórico do arquivo antes da primeira iteração
+        aquecer_do_arquivo(motor_indicadores)
+
+    if STREAMING:
+        # Aquece os indicadores uma única vez por REST; a partir daqui velas e preços chegam por WebSocket
+        atualizar_indicadores(motor_indicadores, obter_dados())
+        stream_mercado = StreamMercado(PAR, TIMEFRAME, client=client,
+                                       url_base=BINANCE_STREAM_URL or URL_BINANCE)
+        stream_mercado.ultimo_tempo_fechado = motor_indicadores.ultimo_tempo
+        stream_mercado.iniciar()
+        log_event("INFO", f"Modo STREAMING ativo: {stream_mercado.url}")
+
+    if AGENDADOR_VELAS:
+        # Sinal uma vez por vela fechada e SL/TP vigiados numa thread própria, com lock partilhado
+        log_event("INFO", f"Modo AGENDADOR_VELAS ativo: sinal a cada vela de {TIMEFRAME}, vigia SL/TP a cada \
+                  {INTERVALO_VIGIA}s")
+        executar_agendado(motor_indicadores)
+        terminar_servicos(exportadores_metricas)
+        sys.exit(0)
+
+    while True:
+        try:
+            executar_iteracao(motor_indicadores)
+        except KeyboardInterrupt:
+            log_event("ALERTA", "Bot interrompido manualmente (Ctrl+C).")
+            break
+
+    terminar_servicos(exportadores_metricas)
@@ -0,0 +1,348 @@
+"""Arquivo histórico de klines: download paralelo e retomável para partições colunares.
+
+As velas de cada símbolo/intervalo ficam numa partição por mês (UTC), um
+``.npy`` por coluna de ``velas.COLUNAS``, lidos com memory-map:
+
+    <destino>/<SIMBOLO>/<intervalo>/<AAAA-MM>/manifesto.json
+    <destino>/<SIMBOLO>/<intervalo>/<AAAA-MM>/<coluna>.<versao>.npy
+
+O manifesto da partição guarda a versão em uso dos ficheiros e a cobertura:
+os intervalos de tempo de abertura ``[inicio, fim)`` já pedidos à exchange
+(incluindo os que não têm velas, ex.: antes da listagem do par). Cada
+gravação escreve uma versão nova das colunas e só depois troca o manifesto
+(escrita atómica), pelo que uma interrupção a meio deixa a versão anterior
+intacta. Voltar a correr o download pede apenas o que falta na cobertura.
+
+O download divide o que falta em pedidos de até ``LIMITE_KLINES`` velas,
+executados em paralelo por um pool de threads. O orçamento de peso e as
+novas tentativas ficam a cargo do cliente (``cliente.ClienteLimitado`` com
+um ``LimitePedidos``), como no bot. Só são guardadas velas fechadas.
+
+Uso:
+    python historico.py descarregar BTCEUR 5m --inicio 2023-01-01 --destino dados_velas
+    python historico.py consultar BTCEUR 5m --inicio "2024-06-01" --fim "2024-06-02" --destino dados_velas
+"""
+import argparse
+import glob
+import json
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+
+from estado import gravar_json_atomico
+from velas import COLUNAS, intervalo_ms
+
+logger = logging.getLogger(__name__)
+
+MANIFESTO = "manifesto.json"
+LIMITE_KLINES = 1000  # Máximo de velas por pedido a get_klines
+GRAVAR_CADA = 16      # Pedidos concluídos de uma partição acumulados antes de a gravar
+
+
+def _log_padrao(tipo, mensagem):
+    logger.info("%s: %s", tipo, mensagem)
+
+
+def para_ms(momento):
+    """Tempo em ms (epoch, UTC): aceita inteiros em ms e tudo o que ``pd.Timestamp`` aceita."""
+    if momento is None:
+        return None
+    if isinstance(momento, (int, np.integer)):
+        return int(momento)
+    momento = pd.Timestamp(momento)
+    if momento.tzinfo is None:
+        momento = momento.tz_localize('UTC')
+    return int(momento.timestamp() * 1000)
+
+
+def mes_de(tempo_ms):
+    """Partição ('AAAA-MM') de uma vela pelo tempo de abertura."""
+    return str(np.datetime64(int(tempo_ms), 'ms').astype('datetime64[M]'))
+
+
+def limites_mes(mes):
+    """[inicio, fim) do mês em ms."""
+    inicio = np.datetime64(mes, 'M')
+    return (int(inicio.astype('datetime64[ms]').astype(np.int64)),
+            int((inicio + 1).astype('datetime64[ms]').astype(np.int64)))
+
+
+def juntar_intervalos(intervalos):
+    """Une intervalos [inicio, fim) sobrepostos ou contíguos; devolve-os ordenados."""
+    juntos = []
+    for inicio, fim in sorted(intervalos):
+        if juntos and inicio <= juntos[-1][1]:
+            juntos[-1][1] = max(juntos[-1][1], fim)
+        else:
+            juntos.append([inicio, fim])
+    return [(inicio, fim) for inicio, fim in juntos]
+
+
+def subtrair_intervalos(inicio, fim, cobertos):
+    """Partes de [inicio, fim) que não estão em ``cobertos`` (ordenados e disjuntos)."""
+    em_falta = []
+    for a, b in cobertos:
+        if b <= inicio or a >= fim:
+            continue
+        if a > inicio:
+            em_falta.append((inicio, a))
+        inicio = max(inicio, b)
+    if inicio < fim:
+        em_falta.append((inicio, fim))
+    return em_falta
+
+
+def klines_para_colunas(klines):
+    """Linhas de get_klines -> arrays tipados de ``velas.COLUNAS``."""
+    return {nome: np.array([linha[indice] for linha in klines], dtype=tipo) if klines else np.zeros(0, dtype=tipo)
+            for nome, (indice, tipo) in COLUNAS.items()}
+
+
+class ArquivoVelas:
+    """Leitura e escrita das partições mensais de velas de um diretório."""
+
+    def __init__(self, destino):
+        self.destino = destino
+
+    def _pasta(self, simbolo, intervalo, mes=None):
+        pasta = os.path.join(self.destino, simbolo.upper(), intervalo)
+        return pasta if mes is None else os.path.join(pasta, mes)
+
+    def meses(self, simbolo, intervalo):
+        """Partições existentes, por ordem."""
+        pasta = self._pasta(simbolo, intervalo)
+        if not os.path.isdir(pasta):
+            return []
+        return sorted(m for m in os.listdir(pasta) if os.path.exists(os.path.join(pasta, m, MANIFESTO)))
+
+    def manifesto(self, simbolo, intervalo, mes):
+        caminho = os.path.join(self._pasta(simbolo, intervalo, mes), MANIFESTO)
+        if not os.path.exists(caminho):
+            return {'versao': 0, 'linhas': 0, 'cobertura': []}
+        with open(caminho, encoding='utf-8') as f:
+            return json.load(f)
+
+    def particao(self, simbolo, intervalo, mes):
+        """Colunas da partição (memory-map; não devem ser alteradas)."""
+        manifesto = self.manifesto(simbolo, intervalo, mes)
+        if not manifesto['linhas']:
+            return klines_para_colunas([])
+        pasta = self._pasta(simbolo, intervalo, mes)
+        return {nome: np.load(os.path.join(pasta, f"{nome}.{manifesto['versao']}.npy"), mmap_mode='r')
+                for nome in COLUNAS}
+
+    def cobertura(self, simbolo, intervalo):
+        """Intervalos [inicio, fim) de tempos de abertura já descarregados, unidos entre partições."""
+        return juntar_intervalos([tuple(c) for mes in self.meses(simbolo, intervalo)
+                                  for c in self.manifesto(simbolo, intervalo, mes)['cobertura']])
+
+    def em_falta(self, simbolo, intervalo, inicio, fim):
+        """Intervalos de [inicio, fim) ainda não descarregados, cortados pelos limites dos meses."""
+        em_falta = []
+        mes = mes_de(inicio)
+        while True:
+            a, b = limites_mes(mes)
+            if a >= fim:
+                break
+            cobertos = [tuple(c) for c in self.manifesto(simbolo, intervalo, mes)['cobertura']]
+            em_falta.extend(subtrair_intervalos(max(a, inicio), min(b, fim), cobertos))
+            mes = mes_de(b)
+        return em_falta
+
+    def gravar(self, simbolo, intervalo, mes, colunas, cobertos):
+        """Junta ``colunas`` (velas novas) e ``cobertos`` (intervalos pedidos) à partição ``mes``.
+
+        As velas repetidas ficam com a versão mais recente. As colunas são gravadas numa
+        versão nova e o manifesto só aponta para ela depois de todas estarem em disco.
+        """
+        pasta = self._pasta(simbolo, intervalo, mes)
+        os.makedirs(pasta, exist_ok=True)
+        manifesto = self.manifesto(simbolo, intervalo, mes)
+        existentes = self.particao(simbolo, intervalo, mes)
+        tempos = np.concatenate([colunas['time'], existentes['time']])
+        # Primeira ocorrência de cada tempo: as velas novas vêm primeiro
+        tempos_unicos, indices = np.unique(tempos, return_index=True)
+        versao = manifesto['versao'] + 1
+        for nome in COLUNAS:
+            valores = np.concatenate([colunas[nome], existentes[nome]])[indices]
+            np.save(os.path.join(pasta, f"{nome}.{versao}.npy"), valores)
+        cobertura = juntar_intervalos([tuple(c) for c in manifesto['cobertura']] + list(cobertos))
+        gravar_json_atomico(os.path.join(pasta, MANIFESTO),
+                            {'versao': versao, 'linhas': int(len(tempos_unicos)),
+                             'cobertura': [list(c) for c in cobertura]})
+        self._limpar_versoes(pasta, versao)
+        return len(tempos_unicos)
+
+    def _limpar_versoes(self, pasta, versao):
+        # Versões antigas e as que ficaram de uma gravação interrompida
+        for caminho in glob.glob(os.path.join(glob.escape(pasta), "*.npy")):
+            if not caminho.endswith(f".{versao}.npy"):
+                os.remove(caminho)
+
+    def ler(self, simbolo, intervalo, inicio=None, fim=None):
+        """Colunas das velas com inicio <= time < fim (uma só partição: fatias sem cópia)."""
+        inicio, fim = para_ms(inicio), para_ms(fim)
+        partes = []
+        for mes in self.meses(simbolo, intervalo):
+            a, b = limites_mes(mes)
+            if (fim is not None and a >= fim) or (inicio is not None and b <= inicio):
+                continue
+            partes.append(self._fatia(self.particao(simbolo, intervalo, mes), inicio, fim))
+        if not partes:
+            return klines_para_colunas([])
+        if len(partes) == 1:
+            return partes[0]
+        return {nome: np.concatenate([parte[nome] for parte in partes]) for nome in COLUNAS}
+
+    def blocos(self, simbolo, intervalo, inicio=None, fim=None):
+        """Itera as colunas partição a partição (para percorrer anos de velas sem as carregar todas)."""
+        inicio, fim = para_ms(inicio), para_ms(fim)
+        for mes in self.meses(simbolo, intervalo):
+            a, b = limites_mes(mes)
+            if (fim is not None and a >= fim) or (inicio is not None and b <= inicio):
+                continue
+            colunas = self._fatia(self.particao(simbolo, intervalo, mes), inicio, fim)
+            if len(colunas['time']):
+                yield colunas
+
+    def _fatia(self, colunas, inicio, fim):
+        tempos = colunas['time']
+        a = 0 if inicio is None else int(np.searchsorted(tempos, inicio, 'left'))
+        b = len(tempos) if fim is None else int(np.searchsorted(tempos, fim, 'left'))
+        return {nome: valores[a:b] for nome, valores in colunas.items()}
+
+    def dataframe(self, simbolo, intervalo, inicio=None, fim=None):
+        """As velas de ``ler`` num DataFrame (colunas de velas.COLUNAS), como o CSV do backtester."""
+        return pd.DataFrame({nome: np.asarray(valores) for nome, valores in
+                             self.ler(simbolo, intervalo, inicio, fim).items()})
+
+
+class DescarregadorVelas:
+    """Descarrega para um ``ArquivoVelas`` os intervalos em falta, em pedidos paralelos."""
+
+    def __init__(self, client, destino, max_threads=4, limite=LIMITE_KLINES, gravar_cada=GRAVAR_CADA,
+                 log=_log_padrao):
+        self.client = client
+        self.arquivo = destino if isinstance(destino, ArquivoVelas) else ArquivoVelas(destino)
+        self.max_threads = max_threads
+        self.limite = limite
+        self.gravar_cada = gravar_cada
+        self.log = log
+        self._lock = threading.Lock()
+
+    def pedidos(self, simbolo, intervalo, inicio, fim):
+        """(inicio, fim) de cada pedido: os intervalos em falta divididos em blocos de ``limite`` velas."""
+        passo = intervalo_ms(intervalo) * self.limite
+        pedidos = []
+        for a, b in self.arquivo.em_falta(simbolo, intervalo, inicio, fim):
+            pedidos.extend((p, min(p + passo, b)) for p in range(a, b, passo))
+        return pedidos
+
+    def _pedir(self, simbolo, intervalo, inicio, fim, agora):
+        klines = self.client.get_klines(symbol=simbolo, interval=intervalo, startTime=inicio, endTime=fim - 1,
+                                        limit=self.limite)
+        # Só velas fechadas e dentro do pedido (a exchange pode devolver a vela em formação)
+        klines = [k for k in klines if inicio <= int(k[0]) < fim and int(k[6]) < agora]
+        return klines_para_colunas(klines)
+
+    def descarregar(self, simbolo, intervalo, inicio, fim=None, agora_ms=None):
+        """Completa o arquivo de ``simbolo``/``intervalo`` entre ``inicio`` e ``fim`` (por omissão, até agora).
+
+        Só até à última vela fechada: a vela em formação nunca é guardada nem dada como coberta.
+        Um pedido que falha (depois das novas tentativas do cliente) fica em falta para a próxima vez.
+        Devolve {'pedidos', 'velas', 'falhas'}.
+        """
+        passo = intervalo_ms(intervalo)
+        if agora_ms is None:
+            agora_ms = int(self.client.get_server_time()['serverTime'])
+        inicio = para_ms(inicio) // passo * passo
+        ultimo = agora_ms // passo * passo  # Abertura da vela em formação
+        fim = ultimo if fim is None else min(para_ms(fim), ultimo)
+        resumo = {'pedidos': 0, 'velas': 0, 'falhas': 0}
+        pedidos = self.pedidos(simbolo, intervalo, inicio, fim) if inicio < fim else []
+        if not pedidos:
+            return resumo
+
+        # Pedidos concluídos por partição, à espera de serem gravados
+        pendentes = {}
+        por_mes = {}
+        for pedido in pedidos:
+            por_mes[mes_de(pedido[0])] = por_mes.get(mes_de(pedido[0]), 0) + 1
+
+        def gravar(mes):
+            blocos = pendentes.pop(mes, [])
+            if blocos:
+                colunas = {nome: np.concatenate([c[nome] for c, _ in blocos]) for nome in COLUNAS}
+                self.arquivo.gravar(simbolo, intervalo, mes, colunas, [p for _, p in blocos])
+
+        self.log("INFO", f"Histórico {simbolo} {intervalo}: {len(pedidos)} pedidos em falta "
+                         f"({len(por_mes)} meses).")
+        with ThreadPoolExecutor(max_workers=self.max_threads) as pool:
+            futuros = {pool.submit(self._pedir, simbolo, intervalo, a, b, agora_ms): (a, b) for a, b in pedidos}
+            try:
+                for futuro in as_completed(futuros):
+                    pedido = futuros[futuro]
+                    mes = mes_de(pedido[0])
+                    por_mes[mes] -= 1
+                    try:
+                        colunas = futuro.result()
+                    except Exception as e:
+                        resumo['falhas'] += 1
+                        self.log("ERRO", f"Falha ao descarregar {simbolo} {intervalo} [{pedido[0]}, {pedido[1]}): {e}")
+                    else:
+                        resumo['pedidos'] += 1
+                        resumo['velas'] += len(colunas['time'])
+                        pendentes.setdefault(mes, []).append((colunas, pedido))
+                    if por_mes[mes] == 0 or len(pendentes.get(mes, ())) >= self.gravar_cada:
+                        gravar(mes)
+            finally:
+                # Interrompido (ex.: Ctrl+C): grava o que já chegou e cancela o resto
+                for futuro in futuros:
+                    futuro.cancel()
+                for mes in list(pendentes):
+                    gravar(mes)
+        self.log("INFO", f"Histórico {simbolo} {intervalo}: {resumo['velas']} velas em {resumo['pedidos']} "
+                         f"pedidos, {resumo['falhas']} falhas.")
+        return resumo
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Arquivo histórico de klines da Binance')
+    sub = parser.add_subparsers(dest='comando', required=True)
+    p_descarregar = sub.add_parser('descarregar', help='Descarrega (ou completa) o histórico de um par')
+    p_consultar = sub.add_parser('consultar', help='Mostra as velas arquivadas de um intervalo de tempo')
+    for p in (p_descarregar, p_consultar):
+        p.add_argument('simbolo', help='Ex.: BTCEUR')
+        p.add_argument('intervalo', help="Ex.: '5m'")
+        p.add_argument('--inicio', help="Ex.: '2023-01-01'")
+        p.add_argument('--fim', help="Por omissão, até à última vela fechada")
+        p.add_argument('--destino', default='dados_velas', help='Diretório do arquivo')
+    p_descarregar.add_argument('--threads', type=int, default=4, help='Pedidos em paralelo')
+    p_descarregar.add_argument('--peso-minuto', type=int, default=1200, help='Orçamento de peso por minuto')
+    args = parser.parse_args()
+
+    if args.comando == 'descarregar':
+        from binance.client import Client
+
+        from cliente import ClienteLimitado
+        from limites import LimitePedidos
+
+        logging.basicConfig(level=logging.INFO, format='%(message)s')
+        client = Client(os.getenv('BINANCE_API_KEY'), os.getenv('BINANCE_API_SECRET'), ping=False)
+        if os.getenv('BINANCE_API_URL'):
+            client.API_URL = os.getenv('BINANCE_API_URL')
+        client = ClienteLimitado(client, LimitePedidos(args.peso_minuto))
+        descarregador = DescarregadorVelas(client, args.destino, args.threads)
+        resumo = descarregador.descarregar(args.simbolo.upper(), args.intervalo, args.inicio or '2017-01-01',
+                                           args.fim)
+        print(", ".join(f"{chave}: {valor}" for chave, valor in resumo.items()))
+    else:
+        print(ArquivoVelas(args.destino).dataframe(args.simbolo, args.intervalo, args.inicio, args.fim).to_string())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,221 @@
+"""Indicadores incrementais (EMA e RSI) para o bot fatima.
+
+Em vez de recalcular as séries completas a cada iteração, estas classes mantêm
+o estado corrente das médias e atualizam-no em O(1) por vela. Os valores são
+equivalentes aos de ``pandas.Series.ewm(span=..., adjust=False).mean()``.
+
+A vela em formação (a última devolvida pela Binance) é tratada como
+*provisória*: o seu valor é calculado a partir do estado confirmado, sem o
+alterar, e só passa a fazer parte do estado quando a vela fecha.
+"""
+from collections import deque
+
+import numpy as np
+
+
+class EMAIncremental:
+    """Média móvel exponencial com ``adjust=False`` atualizada vela a vela."""
+
+    def __init__(self, span):
+        self.span = span
+        self.alpha = 2.0 / (span + 1.0)
+        self.valor = None  # Último valor confirmado
+
+    def proximo(self, x):
+        """Devolve o valor da EMA para ``x`` sem alterar o estado confirmado."""
+        if self.valor is None:
+            return float(x)
+        return (1.0 - self.alpha) * self.valor + self.alpha * x
+
+    def confirmar(self, x):
+        """Incorpora ``x`` no estado confirmado e devolve o novo valor."""
+        self.valor = self.proximo(x)
+        return self.valor
+
+
+def _rsi(media_ganhos, media_perdas):
+    # Mesmo tratamento que o cálculo em pandas: 0/0 -> RS = 0 (fillna), x/0 -> RS = inf
+    if media_perdas == 0:
+        return 100.0 if media_ganhos > 0 else 0.0
+    return 100.0 - (100.0 / (1.0 + media_ganhos / media_perdas))
+
+
+class RSIIncremental:
+    """RSI com médias exponenciais de ganhos e perdas atualizadas vela a vela."""
+
+    def __init__(self, periodo):
+        self.periodo = periodo
+        self.ganhos = EMAIncremental(periodo)
+        self.perdas = EMAIncremental(periodo)
+        self.ultimo_close = None
+
+    def _passo(self, close):
+        if self.ultimo_close is None:
+            ganho = perda = 0.0
+        else:
+            delta = close - self.ultimo_close
+            ganho = delta if delta > 0 else 0.0
+            perda = -delta if delta < 0 else 0.0
+        return self.ganhos.proximo(ganho), self.perdas.proximo(perda)
+
+    def proximo(self, close):
+        """Devolve o RSI para ``close`` sem alterar o estado confirmado."""
+        return _rsi(*self._passo(close))
+
+    def confirmar(self, close):
+        """Incorpora ``close`` no estado confirmado e devolve o novo RSI."""
+        self.ganhos.valor, self.perdas.valor = self._passo(close)
+        self.ultimo_close = float(close)
+        return _rsi(self.ganhos.valor, self.perdas.valor)
+
+
+class MotorIndicadores:
+    """Estado incremental de EMA rápida, EMA lenta e RSI de um par.
+
+    Expõe os últimos ``historico`` valores com a mesma interface de colunas do
+    DataFrame do bot (``motor["EMA9"]``, ``motor["EMA21"]``, ``motor["RSI"]``,
+    ``motor["close"]``), incluindo a vela provisória no fim, e ``len(motor)``
+    devolve o número total de velas processadas.
+
+    Outros períodos podem ser registados antes da primeira vela
+    (``registar``); cada span/período distinto é calculado uma única vez por
+    vela e ``vista`` devolve as colunas de outra combinação com a mesma
+    interface, para várias variantes da estratégia partilharem o estado.
+    """
+
+    COLUNAS = ("close", "EMA9", "EMA21", "RSI")
+
+    def __init__(self, span_rapida, span_lenta, periodo_rsi, historico=3):
+        self.ema_rapida = EMAIncremental(span_rapida)
+        self.ema_lenta = EMAIncremental(span_lenta)
+        self.rsi = RSIIncremental(periodo_rsi)
+        self.n_velas = 0
+        self.ultimo_tempo = None
+        # Cada linha do histórico: (close, valor de cada cálculo em _calculos)
+        self._calculos = [self.ema_rapida, self.ema_lenta, self.rsi]
+        self._indices = {}
+        for indice, chave in enumerate((("EMA", span_rapida), ("EMA", span_lenta), ("RSI", periodo_rsi)), 1):
+            self._indices.setdefault(chave, indice)
+        self._historico = deque(maxlen=historico)
+        self._provisoria = None
+        self._tempo_provisorio = None
+
+    def registar(self, spans=(), periodos=()):
+        """Acrescenta EMAs (``spans``) e RSIs (``periodos``) calculados a cada vela."""
+        novos = [chave for chave in dict.fromkeys([("EMA", s) for s in spans] + [("RSI", p) for p in periodos])
+                 if chave not in self._indices]
+        if novos and self.n_velas:
+            raise ValueError("Os indicadores têm de ser registados antes da primeira vela.")
+        for tipo, periodo in novos:
+            self._indices[(tipo, periodo)] = len(self._calculos) + 1
+            self._calculos.append(EMAIncremental(periodo) if tipo == "EMA" else RSIIncremental(periodo))
+        return self
+
+    def vista(self, span_rapida, span_lenta, periodo_rsi):
+        """Colunas de outra combinação de períodos (registados com ``registar``)."""
+        return VistaIndicadores(self, (0, self._indices[("EMA", span_rapida)],
+                                       self._indices[("EMA", span_lenta)], self._indices[("RSI", periodo_rsi)]))
+
+    def fechar_vela(self, close, tempo=None):
+        """Confirma uma vela fechada e devolve (close, ema_rapida, ema_lenta, rsi)."""
+        close = float(close)
+        linha = (close, *[calculo.confirmar(close) for calculo in self._calculos])
+        self._historico.append(linha)
+        self.n_velas += 1
+        if tempo is not None:
+            self.ultimo_tempo = tempo
+        self._provisoria = None
+        self._tempo_provisorio = None
+        return linha[:4]
+
+    def atualizar_provisoria(self, close, tempo=None):
+        """Calcula os indicadores da vela em formação sem alterar o estado confirmado."""
+        close = float(close)
+        self._provisoria = (close, *[calculo.proximo(close) for calculo in self._calculos])
+        self._tempo_provisorio = tempo
+        return self._provisoria[:4]
+
+    def descartar_provisoria(self):
+        """Remove a vela em formação (ex.: para avaliar apenas velas fechadas)."""
+        self._provisoria = None
+        self._tempo_provisorio = None
+
+    def sincronizar(self, tempos, closes, ultima_fechada=False):
+        """Integra uma janela de velas (ex.: resultado de ``get_klines``).
+
+        Só as velas com tempo de abertura posterior à última confirmada são
+        processadas; a última vela da janela é tratada como provisória, a não
+        ser que ``ultima_fechada`` seja verdadeiro.
+        """
+        tempos = np.asarray(tempos)
+        inicio = 0
+        if self.ultimo_tempo is not None:
+            inicio = int(np.searchsorted(tempos, self.ultimo_tempo, side="right"))
+        fim = len(tempos) if ultima_fechada else len(tempos) - 1
+        for i in range(inicio, fim):
+            self.fechar_vela(closes[i], tempos[i])
+        if not ultima_fechada and fim >= inicio and len(tempos) > 0:
+            self.atualizar_provisoria(closes[-1], tempos[-1])
+        return self
+
+    def exportar(self):
+        """Estado confirmado (sem a vela provisória), serializável em JSON, para ``restaurar``."""
+        calculos = []
+        for calculo in self._calculos:
+            if isinstance(calculo, EMAIncremental):
+                calculos.append(["EMA", calculo.span, calculo.valor])
+            else:
+                calculos.append(["RSI", calculo.periodo,
+                                 [calculo.ganhos.valor, calculo.perdas.valor, calculo.ultimo_close]])
+        return {'n_velas': self.n_velas, 'ultimo_tempo': None if self.ultimo_tempo is None else int(self.ultimo_tempo),
+                'calculos': calculos, 'historico': [list(linha) for linha in self._historico]}
+
+    def restaurar(self, estado):
+        """Repõe o estado de ``exportar``; os indicadores têm de ser os mesmos (mesma ordem e períodos)."""
+        chaves = [(c[0], c[1]) for c in estado['calculos']]
+        atuais = [("EMA", c.span) if isinstance(c, EMAIncremental) else ("RSI", c.periodo) for c in self._calculos]
+        if chaves != atuais:
+            raise ValueError(f"Indicadores do estado ({chaves}) diferentes dos configurados ({atuais}).")
+        for calculo, (_, _, valor) in zip(self._calculos, estado['calculos']):
+            if isinstance(calculo, EMAIncremental):
+                calculo.valor = valor
+            else:
+                calculo.ganhos.valor, calculo.perdas.valor, calculo.ultimo_close = valor
+        self.n_velas = estado['n_velas']
+        self.ultimo_tempo = estado['ultimo_tempo']
+        self._historico.clear()
+        self._historico.extend(tuple(linha) for linha in estado['historico'])
+        self.descartar_provisoria()
+        return self
+
+    def valores_atuais(self):
+        """Devolve (close, ema_rapida, ema_lenta, rsi) da vela mais recente."""
+        if self._provisoria is not None:
+            return self._provisoria[:4]
+        return self._historico[-1][:4] if self._historico else None
+
+    def _coluna(self, indice):
+        linhas = list(self._historico)
+        if self._provisoria is not None:
+            linhas.append(self._provisoria)
+        return np.array([linha[indice] for linha in linhas], dtype=float)
+
+    def __len__(self):
+        return self.n_velas + (1 if self._provisoria is not None else 0)
+
+    def __getitem__(self, coluna):
+        return self._coluna(self.COLUNAS.index(coluna))
+
+
+class VistaIndicadores:
+    """Colunas 'close', 'EMA9', 'EMA21' e 'RSI' de uma combinação de períodos de um ``MotorIndicadores``."""
+
+    def __init__(self, motor, indices):
+        self.motor = motor
+        self._indices = dict(zip(MotorIndicadores.COLUNAS, indices))
+
+    def __len__(self):
+        return len(self.motor)
+
+    def __getitem__(self, coluna):
+        return self.motor._coluna(self._indices[coluna])
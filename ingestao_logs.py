@@ -0,0 +1,273 @@
+"""Ingestão dos logs de trading (formato de log_event) para tabelas colunares.
+
+Converte os ficheiros de texto (``trading.txt``, ``logs/*.txt``, ...) em
+tabelas tipadas e ordenadas por tempo, gravadas em disco como um ficheiro
+``.npy`` por coluna (lidos com memory-map):
+
+    precos   ts, iteracao, preco                      (linhas "*** Iteracao = N || VALOR ...")
+    saldos   ts, ativo, saldo                         (linhas SALDO)
+    sinais   ts, lado, codigo, mensagem               (linhas SINAL e "(N) Sinal de ...")
+    ordens   ts, lado, preco, quantidade              (linhas "PRECO DE COMPRA/VENDA = ...")
+    trades   ts, n_trade, preco_entrada, preco_saida, quantidade
+    erros    ts, tipo, mensagem                       (ERRO, ERRO_GERAL)
+    eventos  ts, tipo, mensagem                       (todas as linhas exceto preços e saldos)
+
+Cada ficheiro é analisado num processo próprio. O manifesto guarda até que
+byte cada ficheiro já foi lido, pelo que voltar a correr a ingestão só lê o
+que foi acrescentado aos ficheiros que ainda estão a crescer.
+
+Uso:
+    python ingestao_logs.py ingerir trading.txt logs --destino dados_logs
+    python ingestao_logs.py consultar --destino dados_logs --tabela sinais --inicio "2025-06-20 12:00"
+"""
+import argparse
+import glob
+import hashlib
+import json
+import os
+import re
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+MANIFESTO = "manifesto.json"
+
+RE_LINHA = re.compile(r'^(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}) - \w+ - (\w+): ?(.*)$')
+RE_PRECO = re.compile(r'Iteracao = (\d+) \|\| VALOR \w+ = ([\d.]+)')
+RE_SALDO = re.compile(r'(\w+): ([\d.]+) disponivel')
+RE_SINAL = re.compile(r'^\((\d+(?:\.\d+)?)\) Sinal de (COMPRA|VENDA|Compra|Venda)')
+RE_ORDEM = re.compile(r'PRECO DE (COMPRA|VENDA) = ([\d.]+)')
+RE_QUANTIDADE = re.compile(r'Quantidade = ([\d.]+)')
+RE_TRADE_LINHA = re.compile(r'^(?:TRADE )?(\d+):?\s+Preco Entrada = ([\d.]+).*?Preco Saida = ([\d.]+)')
+RE_TRADE_CABECALHO = re.compile(r'--- TRADE #(\d+) ---')
+RE_TRADE_BLOCO = re.compile(r'Entrada: ([\d.]+) \w+ \| Saída: ([\d.]+) \w+ \| Qtd: ([\d.]+)')
+
+# Colunas e tipos de cada tabela
+TABELAS = {
+    'precos': {'ts': 'datetime64[s]', 'iteracao': np.int64, 'preco': np.float64},
+    'saldos': {'ts': 'datetime64[s]', 'ativo': str, 'saldo': np.float64},
+    'sinais': {'ts': 'datetime64[s]', 'lado': str, 'codigo': str, 'mensagem': str},
+    'ordens': {'ts': 'datetime64[s]', 'lado': str, 'preco': np.float64, 'quantidade': np.float64},
+    'trades': {'ts': 'datetime64[s]', 'n_trade': np.int64, 'preco_entrada': np.float64,
+               'preco_saida': np.float64, 'quantidade': np.float64},
+    'erros': {'ts': 'datetime64[s]', 'tipo': str, 'mensagem': str},
+    'eventos': {'ts': 'datetime64[s]', 'tipo': str, 'mensagem': str},
+}
+
+
+def analisar_linhas(linhas):
+    """Converte linhas de log em colunas (listas) por tabela."""
+    dados = {tabela: {coluna: [] for coluna in colunas} for tabela, colunas in TABELAS.items()}
+
+    def acrescentar(tabela, **valores):
+        for coluna, valor in valores.items():
+            dados[tabela][coluna].append(valor)
+
+    trade_atual = -1
+    for linha in linhas:
+        m = RE_LINHA.match(linha.rstrip('\r\n'))
+        if not m:
+            continue
+        ts, tipo, mensagem = m.groups()
+
+        if tipo == 'SALDO':
+            s = RE_SALDO.search(mensagem)
+            if s:
+                acrescentar('saldos', ts=ts, ativo=s.group(1), saldo=float(s.group(2)))
+            continue
+        p = RE_PRECO.search(mensagem)
+        if p:
+            acrescentar('precos', ts=ts, iteracao=int(p.group(1)), preco=float(p.group(2)))
+            continue
+
+        acrescentar('eventos', ts=ts, tipo=tipo, mensagem=mensagem)
+        if tipo.startswith('ERRO'):
+            acrescentar('erros', ts=ts, tipo=tipo, mensagem=mensagem)
+        s = RE_SINAL.match(mensagem)
+        if s:
+            acrescentar('sinais', ts=ts, lado=s.group(2).upper(), codigo=s.group(1), mensagem=mensagem)
+        o = RE_ORDEM.search(mensagem)
+        if o:
+            q = RE_QUANTIDADE.search(mensagem)
+            acrescentar('ordens', ts=ts, lado=o.group(1), preco=float(o.group(2)),
+                        quantidade=float(q.group(1)) if q else np.nan)
+        if tipo == 'TRADE':
+            t = RE_TRADE_LINHA.match(mensagem.strip())
+            if t:
+                q = RE_QUANTIDADE.search(mensagem)
+                acrescentar('trades', ts=ts, n_trade=int(t.group(1)), preco_entrada=float(t.group(2)),
+                            preco_saida=float(t.group(3)), quantidade=float(q.group(1)) if q else np.nan)
+                continue
+            c = RE_TRADE_CABECALHO.search(mensagem)
+            if c:
+                trade_atual = int(c.group(1))
+                continue
+            b = RE_TRADE_BLOCO.search(mensagem)
+            if b:
+                acrescentar('trades', ts=ts, n_trade=trade_atual, preco_entrada=float(b.group(1)),
+                            preco_saida=float(b.group(2)), quantidade=float(b.group(3)))
+    return {tabela: _para_arrays(tabela, colunas) for tabela, colunas in dados.items()}
+
+
+def _para_arrays(tabela, colunas):
+    arrays = {}
+    for coluna, tipo in TABELAS[tabela].items():
+        valores = colunas[coluna]
+        if tipo is str:
+            arrays[coluna] = np.array(valores, dtype=str) if valores else np.array([], dtype='<U1')
+        else:
+            arrays[coluna] = np.array(valores, dtype=tipo)
+    return arrays
+
+
+def _analisar_ficheiro(caminho, offset):
+    # Lê apenas as linhas completas a partir de `offset` (byte); corre num processo do pool
+    with open(caminho, 'rb') as f:
+        f.seek(offset)
+        bruto = f.read()
+    fim = bruto.rfind(b'\n') + 1
+    texto = bruto[:fim].decode('utf-8', errors='replace')
+    return caminho, offset + fim, analisar_linhas(texto.splitlines())
+
+
+def expandir_origens(origens):
+    """Aceita ficheiros e diretórios (todos os .txt, recursivamente)."""
+    ficheiros = []
+    for origem in origens:
+        if os.path.isdir(origem):
+            ficheiros.extend(sorted(glob.glob(os.path.join(origem, '**', '*.txt'), recursive=True)))
+        else:
+            ficheiros.append(origem)
+    return [os.path.abspath(f) for f in ficheiros]
+
+
+def _ler_manifesto(destino):
+    caminho = os.path.join(destino, MANIFESTO)
+    if os.path.exists(caminho):
+        with open(caminho, encoding='utf-8') as f:
+            return json.load(f)
+    return {'ficheiros': {}}
+
+
+def _gravar_manifesto(destino, manifesto):
+    caminho = os.path.join(destino, MANIFESTO)
+    temporario = caminho + '.tmp'
+    with open(temporario, 'w', encoding='utf-8') as f:
+        json.dump(manifesto, f, indent=1, ensure_ascii=False)
+    os.replace(temporario, caminho)
+
+
+def _remover_segmentos(destino, segmentos):
+    for segmento in segmentos:
+        for tabela in TABELAS:
+            shutil.rmtree(os.path.join(destino, tabela, segmento), ignore_errors=True)
+
+
+def ingerir(origens, destino, processos=None):
+    """Ingere (ou atualiza) os ficheiros de log em ``destino``. Devolve o número de linhas novas por tabela."""
+    os.makedirs(destino, exist_ok=True)
+    manifesto = _ler_manifesto(destino)
+    tarefas = []
+    for caminho in expandir_origens(origens):
+        tamanho = os.path.getsize(caminho)
+        registo = manifesto['ficheiros'].get(caminho)
+        if registo is not None and tamanho < registo['offset']:
+            # Ficheiro truncado ou substituído: volta a ler do início
+            _remover_segmentos(destino, registo['segmentos'])
+            registo = None
+        if registo is None:
+            registo = manifesto['ficheiros'][caminho] = {'offset': 0, 'segmentos': []}
+        if tamanho > registo['offset']:
+            tarefas.append((caminho, registo['offset']))
+
+    novas = {tabela: 0 for tabela in TABELAS}
+    if not tarefas:
+        return novas
+    with ProcessPoolExecutor(max_workers=processos) as pool:
+        resultados = pool.map(_analisar_ficheiro, *zip(*tarefas))
+        for caminho, offset, tabelas in resultados:
+            registo = manifesto['ficheiros'][caminho]
+            prefixo = hashlib.sha1(caminho.encode('utf-8')).hexdigest()[:12]
+            segmento = f"{prefixo}-{len(registo['segmentos']):05d}"
+            for tabela, colunas in tabelas.items():
+                pasta = os.path.join(destino, tabela, segmento)
+                os.makedirs(pasta, exist_ok=True)
+                for coluna, valores in colunas.items():
+                    np.save(os.path.join(pasta, f"{coluna}.npy"), valores)
+                novas[tabela] += len(colunas['ts'])
+            registo['segmentos'].append(segmento)
+            registo['offset'] = offset
+            _gravar_manifesto(destino, manifesto)
+    return novas
+
+
+class ArquivoLogs:
+    """Consultas por intervalo de tempo e por tipo sobre as tabelas ingeridas."""
+
+    def __init__(self, destino):
+        self.destino = destino
+        self._cache = {}
+
+    def tabela(self, nome):
+        """Colunas da tabela (todas as partes juntas), ordenadas por tempo."""
+        if nome not in self._cache:
+            pasta = os.path.join(self.destino, nome)
+            segmentos = sorted(os.listdir(pasta)) if os.path.isdir(pasta) else []
+            partes = {coluna: [np.load(os.path.join(pasta, s, f"{coluna}.npy"), mmap_mode='r')
+                               for s in segmentos] for coluna in TABELAS[nome]}
+            colunas = {coluna: (np.concatenate(valores) if valores else
+                                _para_arrays(nome, {c: [] for c in TABELAS[nome]})[coluna])
+                       for coluna, valores in partes.items()}
+            ordem = np.argsort(colunas['ts'], kind='stable')
+            self._cache[nome] = {coluna: valores[ordem] for coluna, valores in colunas.items()}
+        return self._cache[nome]
+
+    def consultar(self, nome, inicio=None, fim=None, **filtros):
+        """Linhas de ``nome`` com inicio <= ts < fim e colunas iguais aos ``filtros`` (ex.: tipo='ERRO')."""
+        colunas = self.tabela(nome)
+        ts = colunas['ts']
+        a = 0 if inicio is None else np.searchsorted(ts, np.datetime64(pd.Timestamp(inicio), 's'), 'left')
+        b = len(ts) if fim is None else np.searchsorted(ts, np.datetime64(pd.Timestamp(fim), 's'), 'left')
+        fatia = {coluna: valores[a:b] for coluna, valores in colunas.items()}
+        if filtros:
+            mascara = np.ones(b - a, dtype=bool)
+            for coluna, valor in filtros.items():
+                mascara &= fatia[coluna] == valor
+            fatia = {coluna: valores[mascara] for coluna, valores in fatia.items()}
+        return pd.DataFrame(fatia)
+
+    def antes_de(self, momento, minutos=30, tabelas=('precos', 'sinais', 'ordens')):
+        """O que o bot viu nos ``minutos`` anteriores a ``momento`` (ex.: o ts de um trade)."""
+        fim = pd.Timestamp(momento)
+        inicio = fim - pd.Timedelta(minutes=minutos)
+        return {nome: self.consultar(nome, inicio, fim + pd.Timedelta(seconds=1)) for nome in tabelas}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Ingestão e consulta dos logs de trading')
+    sub = parser.add_subparsers(dest='comando', required=True)
+    p_ingerir = sub.add_parser('ingerir', help='Ingere ficheiros ou diretórios de logs')
+    p_ingerir.add_argument('origens', nargs='+', help='Ficheiros .txt ou diretórios')
+    p_ingerir.add_argument('--destino', default='dados_logs', help='Diretório das tabelas')
+    p_ingerir.add_argument('--processos', type=int, default=None, help='Número de processos')
+    p_consultar = sub.add_parser('consultar', help='Consulta uma tabela por intervalo de tempo')
+    p_consultar.add_argument('--destino', default='dados_logs', help='Diretório das tabelas')
+    p_consultar.add_argument('--tabela', choices=sorted(TABELAS), required=True)
+    p_consultar.add_argument('--inicio', help="Ex.: '2025-06-20 12:00'")
+    p_consultar.add_argument('--fim', help="Ex.: '2025-06-20 13:00'")
+    p_consultar.add_argument('--tipo', help='Filtra pela coluna tipo (eventos/erros)')
+    args = parser.parse_args()
+
+    if args.comando == 'ingerir':
+        novas = ingerir(args.origens, args.destino, args.processos)
+        print(", ".join(f"{tabela}: {n}" for tabela, n in novas.items()))
+    else:
+        filtros = {'tipo': args.tipo} if args.tipo else {}
+        resultado = ArquivoLogs(args.destino).consultar(args.tabela, args.inicio, args.fim, **filtros)
+        print(resultado.to_string())
+
+
+if __name__ == '__main__':
+    main()
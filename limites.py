@@ -0,0 +1,57 @@
+"""Orçamento de peso de pedidos à API da Binance (token bucket).
+
+A Binance limita o peso total dos pedidos por minuto e por IP. Um único
+``LimitePedidos`` é partilhado por todas as threads/pares do processo: cada
+pedido consome o seu peso e, quando o orçamento se esgota, ``adquirir``
+espera o tempo necessário para o balde voltar a encher.
+"""
+import threading
+import time
+
+
+class LimitePedidos:
+    """Token bucket de peso de pedidos, seguro para várias threads."""
+
+    def __init__(self, peso_por_minuto=1200, rajada=None, relogio=time.monotonic, dormir=time.sleep):
+        self.capacidade = float(rajada if rajada is not None else peso_por_minuto)
+        self.taxa = peso_por_minuto / 60.0  # Peso reposto por segundo
+        self.relogio = relogio
+        self.dormir = dormir
+        self.peso_consumido = 0
+        self.espera_total = 0.0
+        self._tokens = self.capacidade
+        self._ultimo = relogio()
+        self._lock = threading.Lock()
+
+    def _repor(self):
+        agora = self.relogio()
+        self._tokens = min(self.capacidade, self._tokens + (agora - self._ultimo) * self.taxa)
+        self._ultimo = agora
+
+    def disponivel(self):
+        with self._lock:
+            self._repor()
+            return self._tokens
+
+    def adquirir(self, peso=1, bloquear=True):
+        """Consome ``peso`` do orçamento, esperando se necessário. Devolve False se não bloquear e faltar peso."""
+        while True:
+            with self._lock:
+                self._repor()
+                if self._tokens >= peso:
+                    self._tokens -= peso
+                    self.peso_consumido += peso
+                    return True
+                espera = (peso - self._tokens) / self.taxa
+                if bloquear:
+                    self.espera_total += espera  # Partilhado pelas threads dos pares: atualizado com o lock
+            if not bloquear:
+                return False
+            self.dormir(espera)
+
+    def sincronizar(self, usado, limite):
+        """Alinha o orçamento com o peso usado reportado pela Binance (cabeçalho x-mbx-used-weight-1m)."""
+        with self._lock:
+            self._repor()
+            restante = self.capacidade * max(0.0, 1.0 - usado / limite)
+            self._tokens = min(self._tokens, restante)
@@ -0,0 +1,149 @@
+"""Modo streaming de dados de mercado (WebSocket da Binance).
+
+Subscreve os streams ``<par>@kline_<intervalo>`` e ``<par>@trade`` (ou
+``<par>@bookTicker``) e coloca eventos numa fila consumida pelo loop
+principal, em vez de consultar ``get_klines``/``get_symbol_ticker`` a cada
+iteração. Em caso de desconexão volta a ligar automaticamente (com espera
+exponencial) e preenche por REST as velas fechadas que se perderam.
+
+Eventos produzidos (tuplos ``(tipo, dados)``):
+    ("VELA", vela)          -> atualização da vela em formação
+    ("VELA_FECHADA", vela)  -> vela fechada (stream ou preenchimento REST)
+    ("PRECO", preco)        -> último preço (trade ou média do bookTicker)
+"""
+import json
+import logging
+import queue
+import threading
+import time
+
+from websockets.sync.client import connect
+
+logger = logging.getLogger(__name__)
+
+URL_BINANCE = "wss://stream.binance.com:9443"
+
+
+def _vela_de_kline(k):
+    # Converte o campo 'k' de um evento kline (ou uma linha de get_klines) num dicionário
+    if isinstance(k, dict):
+        return {'time': int(k['t']), 'open': float(k['o']), 'high': float(k['h']),
+                'low': float(k['l']), 'close': float(k['c']), 'volume': float(k['v']),
+                'close_time': int(k['T'])}
+    return {'time': int(k[0]), 'open': float(k[1]), 'high': float(k[2]), 'low': float(k[3]),
+            'close': float(k[4]), 'volume': float(k[5]), 'close_time': int(k[6])}
+
+
+class StreamMercado:
+    """Cliente WebSocket de velas e preços de um par, a correr numa thread própria."""
+
+    def __init__(self, par, intervalo, client=None, url_base=URL_BINANCE,
+                 stream_preco="trade", espera_maxima=60):
+        self.par = par
+        self.intervalo = intervalo
+        self.client = client  # Usado apenas para preencher lacunas por REST
+        self.url_base = url_base.rstrip("/")
+        self.stream_preco = stream_preco
+        self.espera_maxima = espera_maxima
+        self.eventos = queue.Queue()
+        self.ultimo_preco = None
+        self.ultimo_tempo_fechado = None
+        self.ligacoes = 0
+        self._parar = threading.Event()
+        self._ws = None
+        self._thread = None
+
+    @property
+    def url(self):
+        par = self.par.lower()
+        return f"{self.url_base}/stream?streams={par}@kline_{self.intervalo}/{par}@{self.stream_preco}"
+
+    def iniciar(self):
+        self._thread = threading.Thread(target=self._executar, name=f"stream-{self.par}", daemon=True)
+        self._thread.start()
+        return self
+
+    def parar(self, timeout=5):
+        self._parar.set()
+        if self._ws is not None:
+            try:
+                self._ws.close()
+            except Exception:
+                pass
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def proximo_evento(self, timeout=None):
+        """Devolve o próximo evento da fila, ou None se nada chegar dentro de ``timeout``."""
+        try:
+            return self.eventos.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def _executar(self):
+        espera = 1
+        while not self._parar.is_set():
+            try:
+                with connect(self.url, open_timeout=10, close_timeout=2) as ws:
+                    self._ws = ws
+                    self.ligacoes += 1
+                    if self.ligacoes > 1:
+                        logger.info("Stream %s religado (ligação #%d).", self.par, self.ligacoes)
+                    self._preencher_lacunas()
+                    espera = 1
+                    for mensagem in ws:
+                        self._processar(mensagem)
+            except Exception as e:
+                if self._parar.is_set():
+                    break
+                logger.warning("Stream %s desligado: %s. Nova tentativa em %ss.", self.par, e, espera)
+            finally:
+                self._ws = None
+            if self._parar.wait(espera):
+                break
+            espera = min(espera * 2, self.espera_maxima)
+
+    def _processar(self, mensagem):
+        dados = json.loads(mensagem)
+        dados = dados.get('data', dados)  # Streams combinados vêm em {"stream": ..., "data": ...}
+        tipo = dados.get('e')
+        if tipo == 'kline':
+            vela = _vela_de_kline(dados['k'])
+            self._publicar_preco(vela['close'])
+            if dados['k']['x']:
+                self._publicar_vela_fechada(vela)
+            else:
+                self.eventos.put(("VELA", vela))
+        elif tipo == 'trade':
+            self._publicar_preco(float(dados['p']))
+        elif 'b' in dados and 'a' in dados:  # bookTicker não tem campo 'e'
+            self._publicar_preco((float(dados['b']) + float(dados['a'])) / 2)
+
+    def _publicar_preco(self, preco):
+        self.ultimo_preco = preco
+        self.eventos.put(("PRECO", preco))
+
+    def _publicar_vela_fechada(self, vela):
+        if self.ultimo_tempo_fechado is not None and vela['time'] <= self.ultimo_tempo_fechado:
+            return
+        self.ultimo_tempo_fechado = vela['time']
+        self.eventos.put(("VELA_FECHADA", vela))
+
+    def _preencher_lacunas(self):
+        # Recupera por REST as velas fechadas que o stream não entregou (desconexões ou o intervalo
+        # entre o aquecimento inicial dos indicadores e a primeira ligação)
+        if self.client is None or self.ultimo_tempo_fechado is None:
+            return
+        try:
+            klines = self.client.get_klines(symbol=self.par, interval=self.intervalo,
+                                            startTime=self.ultimo_tempo_fechado + 1, limit=1000)
+        except Exception as e:
+            logger.warning("Falha ao preencher lacunas do stream %s por REST: %s", self.par, e)
+            return
+        agora = time.time() * 1000
+        for k in klines:
+            vela = _vela_de_kline(k)
+            if vela['close_time'] < agora:
+                self._publicar_vela_fechada(vela)
+            else:
+                self.eventos.put(("VELA", vela))
@@ -0,0 +1,310 @@
+"""Métricas do bot: duração por etapa, uso da API e jitter do loop.
+
+``Metricas`` guarda contadores, medidores e histogramas (com etiquetas) em
+memória; registar uma observação custa alguns microssegundos (um ``bisect``
+e um ``append`` sob um lock), pelo que o custo fica muito abaixo de 1% de uma
+iteração. Os pedidos HTTP do cliente Binance (e do Telegram) são medidos por
+um hook de resposta da sessão ``requests``: contagem, peso e latência por
+endpoint, e o peso usado reportado pela Binance (``x-mbx-used-weight-1m``).
+
+Exportação em formato de texto Prometheus, por um endpoint HTTP local
+(``ServidorMetricas``) ou por um ficheiro gravado periodicamente
+(``GravadorMetricas``).
+"""
+import bisect
+import functools
+import logging
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+PREFIXO = "fatima_"
+
+# Limites dos buckets dos histogramas (segundos), de 0.1 ms a ~100 s
+BUCKETS_SEGUNDOS = tuple(round(0.0001 * 2 ** i, 7) for i in range(21))
+
+# Peso dos endpoints REST da Binance (API spot); os restantes contam como 1
+PESO_ENDPOINT = {
+    "/api/v3/klines": 2,
+    "/api/v3/ticker/price": 2,
+    "/api/v3/account": 20,
+    "/api/v3/order": 1,
+    "/api/v3/order/oco": 1,
+    "/api/v3/orderList/oco": 1,
+    "/api/v3/orderList": 4,
+    "/api/v3/openOrders": 6,
+    "/api/v3/exchangeInfo": 20,
+    "/api/v3/time": 1,
+    "/api/v3/ping": 1,
+}
+
+QUANTIS = (0.5, 0.99)
+
+
+class Histograma:
+    """Histograma cumulativo com buckets fixos e uma janela das últimas observações para os quantis."""
+
+    def __init__(self, buckets=BUCKETS_SEGUNDOS, janela=1024):
+        self.buckets = buckets
+        self.contagens = [0] * (len(buckets) + 1)
+        self.soma = 0.0
+        self.total = 0
+        self.recentes = deque(maxlen=janela)
+
+    def observar(self, valor):
+        self.contagens[bisect.bisect_left(self.buckets, valor)] += 1
+        self.soma += valor
+        self.total += 1
+        self.recentes.append(valor)
+
+    def quantil(self, q):
+        if not self.recentes:
+            return float('nan')
+        return float(np.quantile(np.fromiter(self.recentes, dtype=float), q))
+
+
+def _etiquetas(etiquetas):
+    return tuple(sorted(etiquetas.items()))
+
+
+def _formatar_etiquetas(etiquetas, extra=()):
+    pares = list(etiquetas) + list(extra)
+    if not pares:
+        return ""
+    texto = ",".join(f'{k}="{str(v).replace(chr(92), chr(92) * 2).replace(chr(34), chr(92) + chr(34))}"'
+                     for k, v in pares)
+    return "{" + texto + "}"
+
+
+def _valor(v):
+    if v != v:
+        return "NaN"
+    return repr(float(v))
+
+
+def endpoint_de_url(url):
+    """Nome do endpoint para as etiquetas (sem query string nem o token do Telegram)."""
+    partes = urlsplit(url)
+    if "telegram" in partes.netloc:
+        return "telegram:" + partes.path.rsplit("/", 1)[-1]
+    return partes.path or "/"
+
+
+class Metricas:
+    """Registo de métricas seguro para várias threads."""
+
+    def __init__(self, relogio=time.perf_counter):
+        self.relogio = relogio
+        self._contadores = {}
+        self._medidores = {}
+        self._histogramas = {}
+        self._descricoes = {}
+        self._lock = threading.Lock()
+
+    def descrever(self, nome, descricao):
+        self._descricoes[nome] = descricao
+
+    def incrementar(self, nome, valor=1, **etiquetas):
+        chave = (nome, _etiquetas(etiquetas))
+        with self._lock:
+            self._contadores[chave] = self._contadores.get(chave, 0) + valor
+
+    def definir(self, nome, valor, **etiquetas):
+        with self._lock:
+            self._medidores[(nome, _etiquetas(etiquetas))] = valor
+
+    def observar(self, nome, valor, **etiquetas):
+        chave = (nome, _etiquetas(etiquetas))
+        with self._lock:
+            histograma = self._histogramas.get(chave)
+            if histograma is None:
+                histograma = self._histogramas[chave] = Histograma()
+            histograma.observar(valor)
+
+    @contextmanager
+    def cronometrar(self, nome, **etiquetas):
+        """Mede a duração do bloco (segundos) no histograma ``nome``."""
+        inicio = self.relogio()
+        try:
+            yield
+        finally:
+            self.observar(nome, self.relogio() - inicio, **etiquetas)
+
+    def cronometrado(self, etapa):
+        """Decorador: mede cada chamada da função em ``etapa_segundos{etapa=...}``."""
+        def decorador(funcao):
+            @functools.wraps(funcao)
+            def medida(*args, **kwargs):
+                with self.cronometrar("etapa_segundos", etapa=etapa):
+                    return funcao(*args, **kwargs)
+            return medida
+        return decorador
+
+    def contador(self, nome, **etiquetas):
+        with self._lock:
+            return self._contadores.get((nome, _etiquetas(etiquetas)), 0)
+
+    def histograma(self, nome, **etiquetas):
+        with self._lock:
+            return self._histogramas.get((nome, _etiquetas(etiquetas)))
+
+    def quantil(self, nome, q, **etiquetas):
+        histograma = self.histograma(nome, **etiquetas)
+        return histograma.quantil(q) if histograma is not None else float('nan')
+
+    # --- Pedidos HTTP -----------------------------------------------------------
+
+    def registar_resposta(self, resposta):
+        """Conta um pedido HTTP (resposta ``requests``): pedidos, peso, latência e peso usado."""
+        endpoint = endpoint_de_url(resposta.url)
+        metodo = resposta.request.method if resposta.request is not None else "GET"
+        self.incrementar("api_pedidos_total", endpoint=endpoint, metodo=metodo, estado=resposta.status_code)
+        if not endpoint.startswith("telegram:"):
+            self.incrementar("api_peso_total", PESO_ENDPOINT.get(endpoint, 1), endpoint=endpoint)
+        self.observar("api_latencia_segundos", resposta.elapsed.total_seconds(), endpoint=endpoint)
+        usado = resposta.headers.get("x-mbx-used-weight-1m")
+        if usado is not None:
+            self.definir("api_peso_usado_1m", float(usado))
+
+    def instrumentar_sessao(self, sessao):
+        """Regista o hook de resposta numa ``requests.Session`` (ex.: ``client.session``)."""
+        def hook(resposta, *args, **kwargs):
+            try:
+                self.registar_resposta(resposta)
+            except Exception as e:
+                logger.debug("Falha ao registar métricas do pedido: %s", e)
+        sessao.hooks.setdefault("response", []).append(hook)
+        return sessao
+
+    # --- Exportação -------------------------------------------------------------
+
+    def exportar_texto(self):
+        """Todas as métricas em formato de texto Prometheus."""
+        with self._lock:
+            contadores = sorted(self._contadores.items())
+            medidores = sorted(self._medidores.items())
+            histogramas = sorted(self._histogramas.items(), key=lambda item: item[0])
+            quantis = {chave: [h.quantil(q) for q in QUANTIS] for chave, h in histogramas}
+            histogramas = [(chave, list(h.contagens), h.soma, h.total, h.buckets) for chave, h in histogramas]
+
+        linhas = []
+        vistos = set()
+
+        def cabecalho(nome, tipo):
+            if (nome, tipo) not in vistos:
+                vistos.add((nome, tipo))
+                if nome in self._descricoes:
+                    linhas.append(f"# HELP {PREFIXO}{nome} {self._descricoes[nome]}")
+                linhas.append(f"# TYPE {PREFIXO}{nome} {tipo}")
+
+        for (nome, etiquetas), valor in contadores:
+            cabecalho(nome, "counter")
+            linhas.append(f"{PREFIXO}{nome}{_formatar_etiquetas(etiquetas)} {_valor(valor)}")
+        for (nome, etiquetas), valor in medidores:
+            cabecalho(nome, "gauge")
+            linhas.append(f"{PREFIXO}{nome}{_formatar_etiquetas(etiquetas)} {_valor(valor)}")
+        for (nome, etiquetas), contagens, soma, total, buckets in histogramas:
+            cabecalho(nome, "histogram")
+            acumulado = 0
+            for limite, n in zip(list(buckets) + ["+Inf"], contagens):
+                acumulado += n
+                le = limite if limite == "+Inf" else repr(limite)
+                linhas.append(f"{PREFIXO}{nome}_bucket{_formatar_etiquetas(etiquetas, [('le', le)])} {acumulado}")
+            linhas.append(f"{PREFIXO}{nome}_sum{_formatar_etiquetas(etiquetas)} {_valor(soma)}")
+            linhas.append(f"{PREFIXO}{nome}_count{_formatar_etiquetas(etiquetas)} {total}")
+        for (nome, etiquetas), valores in sorted(quantis.items()):
+            cabecalho(f"{nome}_quantil", "gauge")
+            for q, valor in zip(QUANTIS, valores):
+                linhas.append(f"{PREFIXO}{nome}_quantil{_formatar_etiquetas(etiquetas, [('quantil', q)])} "
+                              f"{_valor(valor)}")
+        return "\n".join(linhas) + "\n"
+
+    def resumo(self, nome="etapa_segundos"):
+        """Texto curto com p50/p99 (ms) de cada série de ``nome``, para o log."""
+        with self._lock:
+            series = [(dict(etiquetas), h) for (n, etiquetas), h in sorted(self._histogramas.items(),
+                                                                           key=lambda item: item[0]) if n == nome]
+        return " | ".join(f"{'/'.join(map(str, etiquetas.values())) or nome}: p50 {h.quantil(0.5) * 1000:.1f}ms "
+                          f"p99 {h.quantil(0.99) * 1000:.1f}ms" for etiquetas, h in series)
+
+
+class ServidorMetricas:
+    """Endpoint HTTP local com as métricas em texto Prometheus (GET /metrics)."""
+
+    def __init__(self, metricas, porta=9108, endereco="127.0.0.1"):
+        self.metricas = metricas
+
+        class Pedido(BaseHTTPRequestHandler):
+            def do_GET(pedido):
+                if pedido.path.split("?")[0] not in ("/metrics", "/"):
+                    pedido.send_error(404)
+                    return
+                corpo = metricas.exportar_texto().encode("utf-8")
+                pedido.send_response(200)
+                pedido.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                pedido.send_header("Content-Length", str(len(corpo)))
+                pedido.end_headers()
+                pedido.wfile.write(corpo)
+
+            def log_message(pedido, *args):
+                pass
+
+        self.servidor = ThreadingHTTPServer((endereco, porta), Pedido)
+        self.servidor.daemon_threads = True
+        self._thread = None
+
+    @property
+    def porta(self):
+        return self.servidor.server_address[1]
+
+    def iniciar(self):
+        self._thread = threading.Thread(target=self.servidor.serve_forever, name="metricas-http", daemon=True)
+        self._thread.start()
+        return self
+
+    def parar(self):
+        self.servidor.shutdown()
+        self.servidor.server_close()
+
+
+class GravadorMetricas:
+    """Grava as métricas num ficheiro (texto Prometheus) a cada ``intervalo`` segundos, de forma atómica."""
+
+    def __init__(self, metricas, caminho, intervalo=60):
+        self.metricas = metricas
+        self.caminho = caminho
+        self.intervalo = intervalo
+        self._parar = threading.Event()
+        self._thread = None
+
+    def gravar(self):
+        temporario = self.caminho + ".tmp"
+        with open(temporario, "w", encoding="utf-8") as f:
+            f.write(self.metricas.exportar_texto())
+        os.replace(temporario, self.caminho)
+
+    def iniciar(self):
+        self._thread = threading.Thread(target=self._executar, name="metricas-ficheiro", daemon=True)
+        self._thread.start()
+        return self
+
+    def parar(self, timeout=5):
+        self._parar.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        self.gravar()
+
+    def _executar(self):
+        while not self._parar.wait(self.intervalo):
+            try:
+                self.gravar()
+            except OSError as e:
+                logger.error("Falha ao gravar as métricas em %s: %s", self.caminho, e)
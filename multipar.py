@@ -0,0 +1,257 @@
+"""Motor multi-par: vários pares a negociar num só processo.
+
+Cada par tem o seu objeto ``EstrategiaPar`` (posição, stop-loss/take-profit,
+contadores, buffer de velas e indicadores incrementais). Um único
+``MotorMultiPar`` executa-os num pool de threads e partilha entre todos:
+
+- um só cliente Binance (pool de ligações HTTP keep-alive);
+- um só orçamento de peso de pedidos (``LimitePedidos``), aplicado aqui ou,
+  com ``limite=None``, pelo ``ClienteLimitado`` que envolve o cliente (que
+  também acrescenta o ``newClientOrderId`` e repete as ordens sem duplicar);
+- uma só camada de dados de mercado: um pedido de ticker para todos os pares
+  por iteração, e klines de cada par apenas quando abre uma vela nova (entre
+  velas, a vela em formação é atualizada com o preço do ticker);
+- um só cache de saldos da conta.
+
+Assim o custo por iteração cresce de forma sub-linear com o número de pares.
+"""
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from binance.exceptions import BinanceAPIException
+from requests.adapters import HTTPAdapter
+
+from estrategia import ParametrosEstrategia, avaliar_sinal
+from indicadores import MotorIndicadores
+from velas import BufferVelas, intervalo_ms
+
+logger = logging.getLogger(__name__)
+
+# Peso dos pedidos REST usados (API spot da Binance)
+PESO_TICKER_TODOS = 4
+PESO_KLINES = 2
+PESO_ORDEM = 1
+
+
+def _log_padrao(tipo, mensagem):
+    logger.info("%s: %s", tipo, mensagem)
+
+
+def preco_execucao(ordem, preco_referencia):
+    """Preço médio de execução de uma ordem de mercado (ou o preço de referência se não vier na resposta)."""
+    try:
+        quantidade = float(ordem['executedQty'])
+        return float(ordem['cummulativeQuoteQty']) / quantidade if quantidade else preco_referencia
+    except (KeyError, TypeError, ValueError):
+        return preco_referencia
+
+
+class ServicosPartilhados:
+    """Acesso à API partilhado por todos os pares: cliente, orçamento de pedidos e saldos.
+
+    Com ``limite=None`` o peso não é contado aqui: o cliente é um ``ClienteLimitado``
+    que já o desconta do mesmo orçamento (e o sincroniza com o cabeçalho da Binance).
+    """
+
+    def __init__(self, client, limite, cache_saldos=None, log=_log_padrao):
+        self.client = client
+        self.limite = limite
+        self.cache_saldos = cache_saldos
+        self.log = log
+
+    def _adquirir(self, peso):
+        if self.limite is not None:
+            self.limite.adquirir(peso)
+
+    def precos(self):
+        """Último preço de todos os símbolos num único pedido."""
+        self._adquirir(PESO_TICKER_TODOS)
+        return {t['symbol']: float(t['price']) for t in self.client.get_symbol_ticker()}
+
+    def klines(self, simbolo, intervalo, limite):
+        self._adquirir(PESO_KLINES)
+        return self.client.get_klines(symbol=simbolo, interval=intervalo, limit=limite)
+
+    def ordem(self, simbolo, lado, quantidade, base, cotacao):
+        """Ordem de mercado; em caso de recusa regista o erro e devolve None (não termina o processo)."""
+        self._adquirir(PESO_ORDEM)
+        try:
+            if lado == "BUY":
+                ordem = self.client.order_market_buy(symbol=simbolo, quantity=quantidade)
+            else:
+                ordem = self.client.order_market_sell(symbol=simbolo, quantity=quantidade)
+        except BinanceAPIException as e:
+            self.log("ERRO", f"[{simbolo}] Ordem {lado} recusada. Status: {e.status_code}, Mensagem: {e.message}")
+            if self.cache_saldos is not None:
+                self.cache_saldos.invalidar()
+            return None
+        if self.cache_saldos is not None:
+            self.cache_saldos.aplicar_ordem(ordem, base, cotacao)
+        return ordem
+
+
+class EstrategiaPar:
+    """Estado e lógica de trading de um par (equivalente ao loop de fatima.py para um símbolo)."""
+
+    def __init__(self, moeda, moeda_2, quantidade, parametros=ParametrosEstrategia(), timeframe="5m",
+                 taxa=0.08, capacidade_velas=None, log=_log_padrao):
+        self.moeda = moeda
+        self.moeda_2 = moeda_2
+        self.simbolo = moeda + moeda_2
+        self.quantidade = quantidade
+        self.parametros = parametros
+        self.timeframe = timeframe
+        self.taxa = taxa
+        capacidade = capacidade_velas or max(50, parametros.periodo_rsi + parametros.media_lenta + 5)
+        self.buffer = BufferVelas(capacidade)
+        self.motor = MotorIndicadores(parametros.media_rapida, parametros.media_lenta, parametros.periodo_rsi)
+        self.posicao_aberta = False
+        self.preco_entrada = None
+        self.preco_stop_loss = None
+        self.preco_take_profit = None
+        self.n_trade = 0
+        self.delta_total = 0.0
+        self.lock = threading.Lock()
+        self._log = log
+
+    def log(self, tipo, mensagem):
+        self._log(tipo, f"[{self.simbolo}] {mensagem}")
+
+    def atualizar_velas(self, servicos, preco_atual, agora_ms):
+        # Klines só quando abre uma vela nova; entre velas a vela em formação segue o preço do ticker
+        ultimo = self.buffer.ultimo_tempo
+        if ultimo is None or agora_ms >= ultimo + intervalo_ms(self.timeframe):
+            klines = servicos.klines(self.simbolo, self.timeframe, self.buffer.limite_pedido(self.timeframe, agora_ms))
+            self.buffer.mesclar(klines)
+            self.motor.sincronizar(self.buffer['time'], self.buffer['close'])
+        else:
+            self.motor.atualizar_provisoria(preco_atual, ultimo)
+
+    def passo(self, servicos, preco_atual, agora_ms):
+        """Uma iteração do par: stop-loss/take-profit, indicadores, sinal e ordens."""
+        with self.lock:
+            if self.posicao_aberta and self.preco_entrada is not None:
+                if preco_atual <= self.preco_stop_loss:
+                    self.log("STOP_LOSS", f"🔴 STOP-LOSS sinalizado! Preco atual ({preco_atual:.2f}) atingiu ou "
+                                          f"ultrapassou SL ({self.preco_stop_loss:.2f}).")
+                    self.vender(servicos, preco_atual, "STOP-LOSS")
+                elif preco_atual >= self.preco_take_profit:
+                    self.log("TAKE_PROFIT", f"🟢 TAKE-PROFIT sinalizado! Preco atual ({preco_atual:.2f}) atingiu "
+                                            f"ou ultrapassou TP ({self.preco_take_profit:.2f}).")
+                    self.vender(servicos, preco_atual, "TAKE-PROFIT")
+
+            self.atualizar_velas(servicos, preco_atual, agora_ms)
+            sinal, self.posicao_aberta = avaliar_sinal(self.motor, self.posicao_aberta, self.parametros, self.log)
+
+            if sinal == "COMPRA":
+                self.comprar(servicos, preco_atual)
+            elif sinal == "VENDA":
+                self.vender(servicos, preco_atual, "SINAL")
+            return sinal
+
+    def comprar(self, servicos, preco_atual):
+        ordem = servicos.ordem(self.simbolo, "BUY", self.quantidade, self.moeda, self.moeda_2)
+        if not ordem:
+            self.log("ERRO", "Ordem de compra falhou.")
+            self.posicao_aberta = False
+            return None
+        self.posicao_aberta = True
+        self.preco_entrada = preco_execucao(ordem, preco_atual)
+        self.preco_stop_loss = self.preco_entrada * (1 - self.parametros.stop_loss)
+        self.preco_take_profit = self.preco_entrada * (1 + self.parametros.take_profit)
+        self.log("COMPRA", f"=> PRECO DE COMPRA = {self.preco_entrada:.2f} {self.moeda_2} || Quantidade = "
+                           f"{self.quantidade} {self.moeda} || SL = {self.preco_stop_loss:.2f} | "
+                           f"TP = {self.preco_take_profit:.2f}")
+        return ordem
+
+    def vender(self, servicos, preco_atual, motivo):
+        ordem = servicos.ordem(self.simbolo, "SELL", self.quantidade, self.moeda, self.moeda_2)
+        if not ordem:
+            self.log("ERRO", f"Ordem de venda ({motivo}) falhou.")
+            self.posicao_aberta = True
+            return None
+        preco_saida = preco_execucao(ordem, preco_atual)
+        if self.preco_entrada is not None:
+            lucro = (preco_saida - self.preco_entrada) * self.quantidade
+            self.n_trade += 1
+            self.delta_total += lucro - self.taxa
+            self.log("TRADE", f"--- TRADE #{self.n_trade} --- Entrada: {self.preco_entrada:.2f} | Saída: "
+                              f"{preco_saida:.2f} | Lucro (Preço): {lucro:.2f} {self.moeda_2} | "
+                              f"Total Acumulado: {self.delta_total:.2f} {self.moeda_2}")
+        self.log("VENDA", f"VENDA por {motivo}: => PRECO DE VENDA = {preco_saida:.2f} {self.moeda_2} || "
+                          f"Quantidade = {self.quantidade} {self.moeda}")
+        self.posicao_aberta = False
+        self.preco_entrada = self.preco_stop_loss = self.preco_take_profit = None
+        return ordem
+
+
+class MotorMultiPar:
+    """Executa várias ``EstrategiaPar`` num pool de threads com recursos partilhados."""
+
+    def __init__(self, client, estrategias, limite, cache_saldos=None, intervalo=5, max_threads=8,
+                 log=_log_padrao):
+        self.estrategias = list(estrategias)
+        self.intervalo = intervalo
+        self.log = log
+        self.iteracoes = 0
+        self.iteracao_resumo = 0  # Iteração do último resumo: sem repetir enquanto as iterações falham
+        n_threads = max(1, min(max_threads, len(self.estrategias)))
+        # Um só pool de ligações keep-alive, dimensionado para as threads de trabalho
+        if hasattr(client, "session"):
+            adaptador = HTTPAdapter(pool_connections=1, pool_maxsize=n_threads)
+            client.session.mount("https://", adaptador)
+            client.session.mount("http://", adaptador)
+        self.servicos = ServicosPartilhados(client, limite, cache_saldos, log)
+        self.executor = ThreadPoolExecutor(max_workers=n_threads, thread_name_prefix="par")
+
+    def iteracao(self):
+        """Um pedido de preços para todos os pares e um passo de cada par em paralelo."""
+        precos = self.servicos.precos()
+        agora_ms = time.time() * 1000
+        futuros = {}
+        for estrategia in self.estrategias:
+            if estrategia.simbolo not in precos:
+                self.log("ALERTA", f"[{estrategia.simbolo}] Sem preço no ticker.")
+                continue
+            futuros[self.executor.submit(estrategia.passo, self.servicos, precos[estrategia.simbolo],
+                                         agora_ms)] = estrategia
+        sinais = {}
+        for futuro in as_completed(futuros):
+            estrategia = futuros[futuro]
+            try:
+                sinais[estrategia.simbolo] = futuro.result()
+            except BinanceAPIException as e:
+                self.log("ERRO_GERAL", f"[{estrategia.simbolo}] Erro da API da Binance. Status: {e.status_code}, "
+                                       f"Mensagem: {e.message}")
+            except Exception as e:
+                self.log("ERRO_GERAL", f"[{estrategia.simbolo}] Ocorreu um erro inesperado: {e}")
+        self.iteracoes += 1
+        return sinais
+
+    def resumo(self):
+        total = sum(e.delta_total for e in self.estrategias)
+        trades = sum(e.n_trade for e in self.estrategias)
+        abertas = [e.simbolo for e in self.estrategias if e.posicao_aberta]
+        return (f"📊 Multi-par: Iteração {self.iteracoes} | Pares: {len(self.estrategias)} | Trades: {trades} | "
+                f"Delta Total (Preço): {total:.2f} | Posições abertas: {', '.join(abertas) or '-'}")
+
+    def executar(self, iteracoes=None):
+        """Loop principal; cada iteração começa a cada ``intervalo`` segundos."""
+        try:
+            while iteracoes is None or self.iteracoes < iteracoes:
+                inicio = time.monotonic()
+                try:
+                    self.iteracao()
+                except BinanceAPIException as e:
+                    self.log("ERRO_GERAL", f"Erro da API da Binance no loop multi-par. Status: {e.status_code}, "
+                                           f"Mensagem: {e.message}")
+                except Exception as e:
+                    self.log("ERRO_GERAL", f"Ocorreu um erro inesperado no loop multi-par: {e}")
+                if self.iteracoes % 720 == 0 and self.iteracoes != self.iteracao_resumo:
+                    self.iteracao_resumo = self.iteracoes
+                    self.log("ALERTA", self.resumo())
+                time.sleep(max(0.0, self.intervalo - (time.monotonic() - inicio)))
+        finally:
+            self.executor.shutdown(wait=True)
@@ -0,0 +1,147 @@
+"""Envio de notificações Telegram numa thread de fundo.
+
+O loop de trading só coloca a mensagem numa fila limitada (custo de
+microssegundos, nunca bloqueia). Uma thread dedicada envia as mensagens por
+uma ``requests.Session`` (ligação keep-alive), agrupa rajadas numa única
+mensagem, respeita um intervalo mínimo entre envios e repete os envios
+falhados com espera exponencial. Mensagens descartadas (fila cheia ou envio
+falhado após todas as tentativas) são contadas e registadas no log.
+"""
+import logging
+import queue
+import threading
+import time
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+LIMITE_TELEGRAM = 4096  # Tamanho máximo de uma mensagem da API do Telegram
+_FIM = object()
+
+
+class NotificadorTelegram:
+    """Fila de notificações Telegram consumida por uma thread de fundo."""
+
+    def __init__(self, token, chat_id, tamanho_fila=200, intervalo_minimo=1.0, max_tentativas=4,
+                 espera_base=1.0, timeout=5, max_agrupar=20, sessao=None):
+        self.url = f"https://api.telegram.org/bot{token}/sendMessage"
+        self.chat_id = chat_id
+        self.intervalo_minimo = intervalo_minimo
+        self.max_tentativas = max_tentativas
+        self.espera_base = espera_base
+        self.timeout = timeout
+        self.max_agrupar = max_agrupar
+        self.sessao = sessao or requests.Session()
+        self.fila = queue.Queue(maxsize=tamanho_fila)
+        self.enviadas = 0
+        self.descartadas = 0
+        self._descartadas_reportadas = 0
+        self._lock = threading.Lock()  # descartadas é atualizado por quem envia e pela thread de fundo
+        self._ultimo_envio = 0.0
+        self._thread = None
+
+    def iniciar(self):
+        self._thread = threading.Thread(target=self._executar, name="telegram", daemon=True)
+        self._thread.start()
+        return self
+
+    def enviar(self, mensagem):
+        """Coloca a mensagem na fila sem bloquear. Devolve False se foi descartada."""
+        try:
+            self.fila.put_nowait(mensagem)
+            return True
+        except queue.Full:
+            self._descartar(1)
+            return False
+
+    def parar(self, timeout=10):
+        """Envia o que ainda está na fila e termina a thread."""
+        if self._thread is None:
+            return
+        try:
+            self.fila.put(_FIM, timeout=timeout)
+        except queue.Full:
+            pass
+        self._thread.join(timeout)
+
+    def _executar(self):
+        while True:
+            mensagem = self.fila.get()
+            if mensagem is _FIM:
+                return
+            lote = [mensagem]
+            terminar = False
+            # Agrupa numa só mensagem o que chegou entretanto (rajadas de ERRO/ALERTA, por exemplo)
+            while len(lote) < self.max_agrupar:
+                try:
+                    seguinte = self.fila.get_nowait()
+                except queue.Empty:
+                    break
+                if seguinte is _FIM:
+                    terminar = True
+                    break
+                lote.append(seguinte)
+            self._reportar_descartadas(lote)
+            for texto in self._agrupar(lote):
+                self._enviar_com_tentativas(texto, len(lote))
+            if terminar:
+                return
+
+    def _descartar(self, n_mensagens):
+        with self._lock:
+            self.descartadas += n_mensagens
+
+    def _reportar_descartadas(self, lote):
+        with self._lock:
+            total = self.descartadas
+        novas = total - self._descartadas_reportadas
+        if novas > 0:
+            self._descartadas_reportadas = total
+            logger.warning("Notificações Telegram descartadas: %d (total %d).", novas, total)
+            lote.append(f"⚠️ {novas} notificação(ões) descartada(s) (fila cheia ou falha de envio).")
+
+    @staticmethod
+    def _agrupar(lote):
+        # Junta as mensagens respeitando o limite de tamanho do Telegram
+        blocos, atual = [], ""
+        for mensagem in lote:
+            mensagem = mensagem[:LIMITE_TELEGRAM]
+            if atual and len(atual) + 1 + len(mensagem) > LIMITE_TELEGRAM:
+                blocos.append(atual)
+                atual = mensagem
+            else:
+                atual = f"{atual}\n{mensagem}" if atual else mensagem
+        if atual:
+            blocos.append(atual)
+        return blocos
+
+    def _enviar_com_tentativas(self, texto, n_mensagens):
+        for tentativa in range(self.max_tentativas):
+            espera = self._ultimo_envio + self.intervalo_minimo - time.monotonic()
+            if espera > 0:
+                time.sleep(espera)
+            self._ultimo_envio = time.monotonic()
+            try:
+                resposta = self.sessao.post(self.url, data={"chat_id": self.chat_id, "text": texto},
+                                            timeout=self.timeout)
+                if resposta.status_code == 200:
+                    self.enviadas += n_mensagens
+                    return True
+                espera = self.espera_base * 2 ** tentativa
+                if resposta.status_code == 429:
+                    # O Telegram indica quanto tempo esperar em parameters.retry_after
+                    try:
+                        espera = max(espera, resposta.json()["parameters"]["retry_after"])
+                    except Exception:
+                        pass
+                elif 400 <= resposta.status_code < 500:
+                    logger.error("Telegram recusou a mensagem (HTTP %s): %s", resposta.status_code, resposta.text)
+                    break
+            except requests.RequestException as e:
+                espera = self.espera_base * 2 ** tentativa
+                logger.warning("Falha ao enviar mensagem Telegram (tentativa %d): %s", tentativa + 1, e)
+            if tentativa + 1 < self.max_tentativas:
+                time.sleep(espera)
+        self._descartar(n_mensagens)
+        return False
@@ -0,0 +1,164 @@
+"""Envio de ordens de mercado com os filtros do símbolo em cache e a quantidade validada antes do envio.
+
+Os filtros do símbolo (LOT_SIZE, MARKET_LOT_SIZE, NOTIONAL/MIN_NOTIONAL) são
+lidos uma vez no arranque e refrescados por uma thread de fundo. A mesma
+thread faz ``ping`` à API a intervalos curtos, para a ligação HTTP
+(keep-alive da sessão do cliente) não fechar por inatividade: a ordem não
+paga um novo handshake TCP/TLS.
+
+Antes do envio, a quantidade é limitada ao saldo livre (vendas) e
+arredondada para baixo ao ``stepSize``. Depois é validada contra os limites
+de quantidade e de valor nocional, sem pedidos à API. Uma ordem que a
+Binance recusaria por filtro falha localmente (``OrdemInvalida``). O envio
+leva sempre o ``newClientOrderId`` atribuído pelo bot: as novas tentativas
+do ``ClienteLimitado`` consultam a ordem por esse id antes de a reenviar.
+"""
+import logging
+import math
+import threading
+import time
+from dataclasses import dataclass
+
+logger = logging.getLogger(__name__)
+
+
+def _log_padrao(tipo, mensagem):
+    logger.info("%s: %s", tipo, mensagem)
+
+
+def casas_decimais(passo):
+    """Casas decimais de um stepSize/tickSize (0.00001 -> 5)."""
+    return max(0, -int(math.floor(math.log10(passo)))) if passo else 8
+
+
+def arredondar_para_baixo(valor, passo):
+    """Arredonda ``valor`` para baixo ao múltiplo de ``passo`` (tickSize/stepSize); passo 0 = sem arredondar."""
+    if not passo:
+        return valor
+    return round(math.floor(round(valor / passo, 9)) * passo, casas_decimais(passo))
+
+
+class OrdemInvalida(ValueError):
+    """Ordem recusada localmente (filtros do símbolo ou saldo), sem chegar a ser enviada."""
+
+
+@dataclass(frozen=True)
+class FiltrosSimbolo:
+    """Limites das ordens do símbolo (único parser dos filtros: ordens de mercado e OCO)."""
+    passo: float = 0.0
+    quantidade_minima: float = 0.0
+    quantidade_maxima: float = math.inf
+    nocional_minimo: float = 0.0
+    nocional_maximo: float = math.inf
+    passo_preco: float = 0.0
+
+    @classmethod
+    def de_info(cls, info):
+        """Filtros a partir da entrada do símbolo em exchangeInfo (``client.get_symbol_info``)."""
+        filtros = {f['filterType']: f for f in (info or {}).get('filters', [])}
+        lotes = [filtros[nome] for nome in ('LOT_SIZE', 'MARKET_LOT_SIZE') if nome in filtros]
+        passo = max([float(f.get('stepSize', 0)) for f in lotes] or [0.0])
+        minimo = max([float(f.get('minQty', 0)) for f in lotes] or [0.0])
+        maximo = min([float(f['maxQty']) for f in lotes if float(f.get('maxQty', 0)) > 0] or [math.inf])
+        nocional_minimo, nocional_maximo = 0.0, math.inf
+        if 'NOTIONAL' in filtros:
+            nocional = filtros['NOTIONAL']
+            if nocional.get('applyMinToMarket', True):
+                nocional_minimo = float(nocional.get('minNotional', 0))
+            if nocional.get('applyMaxToMarket', False) and float(nocional.get('maxNotional', 0)) > 0:
+                nocional_maximo = float(nocional['maxNotional'])
+        elif 'MIN_NOTIONAL' in filtros and filtros['MIN_NOTIONAL'].get('applyToMarket', True):
+            nocional_minimo = float(filtros['MIN_NOTIONAL'].get('minNotional', 0))
+        passo_preco = float(filtros.get('PRICE_FILTER', {}).get('tickSize', 0))
+        return cls(passo, minimo, maximo, nocional_minimo, nocional_maximo, passo_preco)
+
+
+class ExecutorOrdens:
+    """Ordens de mercado de ``simbolo`` validadas com os filtros em cache.
+
+    ``refrescar``: segundos entre leituras dos filtros em fundo; ``manter_ligacao``: segundos entre pings que
+    mantêm a ligação aberta (0 desliga cada um).
+    """
+
+    def __init__(self, client, simbolo, refrescar=3600, manter_ligacao=30, log=_log_padrao):
+        self.client = client
+        self.simbolo = simbolo
+        self.refrescar = refrescar
+        self.manter_ligacao = manter_ligacao
+        self.log = log
+        self.filtros = None
+        self.refrescamentos = 0
+        self.recusadas = 0
+        self._lock = threading.Lock()
+        self._parar = threading.Event()
+        self._thread = None
+
+    def carregar(self):
+        """Lê os filtros do símbolo (exchangeInfo)."""
+        invalidar = getattr(self.client, 'invalidar', None)
+        if invalidar is not None:
+            invalidar('get_symbol_info')  # Sem a resposta guardada pelo ClienteLimitado
+        info = self.client.get_symbol_info(self.simbolo)
+        if not info:
+            raise ValueError(f"Símbolo {self.simbolo} desconhecido na exchange.")
+        filtros = FiltrosSimbolo.de_info(info)
+        with self._lock:
+            self.filtros = filtros
+            self.refrescamentos += 1
+        return filtros
+
+    def iniciar(self):
+        if self.refrescar or self.manter_ligacao:
+            self._thread = threading.Thread(target=self._fundo, name="executor-ordens", daemon=True)
+            self._thread.start()
+        return self
+
+    def parar(self):
+        self._parar.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+    def _fundo(self):
+        proximo_refrescamento = time.monotonic() + self.refrescar if self.refrescar else math.inf
+        while not self._parar.wait(min(self.manter_ligacao or math.inf, self.refrescar or math.inf)):
+            try:
+                if time.monotonic() >= proximo_refrescamento:
+                    self.carregar()
+                    proximo_refrescamento = time.monotonic() + self.refrescar
+                elif self.manter_ligacao:
+                    # Direto no Client (mesma sessão HTTP): fora do orçamento de peso e do lock do ClienteLimitado
+                    getattr(self.client, 'client', self.client).ping()
+            except Exception as e:
+                self.log("ALERTA", f"Falha ao refrescar os filtros de {self.simbolo} (mantidos os anteriores): {e}")
+
+    def preparar(self, lado, quantidade, preco=None, disponivel=None):
+        """Quantidade a enviar, em texto com as casas do stepSize.
+
+        Nas vendas é limitada a ``disponivel`` (saldo livre da base). Com ``preco`` (último preço conhecido)
+        também é validado o valor nocional. Levanta ``OrdemInvalida`` se a Binance a fosse recusar.
+        """
+        with self._lock:
+            f = self.filtros or FiltrosSimbolo()
+        if lado == 'SELL' and disponivel is not None:
+            quantidade = min(quantidade, disponivel)
+        quantidade = arredondar_para_baixo(quantidade, f.passo)
+        erro = None
+        if quantidade <= 0 or quantidade < f.quantidade_minima:
+            erro = f"quantidade {quantidade} abaixo do mínimo ({f.quantidade_minima})"
+        elif quantidade > f.quantidade_maxima:
+            erro = f"quantidade {quantidade} acima do máximo ({f.quantidade_maxima})"
+        elif preco and quantidade * preco < f.nocional_minimo:
+            erro = f"valor {quantidade * preco:.2f} abaixo do nocional mínimo ({f.nocional_minimo})"
+        elif preco and quantidade * preco > f.nocional_maximo:
+            erro = f"valor {quantidade * preco:.2f} acima do nocional máximo ({f.nocional_maximo})"
+        if erro is not None:
+            with self._lock:
+                self.recusadas += 1
+            raise OrdemInvalida(f"{lado} {self.simbolo}: {erro}")
+        return f"{quantidade:.{casas_decimais(f.passo)}f}"
+
+    def enviar(self, lado, quantidade, id_cliente, preco=None, disponivel=None):
+        """Valida e envia uma ordem de mercado; devolve a resposta da Binance."""
+        quantidade = self.preparar(lado, quantidade, preco, disponivel)
+        enviar = self.client.order_market_buy if lado == 'BUY' else self.client.order_market_sell
+        return enviar(symbol=self.simbolo, quantity=quantidade, newClientOrderId=id_cliente)
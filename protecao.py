@@ -0,0 +1,166 @@
+"""Stop-loss/take-profit na exchange: ordem OCO de venda colocada ao abrir a posição.
+
+Sem ela, os níveis de SL/TP só existem em memória e só são respeitados
+quando o loop lê o preço; uma saída chega segundos atrasada e, se o
+processo parar, a posição fica sem proteção. ``ProtecaoOCO`` coloca uma
+OCO de venda (LIMIT_MAKER no take-profit, STOP_LOSS_LIMIT no stop-loss)
+logo após a compra, para a saída acontecer à latência da exchange.
+
+A execução é detetada por eventos ``executionReport`` do user-data stream
+(``aplicar_evento``) ou consultando o estado da lista de ordens
+(``verificar``); numa saída por sinal a OCO é cancelada antes da venda a
+mercado (``cancelar`` devolve a execução se a OCO já tiver sido executada
+entretanto).
+"""
+import logging
+import uuid
+from dataclasses import dataclass
+
+from binance.exceptions import BinanceAPIException
+
+from ordens import FiltrosSimbolo, arredondar_para_baixo
+
+logger = logging.getLogger(__name__)
+
+# Tipos das pernas da OCO -> motivo da saída
+MOTIVOS = {'LIMIT_MAKER': "TAKE-PROFIT", 'STOP_LOSS_LIMIT': "STOP-LOSS"}
+CODIGO_ORDEM_DESCONHECIDA = -2011
+
+
+def _log_padrao(tipo, mensagem):
+    logger.info("%s: %s", tipo, mensagem)
+
+
+@dataclass
+class ExecucaoOCO:
+    """Perna da OCO que foi executada."""
+    motivo: str        # "TAKE-PROFIT" ou "STOP-LOSS"
+    preco: float       # Preço médio de execução
+    quantidade: float
+    ordem: dict        # Resposta/estado da ordem (para o cache de saldos)
+
+
+class ProtecaoOCO:
+    """Uma OCO de venda por posição aberta de ``simbolo``.
+
+    ``executor``: ExecutorOrdens do símbolo; a OCO usa os mesmos filtros em cache que as ordens de mercado.
+    """
+
+    def __init__(self, client, simbolo, margem_stop_limite=0.001, log=_log_padrao, executor=None):
+        self.client = client
+        self.executor = executor
+        self.simbolo = simbolo
+        self.margem_stop_limite = margem_stop_limite  # Preço limite abaixo do stop, para garantir a execução
+        self.log = log
+        self.id_lista = None
+        self.pernas = {}  # orderId -> motivo
+        self.preco_stop_limite = None
+        self.quantidade = 0.0  # Quantidade bloqueada pela OCO ativa
+        self.execucao = None
+        self._filtros = None
+
+    @property
+    def ativa(self):
+        return self.id_lista is not None
+
+    def _passos(self):
+        # (tickSize, stepSize) do símbolo: os do executor de ordens ou, sem ele, lidos uma única vez
+        filtros = self.executor.filtros if self.executor is not None else None
+        if filtros is None:
+            if self._filtros is None:
+                self._filtros = FiltrosSimbolo.de_info(self.client.get_symbol_info(self.simbolo))
+            filtros = self._filtros
+        return filtros.passo_preco, filtros.passo
+
+    def colocar(self, quantidade, preco_take_profit, preco_stop_loss):
+        """Coloca a OCO de venda de ``quantidade``; devolve a resposta da Binance."""
+        tick, passo = self._passos()
+        quantidade = arredondar_para_baixo(quantidade, passo)
+        take_profit = arredondar_para_baixo(preco_take_profit, tick)
+        stop = arredondar_para_baixo(preco_stop_loss, tick)
+        stop_limite = arredondar_para_baixo(preco_stop_loss * (1 - self.margem_stop_limite), tick)
+        resposta = self.client.order_oco_sell(
+            symbol=self.simbolo, quantity=quantidade, listClientOrderId=f"fatima-oco-{uuid.uuid4().hex[:16]}",
+            aboveType='LIMIT_MAKER', abovePrice=f"{take_profit}",
+            belowType='STOP_LOSS_LIMIT', belowStopPrice=f"{stop}", belowPrice=f"{stop_limite}",
+            belowTimeInForce='GTC')
+        self.id_lista = resposta['orderListId']
+        self.pernas = {r['orderId']: MOTIVOS.get(r['type'], r['type']) for r in resposta.get('orderReports', [])}
+        self.preco_stop_limite = stop_limite
+        self.quantidade = quantidade
+        self.execucao = None
+        self.log("INFO", f"OCO #{self.id_lista} colocada: TP {take_profit} | SL {stop} (limite {stop_limite}) | "
+                         f"Qtd {quantidade}")
+        return resposta
+
+    def exportar(self):
+        """Estado da OCO ativa (para o snapshot do bot), ou None."""
+        if not self.ativa:
+            return None
+        return {'id_lista': self.id_lista, 'pernas': [[i, m] for i, m in self.pernas.items()],
+                'preco_stop_limite': self.preco_stop_limite, 'quantidade': self.quantidade}
+
+    def restaurar(self, dados):
+        """Retoma o acompanhamento de uma OCO colocada antes de um reinício."""
+        if not dados:
+            self._limpar()
+            return
+        self.id_lista = dados['id_lista']
+        self.pernas = {i: m for i, m in dados['pernas']}
+        self.preco_stop_limite = dados['preco_stop_limite']
+        self.quantidade = dados['quantidade']
+
+    def _limpar(self):
+        self.id_lista = None
+        self.pernas = {}
+        self.preco_stop_limite = None
+        self.quantidade = 0.0
+
+    def _concluir(self, motivo, ordem):
+        quantidade = float(ordem['executedQty'])
+        preco = float(ordem['cummulativeQuoteQty']) / quantidade
+        self.execucao = ExecucaoOCO(motivo, preco, quantidade, ordem)
+        self.log("INFO", f"OCO #{self.id_lista} executada por {motivo} a {preco:.2f}")
+        self._limpar()
+        return self.execucao
+
+    def aplicar_evento(self, evento):
+        """Aplica um evento 'executionReport' do user-data stream; devolve a ExecucaoOCO se uma perna foi executada."""
+        if not self.ativa or evento.get('e') != 'executionReport' or evento.get('g') != self.id_lista:
+            return None
+        if evento.get('X') != 'FILLED':
+            return None
+        ordem = {'symbol': evento['s'], 'orderId': evento['i'], 'side': evento['S'], 'type': evento['o'],
+                 'status': 'FILLED', 'executedQty': evento['z'], 'cummulativeQuoteQty': evento['Z']}
+        return self._concluir(MOTIVOS.get(evento['o'], evento['o']), ordem)
+
+    def verificar(self):
+        """Consulta o estado da OCO; devolve a ExecucaoOCO se terminou com uma perna executada, senão None."""
+        if not self.ativa:
+            return None
+        lista = self.client.v3_get_order_list(orderListId=self.id_lista)
+        if lista.get('listOrderStatus') != 'ALL_DONE':
+            return None
+        for perna in lista.get('orders', []):
+            ordem = self.client.get_order(symbol=self.simbolo, orderId=perna['orderId'])
+            if float(ordem.get('executedQty', 0)) > 0:
+                return self._concluir(MOTIVOS.get(ordem['type'], self.pernas.get(perna['orderId'])), ordem)
+        # Terminada sem execução (cancelada ou expirada fora do bot)
+        self.log("ALERTA", f"OCO #{self.id_lista} terminou sem execução.")
+        self._limpar()
+        return None
+
+    def cancelar(self):
+        """Cancela a OCO (saída por sinal). Se já tinha sido executada, devolve a ExecucaoOCO."""
+        if not self.ativa:
+            return None
+        try:
+            self.client.v3_delete_order_list(symbol=self.simbolo, orderListId=self.id_lista)
+        except BinanceAPIException as e:
+            if e.code != CODIGO_ORDEM_DESCONHECIDA:
+                raise
+            # Já não está aberta: foi executada (ou cancelada) entretanto
+            return self.verificar()
+        self.log("INFO", f"OCO #{self.id_lista} cancelada.")
+        self._limpar()
+        return None
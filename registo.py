@@ -0,0 +1,165 @@
+"""Registo assíncrono do bot: fila, thread de escrita, rotação com compressão e eventos em JSONL.
+
+Com ``configurar_registo``, uma chamada de log no caminho de trading só
+coloca o registo numa fila (``FilaRegisto``). Uma thread de fundo
+(``QueueListener``) formata-o e escreve-o na consola, no ficheiro de texto
+e no ficheiro de eventos JSONL. O ficheiro de texto mantém o formato de
+sempre, que é o que ingestao_logs.py lê. A mensagem só é formatada nessa
+thread e só se algum destino a aceitar, por isso as mensagens de debug
+passam os valores como argumentos (``logging.debug("EMA9 = %.2f", valor)``)
+em vez de uma f-string já montada.
+
+Cada linha do JSONL tem o tempo, o tipo do evento (``INFO``, ``TRADE``,
+``COMPRA``, ...), a mensagem e os campos tipados passados em
+``extra={'campos': {...}}`` (preço, sinal, lucro, ...).
+
+O nível pedido (ex.: DEBUG com as flags de debug) aplica-se só ao logger
+do bot (``LOGGER_BOT``); o logger raiz fica em INFO, para o DEBUG de
+urllib3, websockets e python-binance não chegar aos ficheiros.
+
+Os ficheiros rodam por tamanho e/ou por tempo. Os rodados são comprimidos
+com gzip e só os ``copias`` mais recentes são mantidos.
+"""
+import glob
+import gzip
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import shutil
+import sys
+import time
+
+FORMATO_TEXTO = '%(asctime)s - %(levelname)s - %(message)s'
+FORMATO_DATA = '%Y-%m-%d %H:%M:%S'
+LOGGER_BOT = "fatima"  # Logger das mensagens do bot (log_event/log_debug)
+
+
+class FilaRegisto(logging.handlers.QueueHandler):
+    """Coloca o registo na fila sem o formatar; a formatação fica para a thread de escrita."""
+
+    def prepare(self, record):
+        return record
+
+
+class FicheiroRotativo(logging.handlers.BaseRotatingHandler):
+    """Ficheiro que roda ao atingir ``max_bytes`` e/ou a cada ``intervalo`` segundos.
+
+    O ficheiro rodado fica como ``<caminho>.<AAAAmmdd-HHMMSS>[.gz]``; são mantidos os ``copias`` mais recentes.
+    """
+
+    def __init__(self, caminho, max_bytes=0, intervalo=0, copias=10, comprimir=True, relogio=time.time):
+        super().__init__(caminho, 'a', encoding='utf-8', delay=False)
+        self.max_bytes = max_bytes
+        self.intervalo = intervalo
+        self.copias = copias
+        self.comprimir = comprimir
+        self.relogio = relogio
+        self.rodados = 0
+        self._proxima = relogio() + intervalo if intervalo else None
+
+    def shouldRollover(self, record):
+        if self._proxima is not None and self.relogio() >= self._proxima:
+            return True
+        if self.max_bytes and self.stream is not None:
+            return self.stream.tell() + len(self.format(record)) + 1 > self.max_bytes
+        return False
+
+    def doRollover(self):
+        if self.stream is not None:
+            self.stream.close()
+            self.stream = None
+        if os.path.exists(self.baseFilename) and os.path.getsize(self.baseFilename) > 0:
+            destino = f"{self.baseFilename}.{time.strftime('%Y%m%d-%H%M%S', time.localtime(self.relogio()))}"
+            sufixo, n = "", 1
+            while os.path.exists(destino + sufixo) or os.path.exists(destino + sufixo + ".gz"):
+                sufixo, n = f"-{n}", n + 1
+            destino += sufixo
+            os.replace(self.baseFilename, destino)
+            if self.comprimir:
+                with open(destino, 'rb') as origem, gzip.open(destino + ".gz", 'wb') as comprimido:
+                    shutil.copyfileobj(origem, comprimido)
+                os.remove(destino)
+            self.rodados += 1
+            self._apagar_antigos()
+        if self.intervalo:
+            self._proxima = self.relogio() + self.intervalo
+        self.stream = self._open()
+
+    def _apagar_antigos(self):
+        rodados = sorted(glob.glob(glob.escape(self.baseFilename) + ".*"), key=os.path.getmtime)
+        for caminho in rodados[:-self.copias] if self.copias else []:
+            os.remove(caminho)
+
+
+def _valor_json(valor):
+    # Escalares numpy (np.int64, ...) como números; o resto como texto
+    return valor.item() if hasattr(valor, 'item') else str(valor)
+
+
+class FormatoJSON(logging.Formatter):
+    """Uma linha JSON por registo: ts (epoch), tipo, mensagem e os campos tipados do evento."""
+
+    def format(self, record):
+        tipo = getattr(record, 'tipo', record.levelname)
+        mensagem = record.getMessage()
+        if mensagem.startswith(f"{tipo}: "):
+            mensagem = mensagem[len(tipo) + 2:]
+        evento = {'ts': round(record.created, 3), 'tipo': tipo, 'msg': mensagem}
+        evento.update(getattr(record, 'campos', None) or {})
+        return json.dumps(evento, ensure_ascii=False, default=_valor_json)
+
+
+class RegistoAssincrono:
+    """Fila + thread de escrita instaladas no logger raiz; ``parar`` escreve o que falta e fecha os ficheiros.
+
+    ``nivel`` é o do logger ``logger`` (o do bot); o raiz fica em ``max(nivel, INFO)``.
+    """
+
+    def __init__(self, destinos, nivel=logging.INFO, tamanho_fila=0, logger=LOGGER_BOT):
+        self.fila = queue.Queue(tamanho_fila)
+        self.destinos = destinos
+        self.nivel = nivel
+        self.logger = logging.getLogger(logger)
+        self.ouvinte = logging.handlers.QueueListener(self.fila, *destinos, respect_handler_level=True)
+        self.entrada = FilaRegisto(self.fila)
+
+    def iniciar(self):
+        raiz = logging.getLogger()
+        for handler in list(raiz.handlers):
+            raiz.removeHandler(handler)
+        raiz.addHandler(self.entrada)
+        raiz.setLevel(max(self.nivel, logging.INFO))
+        self.logger.setLevel(self.nivel)
+        self.ouvinte.start()
+        return self
+
+    def parar(self):
+        logging.getLogger().removeHandler(self.entrada)
+        self.logger.setLevel(logging.NOTSET)
+        self.ouvinte.stop()
+        for destino in self.destinos:
+            destino.close()
+
+
+def configurar_registo(caminho_texto, caminho_eventos=None, consola=True, nivel=logging.INFO, max_bytes=0,
+                       intervalo=0, copias=10, comprimir=True):
+    """Instala o registo assíncrono no logger raiz e devolve o ``RegistoAssincrono`` já iniciado.
+
+    ``caminho_eventos``: ficheiro JSONL dos eventos (None = sem JSONL). ``max_bytes``/``intervalo``
+    (segundos): limites de rotação dos ficheiros (0 = sem limite).
+    """
+    destinos = []
+    texto = FicheiroRotativo(caminho_texto, max_bytes, intervalo, copias, comprimir)
+    texto.setFormatter(logging.Formatter(FORMATO_TEXTO, FORMATO_DATA))
+    destinos.append(texto)
+    if caminho_eventos:
+        eventos = FicheiroRotativo(caminho_eventos, max_bytes, intervalo, copias, comprimir)
+        eventos.setFormatter(FormatoJSON())
+        destinos.append(eventos)
+    if consola:
+        terminal = logging.StreamHandler(sys.stdout)
+        terminal.setFormatter(logging.Formatter('%(message)s'))
+        destinos.append(terminal)
+    return RegistoAssincrono(destinos, nivel).iniciar()
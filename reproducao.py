@@ -0,0 +1,250 @@
+"""Reprodução acelerada do loop do bot (fatima.py) num relógio simulado.
+
+``ReproducaoFatima`` corre a própria ``fatima.executar_iteracao``: saldo,
+klines, indicadores, ticker, STOP-LOSS/TAKE-PROFIT dentro da vela, sinal e
+registo dos trades. A exchange é um ``SimuladorExchange`` em processo
+(``ClienteSimulado``, sem HTTP). O trajeto de velas pode ser sintético, lido
+de um CSV ou lido de um arquivo de historico.py.
+
+O módulo ``time`` de fatima.py é trocado por um ``RelogioSimulado``. As
+esperas do loop (5 s entre iterações, 10 s depois de um erro) só avançam o
+relógio, sem dormir, e as decisões são as que o bot tomaria em produção com
+os mesmos preços. As ordens e os trades ficam num diário de trades em memória
+(PnL das execuções do simulador) e os eventos de log_event também
+(``eventos``: hora simulada, tipo, mensagem e campos) em vez de irem para
+ficheiros, para a consola ou para o Telegram.
+
+Modos não suportados (threads e WebSocket): STREAMING, AGENDADOR_VELAS,
+OCO_EXCHANGE e multi-par.
+
+Uso:
+    python reproducao.py --velas 8640 --intervalo 5m
+    python reproducao.py --csv velas.csv --saida eventos.jsonl
+    python reproducao.py --arquivo dados_velas --simbolo BTCEUR --inicio 2024-06-01 --fim 2024-07-01
+"""
+import argparse
+import importlib
+import json
+import logging
+import time
+
+import numpy as np
+
+from diario_trades import DiarioTrades
+from historico import ArquivoVelas, para_ms
+from indicadores import MotorIndicadores
+from ordens import ExecutorOrdens
+from saldos import CacheSaldos
+from simulador_exchange import ClienteSimulado, SimuladorExchange, TrajetoPrecos
+from sombra import MotorSombra
+from velas import BufferVelas, intervalo_ms
+
+# Configuração do bot desligada na reprodução (threads, WebSocket, ficheiros e notificações)
+DESLIGADOS = {'STREAMING': 0, 'AGENDADOR_VELAS': 0, 'OCO_EXCHANGE': 0, 'PARES': [], 'FICHEIRO_ESTADO': "",
+              'METRICAS_PORTA': 0, 'METRICAS_FICHEIRO': "", 'ARQUIVO_VELAS': "", 'TELEGRAM_TOKEN': None}
+
+
+class RelogioSimulado:
+    """Substitui o módulo ``time``: ``time``/``monotonic``/``perf_counter`` dão a hora simulada e ``sleep`` avança-a.
+
+    Também serve de ``relogio`` (chamável) ao trajeto, ao simulador e ao cache de saldos.
+    """
+
+    def __init__(self, inicio=1_700_000_000.0):
+        self.agora = float(inicio)
+
+    def __call__(self):
+        return self.agora
+
+    def time(self):
+        return self.agora
+
+    def monotonic(self):
+        return self.agora
+
+    def perf_counter(self):
+        return self.agora
+
+    def sleep(self, segundos):
+        self.agora += max(0.0, segundos)
+
+    def __getattr__(self, nome):
+        return getattr(time, nome)  # strftime, localtime, ...
+
+
+class EventosReproducao(logging.Handler):
+    """Guarda os eventos de log_event com a hora simulada; faz de ``fatima.registo`` durante a reprodução."""
+
+    def __init__(self, relogio):
+        super().__init__(logging.INFO)
+        self.relogio = relogio
+        self.eventos = []
+
+    def emit(self, record):
+        tipo = getattr(record, 'tipo', None)
+        if tipo is None:
+            return  # Só os eventos do bot (log_event)
+        mensagem = record.getMessage()
+        if mensagem.startswith(f"{tipo}: "):
+            mensagem = mensagem[len(tipo) + 2:]
+        self.eventos.append((self.relogio.agora, tipo, mensagem, getattr(record, 'campos', None) or {}))
+
+    def parar(self):
+        pass
+
+
+def trajeto_do_arquivo(destino, simbolo, intervalo="5m", inicio=None, fim=None, historico=500):
+    """TrajetoPrecos com as velas de um arquivo de historico.py, num RelogioSimulado que arranca depois das
+    primeiras ``historico`` velas (as que o bot usa para aquecer)."""
+    velas = ArquivoVelas(destino).ler(simbolo, intervalo, inicio, fim)
+    if len(velas['time']) <= historico:
+        raise ValueError(f"O arquivo tem {len(velas['time'])} velas de {simbolo} {intervalo}; são precisas mais "
+                         f"de {historico}.")
+    inicio_ms = int(velas['time'][0]) + historico * intervalo_ms(intervalo)
+    relogio = RelogioSimulado(inicio_ms / 1000)
+    return TrajetoPrecos(np.column_stack([velas[c] for c in ('open', 'high', 'low', 'close', 'volume')]), intervalo,
+                         historico=historico, inicio_ms=inicio_ms, relogio=relogio)
+
+
+class ReproducaoFatima:
+    """Loop de fatima.py sobre um trajeto de velas com relógio simulado (``TrajetoPrecos(..., relogio=RelogioSimulado())``).
+
+    ``configuracao``: constantes de fatima.py a alterar (ex.: ``{'PERCENTAGEM_STOP_LOSS': 0.01}``); o diário de
+    trades fica em memória, a não ser que ``DIARIO_TRADES`` indique um ficheiro.
+    ``saldos``: saldos iniciais da conta simulada (por omissão QTD_INIT_BTC na MOEDA, para a comissão da compra,
+    e 1000 na MOEDA_2). As ordens passam pelo ExecutorOrdens do bot, com os filtros do símbolo simulado. Se o bot
+    terminar (``exit()``), a reprodução pára e o motivo fica em ``terminado``.
+    """
+
+    def __init__(self, trajeto, saldos=None, taxa=0.001, configuracao=None):
+        if not isinstance(trajeto.relogio, RelogioSimulado):
+            raise ValueError("O trajeto tem de usar um RelogioSimulado (relogio=RelogioSimulado()).")
+        self.trajeto = trajeto
+        self.relogio = trajeto.relogio
+        self.saldos = saldos
+        self.taxa = taxa
+        self.configuracao = dict(configuracao or {})
+        self.registo = EventosReproducao(self.relogio)
+        self.fatima = None
+        self.simulador = None
+        self.motor = None
+        self.inicio = self.relogio.agora
+        self.iteracoes = 0
+        self.duracao_real = 0.0
+        self.terminado = None
+
+    @property
+    def eventos(self):
+        return self.registo.eventos
+
+    def _preparar(self):
+        import fatima
+        fatima = importlib.reload(fatima)  # Globais do bot a zero, como num processo novo
+        for nome, valor in {**self.configuracao, **DESLIGADOS}.items():
+            setattr(fatima, nome, valor)
+        # Derivados das constantes, recalculados depois da configuração
+        fatima.PAR = fatima.MOEDA + fatima.MOEDA_2
+        fatima.buffer_velas = BufferVelas(capacidade=max(50, fatima.PERIODO_RSI + fatima.MEDIA_LENTA + 5))
+
+        saldos = self.saldos if self.saldos is not None else {fatima.MOEDA: fatima.QTD_INIT_BTC, fatima.MOEDA_2: 1000.0}
+        self.simulador = SimuladorExchange(self.trajeto, fatima.MOEDA, fatima.MOEDA_2, saldos, self.taxa, porta=None,
+                                           relogio=self.relogio)
+        fatima.client = ClienteSimulado(self.simulador)
+        fatima.cache_saldos = CacheSaldos(fatima.client, ttl=fatima.SALDO_TTL, relogio=self.relogio)
+        fatima.diario_trades = DiarioTrades(self.configuracao.get('DIARIO_TRADES') or ":memory:")
+        # Filtros lidos uma vez, sem a thread de fundo (o relógio é simulado)
+        fatima.executor_ordens = ExecutorOrdens(fatima.client, fatima.PAR, log=fatima.log_event)
+        fatima.executor_ordens.carregar()
+        self.motor = MotorIndicadores(fatima.MEDIA_RAPIDA, fatima.MEDIA_LENTA, fatima.PERIODO_RSI)
+        if fatima.VARIANTES_SOMBRA:
+            fatima.sombra = MotorSombra(self.motor, fatima.VARIANTES_SOMBRA, fatima.QUANTIDADE, fatima.TAX,
+                                        fatima.parametros_estrategia(), log=fatima.log_event)
+        self.fatima = fatima
+
+    def fim_trajeto(self):
+        """Hora simulada (s) em que a última vela do trajeto fecha."""
+        return (self.trajeto.tempo_zero + len(self.trajeto.velas) * self.trajeto.intervalo_ms) / 1000
+
+    def executar(self, segundos=None, iteracoes=None):
+        """Corre o loop até passarem ``segundos`` simulados, ``iteracoes`` iterações ou o fim do trajeto."""
+        if self.fatima is None:
+            self._preparar()
+        limite = self.fim_trajeto() if segundos is None else min(self.fim_trajeto(), self.relogio.agora + segundos)
+        fatima = self.fatima
+        raiz = logging.getLogger()
+        nivel = raiz.level
+        raiz.addHandler(self.registo)
+        raiz.setLevel(min(nivel, logging.INFO))
+        fatima.time, fatima.registo = self.relogio, self.registo
+        n = 0
+        inicio = time.perf_counter()
+        try:
+            while self.terminado is None and self.relogio.agora < limite and (iteracoes is None or n < iteracoes):
+                fatima.executar_iteracao(self.motor)
+                n += 1
+        except SystemExit as e:
+            self.terminado = e.code if e.code is not None else "exit()"
+            n += 1
+        finally:
+            self.duracao_real += time.perf_counter() - inicio
+            self.iteracoes += n
+            fatima.time, fatima.registo = time, None
+            raiz.removeHandler(self.registo)
+            raiz.setLevel(nivel)
+        return self.resumo()
+
+    def trades(self):
+        """Campos de cada trade registado pelo bot (registar_trade): n_trade, entrada, saida, lucro, ..."""
+        return [campos for _, tipo, _, campos in self.eventos if tipo == "TRADE" and 'n_trade' in campos]
+
+    def resumo(self):
+        fatima = self.fatima
+        simulado = self.relogio.agora - self.inicio
+        return {'iteracoes': self.iteracoes, 'tempo_simulado': simulado, 'duracao_real': self.duracao_real,
+                'aceleracao': simulado / self.duracao_real if self.duracao_real else 0.0,
+                'trades': fatima.n_trade, 'delta_total': fatima.delta_total,
+                'delta_saldo_total': fatima.delta_saldo_total, 'posicao_aberta': fatima.posicao_aberta,
+                'ordens': self.simulador.estatisticas['ordens'], 'saldos': dict(self.simulador.conta.saldos),
+                'terminado': self.terminado, 'diario': fatima.diario_trades.totais(fatima.PAR)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Reprodução acelerada do loop do bot num relógio simulado')
+    origem = parser.add_mutually_exclusive_group()
+    origem.add_argument('--velas', type=int, default=8640, help='Trajeto sintético com N velas (padrão)')
+    origem.add_argument('--csv', help="CSV com a coluna 'close' (e opcionalmente open/high/low/volume)")
+    origem.add_argument('--arquivo', help='Diretório de historico.py')
+    parser.add_argument('--simbolo', default='BTCEUR', help='Par a ler do arquivo histórico')
+    parser.add_argument('--intervalo', default='5m', help='Intervalo das velas (TIMEFRAME)')
+    parser.add_argument('--inicio', help="Primeira vela a ler do arquivo (ex.: '2024-06-01')")
+    parser.add_argument('--fim', help="Fim (exclusivo) das velas a ler do arquivo")
+    parser.add_argument('--historico', type=int, default=500, help='Velas já fechadas no arranque (aquecimento)')
+    parser.add_argument('--semente', type=int, default=42, help='Semente do trajeto sintético')
+    parser.add_argument('--saldo', type=float, default=1000.0, help='Saldo inicial na moeda de cotação')
+    parser.add_argument('--taxa', type=float, default=0.001, help='Comissão por ordem (fração)')
+    parser.add_argument('--saida', help='Grava os eventos do bot neste ficheiro JSONL')
+    args = parser.parse_args()
+
+    if args.arquivo:
+        trajeto = trajeto_do_arquivo(args.arquivo, args.simbolo, args.intervalo, args.inicio, args.fim, args.historico)
+    else:
+        relogio = RelogioSimulado(para_ms(args.inicio) / 1000 if args.inicio else 1_700_000_000.0)
+        opcoes = dict(intervalo=args.intervalo, historico=args.historico, relogio=relogio)
+        trajeto = (TrajetoPrecos.de_csv(args.csv, **opcoes) if args.csv else
+                   TrajetoPrecos.sintetico(args.velas, args.semente, **opcoes))
+    import fatima
+    reproducao = ReproducaoFatima(trajeto, {fatima.MOEDA: fatima.QTD_INIT_BTC, fatima.MOEDA_2: args.saldo}, args.taxa)
+    resumo = reproducao.executar()
+
+    print(", ".join(f"{chave}: {valor:.2f}" if isinstance(valor, float) else f"{chave}: {valor}"
+                    for chave, valor in resumo.items()))
+    if args.saida:
+        with open(args.saida, 'w', encoding='utf-8') as f:
+            for ts, tipo, mensagem, campos in reproducao.eventos:
+                f.write(json.dumps({'ts': ts, 'tipo': tipo, 'msg': mensagem, **campos}, ensure_ascii=False,
+                                   default=str) + "\n")
+        print(f"{len(reproducao.eventos)} eventos gravados em {args.saida}.")
+
+
+if __name__ == '__main__':
+    main()
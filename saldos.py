@@ -0,0 +1,90 @@
+"""Cache dos saldos da conta Binance.
+
+Evita chamar ``client.get_account()`` (pedido pesado) a cada iteração: os
+saldos são lidos uma vez no arranque e depois mantidos a partir das
+respostas das ordens (``executedQty``, ``cummulativeQuoteQty`` e comissões
+em ``fills``) ou de eventos ``outboundAccountPosition`` do user-data stream.
+Só há um refrescamento completo quando o TTL expira, quando uma resposta
+não pode ser aplicada, ou quando o cache é invalidado (ex.: ordem recusada
+por saldo insuficiente).
+"""
+import threading
+import time
+
+
+class CacheSaldos:
+    """Saldos livres por ativo, com refrescamento completo limitado por TTL."""
+
+    def __init__(self, client, ttl=300, relogio=time.monotonic):
+        self.client = client
+        self.ttl = ttl
+        self.relogio = relogio
+        self.refrescamentos = 0
+        self._saldos = {}
+        self._atualizado_em = None
+        self._lock = threading.Lock()
+
+    def refrescar(self):
+        """Lê todos os saldos da conta (get_account)."""
+        info = self.client.get_account()
+        saldos = {b['asset']: float(b['free']) for b in info['balances']}
+        with self._lock:
+            self._saldos = saldos
+            self._atualizado_em = self.relogio()
+            self.refrescamentos += 1
+        return saldos
+
+    def invalidar(self):
+        """Força um refrescamento completo na próxima leitura."""
+        with self._lock:
+            self._atualizado_em = None
+
+    def _garantir_atual(self):
+        with self._lock:
+            expirado = self._atualizado_em is None or self.relogio() - self._atualizado_em >= self.ttl
+        if expirado:
+            self.refrescar()
+
+    def obter(self, ativo):
+        """Saldo livre de um ativo (0 se não existir)."""
+        self._garantir_atual()
+        with self._lock:
+            return self._saldos.get(ativo, 0.0)
+
+    def todos(self):
+        """Cópia de todos os saldos livres, por ativo."""
+        self._garantir_atual()
+        with self._lock:
+            return dict(self._saldos)
+
+    def aplicar_ordem(self, ordem, base, cotacao):
+        """Atualiza os saldos a partir da resposta de uma ordem executada.
+
+        Se a resposta não trouxer a quantidade executada e o valor em cotação
+        (ex.: respostas ACK), o cache é invalidado.
+        """
+        try:
+            lado = ordem['side']
+            quantidade = float(ordem['executedQty'])
+            valor = float(ordem['cummulativeQuoteQty'])
+        except (KeyError, TypeError, ValueError):
+            self.invalidar()
+            return False
+
+        with self._lock:
+            sinal = 1 if lado == 'BUY' else -1
+            self._saldos[base] = self._saldos.get(base, 0.0) + sinal * quantidade
+            self._saldos[cotacao] = self._saldos.get(cotacao, 0.0) - sinal * valor
+            for fill in ordem.get('fills', []):
+                ativo = fill['commissionAsset']
+                self._saldos[ativo] = self._saldos.get(ativo, 0.0) - float(fill['commission'])
+        return True
+
+    def aplicar_evento_conta(self, evento):
+        """Aplica um evento 'outboundAccountPosition' do user-data stream (saldos absolutos)."""
+        if evento.get('e') != 'outboundAccountPosition':
+            return False
+        with self._lock:
+            for b in evento['B']:
+                self._saldos[b['a']] = float(b['f'])
+        return True
@@ -0,0 +1,754 @@
+"""Simulador local da API spot da Binance, para testes de carga e de latência do bot.
+
+Serve por HTTP os endpoints REST usados pelo bot (``/api/v3/ping``,
+``time``, ``exchangeInfo``, ``klines``, ``ticker/price``, ``account``,
+``order`` e ``orderList``/``orderList/oco``) e, opcionalmente, os streams
+WebSocket ``<par>@kline_<intervalo>`` e ``<par>@trade``. O preço segue um
+trajeto de velas (sintético ou lido de um CSV) reproduzido num relógio
+simulado, à velocidade configurada; as ordens de mercado são executadas ao
+preço atual, com comissão, sobre uma conta simulada. As OCO de venda ficam
+em espera e são executadas quando o trajeto toca o take-profit ou o stop
+(avaliado a cada pedido, sobre os extremos do preço desde o anterior).
+
+Falhas injetáveis (``Falhas``, alteráveis em execução por ``POST /sim/falhas``):
+latência fixa e aleatória, ligações cortadas sem resposta, respostas 429
+aleatórias, limite de peso por minuto (429 com ``Retry-After``) e
+banimento 418 para quem continua a pedir depois de um 429.
+
+``ClienteSimulado`` responde às mesmas chamadas REST em processo, sem HTTP
+(é o que reproducao.py usa para correr o loop do bot num relógio simulado).
+
+As assinaturas dos pedidos não são verificadas. Para ligar o bot:
+
+    python simulador_exchange.py --porta 8900 --porta-stream 8901 --velocidade 60
+    BINANCE_API_URL=http://127.0.0.1:8900/api BINANCE_STREAM_URL=ws://127.0.0.1:8901 python fatima.py
+"""
+import argparse
+import itertools
+import json
+import logging
+import random
+import socket
+import threading
+import time
+from dataclasses import asdict, dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+from urllib.parse import parse_qs, urlsplit
+
+import numpy as np
+import pandas as pd
+from binance.exceptions import BinanceAPIException
+
+from metricas import PESO_ENDPOINT
+from velas import intervalo_ms
+
+logger = logging.getLogger(__name__)
+
+PESO_TICKER_TODOS = 4
+
+
+class ErroExchange(Exception):
+    """Erro devolvido ao cliente no formato da Binance: {"code": ..., "msg": ...}."""
+
+    def __init__(self, status, codigo, mensagem, cabecalhos=None):
+        super().__init__(mensagem)
+        self.status = status
+        self.codigo = codigo
+        self.mensagem = mensagem
+        self.cabecalhos = cabecalhos or {}
+
+
+class TrajetoPrecos:
+    """Velas (open, high, low, close, volume) reproduzidas num relógio simulado.
+
+    Ao arrancar já há ``historico`` velas fechadas (para o bot aquecer os
+    indicadores); a partir daí o tempo simulado avança ``velocidade`` vezes
+    mais depressa que o real. Dentro de cada vela o preço percorre
+    open -> low -> high -> close (ou open -> high -> low -> close nas velas
+    de descida), pelo que os níveis de stop-loss/take-profit são tocados
+    como num mercado real. No fim do trajeto o preço fica no último close.
+    """
+
+    def __init__(self, velas, intervalo="5m", velocidade=1.0, historico=500, inicio_ms=None,
+                 relogio=time.time):
+        self.velas = np.asarray(velas, dtype=float)
+        self.intervalo = intervalo
+        self.intervalo_ms = intervalo_ms(intervalo)
+        self.velocidade = velocidade
+        self.relogio = relogio
+        self.historico = min(historico, len(self.velas) - 1)
+        self._inicio_real = relogio()
+        self.inicio_ms = int(self._inicio_real * 1000) if inicio_ms is None else int(inicio_ms)
+        # Abertura da vela 0: no arranque a vela em formação é a vela `historico`
+        self.tempo_zero = (self.inicio_ms // self.intervalo_ms - self.historico) * self.intervalo_ms
+
+    @classmethod
+    def sintetico(cls, n=20000, semente=42, preco_inicial=90000.0, volatilidade=0.002, **kwargs):
+        """Passeio aleatório geométrico determinista."""
+        rng = np.random.default_rng(semente)
+        close = preco_inicial * np.exp(np.cumsum(rng.normal(0, volatilidade, n)))
+        abertura = np.concatenate(([preco_inicial], close[:-1]))
+        amplitude = np.abs(rng.normal(0, volatilidade / 2, n)) * close
+        velas = np.column_stack([abertura, np.maximum(abertura, close) + amplitude,
+                                 np.minimum(abertura, close) - amplitude, close, rng.uniform(1, 10, n)])
+        return cls(velas, **kwargs)
+
+    @classmethod
+    def de_csv(cls, caminho, **kwargs):
+        """Lê um CSV com a coluna 'close' (e opcionalmente open/high/low/volume)."""
+        df = pd.read_csv(caminho)
+        close = df['close'].to_numpy(dtype=float)
+        abertura = df['open'].to_numpy(dtype=float) if 'open' in df else np.concatenate(([close[0]], close[:-1]))
+        alto = df['high'].to_numpy(dtype=float) if 'high' in df else np.maximum(abertura, close)
+        baixo = df['low'].to_numpy(dtype=float) if 'low' in df else np.minimum(abertura, close)
+        volume = df['volume'].to_numpy(dtype=float) if 'volume' in df else np.ones(len(close))
+        return cls(np.column_stack([abertura, alto, baixo, close, volume]), **kwargs)
+
+    def agora_ms(self):
+        """Hora simulada (ms): avança ``velocidade`` vezes mais depressa que o relógio real."""
+        return int(self.inicio_ms + (self.relogio() - self._inicio_real) * 1000 * self.velocidade)
+
+    def _posicao(self, agora_ms=None):
+        # Índice da vela em formação e fração já decorrida dela
+        decorrido = (self.agora_ms() if agora_ms is None else agora_ms) - self.tempo_zero
+        indice = int(decorrido // self.intervalo_ms)
+        if indice >= len(self.velas):
+            return len(self.velas) - 1, 1.0
+        return indice, (decorrido % self.intervalo_ms) / self.intervalo_ms
+
+    def _vela_parcial(self, indice, fracao):
+        abertura, alto, baixo, fecho, volume = self.velas[indice]
+        if fecho >= abertura:
+            pontos = [abertura, baixo, alto, fecho]
+        else:
+            pontos = [abertura, alto, baixo, fecho]
+        preco = float(np.interp(fracao, [0, 1 / 3, 2 / 3, 1], pontos))
+        vistos = [p for p, limite in zip(pontos, [0, 1 / 3, 2 / 3, 1]) if limite <= fracao] + [preco]
+        return abertura, max(vistos), min(vistos), preco, volume * fracao
+
+    def preco(self, agora_ms=None):
+        return self._vela_parcial(*self._posicao(agora_ms))[3]
+
+    def extremos(self, inicio_ms, fim_ms):
+        """(mínimo, máximo) do preço entre ``inicio_ms`` e ``fim_ms``.
+
+        O preço é linear entre os pontos open/low/high/close de cada vela, pelo
+        que os extremos estão nas pontas do intervalo ou nesses pontos.
+        """
+        terco = self.intervalo_ms / 3
+        primeiro = int((inicio_ms - self.tempo_zero) // terco) + 1
+        ultimo = int(min(fim_ms - self.tempo_zero, len(self.velas) * self.intervalo_ms) // terco)
+        tempos = [inicio_ms, fim_ms] + [self.tempo_zero + k * terco for k in range(max(primeiro, 0), ultimo + 1)]
+        precos = [self.preco(t) for t in tempos]
+        return min(precos), max(precos)
+
+    def kline(self, indice, agora_ms=None):
+        """Linha no formato de get_klines (a vela em formação vem parcial)."""
+        atual, fracao = self._posicao(agora_ms)
+        if indice == atual:
+            abertura, alto, baixo, fecho, volume = self._vela_parcial(indice, fracao)
+        else:
+            abertura, alto, baixo, fecho, volume = self.velas[indice]
+        inicio = self.tempo_zero + indice * self.intervalo_ms
+        return [inicio, f"{abertura:.2f}", f"{alto:.2f}", f"{baixo:.2f}", f"{fecho:.2f}", f"{volume:.8f}",
+                inicio + self.intervalo_ms - 1, f"{volume * fecho:.8f}", 1, "0", "0", "0"]
+
+    def klines(self, limite=500, inicio_ms=None, fim_ms=None):
+        agora = self.agora_ms()
+        atual, _ = self._posicao(agora)
+        primeiro, ultimo = 0, atual
+        if inicio_ms is not None:
+            primeiro = max(0, -(-(int(inicio_ms) - self.tempo_zero) // self.intervalo_ms))
+        if fim_ms is not None:
+            ultimo = min(ultimo, (int(fim_ms) - self.tempo_zero) // self.intervalo_ms)
+        if inicio_ms is None:
+            primeiro = max(primeiro, ultimo - limite + 1)
+        ultimo = min(ultimo, primeiro + limite - 1)
+        return [self.kline(i, agora) for i in range(primeiro, ultimo + 1)]
+
+
+class ContaSimulada:
+    """Saldos e execução de ordens de mercado com comissão (na moeda recebida, como na Binance).
+
+    As OCO de venda bloqueiam a quantidade da moeda base até serem executadas ou canceladas.
+    """
+
+    def __init__(self, saldos=None, taxa=0.001):
+        self.saldos = dict(saldos or {})
+        self.bloqueado = {}
+        self.taxa = taxa
+        self.ordens = []
+        self.listas = {}
+        self._por_id = {}
+        self._ids_cliente = {}
+        self._proximo_id = itertools.count(1)
+        self._proxima_lista = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def saldo(self, ativo):
+        with self._lock:
+            return self.saldos.get(ativo, 0.0)
+
+    def account(self):
+        with self._lock:
+            balances = [{'asset': a, 'free': f"{v:.8f}", 'locked': f"{self.bloqueado.get(a, 0.0):.8f}"}
+                        for a, v in self.saldos.items()]
+        return {'makerCommission': 10, 'takerCommission': 10, 'canTrade': True, 'accountType': 'SPOT',
+                'balances': balances}
+
+    def ordem_mercado(self, simbolo, base, cotacao, lado, preco, tempo_ms, quantidade=None, valor=None,
+                      id_cliente=None):
+        with self._lock:
+            if id_cliente and id_cliente in self._ids_cliente:
+                raise ErroExchange(400, -2010, "Duplicate order sent.")
+            if quantidade is None:
+                quantidade = valor / preco
+            total = quantidade * preco
+            if lado == 'BUY':
+                if self.saldos.get(cotacao, 0.0) < total:
+                    raise ErroExchange(400, -2010, "Account has insufficient balance for requested action.")
+                comissao, ativo_comissao = quantidade * self.taxa, base
+                self.saldos[cotacao] = self.saldos.get(cotacao, 0.0) - total
+                self.saldos[base] = self.saldos.get(base, 0.0) + quantidade - comissao
+            else:
+                if self.saldos.get(base, 0.0) < quantidade:
+                    raise ErroExchange(400, -2010, "Account has insufficient balance for requested action.")
+                comissao, ativo_comissao = total * self.taxa, cotacao
+                self.saldos[base] = self.saldos.get(base, 0.0) - quantidade
+                self.saldos[cotacao] = self.saldos.get(cotacao, 0.0) + total - comissao
+            id_ordem = next(self._proximo_id)
+            id_cliente = id_cliente or f"sim{id_ordem}"
+            ordem = {'symbol': simbolo, 'orderId': id_ordem, 'orderListId': -1, 'clientOrderId': id_cliente,
+                     'transactTime': tempo_ms, 'price': "0.00000000", 'origQty': f"{quantidade:.8f}",
+                     'executedQty': f"{quantidade:.8f}", 'cummulativeQuoteQty': f"{total:.8f}",
+                     'status': 'FILLED', 'timeInForce': 'GTC', 'type': 'MARKET', 'side': lado,
+                     'fills': [{'price': f"{preco:.2f}", 'qty': f"{quantidade:.8f}",
+                                'commission': f"{comissao:.8f}", 'commissionAsset': ativo_comissao}]}
+            self._ids_cliente[id_cliente] = id_ordem
+            self.ordens.append(ordem)
+            self._por_id[id_ordem] = ordem
+            return ordem
+
+    def ordem_oco_venda(self, simbolo, base, quantidade, preco_take_profit, preco_stop, preco_stop_limite,
+                        tempo_ms, id_lista_cliente=None):
+        """Coloca uma OCO de venda (LIMIT_MAKER acima, STOP_LOSS_LIMIT abaixo); devolve a resposta da Binance."""
+        with self._lock:
+            if self.saldos.get(base, 0.0) < quantidade:
+                raise ErroExchange(400, -2010, "Account has insufficient balance for requested action.")
+            if not preco_stop_limite <= preco_stop < preco_take_profit:
+                raise ErroExchange(400, -1106, "Invalid OCO prices.")
+            self.saldos[base] -= quantidade
+            self.bloqueado[base] = self.bloqueado.get(base, 0.0) + quantidade
+            id_lista = next(self._proxima_lista)
+            pernas = []
+            for tipo, preco, stop in (('STOP_LOSS_LIMIT', preco_stop_limite, preco_stop),
+                                      ('LIMIT_MAKER', preco_take_profit, 0.0)):
+                id_ordem = next(self._proximo_id)
+                ordem = {'symbol': simbolo, 'orderId': id_ordem, 'orderListId': id_lista,
+                         'clientOrderId': f"sim{id_ordem}", 'transactTime': tempo_ms, 'price': f"{preco:.8f}",
+                         'stopPrice': f"{stop:.8f}", 'origQty': f"{quantidade:.8f}", 'executedQty': "0.00000000",
+                         'cummulativeQuoteQty': "0.00000000", 'status': 'NEW', 'timeInForce': 'GTC',
+                         'type': tipo, 'side': 'SELL'}
+                self._por_id[id_ordem] = ordem
+                pernas.append(ordem)
+            lista = {'orderListId': id_lista, 'contingencyType': 'OCO', 'listStatusType': 'EXEC_STARTED',
+                     'listOrderStatus': 'EXECUTING', 'listClientOrderId': id_lista_cliente or f"simlista{id_lista}",
+                     'transactionTime': tempo_ms, 'symbol': simbolo,
+                     'orders': [{'symbol': simbolo, 'orderId': o['orderId'], 'clientOrderId': o['clientOrderId']}
+                                for o in pernas]}
+            self.listas[id_lista] = (lista, pernas, base, quantidade)
+            return dict(lista, orderReports=[dict(o) for o in pernas])
+
+    def avaliar_oco(self, cotacao, minimo, maximo, tempo_ms):
+        """Executa as OCO cujo take-profit (<= ``maximo``) ou stop (>= ``minimo``) foi tocado."""
+        with self._lock:
+            for lista, (stop, take_profit), base, quantidade in self.listas.values():
+                if lista['listOrderStatus'] != 'EXECUTING':
+                    continue
+                if minimo <= float(stop['stopPrice']):
+                    executada, outra = stop, take_profit  # Na dúvida (ambos tocados), o stop primeiro
+                elif maximo >= float(take_profit['price']):
+                    executada, outra = take_profit, stop
+                else:
+                    continue
+                total = quantidade * float(executada['price'])
+                comissao = total * self.taxa
+                self.bloqueado[base] -= quantidade
+                self.saldos[cotacao] = self.saldos.get(cotacao, 0.0) + total - comissao
+                executada.update(status='FILLED', executedQty=f"{quantidade:.8f}",
+                                 cummulativeQuoteQty=f"{total:.8f}", updateTime=tempo_ms)
+                outra.update(status='EXPIRED', updateTime=tempo_ms)
+                lista.update(listStatusType='ALL_DONE', listOrderStatus='ALL_DONE', transactionTime=tempo_ms)
+
+    def cancelar_oco(self, id_lista, tempo_ms):
+        with self._lock:
+            if id_lista not in self.listas or self.listas[id_lista][0]['listOrderStatus'] != 'EXECUTING':
+                raise ErroExchange(400, -2011, "Unknown order sent.")
+            lista, pernas, base, quantidade = self.listas[id_lista]
+            self.bloqueado[base] -= quantidade
+            self.saldos[base] = self.saldos.get(base, 0.0) + quantidade
+            for ordem in pernas:
+                ordem.update(status='CANCELED', updateTime=tempo_ms)
+            lista.update(listStatusType='ALL_DONE', listOrderStatus='ALL_DONE', transactionTime=tempo_ms)
+            return dict(lista, orderReports=[dict(o) for o in pernas])
+
+    def lista(self, id_lista=None, id_cliente=None):
+        with self._lock:
+            if id_lista is None:
+                id_lista = next((i for i, (l, *_) in self.listas.items() if l['listClientOrderId'] == id_cliente), None)
+            if id_lista not in self.listas:
+                raise ErroExchange(400, -2018, "Order list does not exist.")
+            return dict(self.listas[id_lista][0])
+
+    def ordem(self, id_ordem=None, id_cliente=None):
+        with self._lock:
+            if id_ordem is None:
+                id_ordem = self._ids_cliente.get(id_cliente)
+            if id_ordem not in self._por_id:
+                raise ErroExchange(400, -2013, "Order does not exist.")
+            return dict(self._por_id[id_ordem])
+
+
+@dataclass
+class Falhas:
+    """Falhas injetadas nas respostas REST."""
+    latencia: float = 0.0           # Segundos acrescentados a cada resposta
+    jitter: float = 0.0             # Segundos aleatórios (uniforme 0..jitter) acrescentados
+    prob_queda: float = 0.0         # Probabilidade de fechar a ligação sem responder
+    prob_429: float = 0.0           # Probabilidade de responder 429 independentemente do peso
+    limite_peso: int = 1200         # Peso por minuto antes de 429 (0 = sem limite)
+    banir_apos: int = 3             # Pedidos feitos durante o Retry-After de um 429 antes de um 418
+    duracao_banimento: float = 60.0  # Segundos de banimento (418)
+
+
+class LimiteSimulado:
+    """Peso usado por minuto (janela fixa, como x-mbx-used-weight-1m), 429 e banimento 418."""
+
+    def __init__(self, falhas, relogio=time.time, aleatorio=random):
+        self.falhas = falhas
+        self.relogio = relogio
+        self.aleatorio = aleatorio
+        self._minuto = None
+        self.usado = 0
+        self._retry_ate = 0.0
+        self._violacoes = 0
+        self._banido_ate = 0.0
+        self._lock = threading.Lock()
+
+    def consumir(self, peso):
+        """Conta o peso do pedido; levanta ErroExchange 429/418 se o pedido deve ser recusado."""
+        agora = self.relogio()
+        with self._lock:
+            minuto = int(agora // 60)
+            if minuto != self._minuto:
+                self._minuto, self.usado = minuto, 0
+            if agora < self._banido_ate:
+                raise self._erro(418, -1003, "Way too many requests; IP banned.", self._banido_ate - agora)
+            if agora < self._retry_ate:
+                self._violacoes += 1
+                if self._violacoes > self.falhas.banir_apos:
+                    self._banido_ate = agora + self.falhas.duracao_banimento
+                    raise self._erro(418, -1003, "Way too many requests; IP banned.",
+                                     self.falhas.duracao_banimento)
+            self.usado += peso
+            if self.falhas.limite_peso and self.usado > self.falhas.limite_peso:
+                self._retry_ate = (minuto + 1) * 60
+                raise self._erro(429, -1003, "Too much request weight used; current limit is "
+                                             f"{self.falhas.limite_peso} request weight per 1 MINUTE.",
+                                 self._retry_ate - agora)
+            if self.falhas.prob_429 and self.aleatorio.random() < self.falhas.prob_429:
+                self._retry_ate = agora + 1
+                raise self._erro(429, -1003, "Too many requests (injected).", 1)
+            if agora >= self._retry_ate:
+                self._violacoes = 0
+
+    def _erro(self, status, codigo, mensagem, espera):
+        return ErroExchange(status, codigo, mensagem, {'Retry-After': str(max(1, int(np.ceil(espera))))})
+
+
+class SimuladorExchange:
+    """Servidor HTTP local com a API REST simulada (e streams WebSocket opcionais)."""
+
+    def __init__(self, trajeto, base="BTC", cotacao="EUR", saldos=None, taxa=0.001, falhas=None,
+                 porta=0, endereco="127.0.0.1", porta_stream=None, intervalo_stream=1.0, semente=None,
+                 relogio=time.time):
+        self.trajeto = trajeto
+        self.base = base
+        self.cotacao = cotacao
+        self.simbolo = base + cotacao
+        self.conta = ContaSimulada(saldos if saldos is not None else {base: 0.0, cotacao: 1000.0}, taxa)
+        self.falhas = falhas or Falhas()
+        self.aleatorio = random.Random(semente)
+        self.limite = LimiteSimulado(self.falhas, relogio=relogio, aleatorio=self.aleatorio)
+        self.estatisticas = {'pedidos': 0, 'quedas': 0, 'erros_429': 0, 'erros_418': 0, 'ordens': 0}
+        self._lock_estatisticas = threading.Lock()
+        self.servidor = None  # porta=None: só em processo (ClienteSimulado), sem servidor HTTP
+        if porta is not None:
+            self.servidor = ThreadingHTTPServer((endereco, porta), self._criar_handler())
+            self.servidor.daemon_threads = True
+        self._avaliado_ate = None  # Hora simulada até à qual as OCO já foram avaliadas
+        self._lock_avaliacao = threading.Lock()
+        self.stream = None
+        if porta_stream is not None:
+            self.stream = ServidorStreamSimulado(self, porta_stream, endereco, intervalo_stream)
+        self._thread = None
+
+    @property
+    def url_api(self):
+        endereco, porta = self.servidor.server_address[:2]
+        return f"http://{endereco}:{porta}/api"
+
+    def iniciar(self):
+        self._thread = threading.Thread(target=self.servidor.serve_forever, name="simulador-http", daemon=True)
+        self._thread.start()
+        if self.stream is not None:
+            self.stream.iniciar()
+        return self
+
+    def parar(self):
+        if self.stream is not None:
+            self.stream.parar()
+        if self.servidor is not None:
+            self.servidor.shutdown()
+            self.servidor.server_close()
+
+    def _contar(self, chave):
+        with self._lock_estatisticas:
+            self.estatisticas[chave] += 1
+
+    # --- Endpoints ---------------------------------------------------------------
+
+    def responder(self, metodo, caminho, parametros):
+        """Devolve (status, corpo, cabeçalhos) do pedido; usado pelo handler HTTP."""
+        if caminho.startswith("/sim/"):
+            return self._controlo(metodo, caminho, parametros)
+        peso = PESO_ENDPOINT.get(caminho, 1)
+        if caminho == "/api/v3/ticker/price" and 'symbol' not in parametros:
+            peso = PESO_TICKER_TODOS
+        try:
+            self.limite.consumir(peso)
+            corpo = self._endpoint(metodo, caminho, parametros)
+            status, cabecalhos = 200, {}
+        except ErroExchange as e:
+            if e.status in (429, 418):
+                self._contar('erros_429' if e.status == 429 else 'erros_418')
+            status, corpo, cabecalhos = e.status, {'code': e.codigo, 'msg': e.mensagem}, dict(e.cabecalhos)
+        cabecalhos['x-mbx-used-weight-1m'] = str(self.limite.usado)
+        return status, corpo, cabecalhos
+
+    def _avaliar_ordens(self, agora):
+        # Executa as OCO tocadas pelo preço desde o último pedido
+        with self._lock_avaliacao:
+            inicio = self._avaliado_ate if self._avaliado_ate is not None else agora
+            self._avaliado_ate = max(agora, inicio)
+        if self.conta.listas:
+            self.conta.avaliar_oco(self.cotacao, *self.trajeto.extremos(inicio, agora), agora)
+
+    def _endpoint(self, metodo, caminho, p):
+        agora = self.trajeto.agora_ms()
+        self._avaliar_ordens(agora)
+        if caminho == "/api/v3/ping":
+            return {}
+        if caminho == "/api/v3/time":
+            return {'serverTime': agora}
+        if caminho == "/api/v3/exchangeInfo":
+            return {'timezone': 'UTC', 'serverTime': agora, 'symbols': [self._info_simbolo()]}
+        if caminho == "/api/v3/klines":
+            self._validar_simbolo(p.get('symbol'))
+            if p.get('interval') != self.trajeto.intervalo:
+                raise ErroExchange(400, -1120, "Invalid interval.")
+            return self.trajeto.klines(int(p.get('limit', 500)), p.get('startTime'), p.get('endTime'))
+        if caminho == "/api/v3/ticker/price":
+            preco = {'symbol': self.simbolo, 'price': f"{self.trajeto.preco(agora):.2f}"}
+            if 'symbol' in p:
+                self._validar_simbolo(p['symbol'])
+                return preco
+            return [preco]
+        if caminho == "/api/v3/account":
+            return self.conta.account()
+        if caminho == "/api/v3/order" and metodo == "POST":
+            self._validar_simbolo(p.get('symbol'))
+            if p.get('type') != 'MARKET':
+                raise ErroExchange(400, -1116, "Invalid orderType.")
+            quantidade = float(p['quantity']) if 'quantity' in p else None
+            valor = float(p['quoteOrderQty']) if 'quoteOrderQty' in p else None
+            if quantidade is None and valor is None:
+                raise ErroExchange(400, -1102, "Mandatory parameter 'quantity' was not sent.")
+            ordem = self.conta.ordem_mercado(self.simbolo, self.base, self.cotacao, p.get('side'),
+                                             self.trajeto.preco(agora), agora, quantidade, valor,
+                                             p.get('newClientOrderId'))
+            self._contar('ordens')
+            return ordem
+        if caminho == "/api/v3/order" and metodo == "GET":
+            self._validar_simbolo(p.get('symbol'))
+            if 'orderId' in p:
+                return self.conta.ordem(int(p['orderId']))
+            return self.conta.ordem(id_cliente=p.get('origClientOrderId'))
+        if caminho == "/api/v3/orderList/oco" and metodo == "POST":
+            self._validar_simbolo(p.get('symbol'))
+            if (p.get('side'), p.get('aboveType'), p.get('belowType')) != ('SELL', 'LIMIT_MAKER', 'STOP_LOSS_LIMIT'):
+                raise ErroExchange(400, -1116, "Invalid orderType.")
+            resposta = self.conta.ordem_oco_venda(self.simbolo, self.base, float(p['quantity']), float(p['abovePrice']),
+                                                  float(p['belowStopPrice']), float(p['belowPrice']), agora,
+                                                  p.get('listClientOrderId'))
+            self._contar('ordens')
+            return resposta
+        if caminho == "/api/v3/orderList" and metodo == "GET":
+            if 'orderListId' in p:
+                return self.conta.lista(int(p['orderListId']))
+            return self.conta.lista(id_cliente=p.get('origClientOrderId'))
+        if caminho == "/api/v3/orderList" and metodo == "DELETE":
+            self._validar_simbolo(p.get('symbol'))
+            return self.conta.cancelar_oco(int(p['orderListId']), agora)
+        raise ErroExchange(404, -1000, f"Endpoint desconhecido: {metodo} {caminho}")
+
+    def _validar_simbolo(self, simbolo):
+        if simbolo != self.simbolo:
+            raise ErroExchange(400, -1121, "Invalid symbol.")
+
+    def _info_simbolo(self):
+        return {'symbol': self.simbolo, 'status': 'TRADING', 'baseAsset': self.base, 'quoteAsset': self.cotacao,
+                'baseAssetPrecision': 8, 'quotePrecision': 8, 'orderTypes': ['MARKET', 'LIMIT', 'LIMIT_MAKER', 'STOP_LOSS_LIMIT'],
+                'ocoAllowed': True,
+                'filters': [{'filterType': 'PRICE_FILTER', 'minPrice': '0.01', 'maxPrice': '1000000.00',
+                             'tickSize': '0.01'},
+                            {'filterType': 'LOT_SIZE', 'minQty': '0.00001', 'maxQty': '9000.00000000',
+                             'stepSize': '0.00001'},
+                            {'filterType': 'NOTIONAL', 'minNotional': '5.00', 'applyMinToMarket': True,
+                             'maxNotional': '9000000.00', 'applyMaxToMarket': False}]}
+
+    def _controlo(self, metodo, caminho, parametros):
+        if caminho == "/sim/falhas" and metodo == "POST":
+            for campo, valor in parametros.items():
+                if hasattr(self.falhas, campo):
+                    setattr(self.falhas, campo, type(getattr(self.falhas, campo))(valor))
+            return 200, asdict(self.falhas), {}
+        if caminho == "/sim/estado":
+            with self._lock_estatisticas:
+                estado = dict(self.estatisticas)
+            estado.update(tempo=self.trajeto.agora_ms(), preco=self.trajeto.preco(),
+                          saldos=dict(self.conta.saldos), bloqueado=dict(self.conta.bloqueado), peso_usado=self.limite.usado,
+                          falhas=asdict(self.falhas))
+            return 200, estado, {}
+        return 404, {'code': -1000, 'msg': 'Desconhecido'}, {}
+
+    def _criar_handler(self):
+        simulador = self
+
+        class Pedido(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # Keep-alive, como a Binance
+
+            def _tratar(pedido, metodo):
+                url = urlsplit(pedido.path)
+                parametros = {k: v[-1] for k, v in parse_qs(url.query).items()}
+                tamanho = int(pedido.headers.get('Content-Length') or 0)
+                if tamanho:
+                    corpo = pedido.rfile.read(tamanho).decode('utf-8')
+                    if pedido.headers.get('Content-Type', '').startswith('application/json'):
+                        parametros.update(json.loads(corpo))
+                    else:
+                        parametros.update({k: v[-1] for k, v in parse_qs(corpo).items()})
+                simulador._contar('pedidos')
+
+                falhas = simulador.falhas
+                controlo = url.path.startswith("/sim/")  # Os pedidos de controlo não sofrem falhas
+                if not controlo and falhas.prob_queda and simulador.aleatorio.random() < falhas.prob_queda:
+                    simulador._contar('quedas')
+                    pedido.close_connection = True
+                    try:
+                        pedido.connection.shutdown(socket.SHUT_RDWR)
+                    except OSError:
+                        pass
+                    return
+                espera = 0.0
+                if not controlo:
+                    espera = falhas.latencia + (simulador.aleatorio.uniform(0, falhas.jitter) if falhas.jitter else 0)
+                if espera > 0:
+                    time.sleep(espera)
+
+                status, corpo, cabecalhos = simulador.responder(metodo, url.path, parametros)
+                dados = json.dumps(corpo).encode('utf-8')
+                pedido.send_response(status)
+                pedido.send_header('Content-Type', 'application/json;charset=UTF-8')
+                pedido.send_header('Content-Length', str(len(dados)))
+                for nome, valor in cabecalhos.items():
+                    pedido.send_header(nome, valor)
+                pedido.end_headers()
+                pedido.wfile.write(dados)
+
+            def do_GET(pedido):
+                pedido._tratar("GET")
+
+            def do_POST(pedido):
+                pedido._tratar("POST")
+
+            def do_DELETE(pedido):
+                pedido._tratar("DELETE")
+
+            def log_message(pedido, *args):
+                pass
+
+        return Pedido
+
+
+class ClienteSimulado:
+    """Cliente em processo com a interface REST do ``binance.client.Client``, sobre ``SimuladorExchange.responder``.
+
+    Sem HTTP nem threads: cada chamada é respondida de imediato, na hora do trajeto. Com um relógio
+    simulado no trajeto (e no ``SimuladorExchange``), o bot corre muito mais depressa que o tempo real.
+    Os erros chegam como ``BinanceAPIException``, como no cliente real.
+    """
+
+    def __init__(self, simulador):
+        self.simulador = simulador
+        self.timestamp_offset = 0
+
+    def _pedido(self, metodo, caminho, parametros):
+        parametros = {chave: valor for chave, valor in parametros.items() if valor is not None}
+        status, corpo, cabecalhos = self.simulador.responder(metodo, caminho, parametros)
+        if status != 200:
+            texto = json.dumps(corpo)
+            raise BinanceAPIException(SimpleNamespace(text=texto, headers=cabecalhos), status, texto)
+        return corpo
+
+    def ping(self):
+        return self._pedido("GET", "/api/v3/ping", {})
+
+    def get_server_time(self):
+        return self._pedido("GET", "/api/v3/time", {})
+
+    def get_exchange_info(self):
+        return self._pedido("GET", "/api/v3/exchangeInfo", {})
+
+    def get_symbol_info(self, symbol):
+        return next((s for s in self.get_exchange_info()['symbols'] if s['symbol'] == symbol), None)
+
+    def get_klines(self, **parametros):
+        return self._pedido("GET", "/api/v3/klines", parametros)
+
+    def get_symbol_ticker(self, **parametros):
+        return self._pedido("GET", "/api/v3/ticker/price", parametros)
+
+    def get_account(self, **parametros):
+        return self._pedido("GET", "/api/v3/account", parametros)
+
+    def get_order(self, **parametros):
+        return self._pedido("GET", "/api/v3/order", parametros)
+
+    def create_order(self, **parametros):
+        return self._pedido("POST", "/api/v3/order", parametros)
+
+    def order_market_buy(self, **parametros):
+        return self.create_order(side='BUY', type='MARKET', **parametros)
+
+    def order_market_sell(self, **parametros):
+        return self.create_order(side='SELL', type='MARKET', **parametros)
+
+
+class ServidorStreamSimulado:
+    """Streams combinados ``/stream?streams=<par>@kline_<intervalo>/<par>@trade`` do trajeto simulado."""
+
+    def __init__(self, simulador, porta=0, endereco="127.0.0.1", intervalo=1.0):
+        from websockets.sync.server import serve
+        self.simulador = simulador
+        self.intervalo = intervalo
+        self.ligacoes = set()
+        self._parar = threading.Event()
+        self.servidor = serve(self._tratar, endereco, porta)
+        self._thread = None
+
+    @property
+    def url(self):
+        endereco, porta = self.servidor.socket.getsockname()[:2]
+        return f"ws://{endereco}:{porta}"
+
+    def iniciar(self):
+        self._thread = threading.Thread(target=self.servidor.serve_forever, name="simulador-ws", daemon=True)
+        self._thread.start()
+        return self
+
+    def parar(self):
+        self._parar.set()
+        self.cortar_ligacoes()
+        self.servidor.shutdown()
+
+    def cortar_ligacoes(self):
+        """Fecha todas as ligações abertas (para testar a religação dos clientes)."""
+        for ligacao in list(self.ligacoes):
+            try:
+                ligacao.close()
+            except Exception:
+                pass
+
+    def _mensagem_kline(self, par, indice, fechada):
+        k = self.simulador.trajeto.kline(indice)
+        return {'stream': f"{par}@kline_{self.simulador.trajeto.intervalo}",
+                'data': {'e': 'kline', 'E': self.simulador.trajeto.agora_ms(), 's': par.upper(),
+                         'k': {'t': k[0], 'T': k[6], 's': par.upper(), 'i': self.simulador.trajeto.intervalo,
+                               'o': k[1], 'h': k[2], 'l': k[3], 'c': k[4], 'v': k[5], 'x': fechada}}}
+
+    def _tratar(self, ligacao):
+        self.ligacoes.add(ligacao)
+        par = self.simulador.simbolo.lower()
+        pedidos = parse_qs(urlsplit(ligacao.request.path).query).get('streams', [''])[0].split('/')
+        trajeto = self.simulador.trajeto
+        try:
+            anterior, _ = trajeto._posicao()
+            while not self._parar.is_set():
+                atual, _ = trajeto._posicao()
+                for indice in range(anterior, atual):
+                    if f"{par}@kline_{trajeto.intervalo}" in pedidos:
+                        ligacao.send(json.dumps(self._mensagem_kline(par, indice, True)))
+                anterior = atual
+                if f"{par}@kline_{trajeto.intervalo}" in pedidos:
+                    ligacao.send(json.dumps(self._mensagem_kline(par, atual, False)))
+                if f"{par}@trade" in pedidos:
+                    ligacao.send(json.dumps({'stream': f"{par}@trade",
+                                             'data': {'e': 'trade', 'E': trajeto.agora_ms(), 's': par.upper(),
+                                                      'p': f"{trajeto.preco():.2f}", 'q': "0.001"}}))
+                if self._parar.wait(self.intervalo):
+                    break
+        except Exception:
+            pass  # Ligação fechada pelo cliente ou cortada
+        finally:
+            self.ligacoes.discard(ligacao)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Simulador local da API da Binance')
+    parser.add_argument('--porta', type=int, default=8900)
+    parser.add_argument('--porta-stream', type=int, help='Porta dos streams WebSocket (omitir = sem streams)')
+    parser.add_argument('--csv', help="CSV com a coluna 'close' (omitir = trajeto sintético)")
+    parser.add_argument('--intervalo', default='5m', help='Intervalo das velas')
+    parser.add_argument('--velocidade', type=float, default=1.0, help='Segundos simulados por segundo real')
+    parser.add_argument('--base', default='BTC')
+    parser.add_argument('--cotacao', default='EUR')
+    parser.add_argument('--saldo', type=float, default=1000.0, help='Saldo inicial na moeda de cotação')
+    parser.add_argument('--taxa', type=float, default=0.001, help='Comissão por ordem (fração)')
+    parser.add_argument('--latencia', type=float, default=0.0)
+    parser.add_argument('--jitter', type=float, default=0.0)
+    parser.add_argument('--prob-queda', type=float, default=0.0)
+    parser.add_argument('--prob-429', type=float, default=0.0)
+    parser.add_argument('--limite-peso', type=int, default=1200)
+    args = parser.parse_args()
+
+    opcoes = dict(intervalo=args.intervalo, velocidade=args.velocidade)
+    trajeto = TrajetoPrecos.de_csv(args.csv, **opcoes) if args.csv else TrajetoPrecos.sintetico(**opcoes)
+    falhas = Falhas(latencia=args.latencia, jitter=args.jitter, prob_queda=args.prob_queda,
+                    prob_429=args.prob_429, limite_peso=args.limite_peso)
+    simulador = SimuladorExchange(trajeto, args.base, args.cotacao, {args.base: 0.0, args.cotacao: args.saldo},
+                                  args.taxa, falhas, args.porta, porta_stream=args.porta_stream).iniciar()
+    print(f"API REST: {simulador.url_api}")
+    if simulador.stream is not None:
+        print(f"Streams: {simulador.stream.url}")
+    try:
+        while True:
+            time.sleep(60)
+            print(json.dumps(simulador.responder("GET", "/sim/estado", {})[1]))
+    except KeyboardInterrupt:
+        simulador.parar()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,107 @@
+"""Modo sombra: várias variantes da estratégia avaliadas em papel sobre o mesmo feed.
+
+Cada ``VarianteSombra`` tem os seus parâmetros (EMAs, RSI, SL/TP), a sua
+posição em papel e o seu registo de trades, mas não envia ordens: as
+entradas e saídas são simuladas ao preço atual, com a taxa fixa por trade.
+As variantes leem os indicadores do ``MotorIndicadores`` do bot, onde cada
+span/período distinto é calculado uma única vez por vela; assim acrescentar
+variantes não faz pedidos à API e custa apenas a avaliação das regras.
+"""
+import logging
+from dataclasses import replace
+
+from estrategia import ParametrosEstrategia, avaliar_sinal
+
+logger = logging.getLogger(__name__)
+
+
+def _log_padrao(tipo, mensagem):
+    logger.info("%s: %s", tipo, mensagem)
+
+
+class VarianteSombra:
+    """Uma variante da estratégia com posição e PnL em papel."""
+
+    def __init__(self, nome, parametros, vista, quantidade, taxa=0.08, log=_log_padrao):
+        self.nome = nome
+        self.parametros = parametros
+        self.vista = vista
+        self.quantidade = quantidade
+        self.taxa = taxa
+        self.log = log
+        self.posicao_aberta = False
+        self.preco_entrada = None
+        self.preco_stop_loss = None
+        self.preco_take_profit = None
+        self.n_trade = 0
+        self.delta_total = 0.0
+        self.trades = []  # (preço de entrada, preço de saída, lucro líquido, motivo)
+
+    def passo(self, preco_atual):
+        """Stop-loss/take-profit, sinal e ordens em papel; devolve o sinal avaliado."""
+        if self.posicao_aberta and self.preco_entrada is not None:
+            if preco_atual <= self.preco_stop_loss:
+                self.vender(preco_atual, "STOP-LOSS")
+            elif preco_atual >= self.preco_take_profit:
+                self.vender(preco_atual, "TAKE-PROFIT")
+
+        sinal, self.posicao_aberta = avaliar_sinal(self.vista, self.posicao_aberta, self.parametros)
+        if sinal == "COMPRA":
+            self.comprar(preco_atual)
+        elif sinal == "VENDA":
+            self.vender(preco_atual, "SINAL")
+        return sinal
+
+    def comprar(self, preco_atual):
+        self.posicao_aberta = True
+        self.preco_entrada = preco_atual
+        self.preco_stop_loss = preco_atual * (1 - self.parametros.stop_loss)
+        self.preco_take_profit = preco_atual * (1 + self.parametros.take_profit)
+
+    def vender(self, preco_atual, motivo):
+        if self.preco_entrada is not None:
+            lucro = (preco_atual - self.preco_entrada) * self.quantidade - self.taxa
+            self.n_trade += 1
+            self.delta_total += lucro
+            self.trades.append((self.preco_entrada, preco_atual, lucro, motivo))
+            self.log("SOMBRA", f"[{self.nome}] TRADE #{self.n_trade} ({motivo}) Entrada: {self.preco_entrada:.2f} | "
+                               f"Saída: {preco_atual:.2f} | Lucro: {lucro:.2f} | Total: {self.delta_total:.2f}")
+        self.posicao_aberta = False
+        self.preco_entrada = self.preco_stop_loss = self.preco_take_profit = None
+
+    def resumo(self):
+        ganhos = sum(1 for t in self.trades if t[2] > 0)
+        return {'nome': self.nome, 'trades': self.n_trade, 'delta_total': self.delta_total,
+                'win_rate': ganhos / self.n_trade if self.n_trade else 0.0, 'posicao_aberta': self.posicao_aberta}
+
+
+class MotorSombra:
+    """Conjunto de variantes em papel alimentadas pelo mesmo ``MotorIndicadores``."""
+
+    def __init__(self, motor, variantes, quantidade, taxa=0.08, base=ParametrosEstrategia(), log=_log_padrao):
+        """``variantes``: {nome: ParametrosEstrategia ou dict com as alterações a ``base``}.
+
+        Os períodos das variantes são registados no motor, que ainda não pode
+        ter recebido velas.
+        """
+        self.variantes = []
+        for nome, parametros in variantes.items():
+            if isinstance(parametros, dict):
+                parametros = replace(base, **parametros)
+            self.variantes.append((nome, parametros))
+        motor.registar(spans=[s for _, p in self.variantes for s in (p.media_rapida, p.media_lenta)],
+                       periodos=[p.periodo_rsi for _, p in self.variantes])
+        self.variantes = [VarianteSombra(nome, p, motor.vista(p.media_rapida, p.media_lenta, p.periodo_rsi),
+                                         quantidade, taxa, log) for nome, p in self.variantes]
+
+    def passo(self, preco_atual):
+        """Avalia todas as variantes com os indicadores atuais; devolve {nome: sinal}."""
+        return {variante.nome: variante.passo(preco_atual) for variante in self.variantes}
+
+    def classificacao(self):
+        """Resumo das variantes, da melhor para a pior (delta total)."""
+        return sorted((v.resumo() for v in self.variantes), key=lambda r: r['delta_total'], reverse=True)
+
+    def resumo_texto(self, maximo=5):
+        return " | ".join(f"{r['nome']}: {r['delta_total']:.2f} ({r['trades']} trades)"
+                          for r in self.classificacao()[:maximo])
@@ -0,0 +1,169 @@
+"""Out-of-core backtest of the live strategy rules (estrategia.regras_sinal), block by block.
+
+The input is read in blocks of ``--bloco`` candles: a CSV in chunks, a
+``.npy`` array of closes through a memory map, or a historico.py archive
+directory partition by partition. Each block only carries over what the next
+one needs: the EMA/RSI state (ema_continua/rsi_continuo), the last two
+candles of indicators (context for the crossover rules) and the open
+position. Peak memory is therefore set by the block size, not by the length
+of the series, and the trades are exactly those of simular_estrategia over
+the whole series in memory.
+
+Uso:
+    python test/backtest/backtest_em_blocos.py velas_1m.csv --bloco 500000
+    python test/backtest/backtest_em_blocos.py dados_velas --simbolo BTCEUR --timeframe 1m --inicio 2020-01-01
+"""
+import argparse
+import os
+from dataclasses import replace
+
+import numpy as np
+import pandas as pd
+
+import backtest_fatima as bt
+from historico import ArquivoVelas
+
+BLOCO = 1_000_000  # Velas por bloco
+
+
+def blocos_csv(caminho: str, tamanho: int = BLOCO):
+    """Closes of a CSV file (column 'close'), ``tamanho`` rows at a time."""
+    for parte in pd.read_csv(caminho, usecols=['close'], chunksize=tamanho):
+        yield parte['close'].to_numpy(dtype=float)
+
+
+def blocos_npy(caminho: str, tamanho: int = BLOCO):
+    """Closes of a 1-D ``.npy`` array, read through a memory map ``tamanho`` at a time."""
+    close = np.load(caminho, mmap_mode='r')
+    for inicio in range(0, len(close), tamanho):
+        yield np.array(close[inicio:inicio + tamanho], dtype=float)
+
+
+def blocos_arquivo(destino: str, simbolo: str, timeframe: str, tamanho: int = BLOCO, inicio=None, fim=None):
+    """Closes of a historico.py archive, partition by partition (split into blocks of ``tamanho``)."""
+    for colunas in ArquivoVelas(destino).blocos(simbolo, timeframe, inicio, fim):
+        close = colunas['close']
+        for a in range(0, len(close), tamanho):
+            yield np.array(close[a:a + tamanho], dtype=float)
+
+
+def ler_blocos(origem: str, tamanho: int = BLOCO, simbolo: str = 'BTCEUR', timeframe: str = '5m',
+               inicio=None, fim=None):
+    """Blocks of closes from a CSV file, a ``.npy`` file or an archive directory."""
+    if os.path.isdir(origem):
+        return blocos_arquivo(origem, simbolo, timeframe, tamanho, inicio, fim)
+    if origem.endswith('.npy'):
+        return blocos_npy(origem, tamanho)
+    return blocos_csv(origem, tamanho)
+
+
+class BacktestEmBlocos:
+    """State of the backtest between blocks: indicators, rule context and the open position."""
+
+    def __init__(self, parametros: bt.ParametrosEstrategia | None = None, stop_loss: float = bt.STOP_LOSS,
+                 take_profit: float = bt.TAKE_PROFIT):
+        self.parametros = parametros or bt.parametros_fatima()
+        self.stop_loss = stop_loss
+        self.take_profit = take_profit
+        self.n = 0            # Velas já processadas (índice global da próxima)
+        self.trades = []
+        self._estados = {}    # Estado de ema_continua/rsi_continuo de cada indicador
+        self._contexto = (np.zeros(0), np.zeros(0), np.zeros(0))
+        self._aberta = None   # (índice global, preço) da entrada em aberto
+        self._ultimo_close = None
+
+    def _regras(self, close: np.ndarray) -> tuple:
+        p = self.parametros
+        rapida, self._estados['rapida'] = bt.ema_continua(close, p.media_rapida, self._estados.get('rapida'))
+        lenta, self._estados['lenta'] = bt.ema_continua(close, p.media_lenta, self._estados.get('lenta'))
+        rsi, self._estados['rsi'] = bt.rsi_continuo(close, p.periodo_rsi, self._estados.get('rsi'))
+        # As regras de cada vela olham para as duas anteriores: o bloco é avaliado com elas à frente
+        series = [np.concatenate((anterior, atual)) for anterior, atual in zip(self._contexto, (rapida, lenta, rsi))]
+        k = len(self._contexto[0])
+        inicio = max(max(p.media_lenta, p.periodo_rsi) - (self.n - k), k)
+        regra_compra, regra_venda = bt.regras_sinal(*series, p, inicio)
+        self._contexto = tuple(serie[-2:] for serie in series)
+        return regra_compra[k:], regra_venda[k:]
+
+    def bloco(self, close: np.ndarray) -> list:
+        """Process the next block of closes; returns the trades closed in it (global candle indices)."""
+        close = np.asarray(close, dtype=float)
+        if not len(close):
+            return []
+        regra_compra, regra_venda = self._regras(close)
+        trades, inicio = [], 0
+        if self._aberta is not None:
+            # Posição vinda do bloco anterior: sai no primeiro toque do SL/TP ou na primeira VENDA
+            entrada, preco = self._aberta
+            saidas = np.flatnonzero((close <= preco * (1 - self.stop_loss)) | (close >= preco * (1 + self.take_profit))
+                                    | (regra_venda != 0))
+            if saidas.size:
+                j = int(saidas[0])
+                motivo = bt._motivo(preco, close[j], self.stop_loss, self.take_profit)
+                trades.append((entrada, self.n + j, preco, close[j], motivo))
+                self._aberta = None
+                inicio = j + 1 if motivo == 'VENDA' else j
+        if self._aberta is None:
+            novos, aberta = bt._simular_estrategia(close[inicio:], regra_compra[inicio:], regra_venda[inicio:],
+                                                   self.stop_loss, self.take_profit)
+            desvio = self.n + inicio
+            trades.extend((entrada + desvio, saida + desvio, preco_entrada, preco_saida, motivo)
+                          for entrada, saida, preco_entrada, preco_saida, motivo in novos)
+            if aberta is not None:
+                self._aberta = (desvio + aberta, close[inicio + aberta])
+        self.n += len(close)
+        self._ultimo_close = close[-1]
+        self.trades.extend(trades)
+        return trades
+
+    def terminar(self, fechar_no_fim: bool = False) -> list:
+        """All trades; with ``fechar_no_fim`` an open position is closed on the last candle ('FIM')."""
+        if fechar_no_fim and self._aberta is not None and self._aberta[0] < self.n - 1:
+            entrada, preco = self._aberta
+            self.trades.append((entrada, self.n - 1, preco, self._ultimo_close, 'FIM'))
+            self._aberta = None
+        return self.trades
+
+
+def backtest_em_blocos(blocos, parametros: bt.ParametrosEstrategia | None = None,
+                       stop_loss: float = bt.STOP_LOSS, take_profit: float = bt.TAKE_PROFIT,
+                       fechar_no_fim: bool = False) -> list:
+    """Trades of the live rules over an iterable of close blocks; same tuples as simular_estrategia."""
+    estado = BacktestEmBlocos(parametros, stop_loss, take_profit)
+    for close in blocos:
+        estado.bloco(close)
+    return estado.terminar(fechar_no_fim)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Backtest das regras do bot por blocos (dados maiores que a RAM)')
+    parser.add_argument('origem', help='Ficheiro CSV (coluna close), ficheiro .npy de closes ou diretório de '
+                                       'historico.py')
+    parser.add_argument('--bloco', type=int, default=BLOCO, help='Velas por bloco')
+    parser.add_argument('--simbolo', default='BTCEUR', help='Par a ler do arquivo histórico')
+    parser.add_argument('--timeframe', default='5m', help='Intervalo das velas a ler do arquivo histórico')
+    parser.add_argument('--inicio', help="Primeira vela a ler do arquivo (ex.: '2024-01-01')")
+    parser.add_argument('--fim', help="Fim (exclusivo) das velas a ler do arquivo")
+    parser.add_argument('--continuacao', action='store_true', help='Ativa os sinais de continuação (CONTINUACAO)')
+    parser.add_argument('--margem-venda', type=float, default=bt.ParametrosEstrategia.margem_venda_ema,
+                        help='Margem da venda antecipada na EMA (MARGEM_PROXIMIDADE_VENDA_EMA)')
+    parser.add_argument('--stop-loss', type=float, default=bt.STOP_LOSS, help='Percentagem de stop-loss')
+    parser.add_argument('--take-profit', type=float, default=bt.TAKE_PROFIT, help='Percentagem de take-profit')
+    parser.add_argument('--quantidade', type=float, default=bt.QUANTITY, help='Quantidade por trade')
+    parser.add_argument('--taxa', type=float, default=bt.TAX, help='Taxa fixa por trade')
+    args = parser.parse_args()
+
+    parametros = replace(bt.parametros_fatima(), continuacao=args.continuacao, margem_venda_ema=args.margem_venda)
+    estado = BacktestEmBlocos(parametros, args.stop_loss, args.take_profit)
+    for close in ler_blocos(args.origem, args.bloco, args.simbolo, args.timeframe, args.inicio, args.fim):
+        estado.bloco(close)
+    trades = estado.terminar()
+    for entrada, saida, preco_entrada, preco_saida, motivo in trades:
+        print(f"{entrada} -> {saida}: {preco_entrada} -> {preco_saida} ({motivo})")
+    resumo = bt.resumo_trades(trades, args.quantidade, args.taxa)
+    print(f"{estado.n} velas | PnL: {resumo['pnl']:.2f} | Trades: {resumo['trades']} | "
+          f"Win rate: {resumo['win_rate']:.0%} | Max drawdown: {resumo['max_drawdown']:.2f}")
+
+
+if __name__ == '__main__':
+    main()
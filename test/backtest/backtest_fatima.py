@@ -1,34 +1,100 @@
+import os
+import sys
+from dataclasses import replace
+
+import numpy as np
 import pandas as pd
 import argparse
 
+_RAIZ = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if _RAIZ not in sys.path:
+    sys.path.insert(0, _RAIZ)
+
+from estrategia import (COMPRA, VENDA, ParametrosEstrategia, avaliar_sinal, proximo_indice,  # noqa: E402
+                        regras_sinal, serie_sinais)
+from historico import ArquivoVelas  # noqa: E402
+
 EMA_FAST = 9
 EMA_SLOW = 21
 RSI_PERIOD = 14
 RSI_OVERBOUGHT = 70
 RSI_OVERSOLD = 30
+STOP_LOSS = 0.02      # Igual a PERCENTAGEM_STOP_LOSS em fatima.py
+TAKE_PROFIT = 0.006   # Igual a PERCENTAGEM_TAKE_PROFIT em fatima.py
+QUANTITY = 0.0012     # Igual a QUANTIDADE em fatima.py
+TAX = 0.08            # Taxa fixa por trade, igual a TAX em fatima.py
+
+NOMES_SINAIS = {COMPRA: 'COMPRA', VENDA: 'VENDA'}
 
 
-def load_data(file_path: str) -> pd.DataFrame:
-    """Load CSV data for backtesting."""
+def load_data(file_path: str, simbolo: str = 'BTCEUR', timeframe: str = '5m', inicio=None, fim=None) -> pd.DataFrame:
+    """Load CSV data for backtesting, or ``simbolo``/``timeframe`` candles from a historico.py archive directory."""
+    if os.path.isdir(file_path):
+        df = ArquivoVelas(file_path).dataframe(simbolo, timeframe, inicio, fim)
+        if df.empty:
+            raise ValueError(f"Sem velas de {simbolo} {timeframe} no arquivo {file_path}.")
+        return df
     df = pd.read_csv(file_path)
     if 'close' not in df.columns:
         raise ValueError("O ficheiro deve conter a coluna 'close'.")
     return df
 
 
-def add_indicators(df: pd.DataFrame) -> pd.DataFrame:
-    """Calculate EMA and RSI indicators."""
-    df = df.copy()
-    df['EMA_FAST'] = df['close'].ewm(span=EMA_FAST, adjust=False).mean()
-    df['EMA_SLOW'] = df['close'].ewm(span=EMA_SLOW, adjust=False).mean()
+def ema(close: pd.Series, span: int) -> pd.Series:
+    """Exponential moving average (adjust=False), as in fatima.py."""
+    return close.ewm(span=span, adjust=False).mean()
 
-    delta = df['close'].diff()
+
+def rsi(close: pd.Series, period: int) -> pd.Series:
+    """RSI from exponentially averaged gains and losses."""
+    delta = close.diff()
     gains = delta.where(delta > 0, 0)
     losses = -delta.where(delta < 0, 0)
-    avg_gains = gains.ewm(span=RSI_PERIOD, adjust=False).mean()
-    avg_losses = losses.ewm(span=RSI_PERIOD, adjust=False).mean()
+    avg_gains = gains.ewm(span=period, adjust=False).mean()
+    avg_losses = losses.ewm(span=period, adjust=False).mean()
     rs = avg_gains / avg_losses
-    df['RSI'] = 100 - (100 / (1 + rs))
+    return 100 - (100 / (1 + rs))
+
+
+def ema_continua(close: np.ndarray, span: int, estado: float | None = None) -> tuple:
+    """EMA of a block of closes, continuing from ``estado`` (the previous block's last EMA value).
+
+    Returns (values, state). Chained over consecutive blocks it gives exactly
+    the values of ema() over the whole series.
+    """
+    close = np.asarray(close, dtype=float)
+    if estado is not None:
+        close = np.concatenate(([estado], close))
+    valores = ema(pd.Series(close), span).to_numpy()
+    if estado is not None:
+        valores = valores[1:]
+    return valores, (float(valores[-1]) if len(valores) else estado)
+
+
+def rsi_continuo(close: np.ndarray, period: int, estado: tuple | None = None) -> tuple:
+    """RSI of a block of closes, continuing from ``estado`` = (last close, avg gain, avg loss).
+
+    Returns (values, state). Chained over consecutive blocks it gives exactly
+    the values of rsi() over the whole series.
+    """
+    close = np.asarray(close, dtype=float)
+    ultimo, media_ganhos, media_perdas = estado if estado is not None else (np.nan, None, None)
+    delta = np.diff(close, prepend=ultimo)
+    ganhos, media_ganhos = ema_continua(np.where(delta > 0, delta, 0.0), period, media_ganhos)
+    perdas, media_perdas = ema_continua(np.where(delta < 0, -delta, 0.0), period, media_perdas)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        valores = 100 - (100 / (1 + ganhos / perdas))
+    ultimo = float(close[-1]) if len(close) else ultimo
+    return valores, (ultimo, media_ganhos, media_perdas)
+
+
+def add_indicators(df: pd.DataFrame, ema_fast: int = EMA_FAST, ema_slow: int = EMA_SLOW,
+                   rsi_period: int = RSI_PERIOD) -> pd.DataFrame:
+    """Calculate EMA and RSI indicators."""
+    df = df.copy()
+    df['EMA_FAST'] = ema(df['close'], ema_fast)
+    df['EMA_SLOW'] = ema(df['close'], ema_slow)
+    df['RSI'] = rsi(df['close'], rsi_period)
     return df
 
 
@@ -54,8 +120,41 @@ def sinal_rsi(df: pd.DataFrame, i: int) -> str | None:
     return None
 
 
-def backtest(df: pd.DataFrame, analysis: str = 'both') -> list:
-    """Return list of operations with (index, type, price)."""
+def parametros_fatima(ema_fast: int = EMA_FAST, ema_slow: int = EMA_SLOW, rsi_period: int = RSI_PERIOD,
+                      overbought: float = RSI_OVERBOUGHT, oversold: float = RSI_OVERSOLD,
+                      base: ParametrosEstrategia = ParametrosEstrategia()) -> ParametrosEstrategia:
+    """Live strategy parameters (estrategia.ParametrosEstrategia) for the backtest settings."""
+    return replace(base, media_rapida=ema_fast, media_lenta=ema_slow, periodo_rsi=rsi_period,
+                   rsi_sobrecompra=overbought, rsi_sobrevenda=oversold)
+
+
+def regras_fatima(df: pd.DataFrame, parametros: ParametrosEstrategia | None = None) -> tuple:
+    """Per-candle rule codes of the live bot (estrategia.regras_sinal) over the indicator columns."""
+    return regras_sinal(df['EMA_FAST'].to_numpy(dtype=float), df['EMA_SLOW'].to_numpy(dtype=float),
+                        df['RSI'].to_numpy(dtype=float), parametros or parametros_fatima())
+
+
+def _backtest_fatima(df: pd.DataFrame, parametros: ParametrosEstrategia | None = None) -> list:
+    # Referência: estrategia.avaliar_sinal (a função do bot) vela a vela, com a posição a inverter em cada sinal
+    dados = pd.DataFrame({'EMA9': df['EMA_FAST'], 'EMA21': df['EMA_SLOW'], 'RSI': df['RSI']})
+    parametros = parametros or parametros_fatima()
+    operations, aberta = [], False
+    for i in range(len(df)):
+        signal, _ = avaliar_sinal(dados.iloc[:i + 1], aberta, parametros)
+        if signal:
+            aberta = signal == 'COMPRA'
+            operations.append((i, signal, df['close'].iloc[i]))
+    return operations
+
+
+def backtest(df: pd.DataFrame, analysis: str = 'both', parametros: ParametrosEstrategia | None = None) -> list:
+    """Return list of operations with (index, type, price).
+
+    ``analysis='fatima'`` replays the live bot's rules (estrategia.avaliar_sinal),
+    position included; 'ema', 'rsi' and 'both' are the simple crossover/turn rules.
+    """
+    if analysis == 'fatima':
+        return _backtest_fatima(df, parametros)
     operations = []
     for i in range(len(df)):
         signal = None
@@ -68,19 +167,241 @@ def backtest(df: pd.DataFrame, analysis: str = 'both') -> list:
     return operations
 
 
+def sinais_ema(fast: np.ndarray, slow: np.ndarray) -> np.ndarray:
+    """int8 array with the EMA crossover signals (COMPRA 1, VENDA -1, else 0)."""
+    sinais = np.zeros(len(fast), dtype=np.int8)
+    if len(fast) > 1:
+        sinais[1:][(fast[1:] > slow[1:]) & (fast[:-1] <= slow[:-1])] = COMPRA
+        sinais[1:][(fast[1:] < slow[1:]) & (fast[:-1] >= slow[:-1])] = VENDA
+    return sinais
+
+
+def sinais_rsi(rsi: np.ndarray, overbought: float = RSI_OVERBOUGHT, oversold: float = RSI_OVERSOLD) -> np.ndarray:
+    """int8 array with the RSI turn signals (COMPRA 1, VENDA -1, else 0)."""
+    sinais = np.zeros(len(rsi), dtype=np.int8)
+    if len(rsi) > 1:
+        rsi_atual, rsi_anterior = rsi[1:], rsi[:-1]
+        sinais[1:][(rsi_anterior < oversold) & (rsi_atual > rsi_anterior)] = COMPRA
+        sinais[1:][(rsi_anterior > overbought) & (rsi_atual < rsi_anterior)] = VENDA
+    return sinais
+
+
+def combinar_sinais(por_ema: np.ndarray | None, por_rsi: np.ndarray | None) -> np.ndarray:
+    """Combine EMA and RSI signals; the EMA signal takes priority, as in backtest()."""
+    if por_ema is None:
+        return por_rsi
+    if por_rsi is None:
+        return por_ema
+    return np.where(por_ema != 0, por_ema, por_rsi).astype(np.int8)
+
+
+def sinais_vetorizados(df: pd.DataFrame, analysis: str = 'both',
+                       overbought: float = RSI_OVERBOUGHT, oversold: float = RSI_OVERSOLD,
+                       parametros: ParametrosEstrategia | None = None) -> np.ndarray:
+    """Return an int8 array with COMPRA (1), VENDA (-1) or 0 for every row.
+
+    Same rules as sinal_ema/sinal_rsi, evaluated as whole-array masks. With
+    ``analysis='fatima'`` it is the live bot's signal series (shared kernel in
+    estrategia.py), where each signal depends on the position opened or closed
+    by the previous one; ``parametros`` overrides the strategy parameters.
+    """
+    if analysis == 'fatima':
+        parametros = parametros or parametros_fatima(overbought=overbought, oversold=oversold)
+        return serie_sinais(*regras_fatima(df, parametros))[0]
+    por_ema = por_rsi = None
+    if analysis in ('ema', 'both'):
+        por_ema = sinais_ema(df['EMA_FAST'].to_numpy(dtype=float), df['EMA_SLOW'].to_numpy(dtype=float))
+    if analysis in ('rsi', 'both'):
+        por_rsi = sinais_rsi(df['RSI'].to_numpy(dtype=float), overbought, oversold)
+    return combinar_sinais(por_ema, por_rsi)
+
+
+def backtest_vetorizado(df: pd.DataFrame, analysis: str = 'both',
+                        parametros: ParametrosEstrategia | None = None) -> list:
+    """Vectorized equivalent of backtest(): same list of (index, type, price)."""
+    sinais = sinais_vetorizados(df, analysis, parametros=parametros)
+    close = df['close'].to_numpy()
+    indices = np.flatnonzero(sinais)
+    return [(int(i), NOMES_SINAIS[int(sinais[i])], close[i]) for i in indices]
+
+
+def indices_proximos(sinais: np.ndarray) -> tuple:
+    """Next COMPRA and next VENDA index arrays, reusable across SL/TP settings."""
+    return proximo_indice(sinais == COMPRA), proximo_indice(sinais == VENDA)
+
+
+def _saidas(close: np.ndarray, entradas: np.ndarray, limites: np.ndarray,
+            stop_loss: float, take_profit: float) -> np.ndarray:
+    # Para cada entrada i, a primeira vela j em (i, limites[i]] que toca o stop-loss ou o take-profit;
+    # sem toque, a própria vela limite (próxima VENDA), ou -1 se a posição ficar aberta até ao fim.
+    # As entradas são resolvidas em bloco, numa janela que duplica de tamanho para as pendentes.
+    n = len(close)
+    saidas = np.full(len(entradas), -1, dtype=np.int64)
+    baixo = close[entradas] * (1 - stop_loss)
+    alto = close[entradas] * (1 + take_profit)
+    pendentes = np.arange(len(entradas))
+    inicio, largura = 1, 32
+    while pendentes.size:
+        passos = np.arange(inicio, inicio + largura)
+        indices = entradas[pendentes, None] + passos[None, :]
+        fim = np.minimum(limites[pendentes], n - 1)
+        validos = indices <= fim[:, None]
+        precos = close[np.minimum(indices, n - 1)]
+        toques = validos & ((precos <= baixo[pendentes, None]) | (precos >= alto[pendentes, None]))
+        com_toque = toques.any(axis=1)
+        saidas[pendentes[com_toque]] = entradas[pendentes[com_toque]] + passos[toques[com_toque].argmax(axis=1)]
+        esgotadas = ~com_toque & ~validos[:, -1]
+        vendas = limites[pendentes[esgotadas]]
+        saidas[pendentes[esgotadas]] = np.where(vendas < n, vendas, -1)
+        pendentes = pendentes[~com_toque & ~esgotadas]
+        inicio, largura = inicio + largura, largura * 2
+    return saidas
+
+
+def simular_posicoes(close: np.ndarray, sinais: np.ndarray,
+                     stop_loss: float = STOP_LOSS, take_profit: float = TAKE_PROFIT,
+                     proximos: tuple | None = None) -> list:
+    """Run the position state machine over a signal array.
+
+    Enters on COMPRA while flat and exits on the first VENDA, stop-loss or
+    take-profit (checked on the candle close, before the signal, as in the
+    live loop). The exit of every possible entry is resolved with 2-D array
+    scans; the Python loop then only jumps from each exit to the next
+    COMPRA, so its cost is proportional to the number of trades. Returns a
+    list of (entry_index, exit_index, entry_price, exit_price, reason); an
+    open position at the end is left out.
+    """
+    close = np.asarray(close, dtype=float)
+    n = len(close)
+    proxima_compra, proxima_venda = proximos if proximos is not None else indices_proximos(sinais)
+    entradas = np.flatnonzero(sinais == COMPRA)
+    if n == 0 or entradas.size == 0:
+        return []
+    limites = np.append(proxima_venda, n)[entradas + 1]
+    saidas = _saidas(close, entradas, limites, stop_loss, take_profit)
+    posicao = np.full(n, -1, dtype=np.int64)
+    posicao[entradas] = np.arange(len(entradas))
+    proxima_compra = np.append(proxima_compra, n).tolist()
+    posicao, saidas = posicao.tolist(), saidas.tolist()
+
+    trades = []
+    i = proxima_compra[0]
+    while i < n:
+        saida = saidas[posicao[i]]
+        if saida < 0:
+            break
+        motivo = _motivo(close[i], close[saida], stop_loss, take_profit)
+        trades.append((i, saida, close[i], close[saida], motivo))
+        i = proxima_compra[saida + 1]
+    return trades
+
+
+def _motivo(preco_entrada: float, preco_saida: float, stop_loss: float, take_profit: float) -> str:
+    if preco_saida <= preco_entrada * (1 - stop_loss):
+        return 'STOP_LOSS'
+    if preco_saida >= preco_entrada * (1 + take_profit):
+        return 'TAKE_PROFIT'
+    return 'VENDA'
+
+
+def simular_estrategia(close: np.ndarray, regra_compra: np.ndarray, regra_venda: np.ndarray,
+                       stop_loss: float = STOP_LOSS, take_profit: float = TAKE_PROFIT,
+                       fechar_no_fim: bool = False) -> list:
+    """Run the live bot's loop over the rule codes of estrategia.regras_sinal.
+
+    On every candle the stop-loss/take-profit is checked first and then the
+    signal, with the position as it stands after that check. So an SL/TP exit
+    lets a COMPRA fire on the same candle, and any VENDA closes the position.
+    As in simular_posicoes, the exits of all candidate entries are resolved
+    with array scans and the Python loop only jumps from trade to trade.
+    Same trade tuples as simular_posicoes. A position still open at the end
+    is left out, or closed on the last candle (reason 'FIM') with
+    ``fechar_no_fim``.
+    """
+    return _simular_estrategia(close, regra_compra, regra_venda, stop_loss, take_profit, fechar_no_fim)[0]
+
+
+def _simular_estrategia(close: np.ndarray, regra_compra: np.ndarray, regra_venda: np.ndarray,
+                        stop_loss: float, take_profit: float, fechar_no_fim: bool = False) -> tuple:
+    # Como simular_estrategia; devolve também o índice da entrada que ficou aberta no fim (ou None)
+    close = np.asarray(close, dtype=float)
+    n = len(close)
+    entradas = np.flatnonzero(regra_compra)
+    if n == 0 or entradas.size == 0:
+        return [], None
+    proxima_venda = np.append(proximo_indice(np.asarray(regra_venda) != 0), n)
+    saidas = _saidas(close, entradas, proxima_venda[entradas + 1], stop_loss, take_profit)
+    posicao = np.full(n, -1, dtype=np.int64)
+    posicao[entradas] = np.arange(len(entradas))
+    proxima_compra = np.append(proximo_indice(np.asarray(regra_compra) != 0), n).tolist()
+    posicao, saidas = posicao.tolist(), saidas.tolist()
+
+    trades, aberta = [], None
+    i = proxima_compra[0]
+    while i < n:
+        saida = saidas[posicao[i]]
+        if saida < 0:
+            if fechar_no_fim and i < n - 1:
+                trades.append((i, n - 1, close[i], close[n - 1], 'FIM'))
+            else:
+                aberta = i
+            break
+        motivo = _motivo(close[i], close[saida], stop_loss, take_profit)
+        trades.append((i, saida, close[i], close[saida], motivo))
+        i = proxima_compra[saida + 1 if motivo == 'VENDA' else saida]
+    return trades, aberta
+
+
+def resumo_trades(trades: list, quantity: float = QUANTITY, tax: float = TAX) -> dict:
+    """PnL net of the fixed per-trade TAX, trade count, win rate and max drawdown."""
+    if not trades:
+        return {'pnl': 0.0, 'trades': 0, 'win_rate': 0.0, 'max_drawdown': 0.0}
+    precos = np.array([(t[2], t[3]) for t in trades], dtype=float)
+    pnl = (precos[:, 1] - precos[:, 0]) * quantity - tax
+    equity = np.concatenate(([0.0], np.cumsum(pnl)))
+    drawdown = np.maximum.accumulate(equity) - equity
+    return {'pnl': float(equity[-1]), 'trades': len(trades),
+            'win_rate': float((pnl > 0).mean()), 'max_drawdown': float(drawdown.max())}
+
+
 def main() -> None:
     parser = argparse.ArgumentParser(description='Backtest simples com EMA e RSI')
-    parser.add_argument('ficheiro', help='Ficheiro CSV com dados (deve ter coluna close)')
-    parser.add_argument('--analise', choices=['ema', 'rsi', 'both'], default='both', help='Tipo de análise')
+    parser.add_argument('ficheiro', help='Ficheiro CSV com dados (deve ter coluna close) ou diretório de historico.py')
+    parser.add_argument('--simbolo', default='BTCEUR', help='Par a ler do arquivo histórico')
+    parser.add_argument('--timeframe', default='5m', help='Intervalo das velas a ler do arquivo histórico')
+    parser.add_argument('--inicio', help="Primeira vela a ler do arquivo (ex.: '2024-01-01')")
+    parser.add_argument('--fim', help="Fim (exclusivo) das velas a ler do arquivo")
+    parser.add_argument('--analise', choices=['fatima', 'ema', 'rsi', 'both'], default='fatima',
+                        help="Tipo de análise ('fatima': as regras do bot, com a posição)")
+    parser.add_argument('--continuacao', action='store_true', help='Ativa os sinais de continuação (CONTINUACAO)')
+    parser.add_argument('--margem-venda', type=float, default=ParametrosEstrategia.margem_venda_ema,
+                        help='Margem da venda antecipada na EMA (MARGEM_PROXIMIDADE_VENDA_EMA)')
+    parser.add_argument('--iterativo', action='store_true', help='Usa o backtest linha a linha (referência)')
+    parser.add_argument('--posicoes', action='store_true', help='Simula posições com stop-loss e take-profit')
+    parser.add_argument('--stop-loss', type=float, default=STOP_LOSS, help='Percentagem de stop-loss (ex.: 0.02)')
+    parser.add_argument('--take-profit', type=float, default=TAKE_PROFIT, help='Percentagem de take-profit')
     args = parser.parse_args()
 
-    df = load_data(args.ficheiro)
+    df = load_data(args.ficheiro, args.simbolo, args.timeframe, args.inicio, args.fim)
     df = add_indicators(df)
-    ops = backtest(df, args.analise)
+    parametros = replace(parametros_fatima(), continuacao=args.continuacao, margem_venda_ema=args.margem_venda)
+    if args.iterativo:
+        ops = backtest(df, args.analise, parametros)
+    else:
+        ops = backtest_vetorizado(df, args.analise, parametros)
 
     for idx, typ, price in ops:
         print(f"{idx}: {typ} @ {price}")
 
+    if args.posicoes:
+        close = df['close'].to_numpy()
+        if args.analise == 'fatima':
+            trades = simular_estrategia(close, *regras_fatima(df, parametros), args.stop_loss, args.take_profit)
+        else:
+            trades = simular_posicoes(close, sinais_vetorizados(df, args.analise), args.stop_loss, args.take_profit)
+        for entrada, saida, preco_entrada, preco_saida, motivo in trades:
+            print(f"{entrada} -> {saida}: {preco_entrada} -> {preco_saida} ({motivo})")
+
 
 if __name__ == '__main__':
     main()
\ No newline at end of file
@@ -0,0 +1,151 @@
+import argparse
+import itertools
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+import backtest_fatima as bt
+
+# Séries pré-calculadas, partilhadas por todas as combinações de cada processo
+_close = None
+_emas = {}
+_rsis = {}
+
+
+def parse_grid(texto: str, tipo=float) -> list:
+    """Parse '5,9,12' into [5, 9, 12] and '5:15:2' into the inclusive range [5, 7, ..., 15]."""
+    if ':' in texto:
+        inicio, fim, passo = (tipo(x) for x in texto.split(':'))
+        valores = np.arange(inicio, fim + passo / 2, passo)
+        return [tipo(round(v, 10)) for v in valores]
+    return [tipo(x) for x in texto.split(',')]
+
+
+def precalcular(close: np.ndarray, spans, periodos) -> tuple:
+    """Compute each distinct EMA span and RSI period once."""
+    serie = pd.Series(close, dtype=float)
+    emas = {span: bt.ema(serie, span).to_numpy() for span in sorted(set(spans))}
+    rsis = {periodo: bt.rsi(serie, periodo).to_numpy() for periodo in sorted(set(periodos))}
+    return emas, rsis
+
+
+def _iniciar_worker(close: np.ndarray, emas: dict, rsis: dict) -> None:
+    global _close, _emas, _rsis
+    _close, _emas, _rsis = close, emas, rsis
+
+
+def _avaliar_grupo(tarefa: tuple) -> list:
+    # Uma tarefa = um trio (EMA rápida, EMA lenta, período RSI) com todos os limites RSI e SL/TP
+    fast, slow, periodo, limites_rsi, stops, analysis, quantity, tax, base = tarefa
+    por_ema = bt.sinais_ema(_emas[fast], _emas[slow]) if analysis in ('ema', 'both') else None
+    resultados = []
+    for overbought, oversold in limites_rsi:
+        if analysis == 'fatima':
+            # Regras do bot: o sinal depende da posição, que depende do SL/TP; simulado por combinação
+            parametros = bt.parametros_fatima(fast, slow, periodo, overbought, oversold, base)
+            regras = bt.regras_sinal(_emas[fast], _emas[slow], _rsis[periodo], parametros)
+        else:
+            por_rsi = bt.sinais_rsi(_rsis[periodo], overbought, oversold) if analysis in ('rsi', 'both') else None
+            sinais = bt.combinar_sinais(por_ema, por_rsi)
+            proximos = bt.indices_proximos(sinais)
+        for stop_loss, take_profit in stops:
+            if analysis == 'fatima':
+                trades = bt.simular_estrategia(_close, *regras, stop_loss, take_profit)
+            else:
+                trades = bt.simular_posicoes(_close, sinais, stop_loss, take_profit, proximos)
+            resultados.append({'ema_fast': fast, 'ema_slow': slow, 'rsi_period': periodo,
+                               'rsi_overbought': overbought, 'rsi_oversold': oversold,
+                               'stop_loss': stop_loss, 'take_profit': take_profit,
+                               **bt.resumo_trades(trades, quantity, tax)})
+    return resultados
+
+
+def sweep(close: np.ndarray, grelha: dict, analysis: str = 'both', processos: int | None = None,
+          quantity: float = bt.QUANTITY, tax: float = bt.TAX,
+          base: bt.ParametrosEstrategia = bt.ParametrosEstrategia()) -> pd.DataFrame:
+    """Backtest every parameter combination and return them ranked by net PnL.
+
+    ``grelha`` maps 'ema_fast', 'ema_slow', 'rsi_period', 'rsi_overbought',
+    'rsi_oversold', 'stop_loss' and 'take_profit' to lists of values. Runs on
+    a process pool (``processos=1`` runs in-process). With ``analysis='fatima'``
+    the live bot's rules are used, with the remaining parameters (early-exit
+    margin, continuation) taken from ``base``.
+    """
+    close = np.asarray(close, dtype=float)
+    # Parâmetros que não entram na análise escolhida não multiplicam as combinações
+    if analysis == 'ema':
+        grelha = {**grelha, 'rsi_period': grelha['rsi_period'][:1],
+                  'rsi_overbought': grelha['rsi_overbought'][:1], 'rsi_oversold': grelha['rsi_oversold'][:1]}
+    elif analysis == 'rsi':
+        grelha = {**grelha, 'ema_fast': grelha['ema_fast'][:1], 'ema_slow': grelha['ema_slow'][:1]}
+
+    emas, rsis = precalcular(close, list(grelha['ema_fast']) + list(grelha['ema_slow']), grelha['rsi_period'])
+    limites_rsi = list(itertools.product(grelha['rsi_overbought'], grelha['rsi_oversold']))
+    stops = list(itertools.product(grelha['stop_loss'], grelha['take_profit']))
+    tarefas = [(fast, slow, periodo, limites_rsi, stops, analysis, quantity, tax, base)
+               for fast, slow, periodo in itertools.product(grelha['ema_fast'], grelha['ema_slow'],
+                                                            grelha['rsi_period'])
+               if analysis == 'rsi' or fast < slow]
+
+    resultados = []
+    if processos == 1:
+        _iniciar_worker(close, emas, rsis)
+        for tarefa in tarefas:
+            resultados.extend(_avaliar_grupo(tarefa))
+    else:
+        processos = processos or os.cpu_count()
+        with ProcessPoolExecutor(max_workers=processos, initializer=_iniciar_worker,
+                                 initargs=(close, emas, rsis)) as pool:
+            chunksize = max(1, len(tarefas) // (processos * 4))
+            for grupo in pool.map(_avaliar_grupo, tarefas, chunksize=chunksize):
+                resultados.extend(grupo)
+
+    if not resultados:
+        return pd.DataFrame()
+    tabela = pd.DataFrame(resultados)
+    return tabela.sort_values(['pnl', 'max_drawdown'], ascending=[False, True]).reset_index(drop=True)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Otimização paralela dos parâmetros EMA/RSI/SL/TP')
+    parser.add_argument('ficheiro', help='Ficheiro CSV com dados (deve ter coluna close)')
+    parser.add_argument('--analise', choices=['fatima', 'ema', 'rsi', 'both'], default='fatima',
+                        help="Tipo de análise ('fatima': as regras do bot, com a posição)")
+    parser.add_argument('--continuacao', action='store_true', help='Ativa os sinais de continuação (CONTINUACAO)')
+    parser.add_argument('--ema-rapida', default=str(bt.EMA_FAST), help="Lista '5,9' ou intervalo '5:15:2'")
+    parser.add_argument('--ema-lenta', default=str(bt.EMA_SLOW), help="Lista ou intervalo")
+    parser.add_argument('--rsi', default=str(bt.RSI_PERIOD), help="Períodos do RSI (lista ou intervalo)")
+    parser.add_argument('--sobrecompra', default=str(bt.RSI_OVERBOUGHT), help="Níveis de sobrecompra do RSI")
+    parser.add_argument('--sobrevenda', default=str(bt.RSI_OVERSOLD), help="Níveis de sobrevenda do RSI")
+    parser.add_argument('--stop-loss', default=str(bt.STOP_LOSS), help="Percentagens de stop-loss")
+    parser.add_argument('--take-profit', default=str(bt.TAKE_PROFIT), help="Percentagens de take-profit")
+    parser.add_argument('--quantidade', type=float, default=bt.QUANTITY, help='Quantidade por trade')
+    parser.add_argument('--taxa', type=float, default=bt.TAX, help='Taxa fixa por trade')
+    parser.add_argument('--processos', type=int, default=None, help='Número de processos (padrão: CPUs)')
+    parser.add_argument('--top', type=int, default=20, help='Número de resultados a mostrar')
+    parser.add_argument('--saida', help='Grava a tabela completa neste ficheiro CSV')
+    args = parser.parse_args()
+
+    grelha = {
+        'ema_fast': parse_grid(args.ema_rapida, int),
+        'ema_slow': parse_grid(args.ema_lenta, int),
+        'rsi_period': parse_grid(args.rsi, int),
+        'rsi_overbought': parse_grid(args.sobrecompra),
+        'rsi_oversold': parse_grid(args.sobrevenda),
+        'stop_loss': parse_grid(args.stop_loss),
+        'take_profit': parse_grid(args.take_profit),
+    }
+    close = bt.load_data(args.ficheiro)['close'].to_numpy(dtype=float)
+    base = bt.ParametrosEstrategia(continuacao=args.continuacao)
+    tabela = sweep(close, grelha, args.analise, args.processos, args.quantidade, args.taxa, base)
+
+    print(tabela.head(args.top).to_string())
+    if args.saida:
+        tabela.to_csv(args.saida, index=False)
+        print(f"Resultados gravados em {args.saida} ({len(tabela)} combinações).")
+
+
+if __name__ == '__main__':
+    main()
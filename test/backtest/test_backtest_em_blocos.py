@@ -0,0 +1,80 @@
+import os
+import tempfile
+import tracemalloc
+import unittest
+
+import numpy as np
+import pandas as pd
+
+import backtest_fatima as bt
+from backtest_em_blocos import BacktestEmBlocos, backtest_em_blocos, ler_blocos
+
+
+def closes(n, semente=11):
+    rng = np.random.default_rng(semente)
+    return 90000 * np.exp(np.cumsum(rng.normal(0, 0.002, n)))
+
+
+def referencia(close, parametros, stop_loss, take_profit, fechar_no_fim=False):
+    # Backtest em memória sobre a série completa
+    df = bt.add_indicators(pd.DataFrame({'close': close}), parametros.media_rapida, parametros.media_lenta,
+                           parametros.periodo_rsi)
+    return bt.simular_estrategia(close, *bt.regras_fatima(df, parametros), stop_loss, take_profit, fechar_no_fim)
+
+
+def em_blocos(close, tamanho):
+    return [close[i:i + tamanho] for i in range(0, len(close), tamanho)]
+
+
+class TestBacktestEmBlocos(unittest.TestCase):
+    def test_trades_iguais_ao_backtest_em_memoria(self):
+        close = closes(12000)
+        for parametros, stop_loss, take_profit in [(bt.parametros_fatima(), 0.02, 0.006),
+                                                   (bt.parametros_fatima(5, 13, 9, 55, 45), 0.003, 0.002),
+                                                   (bt.parametros_fatima(5, 13, 9, 55, 45, bt.ParametrosEstrategia(
+                                                       continuacao=True)), 0.004, 0.004)]:
+            esperado = referencia(close, parametros, stop_loss, take_profit)
+            self.assertTrue(esperado)
+            for tamanho in (3, 250, 4096, len(close)):
+                with self.subTest(parametros=parametros, tamanho=tamanho):
+                    self.assertEqual(backtest_em_blocos(em_blocos(close, tamanho), parametros, stop_loss,
+                                                        take_profit), esperado)
+
+    def test_posicao_aberta_no_fim(self):
+        close = closes(12000)[:11720]  # Cortada logo depois de uma entrada
+        parametros = bt.parametros_fatima(5, 13, 9, 55, 45)
+        esperado = referencia(close, parametros, 0.5, 0.5, fechar_no_fim=True)
+        self.assertEqual(esperado[-1][4], 'FIM')
+        self.assertEqual(backtest_em_blocos(em_blocos(close, 128), parametros, 0.5, 0.5, fechar_no_fim=True),
+                         esperado)
+
+    def test_leitura_de_csv_e_npy(self):
+        close = closes(5000)
+        with tempfile.TemporaryDirectory() as pasta:
+            csv = os.path.join(pasta, "velas.csv")
+            pd.DataFrame({'time': np.arange(len(close)), 'close': close}).to_csv(csv, index=False)
+            npy = os.path.join(pasta, "close.npy")
+            np.save(npy, close)
+            por_csv = list(ler_blocos(csv, 700))
+            por_npy = list(ler_blocos(npy, 700))
+        self.assertEqual([len(b) for b in por_npy], [700] * 7 + [100])
+        np.testing.assert_array_equal(np.concatenate(por_npy), close)
+        np.testing.assert_allclose(np.concatenate(por_csv), close, rtol=1e-15)
+
+    def test_memoria_limitada_pelo_bloco(self):
+        close = closes(400_000)
+        blocos = (close[i:i + 10_000] for i in range(0, len(close), 10_000))
+        tracemalloc.start()
+        try:
+            estado = BacktestEmBlocos(bt.parametros_fatima(), 0.02, 0.006)
+            for bloco in blocos:
+                estado.bloco(bloco)
+            _, pico = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        self.assertEqual(estado.n, 400_000)
+        self.assertLess(pico, close.nbytes)  # A série completa (3.2 MB) nunca é copiada
+
+
+if __name__ == '__main__':
+    unittest.main()
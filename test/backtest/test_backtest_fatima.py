@@ -0,0 +1,120 @@
+import tempfile
+import unittest
+import numpy as np
+import pandas as pd
+
+import backtest_fatima as bt
+from historico import ArquivoVelas, klines_para_colunas, para_ms
+
+
+def dados_sinteticos(n, semente=3):
+    rng = np.random.default_rng(semente)
+    close = 90000 * np.exp(np.cumsum(rng.normal(0, 0.002, n)))
+    return bt.add_indicators(pd.DataFrame({'close': close}))
+
+
+def simular_posicoes_referencia(close, sinais, stop_loss, take_profit):
+    # Máquina de estados linha a linha, usada como referência
+    trades, entrada = [], None
+    for i, preco in enumerate(close):
+        if entrada is None:
+            if sinais[i] == bt.COMPRA:
+                entrada = i
+            continue
+        preco_entrada = close[entrada]
+        if preco <= preco_entrada * (1 - stop_loss):
+            motivo = 'STOP_LOSS'
+        elif preco >= preco_entrada * (1 + take_profit):
+            motivo = 'TAKE_PROFIT'
+        elif sinais[i] == bt.VENDA:
+            motivo = 'VENDA'
+        else:
+            continue
+        trades.append((entrada, i, preco_entrada, preco, motivo))
+        entrada = None
+    return trades
+
+
+def simular_estrategia_referencia(df, parametros, stop_loss, take_profit):
+    # Loop do bot vela a vela: SL/TP com o preço de fecho e depois estrategia.avaliar_sinal com a posição
+    dados = pd.DataFrame({'EMA9': df['EMA_FAST'], 'EMA21': df['EMA_SLOW'], 'RSI': df['RSI']})
+    close = df['close'].to_numpy()
+    trades, entrada = [], None
+    for i, preco in enumerate(close):
+        if entrada is not None:
+            preco_entrada = close[entrada]
+            motivo = ('STOP_LOSS' if preco <= preco_entrada * (1 - stop_loss) else
+                      'TAKE_PROFIT' if preco >= preco_entrada * (1 + take_profit) else None)
+            if motivo:
+                trades.append((entrada, i, preco_entrada, preco, motivo))
+                entrada = None
+        sinal, _ = bt.avaliar_sinal(dados.iloc[:i + 1], entrada is not None, parametros)
+        if sinal == 'COMPRA':
+            entrada = i
+        elif sinal == 'VENDA':
+            trades.append((entrada, i, close[entrada], preco, 'VENDA'))
+            entrada = None
+    return trades
+
+
+class TestBacktestVetorizado(unittest.TestCase):
+    def setUp(self):
+        self.df = dados_sinteticos(5000)
+
+    def test_mesmas_operacoes_que_o_loop(self):
+        for analise in ('ema', 'rsi', 'both'):
+            with self.subTest(analise=analise):
+                self.assertEqual(bt.backtest_vetorizado(self.df, analise), bt.backtest(self.df, analise))
+
+    def test_posicoes_iguais_a_referencia(self):
+        close = self.df['close'].to_numpy()
+        sinais = bt.sinais_vetorizados(self.df)
+        for stop_loss, take_profit in ((0.02, 0.006), (0.003, 0.003), (1.0, 10.0)):
+            with self.subTest(stop_loss=stop_loss, take_profit=take_profit):
+                trades = bt.simular_posicoes(close, sinais, stop_loss, take_profit)
+                self.assertEqual(trades, simular_posicoes_referencia(close, sinais, stop_loss, take_profit))
+                self.assertTrue(trades)
+
+    def test_serie_do_bot_igual_a_avaliar_sinal(self):
+        df = self.df
+        for parametros in (bt.parametros_fatima(),
+                           bt.replace(bt.parametros_fatima(), continuacao=True, margem_venda_ema=0.002)):
+            with self.subTest(parametros=parametros):
+                operacoes = bt.backtest_vetorizado(df, 'fatima', parametros)
+                self.assertEqual(operacoes, bt.backtest(df, 'fatima', parametros))
+                self.assertTrue(operacoes)
+
+    def test_estrategia_com_stops_igual_ao_loop_do_bot(self):
+        df = self.df.iloc[:1500]
+        close = df['close'].to_numpy()
+        parametros = bt.replace(bt.parametros_fatima(), continuacao=True)
+        for stop_loss, take_profit in ((0.02, 0.006), (0.002, 0.002)):
+            with self.subTest(stop_loss=stop_loss, take_profit=take_profit):
+                trades = bt.simular_estrategia(close, *bt.regras_fatima(df, parametros), stop_loss, take_profit)
+                self.assertEqual(trades, simular_estrategia_referencia(df, parametros, stop_loss, take_profit))
+                self.assertTrue(trades)
+
+    def test_dados_curtos(self):
+        df = dados_sinteticos(1)
+        self.assertEqual(bt.backtest_vetorizado(df), [])
+        self.assertEqual(bt.simular_posicoes(df['close'].to_numpy(), bt.sinais_vetorizados(df)), [])
+
+
+class TestCarregarDados(unittest.TestCase):
+    def test_le_o_arquivo_historico(self):
+        inicio = para_ms("2024-03-31 23:00")
+        klines = [[inicio + i * 300_000, "1", "2", "0.5", str(100 + i), "3", inicio + (i + 1) * 300_000 - 1]
+                  for i in range(24)]
+        with tempfile.TemporaryDirectory() as pasta:
+            arquivo = ArquivoVelas(pasta)
+            for mes, parte in (("2024-03", klines[:12]), ("2024-04", klines[12:])):
+                arquivo.gravar("BTCEUR", "5m", mes, klines_para_colunas(parte), [])
+            df = bt.load_data(pasta, "BTCEUR", "5m", inicio=inicio + 300_000)
+            with self.assertRaises(ValueError):
+                bt.load_data(pasta, "ETHEUR", "5m")
+        self.assertEqual(df['close'].tolist(), [float(100 + i) for i in range(1, 24)])
+        self.assertTrue(df['time'].is_monotonic_increasing)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,57 @@
+import unittest
+import numpy as np
+import pandas as pd
+
+import backtest_fatima as bt
+import otimizar_fatima as ot
+
+
+class TestOtimizar(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(11)
+        self.close = 90000 * np.exp(np.cumsum(rng.normal(0, 0.002, 3000)))
+        self.grelha = {
+            'ema_fast': [5, 9], 'ema_slow': [9, 21], 'rsi_period': [14],
+            'rsi_overbought': [70, 75], 'rsi_oversold': [30],
+            'stop_loss': [0.005, 0.02], 'take_profit': [0.006],
+        }
+
+    def test_parse_grid(self):
+        self.assertEqual(ot.parse_grid('5:11:2', int), [5, 7, 9, 11])
+        self.assertEqual(ot.parse_grid('0.01,0.02'), [0.01, 0.02])
+        self.assertEqual(ot.parse_grid('0.1:0.3:0.1'), [0.1, 0.2, 0.3])
+
+    def test_resultados_iguais_ao_backtest_individual(self):
+        tabela = ot.sweep(self.close, self.grelha, processos=1)
+        # EMA rápida >= lenta é ignorada: (5,9), (5,21), (9,21) x 2 sobrecompra x 2 stop-loss
+        self.assertEqual(len(tabela), 12)
+        self.assertTrue(tabela['pnl'].is_monotonic_decreasing)
+
+        linha = tabela[(tabela.ema_fast == 9) & (tabela.ema_slow == 21) & (tabela.rsi_overbought == 75)
+                       & (tabela.stop_loss == 0.02)].iloc[0]
+        df = bt.add_indicators(pd.DataFrame({'close': self.close}), 9, 21, 14)
+        trades = bt.simular_posicoes(self.close, bt.sinais_vetorizados(df, 'both', 75, 30), 0.02, 0.006)
+        esperado = bt.resumo_trades(trades)
+        self.assertAlmostEqual(linha['pnl'], esperado['pnl'])
+        self.assertEqual(linha['trades'], esperado['trades'])
+        self.assertAlmostEqual(linha['max_drawdown'], esperado['max_drawdown'])
+
+    def test_regras_do_bot(self):
+        tabela = ot.sweep(self.close, self.grelha, 'fatima', processos=1)
+        self.assertEqual(len(tabela), 12)
+        linha = tabela[(tabela.ema_fast == 5) & (tabela.ema_slow == 21) & (tabela.rsi_overbought == 70)
+                       & (tabela.stop_loss == 0.005)].iloc[0]
+        df = bt.add_indicators(pd.DataFrame({'close': self.close}), 5, 21, 14)
+        trades = bt.simular_estrategia(self.close, *bt.regras_fatima(df, bt.parametros_fatima(5, 21, 14)),
+                                       0.005, 0.006)
+        self.assertEqual(linha['trades'], bt.resumo_trades(trades)['trades'])
+        self.assertAlmostEqual(linha['pnl'], bt.resumo_trades(trades)['pnl'])
+
+    def test_pool_igual_a_execucao_local(self):
+        local = ot.sweep(self.close, self.grelha, processos=1)
+        paralelo = ot.sweep(self.close, self.grelha, processos=2)
+        pd.testing.assert_frame_equal(local, paralelo)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,62 @@
+import unittest
+import numpy as np
+import pandas as pd
+
+import backtest_fatima as bt
+import walk_forward as wf
+
+
+class TestIndicadoresContinuos(unittest.TestCase):
+    def test_blocos_iguais_a_serie_completa(self):
+        close = 90000 * np.exp(np.cumsum(np.random.default_rng(2).normal(0, 0.002, 5000)))
+        close[300:320] = close[299]  # Velas sem variação: RSI 0/0
+        emas, rsis = wf.precalcular_em_blocos(close, [9, 21], [14], bloco=777)
+        serie = pd.Series(close)
+        np.testing.assert_array_equal(emas[9], bt.ema(serie, 9).to_numpy())
+        np.testing.assert_array_equal(emas[21], bt.ema(serie, 21).to_numpy())
+        np.testing.assert_array_equal(rsis[14], bt.rsi(serie, 14).to_numpy())
+
+
+class TestWalkForward(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(8)
+        self.close = 90000 * np.exp(np.cumsum(rng.normal(0, 0.002, 6000)))
+        self.grelha = {
+            'ema_fast': [5, 9], 'ema_slow': [21], 'rsi_period': [9, 14],
+            'rsi_overbought': [70], 'rsi_oversold': [30, 40],
+            'stop_loss': [0.005, 0.02], 'take_profit': [0.006],
+        }
+        self.base = bt.ParametrosEstrategia(continuacao=True)
+
+    def test_tamanhos_e_folds(self):
+        self.assertEqual(wf.velas_por_periodo('1M', '5m'), 8640)
+        self.assertEqual(wf.velas_por_periodo('2000'), 2000)
+        self.assertEqual(wf.dividir_folds(2500, 1000, 600), [(0, 1000, 1600), (600, 1600, 2200), (1200, 2200, 2500)])
+
+    def test_teste_usa_os_parametros_escolhidos_no_treino(self):
+        folds, curva = wf.walk_forward(self.close, self.grelha, 2000, 1000, processos=1, base=self.base)
+        self.assertEqual(len(folds), 4)
+        self.assertEqual((curva.index[0], curva.index[-1]), (2000, 5999))
+        self.assertAlmostEqual(curva.iloc[-1], folds['pnl_teste'].sum())
+
+        # Fold 2 refeito à mão, com os indicadores da série completa
+        fold = folds.iloc[2]
+        spans = int(fold.ema_fast), int(fold.ema_slow), int(fold.rsi_period)
+        df = bt.add_indicators(pd.DataFrame({'close': self.close}), *spans)
+        parametros = bt.parametros_fatima(*spans, fold.rsi_overbought, fold.rsi_oversold, self.base)
+        compra, venda = bt.regras_fatima(df, parametros)
+        janela = slice(int(fold.teste_inicio), int(fold.teste_fim))
+        trades = bt.simular_estrategia(self.close[janela], compra[janela], venda[janela], fold.stop_loss,
+                                       fold.take_profit, fechar_no_fim=True)
+        self.assertEqual(fold.trades_teste, len(trades))
+        self.assertAlmostEqual(fold.pnl_teste, bt.resumo_trades(trades)['pnl'])
+
+    def test_pool_igual_a_execucao_local(self):
+        local = wf.walk_forward(self.close, self.grelha, 2000, 1000, processos=1)
+        paralelo = wf.walk_forward(self.close, self.grelha, 2000, 1000, processos=2)
+        pd.testing.assert_frame_equal(local[0], paralelo[0])
+        pd.testing.assert_series_equal(local[1], paralelo[1])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,217 @@
+"""Walk-forward analysis of the live strategy rules (estrategia.regras_sinal).
+
+The series is split into rolling folds. Each fold optimizes the parameter
+grid on its train window and trades the best combination on the test window
+that follows it. Test windows follow each other without overlap, so their
+trades stitch into one out-of-sample equity curve.
+
+Indicators are computed once, one block per test window, each block carrying
+the EMA/RSI state over from the block before it (ema_continua/rsi_continuo);
+the folds only slice those arrays. The values are those of a single pass over
+the whole series, so every window starts with warm indicators, as the live
+bot does, and no fold recomputes them. Folds run on a process pool.
+
+Uso:
+    python test/backtest/walk_forward.py velas.csv --treino 3M --teste 1M --ema-rapida 5:13:2 \\
+        --ema-lenta 21,34 --rsi 9,14 --saida curva.csv
+"""
+import argparse
+import itertools
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+import backtest_fatima as bt
+from otimizar_fatima import parse_grid
+from velas import intervalo_ms
+
+MS_POR_MES = 30 * 24 * 3600 * 1000
+
+# Séries partilhadas pelos folds de cada processo
+_close = None
+_emas = {}
+_rsis = {}
+
+
+def velas_por_periodo(texto: str, timeframe: str = '5m') -> int:
+    """Window size in candles: '8640' is taken as is, '3M' is 3 months (30 days) of ``timeframe`` candles."""
+    if texto.upper().endswith('M'):
+        return int(float(texto[:-1]) * MS_POR_MES // intervalo_ms(timeframe))
+    return int(texto)
+
+
+def dividir_folds(n: int, treino: int, teste: int) -> list:
+    """Rolling (train start, test start, test end) windows; the last test window may be shorter."""
+    folds = []
+    inicio = 0
+    while inicio + treino < n:
+        folds.append((inicio, inicio + treino, min(inicio + treino + teste, n)))
+        inicio += teste
+    return folds
+
+
+def precalcular_em_blocos(close: np.ndarray, spans, periodos, bloco: int) -> tuple:
+    """Each distinct EMA span and RSI period over ``close``, computed block by block with the state carried over."""
+    emas = {span: [] for span in sorted(set(spans))}
+    rsis = {periodo: [] for periodo in sorted(set(periodos))}
+    estados = {}
+    for inicio in range(0, len(close), bloco):
+        pedaco = close[inicio:inicio + bloco]
+        for span, partes in emas.items():
+            valores, estados['ema', span] = bt.ema_continua(pedaco, span, estados.get(('ema', span)))
+            partes.append(valores)
+        for periodo, partes in rsis.items():
+            valores, estados['rsi', periodo] = bt.rsi_continuo(pedaco, periodo, estados.get(('rsi', periodo)))
+            partes.append(valores)
+    return ({span: np.concatenate(partes) for span, partes in emas.items()},
+            {periodo: np.concatenate(partes) for periodo, partes in rsis.items()})
+
+
+def _iniciar_worker(close: np.ndarray, emas: dict, rsis: dict) -> None:
+    global _close, _emas, _rsis
+    _close, _emas, _rsis = close, emas, rsis
+
+
+def _regras_janela(parametros, inicio: int, fim: int) -> tuple:
+    # Regras das velas [inicio, fim), com as duas velas anteriores como contexto: iguais às da série completa
+    desde = max(0, inicio - 2)
+    regras = bt.regras_sinal(_emas[parametros.media_rapida][desde:fim], _emas[parametros.media_lenta][desde:fim],
+                             _rsis[parametros.periodo_rsi][desde:fim], parametros,
+                             max(inicio, parametros.media_lenta, parametros.periodo_rsi) - desde)
+    return regras[0][inicio - desde:], regras[1][inicio - desde:]
+
+
+def _simular(regras: tuple, stops: tuple, inicio: int, fim: int) -> list:
+    # Trades da janela (índices globais); cada janela começa sem posição e fecha-a na última vela
+    trades = bt.simular_estrategia(_close[inicio:fim], *regras, *stops, fechar_no_fim=True)
+    return [(entrada + inicio, saida + inicio, preco_entrada, preco_saida, motivo)
+            for entrada, saida, preco_entrada, preco_saida, motivo in trades]
+
+
+def _avaliar_fold(tarefa: tuple) -> dict:
+    indice, (inicio, meio, fim), combinacoes, stops, quantity, tax, base = tarefa
+    melhor = None
+    for fast, slow, periodo, overbought, oversold in combinacoes:
+        parametros = bt.parametros_fatima(fast, slow, periodo, overbought, oversold, base)
+        regras = _regras_janela(parametros, inicio, meio)
+        for stop in stops:
+            resumo = bt.resumo_trades(_simular(regras, stop, inicio, meio), quantity, tax)
+            chave = (resumo['pnl'], -resumo['max_drawdown'])
+            if melhor is None or chave > melhor[0]:
+                melhor = (chave, parametros, stop, resumo)
+    _, parametros, stop, treino = melhor
+    trades = _simular(_regras_janela(parametros, meio, fim), stop, meio, fim)
+    teste = bt.resumo_trades(trades, quantity, tax)
+    return {'fold': indice, 'treino_inicio': inicio, 'teste_inicio': meio, 'teste_fim': fim,
+            'ema_fast': parametros.media_rapida, 'ema_slow': parametros.media_lenta,
+            'rsi_period': parametros.periodo_rsi, 'rsi_overbought': parametros.rsi_sobrecompra,
+            'rsi_oversold': parametros.rsi_sobrevenda, 'stop_loss': stop[0], 'take_profit': stop[1],
+            'pnl_treino': treino['pnl'], 'trades_treino': treino['trades'],
+            'pnl_teste': teste['pnl'], 'trades_teste': teste['trades'], 'max_drawdown_teste': teste['max_drawdown'],
+            'trades': trades}
+
+
+def curva_capital(close: np.ndarray, trades: list, inicio: int, fim: int,
+                  quantity: float = bt.QUANTITY, tax: float = bt.TAX) -> np.ndarray:
+    """Equity (realized PnL net of TAX plus the open position marked to the close) for candles [inicio, fim)."""
+    realizado = np.zeros(fim - inicio)
+    aberto = np.zeros(fim - inicio)
+    for entrada, saida, preco_entrada, preco_saida, _ in trades:
+        realizado[saida - inicio] += (preco_saida - preco_entrada) * quantity - tax
+        aberto[entrada - inicio:saida - inicio] = (close[entrada:saida] - preco_entrada) * quantity
+    return np.cumsum(realizado) + aberto
+
+
+def walk_forward(close: np.ndarray, grelha: dict, treino: int, teste: int, processos: int | None = None,
+                 quantity: float = bt.QUANTITY, tax: float = bt.TAX,
+                 base: bt.ParametrosEstrategia = bt.ParametrosEstrategia()) -> tuple:
+    """Run the walk-forward over ``close`` with windows of ``treino``/``teste`` candles.
+
+    ``grelha`` has the keys of otimizar_fatima.sweep. Returns (folds, curve):
+    one row per fold with the chosen parameters and the train/test results,
+    and the stitched out-of-sample equity curve as a Series indexed by candle,
+    from the first test candle to the end.
+    """
+    close = np.asarray(close, dtype=float)
+    folds = dividir_folds(len(close), treino, teste)
+    if not folds:
+        return pd.DataFrame(), pd.Series(dtype=float)
+    emas, rsis = precalcular_em_blocos(close, list(grelha['ema_fast']) + list(grelha['ema_slow']),
+                                       grelha['rsi_period'], teste)
+    combinacoes = [c for c in itertools.product(grelha['ema_fast'], grelha['ema_slow'], grelha['rsi_period'],
+                                                grelha['rsi_overbought'], grelha['rsi_oversold'])
+                   if c[0] < c[1]]
+    stops = list(itertools.product(grelha['stop_loss'], grelha['take_profit']))
+    tarefas = [(i, fold, combinacoes, stops, quantity, tax, base) for i, fold in enumerate(folds)]
+
+    if processos == 1:
+        _iniciar_worker(close, emas, rsis)
+        resultados = [_avaliar_fold(tarefa) for tarefa in tarefas]
+    else:
+        with ProcessPoolExecutor(max_workers=processos or os.cpu_count(), initializer=_iniciar_worker,
+                                 initargs=(close, emas, rsis)) as pool:
+            resultados = list(pool.map(_avaliar_fold, tarefas))
+
+    curvas, acumulado = [], 0.0
+    for resultado in resultados:
+        curva = curva_capital(close, resultado['trades'], resultado['teste_inicio'], resultado['teste_fim'],
+                              quantity, tax)
+        curvas.append(curva + acumulado)
+        acumulado += curva[-1]  # Cada janela fecha a posição na última vela: só PnL realizado
+    inicio = folds[0][1]
+    curva = pd.Series(np.concatenate(curvas), index=pd.RangeIndex(inicio, inicio + sum(map(len, curvas))),
+                      name='capital')
+    tabela = pd.DataFrame([{k: v for k, v in r.items() if k != 'trades'} for r in resultados])
+    return tabela, curva
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Walk-forward das regras do bot (otimização por janela)')
+    parser.add_argument('ficheiro', help='Ficheiro CSV com dados (deve ter coluna close) ou diretório de historico.py')
+    parser.add_argument('--simbolo', default='BTCEUR', help='Par a ler do arquivo histórico')
+    parser.add_argument('--timeframe', default='5m', help='Intervalo das velas (para tamanhos em meses e o arquivo)')
+    parser.add_argument('--inicio', help="Primeira vela a ler do arquivo (ex.: '2024-01-01')")
+    parser.add_argument('--fim', help="Fim (exclusivo) das velas a ler do arquivo")
+    parser.add_argument('--treino', default='3M', help="Janela de treino: velas ('25920') ou meses ('3M')")
+    parser.add_argument('--teste', default='1M', help="Janela de teste: velas ou meses")
+    parser.add_argument('--ema-rapida', default=str(bt.EMA_FAST), help="Lista '5,9' ou intervalo '5:15:2'")
+    parser.add_argument('--ema-lenta', default=str(bt.EMA_SLOW), help="Lista ou intervalo")
+    parser.add_argument('--rsi', default=str(bt.RSI_PERIOD), help="Períodos do RSI (lista ou intervalo)")
+    parser.add_argument('--sobrecompra', default=str(bt.RSI_OVERBOUGHT), help="Níveis de sobrecompra do RSI")
+    parser.add_argument('--sobrevenda', default=str(bt.RSI_OVERSOLD), help="Níveis de sobrevenda do RSI")
+    parser.add_argument('--stop-loss', default=str(bt.STOP_LOSS), help="Percentagens de stop-loss")
+    parser.add_argument('--take-profit', default=str(bt.TAKE_PROFIT), help="Percentagens de take-profit")
+    parser.add_argument('--continuacao', action='store_true', help='Ativa os sinais de continuação (CONTINUACAO)')
+    parser.add_argument('--quantidade', type=float, default=bt.QUANTITY, help='Quantidade por trade')
+    parser.add_argument('--taxa', type=float, default=bt.TAX, help='Taxa fixa por trade')
+    parser.add_argument('--processos', type=int, default=None, help='Número de processos (padrão: CPUs)')
+    parser.add_argument('--saida', help='Grava a curva de capital fora da amostra neste ficheiro CSV')
+    args = parser.parse_args()
+
+    grelha = {
+        'ema_fast': parse_grid(args.ema_rapida, int),
+        'ema_slow': parse_grid(args.ema_lenta, int),
+        'rsi_period': parse_grid(args.rsi, int),
+        'rsi_overbought': parse_grid(args.sobrecompra),
+        'rsi_oversold': parse_grid(args.sobrevenda),
+        'stop_loss': parse_grid(args.stop_loss),
+        'take_profit': parse_grid(args.take_profit),
+    }
+    close = bt.load_data(args.ficheiro, args.simbolo, args.timeframe, args.inicio, args.fim)['close'].to_numpy(dtype=float)
+    folds, curva = walk_forward(close, grelha, velas_por_periodo(args.treino, args.timeframe),
+                                velas_por_periodo(args.teste, args.timeframe), args.processos,
+                                args.quantidade, args.taxa, bt.ParametrosEstrategia(continuacao=args.continuacao))
+
+    print(folds.to_string())
+    if len(curva):
+        print(f"PnL fora da amostra: {curva.iloc[-1]:.2f} ({int(folds['trades_teste'].sum())} trades, "
+              f"{len(folds)} folds)")
+    if args.saida:
+        curva.to_csv(args.saida)
+        print(f"Curva de capital gravada em {args.saida}.")
+
+
+if __name__ == '__main__':
+    main()
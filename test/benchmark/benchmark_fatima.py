@@ -0,0 +1,261 @@
+"""Benchmarks of the indicator, signal and backtest hot paths.
+
+Each benchmark runs on deterministic synthetic candles at several sizes and
+records the best wall time, the throughput (candles per second) and the
+peak memory allocated during one run (tracemalloc). Results can be saved
+as a baseline and later runs compared against it; any benchmark slower (or
+using more memory) than the baseline by more than the threshold is
+reported as a regression and the script exits with status 1. Without a
+baseline (and without --gravar-baseline) the script also exits with status 1.
+
+Runs offline: the Binance client is the stub in test/test_binance_client.py,
+extended with get_klines over the synthetic candles.
+
+Uso:
+    python test/benchmark/benchmark_fatima.py --gravar-baseline
+    python test/benchmark/benchmark_fatima.py --limite 0.25
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+
+_AQUI = os.path.dirname(os.path.abspath(__file__))
+_RAIZ = os.path.dirname(os.path.dirname(_AQUI))
+for _caminho in (_RAIZ, os.path.join(_RAIZ, 'test'), os.path.join(_RAIZ, 'test', 'backtest')):
+    if _caminho not in sys.path:
+        sys.path.insert(0, _caminho)
+
+import backtest_fatima as bt  # noqa: E402
+import fatima  # noqa: E402
+from test_binance_client import Client  # noqa: E402
+from velas import BufferVelas  # noqa: E402
+
+TAMANHOS = (50, 1_000, 100_000, 1_000_000, 10_000_000)
+BASELINE = os.path.join(_AQUI, 'baseline.json')
+LIMITE_REGRESSAO = 0.25
+INTERVALO_MS = 300_000
+SEMENTE = 42
+_AUSENTE = object()
+
+
+def fechos_sinteticos(n: int, semente: int = SEMENTE) -> np.ndarray:
+    """Deterministic geometric random walk around 90000."""
+    rng = np.random.default_rng(semente)
+    return 90000 * np.exp(np.cumsum(rng.normal(0, 0.002, n)))
+
+
+def klines_sinteticas(n: int, semente: int = SEMENTE) -> list:
+    """Candles in the get_klines response format (strings, as returned by the API)."""
+    close = fechos_sinteticos(n, semente)
+    abertura = np.concatenate(([close[0]], close[:-1]))
+    inicio = 1_700_000_000_000 - n * INTERVALO_MS
+    return [[inicio + i * INTERVALO_MS, f"{o:.2f}", f"{max(o, c):.2f}", f"{min(o, c):.2f}", f"{c:.2f}",
+             "1.0", inicio + (i + 1) * INTERVALO_MS - 1, "0", 1, "0", "0", "0"]
+            for i, (o, c) in enumerate(zip(abertura.tolist(), close.tolist()))]
+
+
+class ClienteBenchmark(Client):
+    """Stub client serving synthetic klines."""
+
+    def __init__(self, klines: list):
+        super().__init__()
+        self.klines = klines
+
+    def get_klines(self, symbol=None, interval=None, limit=500, **kwargs):
+        return self.klines[-limit:]
+
+
+@contextmanager
+def fatima_silencioso():
+    # Sem escrita no terminal nem no log: mede só o caminho de cálculo. Os globais alterados pelos
+    # benchmarks são repostos no fim (``client`` só existe depois do arranque do bot).
+    originais = {nome: getattr(fatima, nome, _AUSENTE)
+                 for nome in ('log_event', 'client', 'buffer_velas', 'posicao_aberta')}
+    fatima.log_event = lambda *args, **kwargs: None
+    try:
+        yield
+    finally:
+        for nome, valor in originais.items():
+            if valor is _AUSENTE:
+                vars(fatima).pop(nome, None)
+            else:
+                setattr(fatima, nome, valor)
+
+
+# --- Benchmarks: cada um prepara os dados (fora da medição) e devolve a função a medir ---
+
+def bench_calcular_medias_e_rsi(n: int):
+    df = pd.DataFrame({'close': fechos_sinteticos(n)})
+    return lambda: fatima.calcular_medias_e_rsi(df)
+
+
+def bench_atualizar_indicadores(n: int):
+    tempos = np.arange(n, dtype=np.int64) * INTERVALO_MS
+    closes = fechos_sinteticos(n)
+
+    def executar():
+        motor = fatima.MotorIndicadores(fatima.MEDIA_RAPIDA, fatima.MEDIA_LENTA, fatima.PERIODO_RSI)
+        motor.sincronizar(tempos, closes)
+    return executar
+
+
+def bench_verificar_sinal(n: int):
+    # Caminho do bot por vela: confirmar a vela no motor incremental e avaliar o sinal
+    closes = fechos_sinteticos(n).tolist()
+
+    def executar():
+        motor = fatima.MotorIndicadores(fatima.MEDIA_RAPIDA, fatima.MEDIA_LENTA, fatima.PERIODO_RSI)
+        fatima.posicao_aberta = False
+        for close in closes:
+            motor.fechar_vela(close)
+            fatima.verificar_sinal(motor)
+    return executar
+
+
+def bench_obter_dados(n: int):
+    fatima.client = ClienteBenchmark(klines_sinteticas(n))
+
+    def executar():
+        fatima.buffer_velas = BufferVelas(capacidade=n)
+        fatima.obter_dados().como_dataframe()
+    return executar
+
+
+def bench_add_indicators(n: int):
+    df = pd.DataFrame({'close': fechos_sinteticos(n)})
+    return lambda: bt.add_indicators(df)
+
+
+def bench_backtest(n: int):
+    df = bt.add_indicators(pd.DataFrame({'close': fechos_sinteticos(n)}))
+    return lambda: bt.backtest(df)
+
+
+def bench_backtest_vetorizado(n: int):
+    df = bt.add_indicators(pd.DataFrame({'close': fechos_sinteticos(n)}))
+    return lambda: bt.backtest_vetorizado(df)
+
+
+def bench_simular_posicoes(n: int):
+    df = bt.add_indicators(pd.DataFrame({'close': fechos_sinteticos(n)}))
+    sinais = bt.sinais_vetorizados(df)
+    close = df['close'].to_numpy()
+    return lambda: bt.simular_posicoes(close, sinais)
+
+
+# Nome -> (função de preparação, maior tamanho a medir). Os caminhos linha a linha em Python
+# ficam limitados para a suite terminar em poucos minutos.
+BENCHMARKS = {
+    'calcular_medias_e_rsi': (bench_calcular_medias_e_rsi, 10_000_000),
+    'atualizar_indicadores': (bench_atualizar_indicadores, 1_000_000),
+    'verificar_sinal': (bench_verificar_sinal, 100_000),
+    'obter_dados': (bench_obter_dados, 100_000),
+    'add_indicators': (bench_add_indicators, 10_000_000),
+    'backtest': (bench_backtest, 10_000),
+    'backtest_vetorizado': (bench_backtest_vetorizado, 10_000_000),
+    'simular_posicoes': (bench_simular_posicoes, 10_000_000),
+}
+
+
+def medir(funcao, n: int, repeticoes: int = 3) -> dict:
+    """Best-of-N wall time, throughput and peak traced memory of one call."""
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        funcao()
+        tempos.append(time.perf_counter() - inicio)
+    tracemalloc.start()
+    try:
+        funcao()
+        _, pico = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    segundos = min(tempos)
+    return {'segundos': segundos, 'velas_por_segundo': n / segundos if segundos > 0 else float('inf'),
+            'pico_mb': pico / 2 ** 20}
+
+
+def executar_benchmarks(tamanhos=TAMANHOS, nomes=None, repeticoes: int = 3, mostrar=print) -> dict:
+    """Run the selected benchmarks; returns {'name[size]': result}."""
+    resultados = {}
+    with fatima_silencioso():
+        for nome, (preparar, maximo) in BENCHMARKS.items():
+            if nomes and nome not in nomes:
+                continue
+            for n in tamanhos:
+                if n > maximo:
+                    continue
+                funcao = preparar(n)
+                # Tamanhos grandes: uma só repetição cronometrada
+                resultado = medir(funcao, n, repeticoes if n <= 1_000_000 else 1)
+                resultados[f"{nome}[{n}]"] = resultado
+                mostrar(f"{nome:>24} {n:>10} velas: {resultado['segundos'] * 1000:10.2f} ms | "
+                        f"{resultado['velas_por_segundo']:14,.0f} velas/s | {resultado['pico_mb']:9.2f} MB")
+    return resultados
+
+
+def comparar(resultados: dict, baseline: dict, limite: float = LIMITE_REGRESSAO) -> list:
+    """Regressions above ``limite`` (fraction) in time or peak memory versus the baseline."""
+    regressoes = []
+    for chave, atual in resultados.items():
+        base = baseline.get(chave)
+        if base is None:
+            continue
+        for metrica in ('segundos', 'pico_mb'):
+            # Ignora variações abaixo da resolução útil (1 ms / 1 MB)
+            minimo = 0.001 if metrica == 'segundos' else 1.0
+            if atual[metrica] > max(base[metrica], minimo) * (1 + limite):
+                regressoes.append((chave, metrica, base[metrica], atual[metrica]))
+    return regressoes
+
+
+def ler_baseline(caminho: str) -> dict:
+    with open(caminho, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def gravar_baseline(resultados: dict, caminho: str) -> None:
+    with open(caminho, 'w', encoding='utf-8') as f:
+        json.dump(resultados, f, indent=1, sort_keys=True)
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description='Benchmarks dos caminhos críticos do bot e do backtest')
+    parser.add_argument('--tamanhos', default=','.join(map(str, TAMANHOS)),
+                        help='Números de velas, separados por vírgulas')
+    parser.add_argument('--apenas', help='Benchmarks a correr, separados por vírgulas')
+    parser.add_argument('--repeticoes', type=int, default=3, help='Repetições cronometradas (fica o melhor tempo)')
+    parser.add_argument('--baseline', default=BASELINE, help='Ficheiro JSON de referência')
+    parser.add_argument('--gravar-baseline', action='store_true', help='Grava os resultados como nova referência')
+    parser.add_argument('--limite', type=float, default=LIMITE_REGRESSAO,
+                        help='Regressão máxima tolerada (fração, ex.: 0.25 = 25%%)')
+    args = parser.parse_args(argv)
+
+    if not args.gravar_baseline and not os.path.exists(args.baseline):
+        print(f"Sem referência em {args.baseline}; corra com --gravar-baseline para a criar.")
+        sys.exit(1)
+    tamanhos = [int(t) for t in args.tamanhos.split(',')]
+    nomes = args.apenas.split(',') if args.apenas else None
+    resultados = executar_benchmarks(tamanhos, nomes, args.repeticoes)
+
+    if args.gravar_baseline:
+        gravar_baseline(resultados, args.baseline)
+        print(f"Referência gravada em {args.baseline}")
+        return
+    regressoes = comparar(resultados, ler_baseline(args.baseline), args.limite)
+    for chave, metrica, base, atual in regressoes:
+        print(f"REGRESSÃO {chave} {metrica}: {base:.4f} -> {atual:.4f} (+{(atual / base - 1) * 100:.0f}%)")
+    if regressoes:
+        sys.exit(1)
+    print(f"Sem regressões acima de {args.limite * 100:.0f}%.")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,47 @@
+import os
+import tempfile
+import unittest
+
+import benchmark_fatima as bench
+
+
+class TestBenchmarks(unittest.TestCase):
+    def test_dados_sinteticos_deterministas(self):
+        np_a, np_b = bench.fechos_sinteticos(100), bench.fechos_sinteticos(100)
+        self.assertTrue((np_a == np_b).all())
+        klines = bench.klines_sinteticas(10)
+        self.assertEqual(klines[1][0] - klines[0][0], bench.INTERVALO_MS)
+        self.assertEqual(float(klines[-1][4]), round(np_a[9], 2))
+
+    def test_todos_os_benchmarks_correm_em_tamanho_pequeno(self):
+        globais = ('client', 'buffer_velas', 'posicao_aberta')
+        originais = [getattr(bench.fatima, nome, None) for nome in globais]
+        resultados = bench.executar_benchmarks([50], repeticoes=1, mostrar=lambda *_: None)
+        # Os globais do bot ficam como estavam
+        self.assertEqual([getattr(bench.fatima, nome, None) for nome in globais], originais)
+        self.assertEqual(set(resultados), {f"{nome}[50]" for nome in bench.BENCHMARKS})
+        for resultado in resultados.values():
+            self.assertGreater(resultado['velas_por_segundo'], 0)
+            self.assertGreaterEqual(resultado['pico_mb'], 0)
+
+    def test_baseline_e_deteccao_de_regressoes(self):
+        resultados = bench.executar_benchmarks([1000], ['add_indicators'], repeticoes=1, mostrar=lambda *_: None)
+        with tempfile.TemporaryDirectory() as pasta:
+            caminho = os.path.join(pasta, 'baseline.json')
+            bench.gravar_baseline(resultados, caminho)
+            baseline = bench.ler_baseline(caminho)
+        self.assertEqual(bench.comparar(resultados, baseline), [])
+
+        mais_lento = {chave: dict(r, segundos=r['segundos'] * 2 + 0.01) for chave, r in resultados.items()}
+        regressoes = bench.comparar(mais_lento, baseline, limite=0.25)
+        self.assertEqual([(chave, metrica) for chave, metrica, *_ in regressoes],
+                         [('add_indicators[1000]', 'segundos')])
+
+    def test_sem_baseline_termina_com_erro(self):
+        with tempfile.TemporaryDirectory() as pasta, self.assertRaises(SystemExit) as saida:
+            bench.main(['--baseline', os.path.join(pasta, 'baseline.json'), '--tamanhos', '50'])
+        self.assertEqual(saida.exception.code, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,131 @@
+import threading
+import unittest
+
+from agendador import AgendadorVelas, RelogioServidor, VigiaSLTP
+
+
+class Relogio:
+    def __init__(self, agora):
+        self.agora = agora
+
+    def __call__(self):
+        return self.agora
+
+
+class ClienteHora:
+    def __init__(self, relogio, desvio_ms):
+        self.relogio = relogio
+        self.desvio_ms = desvio_ms
+        self.chamadas = 0
+
+    def get_server_time(self):
+        self.chamadas += 1
+        return {'serverTime': int(self.relogio() * 1000 + self.desvio_ms)}
+
+
+class TestRelogioServidor(unittest.TestCase):
+    def test_aplica_o_desvio_e_ressincroniza(self):
+        relogio = Relogio(1000.0)
+        client = ClienteHora(relogio, desvio_ms=-2500)
+        servidor = RelogioServidor(client, relogio=relogio, ressincronizar=60)
+        self.assertEqual(servidor.agora_ms(), 1000000 - 2500)
+        relogio.agora += 30
+        servidor.agora_ms()
+        self.assertEqual(client.chamadas, 1)
+        relogio.agora += 30
+        servidor.agora_ms()
+        self.assertEqual(client.chamadas, 2)
+
+
+class TestAgendadorVelas(unittest.TestCase):
+    def test_fechos_alinhados_ao_timeframe(self):
+        relogio = Relogio(1_700_000_123.0)
+        agendador = AgendadorVelas("5m", RelogioServidor(relogio=relogio))
+        self.assertEqual(agendador.ultimo_fecho() % 300000, 0)
+        self.assertEqual(agendador.proximo_fecho() - agendador.ultimo_fecho(), 300000)
+        self.assertLess(agendador.ultimo_fecho(), relogio() * 1000)
+
+    def test_executa_uma_vez_por_vela(self):
+        # Relógio a avançar: cada espera dura o tempo pedido, sem dormir de verdade
+        relogio = Relogio(1_700_000_123.0)
+        agendador = AgendadorVelas("1m", RelogioServidor(relogio=relogio), atraso=0.5)
+
+        def esperar(segundos):
+            relogio.agora += segundos
+            return agendador._parar.is_set()
+        agendador._parar.wait = esperar
+
+        fechos = []
+
+        def tarefa(fecho):
+            fechos.append(fecho)
+            self.assertGreaterEqual(relogio() * 1000, fecho)
+            if len(fechos) == 4:
+                agendador.parar()
+
+        agendador.executar(tarefa)
+        self.assertEqual([b - a for a, b in zip(fechos, fechos[1:])], [60000] * 3)
+        self.assertEqual(agendador.ultimo_atraso_ms, 500)
+
+    def test_relogio_atrasado_nao_repete_o_fecho(self):
+        # A ressincronização atrasa a hora do servidor 2 s depois da primeira vela: o fecho não se repete
+        relogio = Relogio(1_700_000_123.0)
+        servidor = RelogioServidor(relogio=relogio)
+        agendador = AgendadorVelas("1m", servidor, atraso=0.5)
+
+        def esperar(segundos):
+            relogio.agora += segundos
+            return agendador._parar.is_set()
+        agendador._parar.wait = esperar
+
+        fechos = []
+
+        def tarefa(fecho):
+            fechos.append(fecho)
+            if len(fechos) == 2:
+                servidor.desvio_ms -= 2000
+            if len(fechos) == 4:
+                agendador.parar()
+
+        agendador.executar(tarefa)
+        self.assertEqual([b - a for a, b in zip(fechos, fechos[1:])], [60000] * 3)
+        self.assertGreaterEqual(servidor.agora_ms(), fechos[-1])
+
+
+class TestVigiaSLTP(unittest.TestCase):
+    def test_verifica_cada_preco_recebido(self):
+        precos = iter([100.0, None, 98.0, 97.0])
+        vistos = []
+        feito = threading.Event()
+
+        def obter_preco():
+            try:
+                return next(precos)
+            except StopIteration:
+                feito.set()
+                return None
+
+        vigia = VigiaSLTP(obter_preco, vistos.append, intervalo=0).iniciar()
+        self.assertTrue(feito.wait(2))
+        vigia.parar()
+        self.assertEqual(vistos, [100.0, 98.0, 97.0])
+        self.assertEqual(vigia.verificacoes, 3)
+
+    def test_erro_na_verificacao_nao_para_o_vigia(self):
+        chamadas = []
+        repetiu = threading.Event()
+
+        def verificar(preco):
+            chamadas.append(preco)
+            if len(chamadas) == 3:
+                repetiu.set()
+            raise RuntimeError("falha")
+
+        vigia = VigiaSLTP(lambda: 1.0, verificar, intervalo=0).iniciar()
+        self.assertTrue(repetiu.wait(5))
+        vigia.parar()
+        self.assertGreaterEqual(len(chamadas), 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,163 @@
+import threading
+import time
+import unittest
+from unittest import mock
+
+import requests
+from binance.exceptions import BinanceAPIException
+
+from cliente import ClienteLimitado, peso_metodo
+from limites import LimitePedidos
+
+
+def erro_api(status, codigo, cabecalhos=None):
+    resposta = mock.Mock(headers=cabecalhos or {}, text=f'{{"code": {codigo}, "msg": "erro"}}')
+    return BinanceAPIException(resposta, status, resposta.text)
+
+
+class Relogio:
+    def __init__(self):
+        self.agora = 0.0
+
+    def __call__(self):
+        return self.agora
+
+
+class ClienteFalso:
+    def __init__(self):
+        self.pedidos = []
+        self.falhas = []  # Exceções a levantar nos próximos pedidos, por ordem
+        self.ordens = {}
+        self.timestamp_offset = 0
+
+    def _pedido(self, nome, **kwargs):
+        self.pedidos.append((nome, kwargs))
+        if self.falhas:
+            falha = self.falhas.pop(0)
+            if falha is not None:
+                raise falha
+
+    def get_symbol_ticker(self, symbol=None):
+        self._pedido('get_symbol_ticker', symbol=symbol)
+        return {'symbol': symbol, 'price': str(len(self.pedidos))}
+
+    def get_server_time(self):
+        return {'serverTime': int(time.time() * 1000) + 5000}
+
+    def order_market_buy(self, symbol, quantity, newClientOrderId):
+        self._pedido('order_market_buy', newClientOrderId=newClientOrderId)
+        self.ordens[newClientOrderId] = {'symbol': symbol, 'clientOrderId': newClientOrderId, 'status': 'FILLED'}
+        return self.ordens[newClientOrderId]
+
+    def get_order(self, symbol, origClientOrderId):
+        self.pedidos.append(('get_order', {}))
+        if origClientOrderId not in self.ordens:
+            raise erro_api(400, -2013)
+        return self.ordens[origClientOrderId]
+
+
+class TestClienteLimitado(unittest.TestCase):
+    def setUp(self):
+        self.falso = ClienteFalso()
+        self.relogio = Relogio()
+        self.esperas = []
+        self.cliente = ClienteLimitado(self.falso, relogio=self.relogio, dormir=self.esperas.append,
+                                       aleatorio=lambda: 1.0)
+
+    def test_leituras_recentes_sao_reutilizadas(self):
+        primeiro = self.cliente.get_symbol_ticker(symbol="BTCEUR")
+        self.assertIs(self.cliente.get_symbol_ticker(symbol="BTCEUR"), primeiro)
+        self.cliente.get_symbol_ticker(symbol="ETHEUR")  # Outros parâmetros: outro pedido
+        self.relogio.agora += 1.5
+        self.assertIsNot(self.cliente.get_symbol_ticker(symbol="BTCEUR"), primeiro)
+        self.assertEqual(len(self.falso.pedidos), 3)
+        self.assertEqual(self.cliente.estatisticas['agregados'], 1)
+
+    def test_pedidos_iguais_em_curso_sao_agregados(self):
+        liberar = threading.Event()
+        original = self.falso.get_symbol_ticker
+
+        def lento(symbol):
+            liberar.wait(2)
+            return original(symbol)
+        self.falso.get_symbol_ticker = lento
+
+        resultados = []
+        threads = [threading.Thread(target=lambda: resultados.append(self.cliente.get_symbol_ticker(symbol="BTCEUR")))
+                   for _ in range(5)]
+        for t in threads:
+            t.start()
+        time.sleep(0.1)
+        liberar.set()
+        for t in threads:
+            t.join()
+        self.assertEqual(len(self.falso.pedidos), 1)
+        self.assertEqual(len({id(r) for r in resultados}), 1)
+
+    def test_falhas_transitorias_sao_repetidas_com_espera_crescente(self):
+        self.falso.falhas = [requests.ConnectionError("reset"), erro_api(503, -1000)]
+        self.assertEqual(self.cliente.get_symbol_ticker(symbol="BTCEUR")['symbol'], "BTCEUR")
+        self.assertEqual(self.esperas, [0.5, 1.0])
+
+    def test_429_respeita_retry_after_e_erros_definitivos_nao_se_repetem(self):
+        self.falso.falhas = [erro_api(429, -1003, {'Retry-After': '7'})]
+        self.cliente.get_symbol_ticker(symbol="BTCEUR")
+        self.assertEqual(self.esperas, [7.0])
+        self.falso.falhas = [erro_api(400, -1121)]
+        with self.assertRaises(BinanceAPIException):
+            self.cliente.get_symbol_ticker(symbol="XXX")
+        self.assertEqual(len(self.esperas), 1)
+
+    def test_recv_window_sincroniza_o_relogio(self):
+        self.falso.falhas = [erro_api(400, -1021)]
+        self.cliente.get_symbol_ticker(symbol="BTCEUR")
+        self.assertGreater(self.falso.timestamp_offset, 4000)
+
+    def test_ordem_executada_antes_da_falha_nao_e_duplicada(self):
+        original = self.falso.order_market_buy
+
+        def perde_resposta(symbol, quantity, newClientOrderId):
+            original(symbol, quantity, newClientOrderId)  # Executada na Binance...
+            raise requests.Timeout("sem resposta")        # ...mas a resposta perdeu-se
+        self.falso.order_market_buy = perde_resposta
+
+        ordem = self.cliente.order_market_buy(symbol="BTCEUR", quantity=0.001)
+        self.assertEqual(len(self.falso.ordens), 1)
+        self.assertEqual(ordem['clientOrderId'], next(iter(self.falso.ordens)))
+        self.assertEqual(self.cliente.estatisticas['ordens_recuperadas'], 1)
+
+    def test_ordem_que_nao_chegou_e_reenviada_com_o_mesmo_id(self):
+        self.falso.falhas = [requests.ConnectionError("reset")]
+        self.cliente.order_market_buy(symbol="BTCEUR", quantity=0.001, newClientOrderId="id-1")
+        enviadas = [k['newClientOrderId'] for nome, k in self.falso.pedidos if nome == 'order_market_buy']
+        self.assertEqual(enviadas, ["id-1", "id-1"])
+        self.assertEqual(list(self.falso.ordens), ["id-1"])
+
+    def test_peso_usado_reportado_ajusta_o_orcamento(self):
+        limite = LimitePedidos(1200, relogio=self.relogio, dormir=self.esperas.append)
+        cliente = ClienteLimitado(self.falso, limite, relogio=self.relogio)
+        cliente._registar_resposta(mock.Mock(headers={'x-mbx-used-weight-1m': '900'}))
+        self.assertEqual(cliente.peso_usado, 900)
+        self.assertAlmostEqual(limite.disponivel(), 300)
+
+    def test_peso_do_ticker_depende_do_simbolo(self):
+        self.assertEqual((peso_metodo('get_symbol_ticker', {'symbol': "BTCEUR"}), peso_metodo('get_symbol_ticker', {})),
+                         (2, 4))
+        self.assertEqual(peso_metodo('get_open_orders', {}), 80)
+        limite = LimitePedidos(1200, relogio=self.relogio, dormir=self.esperas.append)
+        cliente = ClienteLimitado(self.falso, limite, relogio=self.relogio)
+        cliente.get_symbol_ticker()
+        self.assertAlmostEqual(limite.disponivel(), 1200 - 4)
+
+    def test_escritas_de_atributos_chegam_ao_cliente(self):
+        # conexao_binance acerta o relógio no cliente embrulhado: o offset tem de chegar ao Client
+        self.cliente.timestamp_offset = 1234
+        self.assertEqual(self.falso.timestamp_offset, 1234)
+        self.assertEqual(self.cliente.timestamp_offset, 1234)
+        self.assertNotIn('timestamp_offset', vars(self.cliente))
+        self.cliente.peso_usado = 10  # Atributos da camada ficam na camada
+        self.assertFalse(hasattr(self.falso, 'peso_usado'))
+
+
+if __name__ == '__main__':
+    unittest.main()
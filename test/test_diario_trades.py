@@ -0,0 +1,114 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from diario_trades import DiarioTrades, execucao
+from historico import para_ms
+from simulador_exchange import ClienteSimulado, SimuladorExchange, TrajetoPrecos
+
+DIA = 86_400_000
+
+
+def ordem(lado, quantidade, preco, tempo_ms, id_ordem, taxa=0.001, ativo_comissao=None):
+    # Resposta FULL da Binance com um fill; comissão na moeda recebida (ou em `ativo_comissao`)
+    ativo = ativo_comissao or ('BTC' if lado == 'BUY' else 'EUR')
+    comissao = quantidade * taxa if ativo == 'BTC' else quantidade * preco * taxa if ativo == 'EUR' else 0.0005
+    return {'symbol': 'BTCEUR', 'orderId': id_ordem, 'clientOrderId': f"c{id_ordem}", 'transactTime': tempo_ms,
+            'side': lado, 'executedQty': f"{quantidade:.8f}", 'cummulativeQuoteQty': f"{quantidade * preco:.8f}",
+            'fills': [{'price': f"{preco:.2f}", 'qty': f"{quantidade:.8f}", 'commission': f"{comissao:.8f}",
+                       'commissionAsset': ativo}]}
+
+
+class TestDiarioTrades(unittest.TestCase):
+    def setUp(self):
+        self.diario = DiarioTrades(":memory:")
+        self.inicio = para_ms("2024-06-01")
+
+    def trade(self, entrada, saida, dia=0, id_ordem=1, motivo="SINAL"):
+        tempo = self.inicio + dia * DIA
+        self.diario.registar_ordem('BTCEUR', 'BTC', 'EUR', ordem('BUY', 0.001, entrada, tempo, id_ordem))
+        return self.diario.registar_ordem('BTCEUR', 'BTC', 'EUR', ordem('SELL', 0.001, saida, tempo + 60_000,
+                                                                         id_ordem + 1), motivo)
+
+    def test_pnl_das_execucoes_com_comissoes(self):
+        trade = self.trade(100_000, 101_000)
+        # -100 EUR + (101 - 0.101) EUR + (0.001 - 0.000001 - 0.001) BTC x 101000
+        self.assertAlmostEqual(trade['pnl'], 1.0 - 0.101 - 0.101)
+        self.assertAlmostEqual(trade['comissoes'], 0.1 + 0.101)
+        self.assertEqual((trade['preco_entrada'], trade['preco_saida'], trade['motivo']), (100_000, 101_000, "SINAL"))
+        # Comissão em BNB: registada na ordem, fora do PnL
+        e = execucao(ordem('SELL', 0.001, 101_000, 0, 9, ativo_comissao='BNB'), 'BTC', 'EUR')
+        self.assertEqual((e['comissao'], e['comissoes'], e['cotacao_liquida']), (0.0, {'BNB': 0.0005}, 101.0))
+
+    def test_venda_sem_compra_e_ordem_repetida(self):
+        venda = ordem('SELL', 0.001, 100_000, self.inicio, 1)
+        self.assertIsNone(self.diario.registar_ordem('BTCEUR', 'BTC', 'EUR', venda))
+        self.assertIsNone(self.diario.ultimo_trade('BTCEUR'))
+        self.trade(100_000, 100_500, id_ordem=2)
+        self.assertEqual(self.diario.totais('BTCEUR')['trades'], 1)
+        # A mesma ordem (ex.: reconciliada depois de um reinício) não é gravada duas vezes
+        self.assertIsNone(self.diario.registar_ordem('BTCEUR', 'BTC', 'EUR', ordem('SELL', 0.001, 100_500,
+                                                                                   self.inicio + 60_000, 3)))
+        self.assertEqual(len(self.diario.ordens()), 3)
+
+    def test_agregados_iguais_a_referencia(self):
+        rng = np.random.default_rng(3)
+        saidas = 100_000 * (1 + rng.normal(0, 0.004, 300))
+        pnls = [self.trade(100_000, saida, dia=i // 20, id_ordem=2 * i + 1)['pnl'] for i, saida in enumerate(saidas)]
+
+        acumulado = np.cumsum(pnls)
+        max_drawdown = np.max(np.maximum.accumulate(np.maximum(acumulado, 0)) - acumulado)
+        for r in (self.diario.resumo('BTCEUR'), self.diario.totais('BTCEUR')):
+            self.assertEqual(r['trades'], 300)
+            self.assertAlmostEqual(r['pnl'], sum(pnls), places=6)
+            self.assertAlmostEqual(r['win_rate'], np.mean(np.array(pnls) > 0))
+            self.assertAlmostEqual(r['max_drawdown'], max_drawdown, places=6)
+            self.assertAlmostEqual(r['arrasto_comissoes'], 0.001, places=6)
+
+        dias = self.diario.pnl_diario('BTCEUR')
+        self.assertEqual(len(dias), 15)
+        self.assertEqual(dias[1]['dia'], "2024-06-02")
+        self.assertAlmostEqual(dias[1]['pnl'], sum(pnls[20:40]), places=6)
+        semana = self.diario.resumo('BTCEUR', "2024-06-02", "2024-06-09")
+        self.assertEqual(semana['trades'], 7 * 20)
+        self.assertAlmostEqual(semana['pnl'], sum(pnls[20:160]), places=6)
+        self.assertEqual(self.diario.resumo('ETHEUR')['trades'], 0)
+
+    def test_reabrir_repoe_totais_e_posicao(self):
+        with tempfile.TemporaryDirectory() as pasta:
+            caminho = os.path.join(pasta, "trades.db")
+            diario = DiarioTrades(caminho)
+            for i, saida in enumerate((101_000, 99_000, 100_300)):
+                diario.registar_ordem('BTCEUR', 'BTC', 'EUR', ordem('BUY', 0.001, 100_000, self.inicio + i, 2 * i))
+                diario.registar_ordem('BTCEUR', 'BTC', 'EUR', ordem('SELL', 0.001, saida, self.inicio + i, 2 * i + 1))
+            diario.registar_ordem('BTCEUR', 'BTC', 'EUR', ordem('BUY', 0.001, 100_000, self.inicio + 9, 10))
+            totais = diario.totais('BTCEUR')
+            diario.fechar()
+
+            reaberto = DiarioTrades(caminho)
+            self.assertEqual(reaberto.totais('BTCEUR'), totais)
+            self.assertAlmostEqual(reaberto.posicao_aberta('BTCEUR'), 0.001)
+            trade = reaberto.registar_ordem('BTCEUR', 'BTC', 'EUR', ordem('SELL', 0.001, 100_000, self.inicio + 9, 11))
+            self.assertEqual(trade['ordem_entrada'], 7)
+            self.assertEqual(reaberto.totais('BTCEUR')['trades'], 4)
+            reaberto.fechar()
+
+    def test_execucoes_batem_com_a_conta(self):
+        trajeto = TrajetoPrecos.sintetico(600, intervalo="1m", historico=500, velocidade=0)
+        simulador = SimuladorExchange(trajeto, saldos={'BTC': 0.0001, 'EUR': 1000.0}, porta=None)
+        client = ClienteSimulado(simulador)
+        for i in range(5):
+            for lado in ('BUY', 'SELL'):
+                resposta = client.create_order(symbol='BTCEUR', side=lado, type='MARKET', quantity=0.0012)
+                self.diario.registar_ordem('BTCEUR', 'BTC', 'EUR', resposta)
+        ordens = self.diario.ordens('BTCEUR')
+        saldos = simulador.conta.saldos
+        self.assertAlmostEqual(saldos['EUR'] - 1000, sum(o['cotacao_liquida'] for o in ordens), places=6)
+        self.assertAlmostEqual(saldos['BTC'] - 0.0001, sum(o['base_liquida'] for o in ordens), places=9)
+        self.assertEqual(self.diario.totais('BTCEUR')['trades'], 5)
+
+
+if __name__ == '__main__':
+    unittest.main()
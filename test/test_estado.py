@@ -0,0 +1,63 @@
+import json
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from estado import VERSAO, GravadorEstado
+from indicadores import MotorIndicadores
+
+
+class TestGravadorEstado(unittest.TestCase):
+    def setUp(self):
+        self.pasta = tempfile.TemporaryDirectory()
+        self.addCleanup(self.pasta.cleanup)
+        self.caminho = os.path.join(self.pasta.name, "estado.json")
+
+    def test_grava_apenas_quando_muda(self):
+        gravador = GravadorEstado(self.caminho)
+        self.assertTrue(gravador.gravar({'n_trade': 1}))
+        self.assertFalse(gravador.gravar({'n_trade': 1}))
+        self.assertTrue(gravador.gravar({'n_trade': 2}))
+        self.assertEqual(GravadorEstado(self.caminho).ler(), {'n_trade': 2, 'versao': VERSAO})
+        self.assertFalse(os.path.exists(self.caminho + ".tmp"))
+
+    def test_ficheiro_ausente_corrompido_ou_de_outra_versao(self):
+        gravador = GravadorEstado(self.caminho)
+        self.assertIsNone(gravador.ler())
+        with open(self.caminho, "w") as f:
+            f.write('{"n_trade": 1, "ver')  # Escrita interrompida (sem a troca atómica)
+        self.assertIsNone(gravador.ler())
+        with open(self.caminho, "w") as f:
+            json.dump({'versao': VERSAO + 1}, f)
+        self.assertIsNone(gravador.ler())
+
+
+class TestEstadoIndicadores(unittest.TestCase):
+    def test_restaurar_continua_como_o_original(self):
+        closes = 90000 * np.exp(np.cumsum(np.random.default_rng(3).normal(0, 0.002, 150)))
+        original = MotorIndicadores(9, 21, 14).registar(spans=[50])
+        for i, close in enumerate(closes[:100]):
+            original.fechar_vela(close, i)
+        original.atualizar_provisoria(closes[100])
+
+        estado = json.loads(json.dumps(original.exportar()))
+        restaurado = MotorIndicadores(9, 21, 14).registar(spans=[50]).restaurar(estado)
+        self.assertEqual((len(restaurado), restaurado.ultimo_tempo), (100, 99))
+
+        for i, close in enumerate(closes[100:], 100):
+            original.fechar_vela(close, i)
+            restaurado.fechar_vela(close, i)
+        for coluna in MotorIndicadores.COLUNAS:
+            np.testing.assert_array_equal(restaurado[coluna], original[coluna])
+        np.testing.assert_array_equal(restaurado.vista(50, 21, 14)["EMA9"], original.vista(50, 21, 14)["EMA9"])
+
+    def test_indicadores_diferentes_sao_recusados(self):
+        estado = MotorIndicadores(9, 21, 14).exportar()
+        with self.assertRaises(ValueError):
+            MotorIndicadores(5, 21, 14).restaurar(estado)
+
+
+if __name__ == '__main__':
+    unittest.main()
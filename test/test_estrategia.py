@@ -0,0 +1,66 @@
+import unittest
+import numpy as np
+import pandas as pd
+
+from estrategia import (COMPRA, CONTINUACAO_ALTA, VENDA, VENDA_ANTECIPADA, ParametrosEstrategia, avaliar_sinal,
+                        regras_sinal, serie_sinais)
+
+
+class TestAvaliarSinal(unittest.TestCase):
+    def setUp(self):
+        self.compra = pd.DataFrame({'EMA9': [10]*21 + [12], 'EMA21': [11]*21 + [10], 'RSI': [25]*21 + [35]})
+        self.venda = pd.DataFrame({'EMA9': [12]*21 + [10], 'EMA21': [10]*21 + [11], 'RSI': [75]*21 + [65]})
+
+    def test_posicao_explicita(self):
+        self.assertEqual(avaliar_sinal(self.compra, False), ("COMPRA", True))
+        self.assertEqual(avaliar_sinal(self.compra, True), (None, True))
+        # RSI ainda acima de 50: venda antecipada (2.0), a posição é fechada pelo loop principal
+        self.assertEqual(avaliar_sinal(self.venda, True), ("VENDA", True))
+        self.assertEqual(avaliar_sinal(self.venda, False), (None, False))
+        venda_cruzamento = self.venda.assign(RSI=[75]*21 + [45])
+        self.assertEqual(avaliar_sinal(venda_cruzamento, True), ("VENDA", False))
+
+    def test_parametros_por_instancia(self):
+        # Com sobrevenda em 20 o RSI anterior (25) já não está perto o suficiente da sobrevenda
+        self.assertEqual(avaliar_sinal(self.compra, False, ParametrosEstrategia(rsi_sobrevenda=10)), (None, False))
+        self.assertEqual(avaliar_sinal(self.compra.iloc[-10:], False), (None, False))
+        self.assertEqual(avaliar_sinal(self.compra.iloc[-10:], False, ParametrosEstrategia(media_lenta=5,
+                                                                                           periodo_rsi=5)),
+                         ("COMPRA", True))
+
+
+class TestNucleoVetorizado(unittest.TestCase):
+    def setUp(self):
+        close = pd.Series(90000 * np.exp(np.cumsum(np.random.default_rng(5).normal(0, 0.002, 600))))
+        variacao = close.diff()
+        ganhos = variacao.where(variacao > 0, 0).ewm(span=14, adjust=False).mean()
+        perdas = -variacao.where(variacao < 0, 0).ewm(span=14, adjust=False).mean()
+        self.dados = pd.DataFrame({'EMA9': close.ewm(span=9, adjust=False).mean(),
+                                   'EMA21': close.ewm(span=21, adjust=False).mean(),
+                                   'RSI': 100 - 100 / (1 + ganhos / perdas)})
+
+    def test_regras_iguais_a_avaliar_sinal_vela_a_vela(self):
+        for p in (ParametrosEstrategia(), ParametrosEstrategia(continuacao=True, margem_venda_ema=0.002)):
+            regra_compra, regra_venda = regras_sinal(self.dados['EMA9'], self.dados['EMA21'], self.dados['RSI'], p)
+            janelas = [self.dados.iloc[:i + 1] for i in range(len(self.dados))]
+            self.assertEqual([avaliar_sinal(j, False, p)[0] for j in janelas],
+                             ["COMPRA" if r else None for r in regra_compra])
+            self.assertEqual([avaliar_sinal(j, True, p)[0] for j in janelas],
+                             ["VENDA" if r else None for r in regra_venda])
+        self.assertIn(CONTINUACAO_ALTA, regra_compra)
+        self.assertIn(VENDA_ANTECIPADA, regra_venda)
+
+    def test_serie_alterna_compra_e_venda(self):
+        regras = regras_sinal(self.dados['EMA9'], self.dados['EMA21'], self.dados['RSI'],
+                              ParametrosEstrategia(continuacao=True))
+        sinais, posicao = serie_sinais(*regras)
+        emitidos = sinais[sinais != 0]
+        self.assertGreater(len(emitidos), 2)
+        self.assertTrue((emitidos[::2] == COMPRA).all() and (emitidos[1::2] == VENDA).all())
+        self.assertEqual(bool(posicao[-1]), emitidos[-1] == COMPRA)
+        com_posicao = serie_sinais(*regras, posicao_inicial=True)[0]
+        self.assertEqual(com_posicao[com_posicao != 0][0], VENDA)
+
+
+if __name__ == '__main__':
+    unittest.main()
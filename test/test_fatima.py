@@ -1,8 +1,20 @@
+import os
+import tempfile
+import time
 import unittest
+from unittest import mock
 import pandas as pd
 from importlib import reload
 
+from binance.exceptions import BinanceAPIException
+
 import fatima
+from diario_trades import DiarioTrades
+from estado import GravadorEstado
+from indicadores import MotorIndicadores
+from ordens import ExecutorOrdens
+from protecao import ExecucaoOCO
+from simulador_exchange import TrajetoPrecos
 
 class TestTradingSignals(unittest.TestCase):
     def load_dotenv(*args, **kwargs):
@@ -33,5 +45,309 @@ class TestTradingSignals(unittest.TestCase):
         sinal = fatima.verificar_sinal(df)
         self.assertEqual(sinal, "VENDA")
 
+
+class TestStopLossTakeProfit(unittest.TestCase):
+    def setUp(self):
+        reload(fatima)
+        fatima.client = mock.Mock()
+        fatima.client.get_symbol_ticker.return_value = {'price': '97.0'}
+        fatima.client.order_market_sell.return_value = {'side': 'SELL', 'executedQty': '0.0012',
+                                                       'cummulativeQuoteQty': '0.1164'}
+        fatima.cache_saldos = mock.Mock()
+        fatima.cache_saldos.obter.return_value = 0.0
+        fatima.saldo_entrada = 0.0
+        fatima.posicao_aberta = True
+        fatima.preco_entrada_global = 100.0
+        fatima.preco_stop_loss = 98.0
+        fatima.preco_take_profit = 101.0
+
+    def test_sem_cruzamento_nao_vende(self):
+        self.assertIsNone(fatima.verificar_stop_loss_take_profit(99.0))
+        fatima.client.order_market_sell.assert_not_called()
+        self.assertTrue(fatima.posicao_aberta)
+
+    def test_stop_loss_fecha_a_posicao(self):
+        self.assertEqual(fatima.verificar_stop_loss_take_profit(97.5), "STOP-LOSS")
+        fatima.client.order_market_sell.assert_called_once()
+        self.assertFalse(fatima.posicao_aberta)
+        self.assertIsNone(fatima.preco_stop_loss)
+        # Uma segunda verificação (ex.: pelo vigia) já não encontra posição
+        self.assertIsNone(fatima.verificar_stop_loss_take_profit(97.0))
+        self.assertEqual(fatima.n_trade, 1)
+
+    def test_take_profit(self):
+        self.assertEqual(fatima.verificar_stop_loss_take_profit(101.5), "TAKE-PROFIT")
+        self.assertFalse(fatima.posicao_aberta)
+
+    def test_venda_de_sl_rejeitada_espera_antes_de_repetir(self):
+        resposta = mock.Mock(text='{"code": -2010, "msg": "Account has insufficient balance."}')
+        fatima.client.order_market_sell.side_effect = BinanceAPIException(resposta, 400, resposta.text)
+        agora = [1000.0]
+        with mock.patch.object(fatima.time, "monotonic", lambda: agora[0]), \
+                mock.patch.object(fatima, "enviar_telegram") as telegram:
+            self.assertEqual(fatima.verificar_stop_loss_take_profit(97.5), "STOP-LOSS")
+            # Vigia (1 s) e loop continuam a ver o preço abaixo do SL: sem novos pedidos durante a espera
+            for _ in range(4):
+                agora[0] += 1
+                self.assertIsNone(fatima.verificar_stop_loss_take_profit(97.5))
+            self.assertEqual(fatima.client.order_market_sell.call_count, 1)
+            agora[0] += 1  # 5 s depois da falha
+            fatima.verificar_stop_loss_take_profit(97.5)
+            self.assertEqual(fatima.client.order_market_sell.call_count, 2)
+            # Segunda falha seguida: a espera duplica
+            agora[0] += fatima.SAIDA_ESPERA_FALHA * 2 - 1
+            self.assertIsNone(fatima.verificar_stop_loss_take_profit(97.5))
+            agora[0] += 1
+            fatima.client.order_market_sell.side_effect = None
+            self.assertEqual(fatima.verificar_stop_loss_take_profit(97.5), "STOP-LOSS")
+        self.assertFalse(fatima.posicao_aberta)
+        self.assertEqual((fatima.falhas_saida, fatima.client.order_market_sell.call_count), (0, 3))
+        # Uma notificação de erro por tentativa (ordem rejeitada + venda falhada), não por verificação
+        self.assertEqual(telegram.call_count, 2 * 2 + 1)
+
+    def test_venda_por_sinal_rejeitada_mantem_o_sl_tp(self):
+        resposta = mock.Mock(text='{"code": -2010, "msg": "Account has insufficient balance."}')
+        fatima.client.order_market_sell.side_effect = BinanceAPIException(resposta, 400, resposta.text)
+        fatima.executar_sinal("VENDA")
+        self.assertTrue(fatima.posicao_aberta)
+        self.assertEqual((fatima.preco_entrada_global, fatima.preco_stop_loss), (100.0, 98.0))
+        # O SL continua vigiado: a queda seguinte fecha a posição
+        fatima.client.order_market_sell.side_effect = None
+        self.assertEqual(fatima.verificar_stop_loss_take_profit(1.0), "STOP-LOSS")
+        self.assertFalse(fatima.posicao_aberta)
+
+
+class TestOCO(unittest.TestCase):
+    def setUp(self):
+        reload(fatima)
+        fatima.client = mock.Mock()
+        fatima.cache_saldos = mock.Mock()
+        fatima.cache_saldos.obter.return_value = 0.0
+        fatima.saldo_entrada = 0.0
+        fatima.posicao_aberta = True
+        fatima.preco_entrada_global = 100.0
+        fatima.preco_stop_loss = 98.0
+        fatima.preco_take_profit = 101.0
+        fatima.protecao = mock.Mock(ativa=True, preco_stop_limite=97.9)
+        fatima.ultima_verificacao_oco = time.monotonic()
+
+    def test_sem_cruzamento_nao_consulta_a_exchange(self):
+        self.assertIsNone(fatima.verificar_stop_loss_take_profit(99.0))
+        fatima.protecao.verificar.assert_not_called()
+
+    def test_execucao_da_oco_fecha_a_posicao_sem_ordem_de_mercado(self):
+        fatima.protecao.verificar.return_value = ExecucaoOCO("TAKE-PROFIT", 101.0, 0.0012, {'side': 'SELL'})
+        self.assertEqual(fatima.verificar_stop_loss_take_profit(101.2), "TAKE-PROFIT")
+        fatima.client.order_market_sell.assert_not_called()
+        self.assertFalse(fatima.posicao_aberta)
+        self.assertEqual(fatima.n_trade, 1)
+
+    def test_venda_por_sinal_cancela_a_oco(self):
+        fatima.protecao.cancelar.return_value = None
+        fatima.client.get_symbol_ticker.return_value = {'price': '99.5'}
+        fatima.client.order_market_sell.return_value = {'side': 'SELL'}
+        fatima.executar_sinal("VENDA")
+        fatima.protecao.cancelar.assert_called_once()
+        fatima.client.order_market_sell.assert_called_once()
+
+
+class TestDiarioTrades(unittest.TestCase):
+    def setUp(self):
+        reload(fatima)
+        fatima.diario_trades = DiarioTrades(":memory:")
+        fatima.client = mock.Mock()
+        fatima.cache_saldos = mock.Mock()
+        fatima.cache_saldos.obter.return_value = 1000.0
+
+    def execucao(self, lado, preco, comissao, ativo):
+        return {'side': lado, 'orderId': 1 if lado == 'BUY' else 2, 'transactTime': 1_700_000_000_000,
+                'executedQty': '0.00120000', 'cummulativeQuoteQty': f"{0.0012 * preco:.8f}",
+                'fills': [{'price': str(preco), 'qty': '0.00120000', 'commission': comissao, 'commissionAsset': ativo}]}
+
+    def test_pnl_das_execucoes_e_resumo_sem_pedidos_de_saldo(self):
+        # O ticker diz 100 -> 101.5, mas as ordens são executadas a 100.2 e 101.1
+        fatima.client.get_symbol_ticker.return_value = {'price': '100.0'}
+        fatima.client.order_market_buy.return_value = self.execucao('BUY', 100.2, '0.0000012', 'BTC')
+        fatima.executar_sinal("COMPRA")
+        fatima.posicao_aberta = True  # Marcada por verificar_sinal no loop
+        fatima.client.get_symbol_ticker.return_value = {'price': '101.5'}
+        fatima.client.order_market_sell.return_value = self.execucao('SELL', 101.1, '0.00012132', 'EUR')
+        self.assertEqual(fatima.verificar_stop_loss_take_profit(101.5), "TAKE-PROFIT")
+
+        pnl = 0.0012 * (101.1 - 100.2) - 0.00012132 - 0.0000012 * 101.1
+        self.assertAlmostEqual(fatima.delta_saldo_total, pnl)
+        self.assertAlmostEqual(fatima.delta_total, 0.0012 * (101.1 - 100.2) - fatima.TAX)
+        self.assertEqual(fatima.diario_trades.trades()[0]['motivo'], "TAKE-PROFIT")
+
+        fatima.cache_saldos.reset_mock()
+        fatima.client.reset_mock()
+        fatima.contador = 720
+        fatima.exibir_resumo()
+        self.assertEqual(fatima.cache_saldos.method_calls, [])
+        self.assertEqual(fatima.client.method_calls, [])
+
+    def test_venda_sem_compra_no_diario_nao_soma_o_saldo(self):
+        # Posição aberta antes do diário: saldo_entrada nunca foi lido (0.0) e o saldo em cache é 1000
+        fatima.posicao_aberta, fatima.preco_entrada_global = True, 100.0
+        fatima.preco_stop_loss, fatima.preco_take_profit = 98.0, 101.0
+        fatima.client.order_market_sell.return_value = self.execucao('SELL', 101.1, '0.00012132', 'EUR')
+        with mock.patch.object(fatima, "log_event") as log:
+            self.assertEqual(fatima.verificar_stop_loss_take_profit(101.5), "TAKE-PROFIT")
+        self.assertEqual(fatima.delta_saldo_total, 0.0)
+        self.assertEqual(fatima.n_trade, 1)
+        self.assertIn("ALERTA", [chamada.args[0] for chamada in log.call_args_list])
+
+
+class TestEstadoPersistente(unittest.TestCase):
+    def setUp(self):
+        reload(fatima)
+        pasta = tempfile.TemporaryDirectory()
+        self.addCleanup(pasta.cleanup)
+        fatima.gravador_estado = GravadorEstado(os.path.join(pasta.name, "estado.json"))
+        fatima.client = mock.Mock()
+        fatima.client.get_open_orders.return_value = []
+        fatima.cache_saldos = mock.Mock()
+        fatima.cache_saldos.obter.return_value = fatima.QUANTIDADE
+
+    def reiniciar(self):
+        # Novo processo: globals a zero, o mesmo ficheiro de estado
+        gravador, client, cache = fatima.gravador_estado, fatima.client, fatima.cache_saldos
+        reload(fatima)
+        fatima.gravador_estado, fatima.client, fatima.cache_saldos = gravador, client, cache
+        return fatima.restaurar_estado(MotorIndicadores(fatima.MEDIA_RAPIDA, fatima.MEDIA_LENTA, fatima.PERIODO_RSI))
+
+    def test_posicao_aberta_sobrevive_ao_reinicio(self):
+        fatima.posicao_aberta, fatima.preco_entrada_global = True, 100.0
+        fatima.preco_stop_loss, fatima.preco_take_profit = 98.0, 101.0
+        fatima.n_trade = 3
+        fatima.gravar_estado()
+        self.assertTrue(self.reiniciar())
+        self.assertEqual((fatima.posicao_aberta, fatima.preco_entrada_global, fatima.preco_stop_loss), (True, 100.0, 98.0))
+        self.assertEqual(fatima.n_trade, 3)
+
+    def test_compra_executada_durante_a_queda_abre_a_posicao(self):
+        fatima.posicao_aberta, fatima.preco_entrada_global = True, 100.0
+        fatima.client.order_market_buy.side_effect = KeyboardInterrupt  # O processo morre com a ordem enviada
+        with self.assertRaises(KeyboardInterrupt):
+            fatima.executar_ordem("BUY", fatima.QUANTIDADE)
+        id_cliente = fatima.client.order_market_buy.call_args.kwargs['newClientOrderId']
+
+        fatima.client.get_order.return_value = {'side': 'BUY', 'status': 'FILLED', 'executedQty': '0.0012',
+                                                'cummulativeQuoteQty': '0.12'}
+        self.reiniciar()
+        fatima.client.get_order.assert_called_once_with(symbol=fatima.PAR, origClientOrderId=id_cliente)
+        self.assertTrue(fatima.posicao_aberta)
+        self.assertAlmostEqual(fatima.preco_entrada_global, 100.0)
+        self.assertAlmostEqual(fatima.preco_stop_loss, 100.0 * (1 - fatima.PERCENTAGEM_STOP_LOSS))
+        self.assertIsNone(fatima.ordem_pendente)
+
+    def test_venda_que_nao_chegou_a_binance_mantem_a_posicao(self):
+        fatima.posicao_aberta, fatima.preco_entrada_global = False, 100.0
+        fatima.ordem_pendente = {'tipo': "SELL", 'id': "fatima-x"}
+        fatima.gravar_estado()
+        resposta = mock.Mock(text='{"code": -2013, "msg": "Order does not exist."}')
+        fatima.client.get_order.side_effect = BinanceAPIException(resposta, 400, resposta.text)
+        self.reiniciar()
+        self.assertTrue(fatima.posicao_aberta)
+
+    def test_posicao_sem_saldo_e_dada_como_fechada(self):
+        fatima.posicao_aberta, fatima.preco_entrada_global = True, 100.0
+        fatima.gravar_estado()
+        fatima.cache_saldos.obter.return_value = 0.0
+        fatima.client.get_open_orders.return_value = [{'orderId': 7, 'orderListId': -1}]
+        self.reiniciar()
+        self.assertFalse(fatima.posicao_aberta)
+
+
+class TestSimulacao(unittest.TestCase):
+    def setUp(self):
+        reload(fatima)
+        fatima.client = mock.Mock()
+        fatima.client.get_symbol_ticker.return_value = {'price': '90000.0'}
+        fatima.cache_saldos = mock.Mock()
+        fatima.SIMULACAO = 1
+
+    def test_ordem_nao_e_enviada(self):
+        ordem = fatima.executar_ordem("BUY", 0.001)
+        fatima.client.order_market_buy.assert_not_called()
+        fatima.cache_saldos.aplicar_ordem.assert_not_called()
+        self.assertEqual(ordem['side'], "BUY")
+        self.assertAlmostEqual(float(ordem['cummulativeQuoteQty']), 90.0)
+
+    def test_ordens_em_papel_ficam_fora_do_diario(self):
+        fatima.diario_trades = DiarioTrades(":memory:")
+        fatima.executar_ordem("BUY", 0.001)
+        fatima.executar_ordem("SELL", 0.001, "SINAL")
+        self.assertEqual(fatima.diario_trades.ordens(), [])
+        self.assertEqual(fatima.diario_trades.totais(fatima.PAR)['trades'], 0)
+
+
+class TestRegisto(unittest.TestCase):
+    def setUp(self):
+        reload(fatima)
+        fatima.client = mock.Mock()
+
+    def test_log_event_leva_campos_tipados(self):
+        with self.assertLogs(level="INFO") as capturado:
+            fatima.log_event("TRADE", "--- TRADE #3 ---", n_trade=3, lucro=1.5)
+        registo = capturado.records[0]
+        self.assertEqual(registo.getMessage(), "TRADE: --- TRADE #3 ---")
+        self.assertEqual(registo.tipo, "TRADE")
+        self.assertEqual(registo.campos, {'n_trade': 3, 'lucro': 1.5})
+
+    def test_ordem_rejeitada_regista_o_erro(self):
+        resposta = mock.Mock(text='{"code": -2010, "msg": "Account has insufficient balance."}')
+        fatima.client.order_market_buy.side_effect = BinanceAPIException(resposta, 400, resposta.text)
+        # A recusa é registada e o bot continua; a ordem não existe na Binance, não fica pendente
+        with mock.patch.object(fatima, "log_event") as log:
+            self.assertIsNone(fatima.executar_ordem("BUY", 0.001))
+        tipo, mensagem = log.call_args.args
+        self.assertEqual(tipo, "ERRO")
+        self.assertIn("-2010", mensagem)
+        self.assertIn("insufficient balance", mensagem)
+        self.assertIsNone(fatima.ordem_pendente)
+
+    def test_ordem_fora_dos_filtros_nao_e_enviada(self):
+        fatima.executor_ordens = ExecutorOrdens(fatima.client, "BTCEUR")
+        fatima.client.get_symbol_info.return_value = {'filters': [
+            {'filterType': 'LOT_SIZE', 'minQty': '0.00001', 'maxQty': '9000', 'stepSize': '0.00001'},
+            {'filterType': 'NOTIONAL', 'minNotional': '5.00', 'applyMinToMarket': True}]}
+        fatima.executor_ordens.carregar()
+        with mock.patch.object(fatima, "log_event") as log:
+            self.assertIsNone(fatima.executar_ordem("BUY", 0.00004, preco=100_000))
+        fatima.client.order_market_buy.assert_not_called()
+        self.assertIn("nocional", log.call_args.args[1])
+
+
+class TestArquivoVelas(unittest.TestCase):
+    def setUp(self):
+        reload(fatima)
+        pasta = tempfile.TemporaryDirectory()
+        self.addCleanup(pasta.cleanup)
+        fatima.ARQUIVO_VELAS = pasta.name
+        fatima.ARQUIVO_AQUECIMENTO_DIAS = 2
+        # 600 velas de 5m já fechadas; o cliente serve-as como a Binance
+        self.trajeto = TrajetoPrecos.sintetico(n=601, intervalo="5m", historico=600, velocidade=0,
+                                               inicio_ms=1_700_000_160_000)
+        fatima.client = mock.Mock()
+        fatima.client.get_server_time.side_effect = lambda: {'serverTime': self.trajeto.agora_ms()}
+        fatima.client.get_klines.side_effect = lambda symbol, interval, startTime, endTime, limit: \
+            self.trajeto.klines(limit, startTime, endTime)
+
+    def test_aquece_os_indicadores_com_o_historico(self):
+        motor = MotorIndicadores(fatima.MEDIA_RAPIDA, fatima.MEDIA_LENTA, fatima.PERIODO_RSI)
+        with mock.patch.object(fatima.time, "time", return_value=self.trajeto.agora_ms() / 1000):
+            self.assertTrue(fatima.aquecer_do_arquivo(motor))
+        self.assertEqual(motor.n_velas, 575)  # Velas fechadas abertas nos últimos 2 dias (2 x 288, menos a vela em formação)
+        self.assertEqual(motor.ultimo_tempo, self.trajeto.tempo_zero + 599 * 300_000)
+        self.assertAlmostEqual(motor.valores_atuais()[0], self.trajeto.velas[599, 3], places=2)
+
+    def test_falha_deixa_o_aquecimento_para_o_rest(self):
+        fatima.client.get_server_time.side_effect = OSError("sem rede")
+        motor = MotorIndicadores(fatima.MEDIA_RAPIDA, fatima.MEDIA_LENTA, fatima.PERIODO_RSI)
+        self.assertFalse(fatima.aquecer_do_arquivo(motor))
+        self.assertIsNone(motor.ultimo_tempo)
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,109 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+from binance.client import Client
+
+from historico import ArquivoVelas, DescarregadorVelas, limites_mes, mes_de, para_ms, subtrair_intervalos
+from simulador_exchange import SimuladorExchange, TrajetoPrecos
+
+INTERVALO = 3_600_000  # 1h
+INICIO = para_ms("2024-01-15")
+
+
+def cliente(simulador):
+    client = Client("chave", "segredo", ping=False)
+    client.API_URL = simulador.url_api
+    return client
+
+
+class ClienteInterrompido:
+    """Deixa passar ``pedidos`` pedidos de klines e falha os restantes (como uma ligação perdida a meio)."""
+
+    def __init__(self, client, pedidos):
+        self.client = client
+        self.restantes = pedidos
+        self.chamadas = 0
+
+    def get_server_time(self):
+        return self.client.get_server_time()
+
+    def get_klines(self, **kwargs):
+        self.chamadas += 1
+        self.restantes -= 1
+        if self.restantes < 0:
+            raise ConnectionError("ligação perdida")
+        return self.client.get_klines(**kwargs)
+
+
+class TestIntervalos(unittest.TestCase):
+    def test_meses_e_intervalos_em_falta(self):
+        self.assertEqual(mes_de(para_ms("2024-02-29 23:00")), "2024-02")
+        self.assertEqual(limites_mes("2024-02"), (para_ms("2024-02-01"), para_ms("2024-03-01")))
+        self.assertEqual(subtrair_intervalos(0, 100, [(10, 20), (50, 120)]), [(0, 10), (20, 50)])
+        self.assertEqual(subtrair_intervalos(0, 100, []), [(0, 100)])
+
+
+class TestDescarregador(unittest.TestCase):
+    def setUp(self):
+        # 2000 velas de 1h a partir de INICIO, todas fechadas (a vela 2000 é a que está em formação)
+        n = 2000
+        self.trajeto = TrajetoPrecos.sintetico(n=n + 1, intervalo="1h", historico=n, velocidade=0,
+                                               inicio_ms=INICIO + n * INTERVALO + 60_000)
+        self.simulador = SimuladorExchange(self.trajeto, base="BTC", cotacao="EUR").iniciar()
+        self.addCleanup(self.simulador.parar)
+        pasta = tempfile.TemporaryDirectory()
+        self.addCleanup(pasta.cleanup)
+        self.destino = pasta.name
+        self.fecho = self.trajeto.velas[:n, 3]
+
+    def test_descarrega_por_meses_so_velas_fechadas(self):
+        descarregador = DescarregadorVelas(cliente(self.simulador), self.destino, max_threads=4, limite=500)
+        resumo = descarregador.descarregar("BTCEUR", "1h", INICIO)
+
+        self.assertEqual((resumo['velas'], resumo['falhas']), (2000, 0))
+        arquivo = ArquivoVelas(self.destino)
+        self.assertEqual(arquivo.meses("BTCEUR", "1h"), ["2024-01", "2024-02", "2024-03", "2024-04"])
+        velas = arquivo.ler("BTCEUR", "1h")
+        np.testing.assert_array_equal(velas['time'], INICIO + np.arange(2000) * INTERVALO)
+        np.testing.assert_allclose(velas['close'], self.fecho, atol=0.005)
+        self.assertEqual(velas['close'].dtype, np.float64)
+        # Intervalo de leitura a meio de um mês e a atravessar a fronteira
+        fatia = arquivo.dataframe("BTCEUR", "1h", "2024-01-31 22:00", "2024-02-01 02:00")
+        self.assertEqual(len(fatia), 4)
+        self.assertEqual(int(fatia['time'].iloc[0]), para_ms("2024-01-31 22:00"))
+
+    def test_retoma_e_pede_so_o_que_falta(self):
+        interrompido = ClienteInterrompido(cliente(self.simulador), pedidos=2)
+        primeiro = DescarregadorVelas(interrompido, self.destino, max_threads=1, limite=500, log=lambda *a: None)
+        resumo = primeiro.descarregar("BTCEUR", "1h", INICIO)
+        self.assertEqual(resumo['pedidos'], 2)
+        self.assertGreater(resumo['falhas'], 0)
+
+        # A segunda execução só pede os blocos que falharam e o arquivo fica completo
+        retoma = ClienteInterrompido(cliente(self.simulador), pedidos=100)
+        resumo = DescarregadorVelas(retoma, self.destino, max_threads=4, limite=500).descarregar("BTCEUR", "1h", INICIO)
+        self.assertEqual(retoma.chamadas, interrompido.chamadas - 2)
+        self.assertEqual(resumo['falhas'], 0)
+        velas = ArquivoVelas(self.destino).ler("BTCEUR", "1h")
+        np.testing.assert_array_equal(velas['time'], INICIO + np.arange(2000) * INTERVALO)
+        self.assertEqual(ArquivoVelas(self.destino).cobertura("BTCEUR", "1h"), [(INICIO, INICIO + 2000 * INTERVALO)])
+
+        # Nada em falta: nenhum pedido
+        terceiro = ClienteInterrompido(cliente(self.simulador), pedidos=100)
+        DescarregadorVelas(terceiro, self.destino).descarregar("BTCEUR", "1h", INICIO)
+        self.assertEqual(terceiro.chamadas, 0)
+
+    def test_versoes_antigas_sao_apagadas(self):
+        descarregador = DescarregadorVelas(cliente(self.simulador), self.destino, limite=200, gravar_cada=1)
+        descarregador.descarregar("BTCEUR", "1h", INICIO, "2024-02-01")
+        pasta = os.path.join(self.destino, "BTCEUR", "1h", "2024-01")
+        ficheiros = sorted(f for f in os.listdir(pasta) if f.endswith(".npy"))
+        versao = ArquivoVelas(self.destino).manifesto("BTCEUR", "1h", "2024-01")['versao']
+        self.assertEqual(ficheiros, sorted(f"{coluna}.{versao}.npy" for coluna in
+                                           ('time', 'open', 'high', 'low', 'close', 'volume', 'close_time')))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,64 @@
+import unittest
+import numpy as np
+import pandas as pd
+
+from indicadores import MotorIndicadores
+
+
+def indicadores_pandas(closes):
+    # Mesmo cálculo de fatima.calcular_medias_e_rsi
+    close = pd.Series(closes, dtype=float)
+    delta = close.diff()
+    ganhos = delta.where(delta > 0, 0)
+    perdas = -delta.where(delta < 0, 0)
+    rs = (ganhos.ewm(span=14, adjust=False).mean() / perdas.ewm(span=14, adjust=False).mean()).fillna(0)
+    return (close.ewm(span=9, adjust=False).mean().to_numpy(),
+            close.ewm(span=21, adjust=False).mean().to_numpy(),
+            (100 - (100 / (1 + rs))).to_numpy())
+
+
+class TestMotorIndicadores(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(7)
+        self.closes = 90000 + np.cumsum(rng.normal(0, 50, 300))
+        self.tempos = np.arange(300) * 300_000
+
+    def test_igual_ao_pandas(self):
+        motor = MotorIndicadores(9, 21, 14, historico=300)
+        for close in self.closes:
+            motor.fechar_vela(close)
+        ema9, ema21, rsi = indicadores_pandas(self.closes)
+        np.testing.assert_allclose(motor["EMA9"], ema9, rtol=1e-12)
+        np.testing.assert_allclose(motor["EMA21"], ema21, rtol=1e-12)
+        np.testing.assert_allclose(motor["RSI"], rsi, rtol=1e-9, atol=1e-9)
+        self.assertEqual(len(motor), 300)
+
+    def test_vela_provisoria_nao_altera_estado(self):
+        motor = MotorIndicadores(9, 21, 14)
+        motor.sincronizar(self.tempos[:50], self.closes[:50])
+        # A vela em formação é revista várias vezes antes de fechar
+        for preco_intermedio in (1.0, 1e6, self.closes[49]):
+            closes = self.closes[:50].copy()
+            closes[-1] = preco_intermedio
+            motor.sincronizar(self.tempos[:50], closes)
+        self.assertEqual(motor.n_velas, 49)
+
+        # Janela deslizante como a de get_klines: a vela 49 fecha e a 50 fica provisória
+        motor.sincronizar(self.tempos[1:51], self.closes[1:51])
+        ema9, ema21, rsi = indicadores_pandas(self.closes[:51])
+        self.assertEqual(motor.n_velas, 50)
+        self.assertEqual(len(motor), 51)
+        np.testing.assert_allclose(motor["EMA9"], ema9[-4:], rtol=1e-12)
+        np.testing.assert_allclose(motor["EMA21"], ema21[-4:], rtol=1e-12)
+        np.testing.assert_allclose(motor["RSI"], rsi[-4:], rtol=1e-9)
+
+    def test_rsi_sem_perdas(self):
+        motor = MotorIndicadores(9, 21, 14)
+        motor.fechar_vela(10)
+        self.assertEqual(motor["RSI"][-1], 0.0)
+        motor.fechar_vela(11)
+        self.assertEqual(motor["RSI"][-1], 100.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,84 @@
+import os
+import tempfile
+import unittest
+
+from ingestao_logs import ArquivoLogs, analisar_linhas, ingerir
+
+LINHAS = [
+    "2025-06-20 11:56:25 - INFO - INFO:  *** Iteracao = 1 || VALOR BTC = 91000.50 EUR ***\n",
+    "2025-06-20 11:56:25 - INFO - SALDO: 🔹 BTC: 0.0012000 disponivel\n",
+    "2025-06-20 11:56:30 - INFO - SINAL: (1.1) Sinal de COMPRA! EMA cruzou para cima e RSI (35.00) confirmou.\n",
+    "2025-06-20 11:56:31 - INFO - COMPRA: => PRECO DE COMPRA = 91010.00 EUR || Quantidade = 0.0012 BTC || Valor gasto = 109.21 EUR\n",
+    "2025-06-20 12:10:00 - INFO - INFO:  *** Iteracao = 2 || VALOR BTC = 91600.00 EUR ***\n",
+    "2025-06-20 12:10:01 - INFO - VENDA: => PRECO DE VENDA = 91600.00 EUR || Quantidade = 0.0012 BTC\n",
+    "2025-06-20 12:10:01 - INFO - TRADE: --- TRADE #1 ---\n",
+    "2025-06-20 12:10:01 - INFO - TRADE:   Entrada: 91010.00 EUR | Saída: 91600.00 EUR | Qtd: 0.0012 BTC\n",
+    "2025-06-20 12:11:00 - ERROR - ERRO_GERAL: Ocorreu um erro inesperado: timeout\n",
+]
+
+
+class TestAnalisarLinhas(unittest.TestCase):
+    def test_separa_as_linhas_por_tabela(self):
+        tabelas = analisar_linhas(LINHAS)
+        self.assertEqual(list(tabelas['precos']['preco']), [91000.5, 91600.0])
+        self.assertEqual(list(tabelas['saldos']['ativo']), ['BTC'])
+        self.assertEqual(list(tabelas['sinais']['lado']), ['COMPRA'])
+        self.assertEqual(list(tabelas['ordens']['lado']), ['COMPRA', 'VENDA'])
+        self.assertEqual(tabelas['trades']['n_trade'][0], 1)
+        self.assertEqual(tabelas['trades']['preco_saida'][0], 91600.0)
+        self.assertEqual(list(tabelas['erros']['tipo']), ['ERRO_GERAL'])
+        self.assertEqual(str(tabelas['precos']['ts'].dtype), 'datetime64[s]')
+
+    def test_formato_antigo_de_trade(self):
+        linha = ("2025-04-07 17:28:20 - INFO - TRADE: 1 \t Preco Entrada = 71000.00 EUR \t| Preco Saida = "
+                 "71500.00 \t| Saldo EUR = 10.00 | Quantidade = 0.0012 BTC\n")
+        trades = analisar_linhas([linha])['trades']
+        self.assertEqual(trades['preco_entrada'][0], 71000.0)
+        self.assertEqual(trades['quantidade'][0], 0.0012)
+
+
+class TestIngestao(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.dir.cleanup)
+        self.log = os.path.join(self.dir.name, 'trading.txt')
+        self.destino = os.path.join(self.dir.name, 'dados')
+
+    def escrever(self, linhas, modo='a'):
+        with open(self.log, modo, encoding='utf-8') as f:
+            f.writelines(linhas)
+
+    def test_reingestao_le_apenas_o_que_foi_acrescentado(self):
+        self.escrever(LINHAS[:5] + ["2025-06-20 12:10:00 - INFO - INFO:  *** Iteracao"])  # Linha incompleta
+        novas = ingerir([self.log], self.destino, processos=1)
+        self.assertEqual(novas['precos'], 2)
+        self.assertEqual(ingerir([self.log], self.destino, processos=1)['precos'], 0)
+
+        self.escrever([" = 3 || VALOR BTC = 91700.00 EUR ***\n"] + LINHAS[5:])
+        novas = ingerir([self.log], self.destino, processos=1)
+        self.assertEqual(novas['precos'], 1)
+        self.assertEqual(novas['trades'], 1)
+
+        arquivo = ArquivoLogs(self.destino)
+        self.assertEqual(list(arquivo.consultar('precos')['iteracao']), [1, 2, 3])
+
+    def test_ficheiro_truncado_e_lido_de_novo(self):
+        self.escrever(LINHAS)
+        ingerir([self.log], self.destino, processos=1)
+        self.escrever(LINHAS[:2], modo='w')
+        ingerir([self.log], self.destino, processos=1)
+        self.assertEqual(len(ArquivoLogs(self.destino).consultar('precos')), 1)
+
+    def test_consultas_por_tempo_e_tipo(self):
+        self.escrever(LINHAS)
+        ingerir([self.dir.name], self.destino, processos=1)
+        arquivo = ArquivoLogs(self.destino)
+        self.assertEqual(len(arquivo.consultar('precos', '2025-06-20 12:00', '2025-06-20 13:00')), 1)
+        self.assertEqual(len(arquivo.consultar('eventos', tipo='ERRO_GERAL')), 1)
+        contexto = arquivo.antes_de('2025-06-20 12:10:01', minutos=20)
+        self.assertEqual(len(contexto['precos']), 2)
+        self.assertEqual(len(contexto['sinais']), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,75 @@
+import json
+import threading
+import unittest
+
+from websockets.sync.server import serve
+
+from mercado_stream import StreamMercado
+
+MINUTO = 60_000
+
+
+def kline(t, close, fechada):
+    return json.dumps({"stream": "btceur@kline_1m", "data": {
+        "e": "kline", "s": "BTCEUR",
+        "k": {"t": t, "T": t + MINUTO - 1, "o": "1", "h": "1", "l": "1", "c": str(close), "v": "1", "x": fechada}}})
+
+
+class ClienteREST:
+    # Devolve a vela perdida durante a desconexão
+    def __init__(self):
+        self.pedidos = []
+
+    def get_klines(self, **params):
+        self.pedidos.append(params)
+        return [[2 * MINUTO, "1", "1", "1", "102", "1", 3 * MINUTO - 1]]
+
+
+class TestStreamMercado(unittest.TestCase):
+    def setUp(self):
+        self.ligacoes = 0
+
+        def handler(ws):
+            self.ligacoes += 1
+            if self.ligacoes == 1:
+                ws.send(kline(0, 100, False))
+                ws.send(json.dumps({"stream": "btceur@trade", "data": {"e": "trade", "p": "100.5"}}))
+                ws.send(kline(0, 101, True))
+                ws.send(kline(MINUTO, 101.5, False))
+                # Fecha a ligação antes de a vela de MINUTO fechar
+            else:
+                ws.send(kline(3 * MINUTO, 103, True))
+                ws.recv()  # Mantém a ligação aberta até o cliente sair
+
+        self.servidor = serve(handler, "127.0.0.1", 0)
+        threading.Thread(target=self.servidor.serve_forever, daemon=True).start()
+        porta = self.servidor.socket.getsockname()[1]
+        self.client = ClienteREST()
+        self.stream = StreamMercado("BTCEUR", "1m", client=self.client, url_base=f"ws://127.0.0.1:{porta}")
+        self.stream.espera_maxima = 0.1
+
+    def tearDown(self):
+        self.stream.parar()
+        self.servidor.shutdown()
+
+    def test_eventos_e_religacao_com_preenchimento(self):
+        self.stream.iniciar()
+        fechadas = []
+        while len(fechadas) < 3:
+            evento = self.stream.proximo_evento(timeout=5)
+            self.assertIsNotNone(evento, "stream não entregou eventos")
+            if evento[0] == "VELA_FECHADA":
+                fechadas.append((evento[1]['time'], evento[1]['close']))
+
+        # Vela 0 pelo stream, vela 2 pelo preenchimento REST após religar, vela 3 de novo pelo stream
+        self.assertEqual(fechadas, [(0, 101.0), (2 * MINUTO, 102.0), (3 * MINUTO, 103.0)])
+        self.assertEqual(self.client.pedidos[0]['startTime'], 1)
+        self.assertEqual(self.stream.ultimo_preco, 103.0)
+        self.assertGreaterEqual(self.stream.ligacoes, 2)
+
+    def test_url_combinada(self):
+        self.assertTrue(self.stream.url.endswith("/stream?streams=btceur@kline_1m/btceur@trade"))
+
+
+if __name__ == '__main__':
+    unittest.main()
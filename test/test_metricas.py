@@ -0,0 +1,94 @@
+import os
+import tempfile
+import time
+import unittest
+
+import requests
+
+from metricas import GravadorMetricas, Metricas, ServidorMetricas, endpoint_de_url
+
+
+class Relogio:
+    def __init__(self):
+        self.agora = 0.0
+
+    def __call__(self):
+        return self.agora
+
+
+class TestMetricas(unittest.TestCase):
+    def test_quantis_por_etapa(self):
+        metricas = Metricas()
+        for i in range(1, 101):
+            metricas.observar("etapa_segundos", i / 1000, etapa="obter_dados")
+        self.assertAlmostEqual(metricas.quantil("etapa_segundos", 0.5, etapa="obter_dados"), 0.0505)
+        self.assertGreater(metricas.quantil("etapa_segundos", 0.99, etapa="obter_dados"), 0.098)
+        self.assertEqual(metricas.histograma("etapa_segundos", etapa="obter_dados").total, 100)
+
+    def test_decorador_mede_cada_chamada(self):
+        relogio = Relogio()
+        metricas = Metricas(relogio=relogio)
+
+        @metricas.cronometrado("verificar_sinal")
+        def verificar():
+            relogio.agora += 0.25
+            return "COMPRA"
+
+        self.assertEqual(verificar(), "COMPRA")
+        self.assertEqual(metricas.quantil("etapa_segundos", 0.5, etapa="verificar_sinal"), 0.25)
+
+    def test_texto_prometheus(self):
+        metricas = Metricas()
+        metricas.descrever("etapa_segundos", "Duração de cada etapa")
+        metricas.observar("etapa_segundos", 0.003, etapa="obter_dados")
+        metricas.incrementar("api_peso_total", 2, endpoint="/api/v3/klines")
+        metricas.definir("api_peso_usado_1m", 42)
+        texto = metricas.exportar_texto()
+        self.assertIn("# TYPE fatima_etapa_segundos histogram", texto)
+        self.assertIn('fatima_etapa_segundos_bucket{etapa="obter_dados",le="+Inf"} 1', texto)
+        self.assertIn('fatima_etapa_segundos_count{etapa="obter_dados"} 1', texto)
+        self.assertIn('fatima_etapa_segundos_quantil{etapa="obter_dados",quantil="0.99"}', texto)
+        self.assertIn('fatima_api_peso_total{endpoint="/api/v3/klines"} 2.0', texto)
+        self.assertIn("fatima_api_peso_usado_1m 42.0", texto)
+
+    def test_endpoint_nao_expoe_o_token_do_telegram(self):
+        self.assertEqual(endpoint_de_url("https://api.telegram.org/bot123:ABC/sendMessage"), "telegram:sendMessage")
+        self.assertEqual(endpoint_de_url("https://api.binance.com/api/v3/klines?symbol=BTCEUR"), "/api/v3/klines")
+
+    def test_custo_por_observacao(self):
+        metricas = Metricas()
+        inicio = time.perf_counter()
+        for _ in range(10000):
+            with metricas.cronometrar("etapa_segundos", etapa="x"):
+                pass
+        # Muito abaixo de 1% de uma iteração de 5 s
+        self.assertLess((time.perf_counter() - inicio) / 10000, 0.0005)
+
+
+class TestExportacao(unittest.TestCase):
+    def test_endpoint_http_e_hook_da_sessao(self):
+        metricas = Metricas()
+        servidor = ServidorMetricas(metricas, porta=0).iniciar()
+        self.addCleanup(servidor.parar)
+        sessao = metricas.instrumentar_sessao(requests.Session())
+        self.addCleanup(sessao.close)
+
+        resposta = sessao.get(f"http://127.0.0.1:{servidor.porta}/metrics", timeout=5)
+        self.assertEqual(resposta.status_code, 200)
+        self.assertEqual(metricas.contador("api_pedidos_total", endpoint="/metrics", metodo="GET", estado=200), 1)
+        texto = sessao.get(f"http://127.0.0.1:{servidor.porta}/metrics", timeout=5).text
+        self.assertIn('fatima_api_pedidos_total{endpoint="/metrics",estado="200",metodo="GET"} 1', texto)
+
+    def test_ficheiro_gravado_ao_parar(self):
+        metricas = Metricas()
+        metricas.incrementar("api_pedidos_total", endpoint="/api/v3/order")
+        with tempfile.TemporaryDirectory() as pasta:
+            caminho = os.path.join(pasta, "metricas.prom")
+            gravador = GravadorMetricas(metricas, caminho, intervalo=3600).iniciar()
+            gravador.parar()
+            with open(caminho, encoding="utf-8") as f:
+                self.assertIn("fatima_api_pedidos_total", f.read())
+
+
+if __name__ == '__main__':
+    unittest.main()
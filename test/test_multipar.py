@@ -0,0 +1,155 @@
+import threading
+import time
+import unittest
+from collections import Counter
+from unittest import mock
+
+import numpy as np
+
+from cliente import ClienteLimitado
+from estrategia import ParametrosEstrategia
+from limites import LimitePedidos
+from multipar import EstrategiaPar, MotorMultiPar
+
+CINCO_MIN = 300_000
+
+
+class ClienteMultiPar:
+    # Preços sintéticos por símbolo; conta os pedidos por endpoint
+    def __init__(self, simbolos, n_velas=60):
+        rng = np.random.default_rng(5)
+        self.series = {s: 100 * np.exp(np.cumsum(rng.normal(0, 0.01, 500))) for s in simbolos}
+        self.vela = n_velas
+        self.chamadas = Counter()
+        self.ids_ordens = []
+
+    def get_symbol_ticker(self, **params):
+        self.chamadas['ticker'] += 1
+        return [{'symbol': s, 'price': str(serie[self.vela])} for s, serie in self.series.items()]
+
+    def get_klines(self, symbol, interval, limit):
+        self.chamadas['klines'] += 1
+        inicio = max(0, self.vela + 1 - limit)
+        return [[i * CINCO_MIN, "0", "0", "0", str(self.series[symbol][i]), "0", (i + 1) * CINCO_MIN - 1]
+                for i in range(inicio, self.vela + 1)]
+
+    def order_market_buy(self, symbol, quantity, **params):
+        self.chamadas['ordem'] += 1
+        self.ids_ordens.append(params.get('newClientOrderId'))
+        return {'side': 'BUY', 'executedQty': str(quantity),
+                'cummulativeQuoteQty': str(quantity * self.series[symbol][self.vela])}
+
+    def order_market_sell(self, symbol, quantity, **params):
+        self.chamadas['ordem'] += 1
+        self.ids_ordens.append(params.get('newClientOrderId'))
+        return {'side': 'SELL', 'executedQty': str(quantity),
+                'cummulativeQuoteQty': str(quantity * self.series[symbol][self.vela])}
+
+
+class TestMotorMultiPar(unittest.TestCase):
+    def setUp(self):
+        self.pares = [(f"M{i}", "EUR") for i in range(20)]
+        self.client = ClienteMultiPar([a + b for a, b in self.pares])
+        estrategias = [EstrategiaPar(a, b, 1.0, ParametrosEstrategia()) for a, b in self.pares]
+        self.motor = MotorMultiPar(self.client, estrategias, LimitePedidos(10**6), intervalo=0, max_threads=4)
+
+    def tearDown(self):
+        self.motor.executor.shutdown()
+
+    def iteracao(self, vela, segundos=1):
+        self.client.vela = vela
+        with mock.patch.object(time, 'time', return_value=(vela * CINCO_MIN) / 1000 + segundos):
+            self.motor.iteracao()
+
+    def test_um_pedido_de_ticker_para_todos_os_pares(self):
+        # Na mesma vela: só o ticker partilhado; klines apenas na primeira iteração de cada par
+        for segundos in range(0, 250, 50):
+            self.iteracao(60, segundos)
+        self.assertEqual(self.client.chamadas['ticker'], 5)
+        self.assertEqual(self.client.chamadas['klines'], 20)
+
+    def test_trades_por_par(self):
+        for vela in range(60, 400):
+            self.iteracao(vela)
+        self.assertEqual(self.client.chamadas['ticker'], 340)
+        self.assertEqual(self.client.chamadas['klines'], 20 * 340)
+        trades = [e.n_trade for e in self.motor.estrategias]
+        self.assertGreater(sum(trades), 0)
+        # Cada par tem o seu próprio estado
+        self.assertGreater(len(set(e.delta_total for e in self.motor.estrategias)), 1)
+
+    def test_orcamento_do_cliente_limitado(self):
+        # Sem limite próprio, o peso é contado uma só vez pelo ClienteLimitado, que dá id às ordens
+        self.motor.executor.shutdown()
+        limite = LimitePedidos(10**6)
+        estrategias = [EstrategiaPar(a, b, 1.0, ParametrosEstrategia()) for a, b in self.pares]
+        self.motor = MotorMultiPar(ClienteLimitado(self.client, limite), estrategias, None, intervalo=0,
+                                   max_threads=4)
+        self.iteracao(60)
+        self.assertEqual(limite.peso_consumido, 4 + 20 * 2)
+        self.assertIsNotNone(self.motor.servicos.ordem("M0EUR", "BUY", 1.0, "M0", "EUR"))
+        self.assertEqual(limite.peso_consumido, 4 + 20 * 2 + 1)
+        self.assertTrue(self.client.ids_ordens[-1].startswith("fatima-"))
+
+    def test_resumo_nao_se_repete_com_iteracoes_a_falhar(self):
+        # KeyboardInterrupt (como o Ctrl+C) termina o loop no fim
+        resultados = iter([RuntimeError("falha")] * 5 + [None] * 720 + [RuntimeError("falha")] * 5
+                          + [KeyboardInterrupt()])
+
+        def iteracao():
+            resultado = next(resultados)
+            if resultado is not None:
+                raise resultado
+            self.motor.iteracoes += 1
+        self.motor.iteracao = iteracao
+        self.motor.log = mock.Mock()
+        with mock.patch.object(time, 'sleep'):
+            with self.assertRaises(KeyboardInterrupt):
+                self.motor.executar()
+        resumos = [c for c in self.motor.log.call_args_list if c.args[0] == "ALERTA"]
+        self.assertEqual(len(resumos), 1)
+        self.assertIn("Iteração 720", resumos[0].args[1])
+
+
+class TestLimitePedidos(unittest.TestCase):
+    def test_espera_quando_o_orcamento_acaba(self):
+        agora = [0.0]
+        esperas = []
+
+        def dormir(segundos):
+            esperas.append(segundos)
+            agora[0] += segundos
+
+        limite = LimitePedidos(peso_por_minuto=60, relogio=lambda: agora[0], dormir=dormir)
+        for _ in range(60):
+            limite.adquirir(1)
+        self.assertEqual(esperas, [])
+        self.assertFalse(limite.adquirir(5, bloquear=False))
+        limite.adquirir(5)
+        self.assertAlmostEqual(sum(esperas), 5.0)
+
+        limite.sincronizar(usado=1140, limite=1200)
+        self.assertLessEqual(limite.disponivel(), 3.0)
+
+    def test_espera_total_com_varias_threads(self):
+        agora = [0.0]
+        esperas = []
+        trinco = threading.Lock()
+
+        def dormir(segundos):
+            with trinco:
+                esperas.append(segundos)
+                agora[0] += segundos + 1e-6  # Sem esperas residuais de arredondamento
+
+        limite = LimitePedidos(peso_por_minuto=600, rajada=1, relogio=lambda: agora[0], dormir=dormir)
+        threads = [threading.Thread(target=lambda: [limite.adquirir(1) for _ in range(200)]) for _ in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(limite.peso_consumido, 1600)
+        self.assertAlmostEqual(limite.espera_total, sum(esperas))
+
+
+if __name__ == '__main__':
+    unittest.main()
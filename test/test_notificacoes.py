@@ -0,0 +1,108 @@
+import threading
+import unittest
+
+import requests
+
+from notificacoes import NotificadorTelegram, LIMITE_TELEGRAM
+
+
+class Resposta:
+    def __init__(self, status_code, dados=None):
+        self.status_code = status_code
+        self.text = ""
+        self._dados = dados or {}
+
+    def json(self):
+        return self._dados
+
+
+class SessaoFalsa:
+    # Regista os envios; as primeiras respostas podem ser falhas simuladas
+    def __init__(self, respostas=(), bloqueio=None):
+        self.respostas = list(respostas)
+        self.bloqueio = bloqueio
+        self.enviados = []
+        self.em_envio = threading.Event()
+
+    def post(self, url, data, timeout):
+        self.em_envio.set()
+        if self.bloqueio is not None:
+            self.bloqueio.wait()
+        self.enviados.append(data["text"])
+        resposta = self.respostas.pop(0) if self.respostas else Resposta(200)
+        if isinstance(resposta, Exception):
+            raise resposta
+        return resposta
+
+
+class TestNotificadorTelegram(unittest.TestCase):
+    def novo(self, sessao, **kwargs):
+        kwargs.setdefault("intervalo_minimo", 0)
+        kwargs.setdefault("espera_base", 0.001)
+        return NotificadorTelegram("token", "chat", sessao=sessao, **kwargs)
+
+    def test_rajada_agrupada_numa_mensagem(self):
+        bloqueio = threading.Event()
+        sessao = SessaoFalsa(bloqueio=bloqueio)
+        notificador = self.novo(sessao).iniciar()
+        notificador.enviar("primeira")
+        self.assertTrue(sessao.em_envio.wait(2))  # A thread fica presa no envio da primeira mensagem
+        for i in range(5):
+            notificador.enviar(f"msg {i}")
+        bloqueio.set()
+        notificador.parar()
+        self.assertEqual(sessao.enviados, ["primeira", "msg 0\nmsg 1\nmsg 2\nmsg 3\nmsg 4"])
+        self.assertEqual(notificador.enviadas, 6)
+
+    def test_enfileirar_nao_bloqueia_e_conta_descartadas(self):
+        bloqueio = threading.Event()
+        sessao = SessaoFalsa(bloqueio=bloqueio)
+        notificador = self.novo(sessao, tamanho_fila=3).iniciar()
+        # Com o envio bloqueado, enfileirar termina na mesma (se bloqueasse, a thread ficava presa)
+        resultados = []
+        produtor = threading.Thread(target=lambda: resultados.extend(notificador.enviar(f"m{i}") for i in range(10)))
+        produtor.start()
+        produtor.join(5)
+        self.assertFalse(produtor.is_alive())
+        self.assertIn(False, resultados)
+        descartadas = notificador.descartadas
+        self.assertGreater(descartadas, 0)
+        bloqueio.set()
+        notificador.parar()
+        self.assertIn(f"⚠️ {descartadas} notificação(ões) descartada(s)", sessao.enviados[-1])
+
+    def test_descartadas_com_varias_threads(self):
+        # Sem a thread de fundo a fila enche logo: todas as mensagens a mais contam como descartadas
+        notificador = self.novo(SessaoFalsa(), tamanho_fila=1)
+        produtores = [threading.Thread(target=lambda: [notificador.enviar("m") for _ in range(2000)])
+                      for _ in range(8)]
+        for produtor in produtores:
+            produtor.start()
+        for produtor in produtores:
+            produtor.join()
+        self.assertEqual(notificador.descartadas, 8 * 2000 - 1)
+
+    def test_novas_tentativas_com_espera(self):
+        sessao = SessaoFalsa([requests.ConnectionError("falha"), Resposta(429, {"parameters": {"retry_after": 0}}),
+                              Resposta(200)])
+        notificador = self.novo(sessao).iniciar()
+        notificador.enviar("ordem")
+        notificador.parar()
+        self.assertEqual(sessao.enviados, ["ordem"] * 3)
+        self.assertEqual((notificador.enviadas, notificador.descartadas), (1, 0))
+
+    def test_falha_definitiva_conta_como_descartada(self):
+        sessao = SessaoFalsa([Resposta(500)] * 10)
+        notificador = self.novo(sessao, max_tentativas=2).iniciar()
+        notificador.enviar("ordem")
+        notificador.parar()
+        self.assertEqual(len(sessao.enviados), 2)
+        self.assertEqual(notificador.descartadas, 1)
+
+    def test_agrupar_respeita_limite(self):
+        blocos = NotificadorTelegram._agrupar(["a" * 3000, "b" * 3000, "c" * 5000])
+        self.assertEqual([len(b) for b in blocos], [3000, 3000, LIMITE_TELEGRAM])
+
+
+if __name__ == '__main__':
+    unittest.main()
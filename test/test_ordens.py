@@ -0,0 +1,103 @@
+import math
+import time
+import unittest
+from unittest import mock
+
+from cliente import ClienteLimitado
+from limites import LimitePedidos
+from ordens import ExecutorOrdens, FiltrosSimbolo, OrdemInvalida, casas_decimais
+from simulador_exchange import ClienteSimulado, SimuladorExchange, TrajetoPrecos
+
+INFO = {'symbol': 'BTCEUR', 'filters': [
+    {'filterType': 'PRICE_FILTER', 'minPrice': '0.01', 'maxPrice': '1000000.00', 'tickSize': '0.01'},
+    {'filterType': 'LOT_SIZE', 'minQty': '0.00001', 'maxQty': '9000.00000000', 'stepSize': '0.00001'},
+    {'filterType': 'MARKET_LOT_SIZE', 'minQty': '0.00000000', 'maxQty': '50.00000000', 'stepSize': '0.00000000'},
+    {'filterType': 'NOTIONAL', 'minNotional': '5.00', 'applyMinToMarket': True, 'maxNotional': '9000000.00',
+     'applyMaxToMarket': False}]}
+
+
+class TestFiltrosSimbolo(unittest.TestCase):
+    def test_filtros_do_exchange_info(self):
+        f = FiltrosSimbolo.de_info(INFO)
+        # O MARKET_LOT_SIZE limita o máximo; o maxNotional não se aplica a ordens de mercado
+        self.assertEqual((f.passo, f.quantidade_minima, f.quantidade_maxima), (0.00001, 0.00001, 50.0))
+        self.assertEqual((f.nocional_minimo, f.nocional_maximo), (5.0, math.inf))
+        self.assertEqual(f.passo_preco, 0.01)
+        antigo = {'filters': [{'filterType': 'MIN_NOTIONAL', 'minNotional': '10.0', 'applyToMarket': True}]}
+        self.assertEqual(FiltrosSimbolo.de_info(antigo).nocional_minimo, 10.0)
+        self.assertEqual(FiltrosSimbolo.de_info({}), FiltrosSimbolo())
+        self.assertEqual([casas_decimais(p) for p in (0.00001, 0.01, 1.0, 0.0)], [5, 2, 0, 8])
+
+
+class TestExecutorOrdens(unittest.TestCase):
+    def setUp(self):
+        self.client = mock.Mock()
+        self.client.get_symbol_info.return_value = INFO
+        self.executor = ExecutorOrdens(self.client, 'BTCEUR')
+        self.executor.carregar()
+
+    def test_quantidade_arredondada_ao_passo(self):
+        self.assertEqual(self.executor.preparar('BUY', 0.0012999, preco=60_000), "0.00129")
+        # Venda limitada ao saldo livre (a comissão da compra foi paga em BTC)
+        self.assertEqual(self.executor.preparar('SELL', 0.0012, 60_000, disponivel=0.0011988), "0.00119")
+        self.assertEqual(self.executor.preparar('BUY', 0.0012, preco=None), "0.00120")
+
+    def test_recusas_locais(self):
+        casos = [('BUY', 0.000009, 60_000, None, "mínimo"), ('BUY', 51.0, 60_000, None, "máximo"),
+                 ('BUY', 0.00005, 60_000, None, "nocional"), ('SELL', 0.0012, 60_000, 0.0, "mínimo")]
+        for lado, quantidade, preco, disponivel, erro in casos:
+            with self.subTest(erro=erro), self.assertRaisesRegex(OrdemInvalida, erro):
+                self.executor.preparar(lado, quantidade, preco, disponivel)
+        self.assertEqual(self.executor.recusadas, len(casos))
+        self.client.order_market_buy.assert_not_called()
+
+    def test_envio_com_id_do_cliente(self):
+        self.executor.enviar('SELL', 0.0012, "fatima-1", 60_000, disponivel=0.00119)
+        self.client.order_market_sell.assert_called_once_with(symbol='BTCEUR', quantity="0.00119",
+                                                              newClientOrderId="fatima-1")
+
+    def test_preparar_sem_pedidos(self):
+        self.client.reset_mock()
+        inicio = time.perf_counter()
+        for _ in range(10_000):
+            self.executor.preparar('BUY', 0.0012, 60_000)
+        self.assertLess((time.perf_counter() - inicio) / 10_000, 0.001)
+        self.assertEqual(self.client.method_calls, [])
+
+    def test_fundo_refresca_e_mantem_a_ligacao(self):
+        # O ping vai direto ao Client: não gasta o orçamento de peso do ClienteLimitado
+        limite = LimitePedidos(1200)
+        executor = ExecutorOrdens(ClienteLimitado(self.client, limite), 'BTCEUR', refrescar=0.05, manter_ligacao=0.01)
+        executor.carregar()
+        self.client.get_symbol_info.side_effect = [{'filters': [
+            {'filterType': 'LOT_SIZE', 'minQty': '0.001', 'maxQty': '100', 'stepSize': '0.001'}]}, Exception("timeout")]
+        executor.iniciar()
+        try:
+            limite = time.monotonic() + 5
+            while executor.refrescamentos < 2 and time.monotonic() < limite:
+                time.sleep(0.01)
+        finally:
+            executor.parar()
+        self.assertEqual(executor.filtros.passo, 0.001)
+        self.assertGreater(self.client.ping.call_count, 0)
+        self.assertFalse(executor._thread.is_alive())
+        # Só as leituras dos filtros passaram pelo ClienteLimitado (a do setUp foi direta)
+        self.assertEqual(executor.client.estatisticas['pedidos'], self.client.get_symbol_info.call_count - 1)
+
+    def test_simbolo_desconhecido(self):
+        self.client.get_symbol_info.return_value = None
+        with self.assertRaises(ValueError):
+            ExecutorOrdens(self.client, 'XYZEUR').carregar()
+
+    def test_filtros_do_simulador(self):
+        trajeto = TrajetoPrecos.sintetico(10, intervalo="1m", historico=5, velocidade=0)
+        client = ClienteSimulado(SimuladorExchange(trajeto, saldos={'BTC': 0.0, 'EUR': 1000.0}, porta=None))
+        executor = ExecutorOrdens(client, 'BTCEUR')
+        self.assertEqual(executor.carregar().passo, 0.00001)
+        preco = float(client.get_symbol_ticker(symbol='BTCEUR')['price'])
+        ordem = executor.enviar('BUY', 0.0012345, "fatima-2", preco)
+        self.assertEqual(ordem['executedQty'], "0.00123000")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,96 @@
+import unittest
+
+from binance.client import Client
+
+from ordens import ExecutorOrdens, arredondar_para_baixo
+from protecao import ProtecaoOCO
+from simulador_exchange import SimuladorExchange, TrajetoPrecos
+
+
+class Relogio:
+    def __init__(self, agora=1_700_000_000.0):
+        self.agora = agora
+
+    def __call__(self):
+        return self.agora
+
+
+class TestProtecaoOCO(unittest.TestCase):
+    def setUp(self):
+        # Velas de 1m a 60x: cada segundo real é uma vela; a vela 2 sobe a 103 e a vela 3 desce a 90
+        self.relogio = Relogio()
+        velas = [[100, 101, 99, 100, 1], [100, 100, 100, 100, 1], [100, 103, 100, 102, 1], [102, 102, 90, 91, 1]]
+        trajeto = TrajetoPrecos(velas, "1m", velocidade=60, historico=1, inicio_ms=120_000, relogio=self.relogio)
+        self.simulador = SimuladorExchange(trajeto, saldos={'BTC': 0.01, 'EUR': 0.0}, taxa=0.001).iniciar()
+        self.addCleanup(self.simulador.parar)
+        client = Client("chave", "segredo", ping=False)
+        client.API_URL = self.simulador.url_api
+        self.protecao = ProtecaoOCO(client, "BTCEUR", margem_stop_limite=0.001)
+
+    def saldos(self):
+        return self.simulador.conta.saldos
+
+    def test_take_profit_executado_na_exchange(self):
+        self.protecao.colocar(0.01, 101.5, 98.0)
+        self.assertTrue(self.protecao.ativa)
+        self.assertEqual(self.simulador.conta.bloqueado['BTC'], 0.01)
+        self.assertIsNone(self.protecao.verificar())
+
+        self.relogio.agora += 1.7  # Vela 2 passa pelo máximo (103)
+        execucao = self.protecao.verificar()
+        self.assertEqual(execucao.motivo, "TAKE-PROFIT")
+        self.assertAlmostEqual(execucao.preco, 101.5)
+        self.assertFalse(self.protecao.ativa)
+        self.assertAlmostEqual(self.saldos()['EUR'], 1.015 * 0.999)
+        self.assertEqual(self.saldos()['BTC'], 0.0)
+
+    def test_stop_loss_entre_pedidos_usa_o_minimo_do_trajeto(self):
+        self.protecao.colocar(0.01, 105.0, 98.0)
+        self.relogio.agora += 4  # Fim do trajeto (91): o mínimo (90) ficou entre os dois pedidos
+        execucao = self.protecao.verificar()
+        self.assertEqual(execucao.motivo, "STOP-LOSS")
+        self.assertAlmostEqual(execucao.preco, 97.9)  # Limite da perna de stop (0.1% abaixo)
+
+    def test_cancelar_liberta_o_saldo(self):
+        self.protecao.colocar(0.01, 105.0, 98.0)
+        self.assertIsNone(self.protecao.cancelar())
+        self.assertFalse(self.protecao.ativa)
+        self.assertEqual(self.saldos()['BTC'], 0.01)
+
+    def test_cancelar_depois_da_execucao_devolve_a_execucao(self):
+        self.protecao.colocar(0.01, 101.5, 98.0)
+        self.relogio.agora += 1.7
+        execucao = self.protecao.cancelar()
+        self.assertEqual(execucao.motivo, "TAKE-PROFIT")
+
+    def test_evento_execution_report(self):
+        self.protecao.colocar(0.01, 101.5, 98.0)
+        outro = {'e': 'executionReport', 'g': self.protecao.id_lista + 1, 'X': 'FILLED'}
+        self.assertIsNone(self.protecao.aplicar_evento(outro))
+        evento = {'e': 'executionReport', 'g': self.protecao.id_lista, 's': 'BTCEUR', 'i': 2, 'S': 'SELL',
+                  'o': 'LIMIT_MAKER', 'X': 'FILLED', 'z': '0.01000000', 'Z': '1.01500000'}
+        execucao = self.protecao.aplicar_evento(evento)
+        self.assertEqual((execucao.motivo, execucao.quantidade), ("TAKE-PROFIT", 0.01))
+        self.assertAlmostEqual(execucao.preco, 101.5)
+        self.assertEqual(execucao.ordem['side'], 'SELL')
+        self.assertFalse(self.protecao.ativa)
+
+    def test_filtros_partilhados_com_o_executor(self):
+        # A OCO arredonda com os mesmos filtros (em cache) que as ordens de mercado
+        executor = ExecutorOrdens(self.protecao.client, "BTCEUR")
+        filtros = executor.carregar()
+        protecao = ProtecaoOCO(self.protecao.client, "BTCEUR", margem_stop_limite=0.001, executor=executor)
+        self.assertEqual(protecao._passos(), (filtros.passo_preco, filtros.passo))
+        self.assertEqual(protecao._passos(), self.protecao._passos())
+        protecao.colocar(0.0099999, 105.004, 98.0)
+        self.assertEqual(protecao.quantidade, 0.00999)
+        self.assertEqual(self.simulador.conta.bloqueado['BTC'], 0.00999)
+
+    def test_arredondar_para_baixo(self):
+        self.assertEqual(arredondar_para_baixo(90450.129, 0.01), 90450.12)
+        self.assertEqual(arredondar_para_baixo(0.0011999, 0.00001), 0.00119)
+        self.assertEqual(arredondar_para_baixo(1.23456, 0), 1.23456)
+
+
+if __name__ == '__main__':
+    unittest.main()
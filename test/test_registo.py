@@ -0,0 +1,123 @@
+import glob
+import gzip
+import json
+import logging
+import os
+import tempfile
+import threading
+import unittest
+
+from ingestao_logs import analisar_linhas
+from registo import LOGGER_BOT, FicheiroRotativo, configurar_registo
+
+
+class _Contador:
+    """Valor cujo texto conta quantas vezes (e em que thread) foi formatado."""
+
+    def __init__(self):
+        self.threads = []
+
+    def __str__(self):
+        self.threads.append(threading.current_thread())
+        return "valor"
+
+
+class TestRegistoAssincrono(unittest.TestCase):
+    def setUp(self):
+        self.pasta = tempfile.TemporaryDirectory()
+        self.addCleanup(self.pasta.cleanup)
+        self.texto = os.path.join(self.pasta.name, "trading.txt")
+        self.eventos = os.path.join(self.pasta.name, "eventos.jsonl")
+        raiz = logging.getLogger()
+        handlers, nivel = list(raiz.handlers), raiz.level
+
+        def repor():
+            raiz.handlers[:] = handlers
+            raiz.setLevel(nivel)
+        self.addCleanup(repor)
+
+    def test_texto_legivel_pela_ingestao_e_eventos_jsonl(self):
+        registo = configurar_registo(self.texto, self.eventos, consola=False)
+        logging.info("%s: %s", "INFO", " *** Iteracao = 7 || VALOR BTC = 91000.50 EUR ***",
+                     extra={'tipo': "INFO", 'campos': {'iteracao': 7, 'preco': 91000.5}})
+        logging.info("%s: %s", "SINAL", "(1.1) Sinal de COMPRA! EMA cruzou", extra={'tipo': "SINAL", 'campos': {}})
+        registo.parar()
+
+        with open(self.texto, encoding='utf-8') as f:
+            tabelas = analisar_linhas(f.readlines())
+        self.assertEqual(list(tabelas['precos']['preco']), [91000.5])
+        self.assertEqual(list(tabelas['sinais']['lado']), ["COMPRA"])
+
+        with open(self.eventos, encoding='utf-8') as f:
+            eventos = [json.loads(linha) for linha in f]
+        self.assertEqual(eventos[0]['tipo'], "INFO")
+        self.assertEqual(eventos[0]['preco'], 91000.5)
+        self.assertEqual(eventos[0]['iteracao'], 7)
+        self.assertEqual(eventos[1]['msg'], "(1.1) Sinal de COMPRA! EMA cruzou")
+
+    def test_debug_formatado_so_quando_emitido_e_fora_do_chamador(self):
+        bot = logging.getLogger(LOGGER_BOT)
+        valor = _Contador()
+        registo = configurar_registo(self.texto, consola=False, nivel=logging.INFO)
+        bot.debug("DEBUG_EMA: EMA9 = %s", valor)
+        registo.parar()
+        self.assertEqual(valor.threads, [])
+
+        registo = configurar_registo(self.texto, consola=False, nivel=logging.DEBUG)
+        bot.debug("DEBUG_EMA: EMA9 = %s", valor)
+        registo.parar()
+        self.assertEqual(len(valor.threads), 1)
+        self.assertIsNot(valor.threads[0], threading.current_thread())
+
+    def test_debug_so_do_bot(self):
+        # O DEBUG das bibliotecas (urllib3, websockets, python-binance) não chega aos destinos
+        registo = configurar_registo(self.texto, self.eventos, consola=False, nivel=logging.DEBUG)
+        logging.getLogger("urllib3.connectionpool").debug("Starting new HTTPS connection")
+        logging.getLogger("binance").info("ligado")
+        logging.getLogger(LOGGER_BOT).debug("DEBUG_RSI: RSI = %.1f", 41.5)
+        registo.parar()
+        with open(self.eventos, encoding='utf-8') as f:
+            self.assertEqual([json.loads(linha)['msg'] for linha in f], ["ligado", "DEBUG_RSI: RSI = 41.5"])
+        self.assertEqual(logging.getLogger(LOGGER_BOT).level, logging.NOTSET)
+
+
+class TestFicheiroRotativo(unittest.TestCase):
+    def setUp(self):
+        self.pasta = tempfile.TemporaryDirectory()
+        self.addCleanup(self.pasta.cleanup)
+        self.caminho = os.path.join(self.pasta.name, "trading.txt")
+
+    def _registo(self, mensagem):
+        return logging.LogRecord("fatima", logging.INFO, __file__, 0, mensagem, None, None)
+
+    def test_roda_por_tamanho_comprime_e_mantem_as_copias(self):
+        ficheiro = FicheiroRotativo(self.caminho, max_bytes=100, copias=2)
+        for i in range(20):
+            ficheiro.emit(self._registo(f"linha {i:02d} " + "x" * 30))
+        ficheiro.close()
+
+        rodados = sorted(glob.glob(self.caminho + ".*"))
+        self.assertEqual(len(rodados), 2)
+        self.assertTrue(all(r.endswith(".gz") for r in rodados))
+        self.assertGreater(ficheiro.rodados, 2)
+        self.assertLessEqual(os.path.getsize(self.caminho), 100)
+        with gzip.open(rodados[-1], 'rt') as f:
+            self.assertIn("linha", f.read())
+
+    def test_roda_por_tempo(self):
+        agora = [1000.0]
+        ficheiro = FicheiroRotativo(self.caminho, intervalo=60, comprimir=False, relogio=lambda: agora[0])
+        ficheiro.emit(self._registo("antes"))
+        agora[0] += 30
+        ficheiro.emit(self._registo("ainda antes"))
+        self.assertEqual(ficheiro.rodados, 0)
+        agora[0] += 31
+        ficheiro.emit(self._registo("depois"))
+        ficheiro.close()
+        self.assertEqual(ficheiro.rodados, 1)
+        with open(self.caminho) as f:
+            self.assertEqual(f.read(), "depois\n")
+
+
+if __name__ == '__main__':
+    unittest.main()
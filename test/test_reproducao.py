@@ -0,0 +1,78 @@
+import unittest
+
+from reproducao import RelogioSimulado, ReproducaoFatima
+from simulador_exchange import TrajetoPrecos
+
+# Regras mais rápidas que as de produção, para haver trades numa reprodução curta
+CONFIGURACAO = dict(MEDIA_RAPIDA=5, MEDIA_LENTA=13, PERIODO_RSI=9, RSI_SOBRECOMPRA=55, RSI_SOBREVENDA=45,
+                    PERCENTAGEM_STOP_LOSS=0.003, PERCENTAGEM_TAKE_PROFIT=0.002)
+
+
+def reproducao(n=240, saldos=None):
+    trajeto = TrajetoPrecos.sintetico(n, 11, intervalo="5m", historico=60, relogio=RelogioSimulado())
+    return ReproducaoFatima(trajeto, saldos, configuracao=CONFIGURACAO)
+
+
+class TestReproducaoFatima(unittest.TestCase):
+    def test_loop_do_bot_em_tempo_simulado(self):
+        r = reproducao()
+        resumo = r.executar()
+
+        # As 180 velas de 5 min percorridas pelo loop (a primeira já começada), uma iteração a cada 5 s simulados
+        self.assertEqual(resumo['tempo_simulado'], r.fim_trajeto() - r.inicio)
+        self.assertGreater(resumo['tempo_simulado'], 179 * 300)
+        self.assertEqual(resumo['iteracoes'], resumo['tempo_simulado'] // 5)
+        self.assertGreater(resumo['aceleracao'], 100)
+        self.assertIsNone(resumo['terminado'])
+
+        trades = r.trades()
+        self.assertGreaterEqual(len(trades), 2)
+        self.assertEqual([t['n_trade'] for t in trades], list(range(1, resumo['trades'] + 1)))
+        # As ordens e os saldos são os da conta simulada
+        self.assertEqual(resumo['ordens'], 2 * resumo['trades'] + resumo['posicao_aberta'])
+        # O PnL vem das execuções registadas no diário de trades
+        self.assertEqual(resumo['diario']['trades'], resumo['trades'])
+        self.assertAlmostEqual(resumo['diario']['pnl'], resumo['delta_saldo_total'], places=9)
+        if not resumo['posicao_aberta']:
+            # Variação da conta, com a comissão das compras (paga em BTC) ao preço do fecho
+            variacao_btc = resumo['saldos']['BTC'] - r.fatima.QTD_INIT_BTC
+            self.assertAlmostEqual(resumo['saldos']['EUR'] - 1000 + variacao_btc * trades[-1]['saida'],
+                                   resumo['delta_saldo_total'], delta=0.01)
+        # Os eventos têm a hora simulada
+        self.assertEqual(r.eventos[0][0], r.inicio)
+        self.assertLessEqual(r.eventos[-1][0], r.relogio.agora)
+
+    def test_determinista_e_por_partes(self):
+        inteira = reproducao()
+        inteira.executar()
+        por_partes = reproducao()
+        por_partes.executar(segundos=6 * 3600)
+        por_partes.executar(iteracoes=1000)
+        por_partes.executar()
+        self.assertEqual(por_partes.iteracoes, inteira.iteracoes)
+        self.assertEqual(por_partes.trades(), inteira.trades())
+
+    def test_venda_limitada_ao_saldo_livre(self):
+        # Sem BTC extra a comissão da compra deixa menos que QUANTIDADE: a venda é ajustada ao saldo livre
+        r = reproducao(n=160, saldos={'BTC': 0.0, 'EUR': 1000.0})
+        resumo = r.executar()
+        self.assertIsNone(resumo['terminado'])
+        self.assertGreaterEqual(resumo['trades'], 1)
+        self.assertNotIn("ERRO", [evento[1] for evento in r.eventos])
+        self.assertLess(resumo['saldos']['BTC'], r.fatima.executor_ordens.filtros.passo)
+
+    def test_ordem_rejeitada_nao_termina_o_bot(self):
+        # Sem EUR para a compra a Binance recusa a ordem (-2010): o bot regista o erro e continua
+        r = reproducao(n=160, saldos={'BTC': 0.0, 'EUR': 1.0})
+        resumo = r.executar()
+        self.assertIsNone(resumo['terminado'])
+        self.assertEqual(resumo['iteracoes'], resumo['tempo_simulado'] // 5)
+        erros = [mensagem for _, tipo, mensagem, *_ in r.eventos if tipo == "ERRO"]
+        self.assertIn("-2010", erros[0])
+        self.assertIn("Ordem de compra falhou", erros[1])
+        self.assertEqual((resumo['trades'], resumo['ordens'], resumo['posicao_aberta']), (0, 0, False))
+        self.assertIsNone(r.fatima.ordem_pendente)
+
+
+if __name__ == '__main__':
+    unittest.main()
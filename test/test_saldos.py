@@ -0,0 +1,66 @@
+import unittest
+
+from saldos import CacheSaldos
+
+
+class ClienteConta:
+    def __init__(self):
+        self.chamadas = 0
+        self.balances = [{'asset': 'BTC', 'free': '0.0010000'}, {'asset': 'EUR', 'free': '130.00'}]
+
+    def get_account(self):
+        self.chamadas += 1
+        return {'balances': self.balances}
+
+
+class Relogio:
+    def __init__(self):
+        self.agora = 0.0
+
+    def __call__(self):
+        return self.agora
+
+
+class TestCacheSaldos(unittest.TestCase):
+    def setUp(self):
+        self.client = ClienteConta()
+        self.relogio = Relogio()
+        self.cache = CacheSaldos(self.client, ttl=60, relogio=self.relogio)
+
+    def test_refresca_apenas_quando_o_ttl_expira(self):
+        for _ in range(10):
+            self.assertEqual(self.cache.obter('EUR'), 130.0)
+            self.cache.todos()
+        self.assertEqual(self.client.chamadas, 1)
+        self.relogio.agora = 61
+        self.cache.obter('BTC')
+        self.assertEqual(self.client.chamadas, 2)
+
+    def test_aplica_fills_da_ordem(self):
+        self.cache.refrescar()
+        compra = {'side': 'BUY', 'executedQty': '0.0012', 'cummulativeQuoteQty': '110.40',
+                  'fills': [{'price': '92000', 'qty': '0.0012', 'commission': '0.0000012', 'commissionAsset': 'BTC'}]}
+        self.assertTrue(self.cache.aplicar_ordem(compra, 'BTC', 'EUR'))
+        self.assertAlmostEqual(self.cache.obter('BTC'), 0.001 + 0.0012 - 0.0000012)
+        self.assertAlmostEqual(self.cache.obter('EUR'), 130.0 - 110.40)
+
+        venda = {'side': 'SELL', 'executedQty': '0.0012', 'cummulativeQuoteQty': '111.00',
+                 'fills': [{'price': '92500', 'qty': '0.0012', 'commission': '0.11', 'commissionAsset': 'EUR'}]}
+        self.cache.aplicar_ordem(venda, 'BTC', 'EUR')
+        self.assertAlmostEqual(self.cache.obter('EUR'), 130.0 - 110.40 + 111.00 - 0.11)
+        self.assertEqual(self.client.chamadas, 1)
+
+    def test_resposta_incompleta_invalida_o_cache(self):
+        self.cache.refrescar()
+        self.assertFalse(self.cache.aplicar_ordem({'symbol': 'BTCEUR', 'executedQty': 0.0012}, 'BTC', 'EUR'))
+        self.cache.obter('BTC')
+        self.assertEqual(self.client.chamadas, 2)
+
+    def test_evento_do_user_data_stream(self):
+        self.cache.refrescar()
+        self.cache.aplicar_evento_conta({'e': 'outboundAccountPosition', 'B': [{'a': 'EUR', 'f': '50.5', 'l': '0'}]})
+        self.assertEqual(self.cache.obter('EUR'), 50.5)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,125 @@
+import time
+import unittest
+
+import requests
+from binance.client import Client
+from binance.exceptions import BinanceAPIException
+
+from mercado_stream import StreamMercado
+from simulador_exchange import Falhas, SimuladorExchange, TrajetoPrecos
+
+
+class Relogio:
+    def __init__(self, agora=1_700_000_000.0):
+        self.agora = agora
+
+    def __call__(self):
+        return self.agora
+
+
+def cliente(simulador):
+    client = Client("chave", "segredo", ping=False)
+    client.API_URL = simulador.url_api
+    return client
+
+
+class TestTrajetoPrecos(unittest.TestCase):
+    def setUp(self):
+        self.relogio = Relogio()
+        velas = [[100, 104, 99, 103, 1], [103, 103, 95, 96, 1], [96, 98, 95, 97, 1]]
+        self.trajeto = TrajetoPrecos(velas, "1m", velocidade=60, historico=1, inicio_ms=120_000,
+                                     relogio=self.relogio)
+
+    def test_vela_em_formacao_percorre_minimo_e_maximo(self):
+        # Arranque no início da vela 1 (descida): open -> high -> low -> close
+        self.assertEqual(self.trajeto.preco(), 103)
+        self.relogio.agora += 2 / 3  # 2/3 da vela (40 s simulados)
+        self.assertAlmostEqual(self.trajeto.preco(), 95)
+        kline = self.trajeto.klines()[-1]
+        self.assertEqual(kline[0], 120_000)
+        self.assertEqual((kline[2], kline[3]), ("103.00", "95.00"))
+
+    def test_velocidade_e_fim_do_trajeto(self):
+        self.relogio.agora += 1  # 60 s simulados: vela 2 em formação
+        self.assertEqual(len(self.trajeto.klines()), 3)
+        self.assertEqual(self.trajeto.klines(limite=1)[0][0], 180_000)
+        self.relogio.agora += 100
+        self.assertEqual(self.trajeto.preco(), 97)
+
+
+class TestSimuladorExchange(unittest.TestCase):
+    def iniciar(self, **kwargs):
+        trajeto = TrajetoPrecos.sintetico(n=1000, intervalo="5m", historico=200)
+        simulador = SimuladorExchange(trajeto, saldos={'BTC': 0.0, 'EUR': 1000.0}, **kwargs).iniciar()
+        self.addCleanup(simulador.parar)
+        return simulador
+
+    def test_endpoints_rest_com_o_cliente_binance(self):
+        simulador = self.iniciar(taxa=0.001)
+        client = cliente(simulador)
+        klines = client.get_klines(symbol="BTCEUR", interval="5m", limit=50)
+        self.assertEqual(len(klines), 50)
+        self.assertEqual(klines[1][0] - klines[0][0], 300_000)
+        preco = float(client.get_symbol_ticker(symbol="BTCEUR")['price'])
+        self.assertAlmostEqual(float(klines[-1][4]), preco, delta=preco * 0.001)
+
+        ordem = client.order_market_buy(symbol="BTCEUR", quantity=0.001)
+        self.assertEqual(ordem['status'], 'FILLED')
+        self.assertEqual(ordem['fills'][0]['commissionAsset'], 'BTC')
+        saldos = {b['asset']: float(b['free']) for b in client.get_account()['balances']}
+        self.assertAlmostEqual(saldos['BTC'], 0.001 * 0.999)
+        self.assertAlmostEqual(saldos['EUR'], 1000 - float(ordem['cummulativeQuoteQty']))
+        self.assertIn('x-mbx-used-weight-1m', client.response.headers)
+
+        with self.assertRaises(BinanceAPIException) as erro:
+            client.order_market_sell(symbol="BTCEUR", quantity=1)
+        self.assertEqual(erro.exception.code, -2010)
+
+    def test_limite_de_peso_429_e_banimento_418(self):
+        simulador = self.iniciar(falhas=Falhas(limite_peso=5, banir_apos=1, duracao_banimento=60))
+        client = cliente(simulador)
+        for _ in range(2):
+            client.get_klines(symbol="BTCEUR", interval="5m", limit=5)
+        with self.assertRaises(BinanceAPIException) as erro:
+            client.get_klines(symbol="BTCEUR", interval="5m", limit=5)
+        self.assertEqual(erro.exception.status_code, 429)
+        self.assertIn('Retry-After', erro.exception.response.headers)
+        estados = []
+        for _ in range(2):
+            try:
+                client.get_server_time()
+            except BinanceAPIException as e:
+                estados.append(e.status_code)
+        self.assertEqual(estados, [429, 418])
+        self.assertEqual(simulador.estatisticas['erros_418'], 1)
+
+    def test_latencia_e_ligacoes_cortadas(self):
+        simulador = self.iniciar(falhas=Falhas(latencia=0.05))
+        client = cliente(simulador)
+        inicio = time.perf_counter()
+        client.get_server_time()
+        self.assertGreaterEqual(time.perf_counter() - inicio, 0.05)
+
+        requests.post(simulador.url_api.replace("/api", "/sim/falhas"), data={'prob_queda': 1.0, 'latencia': 0})
+        with self.assertRaises(requests.exceptions.ConnectionError):
+            client.get_server_time()
+        self.assertEqual(simulador.estatisticas['quedas'], 1)
+        estado = requests.get(simulador.url_api.replace("/api", "/sim/estado")).json()
+        self.assertEqual(estado['falhas']['prob_queda'], 1.0)
+
+    def test_streams_para_o_stream_mercado(self):
+        simulador = self.iniciar(porta_stream=0, intervalo_stream=0.05)
+        stream = StreamMercado("BTCEUR", "5m", url_base=simulador.stream.url).iniciar()
+        self.addCleanup(stream.parar)
+        tipos = set()
+        limite = time.monotonic() + 5
+        while time.monotonic() < limite and not {'VELA', 'PRECO'} <= tipos:
+            evento = stream.proximo_evento(timeout=1)
+            if evento:
+                tipos.add(evento[0])
+        self.assertLessEqual({'VELA', 'PRECO'}, tipos)
+        self.assertIsNotNone(stream.ultimo_preco)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,77 @@
+import unittest
+
+import numpy as np
+
+from estrategia import ParametrosEstrategia
+from indicadores import MotorIndicadores
+from sombra import MotorSombra, VarianteSombra
+
+
+def fechos(n=3000, semente=11):
+    rng = np.random.default_rng(semente)
+    return 90000 * np.exp(np.cumsum(rng.normal(0, 0.002, n)))
+
+
+class TestIndicadoresPartilhados(unittest.TestCase):
+    def test_vista_igual_a_um_motor_proprio(self):
+        partilhado = MotorIndicadores(9, 21, 14).registar(spans=[5, 30], periodos=[7])
+        proprio = MotorIndicadores(5, 30, 7)
+        vista = partilhado.vista(5, 30, 7)
+        for i, close in enumerate(fechos(200)):
+            partilhado.fechar_vela(close, i)
+            proprio.fechar_vela(close, i)
+        partilhado.atualizar_provisoria(91000.0)
+        proprio.atualizar_provisoria(91000.0)
+        self.assertEqual(len(vista), len(proprio))
+        for coluna in MotorIndicadores.COLUNAS:
+            np.testing.assert_allclose(vista[coluna], proprio[coluna])
+
+    def test_registar_depois_das_velas_falha(self):
+        motor = MotorIndicadores(9, 21, 14)
+        motor.registar(spans=[9, 21])  # Já existentes: nada a fazer
+        motor.fechar_vela(100.0)
+        with self.assertRaises(ValueError):
+            motor.registar(spans=[50])
+
+
+class TestMotorSombra(unittest.TestCase):
+    def test_variantes_partilhadas_iguais_a_variantes_isoladas(self):
+        variantes = {
+            'base': {},
+            'ema5_21': dict(media_rapida=5),
+            'rsi7_sl1': dict(periodo_rsi=7, stop_loss=0.01, rsi_sobrevenda=35),
+        }
+        motor = MotorIndicadores(9, 21, 14)
+        sombra = MotorSombra(motor, variantes, quantidade=0.0012, taxa=0.08)
+
+        isoladas = []
+        for variante in sombra.variantes:
+            p = variante.parametros
+            proprio = MotorIndicadores(p.media_rapida, p.media_lenta, p.periodo_rsi)
+            isoladas.append((proprio, VarianteSombra(variante.nome, p, proprio, 0.0012, 0.08)))
+
+        for i, close in enumerate(fechos()):
+            motor.fechar_vela(close, i)
+            sombra.passo(close)
+            for proprio, variante in isoladas:
+                proprio.fechar_vela(close, i)
+                variante.passo(close)
+
+        for variante, (_, isolada) in zip(sombra.variantes, isoladas):
+            self.assertEqual(variante.trades, isolada.trades)
+        self.assertGreater(sum(v.n_trade for v in sombra.variantes), 0)
+        classificacao = sombra.classificacao()
+        self.assertEqual([r['delta_total'] for r in classificacao],
+                         sorted((r['delta_total'] for r in classificacao), reverse=True))
+
+    def test_stop_loss_em_papel(self):
+        motor = MotorIndicadores(9, 21, 14)
+        variante = MotorSombra(motor, {'v': ParametrosEstrategia()}, 1.0, taxa=0.0).variantes[0]
+        variante.comprar(100.0)
+        variante.passo(97.0)
+        self.assertFalse(variante.posicao_aberta)
+        self.assertEqual(variante.trades, [(100.0, 97.0, -3.0, 'STOP-LOSS')])
+
+
+if __name__ == '__main__':
+    unittest.main()
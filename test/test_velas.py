@@ -0,0 +1,47 @@
+import unittest
+import numpy as np
+
+from velas import BufferVelas, intervalo_ms
+
+MINUTO = 60_000
+
+
+def kline(t, close):
+    # Mesmo formato de client.get_klines (valores numéricos em texto)
+    return [t, "1.0", "2.0", "0.5", str(close), "10.0", t + MINUTO - 1, "0", 1, "0", "0", "0"]
+
+
+class TestBufferVelas(unittest.TestCase):
+    def test_mesclar_apenas_novas_e_revistas(self):
+        buffer = BufferVelas(capacidade=5)
+        self.assertEqual(buffer.mesclar([kline(i * MINUTO, 100 + i) for i in range(3)]), 3)
+        # Nova janela: a vela 2 foi revista e a vela 3 é nova
+        self.assertEqual(buffer.mesclar([kline(1 * MINUTO, 101), kline(2 * MINUTO, 200), kline(3 * MINUTO, 103)]), 1)
+        np.testing.assert_array_equal(buffer['close'], [100, 101, 200, 103])
+        self.assertEqual(buffer.ultimo_tempo, 3 * MINUTO)
+
+    def test_janela_circular_e_views_sem_copia(self):
+        buffer = BufferVelas(capacidade=4)
+        for i in range(10):
+            buffer.acrescentar(kline(i * MINUTO, i))
+        closes = buffer['close']
+        np.testing.assert_array_equal(closes, [6, 7, 8, 9])
+        np.testing.assert_array_equal(buffer['time'], np.arange(6, 10) * MINUTO)
+        self.assertTrue(closes.flags['C_CONTIGUOUS'])
+        self.assertFalse(closes.flags['OWNDATA'])
+        self.assertEqual(buffer['time'].dtype, np.int64)
+
+        df = buffer.como_dataframe()
+        self.assertEqual(list(df['close']), [6, 7, 8, 9])
+
+    def test_limite_pedido(self):
+        buffer = BufferVelas(capacidade=50)
+        self.assertEqual(buffer.limite_pedido("5m", 0), 50)
+        buffer.acrescentar(kline(0, 1))
+        self.assertEqual(buffer.limite_pedido("5m", 60_000), 2)
+        self.assertEqual(buffer.limite_pedido("5m", 3 * intervalo_ms("5m") + 1), 5)
+        self.assertEqual(buffer.limite_pedido("5m", 10**12), 50)
+
+
+if __name__ == '__main__':
+    unittest.main()
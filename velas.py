@@ -0,0 +1,96 @@
+"""Buffer circular de velas (OHLCV + tempos) com arrays NumPy de tipo fixo.
+
+Guarda as últimas ``capacidade`` velas de um par sem alocar memória nova a
+cada iteração: cada consulta a ``get_klines`` só escreve as velas novas ou a
+vela em formação que mudou. Cada vela é escrita duas vezes (posição ``i`` e
+``i + capacidade``) para que a janela cronológica seja sempre uma fatia
+contígua dos arrays, ou seja, uma *view* sem cópia.
+"""
+import numpy as np
+import pandas as pd
+
+# Colunas do resultado de get_klines guardadas no buffer (índice na linha da kline)
+COLUNAS = {
+    'time': (0, np.int64),
+    'open': (1, np.float64),
+    'high': (2, np.float64),
+    'low': (3, np.float64),
+    'close': (4, np.float64),
+    'volume': (5, np.float64),
+    'close_time': (6, np.int64),
+}
+
+_MS_POR_UNIDADE = {'s': 1_000, 'm': 60_000, 'h': 3_600_000, 'd': 86_400_000, 'w': 604_800_000}
+
+
+def intervalo_ms(timeframe):
+    """Converte um intervalo da Binance ('1m', '5m', '1h', ...) em milissegundos."""
+    return int(timeframe[:-1]) * _MS_POR_UNIDADE[timeframe[-1]]
+
+
+class BufferVelas:
+    """Janela das últimas ``capacidade`` velas de um par."""
+
+    def __init__(self, capacidade=500):
+        self.capacidade = capacidade
+        self._arrays = {nome: np.zeros(2 * capacidade, dtype=tipo) for nome, (_, tipo) in COLUNAS.items()}
+        self._pos = 0      # Próxima posição de escrita em [0, capacidade)
+        self._n = 0        # Número de velas válidas (<= capacidade)
+
+    def __len__(self):
+        return self._n
+
+    @property
+    def empty(self):
+        return self._n == 0
+
+    @property
+    def ultimo_tempo(self):
+        return int(self._arrays['time'][self._pos - 1]) if self._n else None
+
+    def __getitem__(self, coluna):
+        """View cronológica (sem cópia) de uma coluna. Não deve ser alterada."""
+        fim = self._pos + self.capacidade
+        return self._arrays[coluna][fim - self._n:fim]
+
+    def _escrever(self, slot, kline):
+        for nome, (indice, tipo) in COLUNAS.items():
+            valor = int(kline[indice]) if tipo is np.int64 else float(kline[indice])
+            self._arrays[nome][slot] = valor
+            self._arrays[nome][slot + self.capacidade] = valor
+
+    def acrescentar(self, kline):
+        """Acrescenta uma vela no fim, descartando a mais antiga se o buffer estiver cheio."""
+        self._escrever(self._pos, kline)
+        self._pos = (self._pos + 1) % self.capacidade
+        self._n = min(self._n + 1, self.capacidade)
+
+    def mesclar(self, klines):
+        """Integra o resultado de ``get_klines``: só as velas novas ou alteradas são escritas.
+
+        Devolve o número de velas novas acrescentadas.
+        """
+        ultimo = self.ultimo_tempo
+        inicio = len(klines)
+        # Percorre do fim para o início: normalmente só a última (ou as duas últimas) velas interessam
+        while inicio > 0 and (ultimo is None or int(klines[inicio - 1][0]) >= ultimo):
+            inicio -= 1
+        novas = 0
+        for kline in klines[inicio:]:
+            if ultimo is not None and int(kline[0]) == ultimo:
+                self._escrever((self._pos - 1) % self.capacidade, kline)  # Vela em formação revista
+            else:
+                self.acrescentar(kline)
+                novas += 1
+        return novas
+
+    def limite_pedido(self, timeframe, agora_ms, minimo=2):
+        """Número de klines a pedir para cobrir as velas em falta desde a última guardada."""
+        if self.empty:
+            return self.capacidade
+        em_falta = (agora_ms - self.ultimo_tempo) // intervalo_ms(timeframe)
+        return int(min(self.capacidade, max(minimo, em_falta + 2)))
+
+    def como_dataframe(self):
+        """DataFrame construído sobre as views do buffer (para código que ainda usa pandas)."""
+        return pd.DataFrame({nome: self[nome] for nome in COLUNAS}, copy=False)